@@ -0,0 +1,434 @@
+"""
+Alert Correlator - Correlação de alertas por topologia (tempestade de alertas)
+
+Quando um switch/uplink cai, todos os dispositivos atrás dele falham ao mesmo tempo e cada
+um dispararia o próprio alerta de disponibilidade/latência. O correlator fica entre a
+avaliação dos triggers e o alert_manager.create_alert:
+
+  - cada dispositivo pertence a um grupo: o pai configurado (settings['correlation']['parents'])
+    ou a sub-rede (/24 por padrão), cujo pai é o gateway aprendido no scan (nics[].gateway)
+    quando ele também está no inventário;
+  - alertas de métricas de conectividade ficam retidos por hold_seconds; se nesse meio tempo o
+    grupo tiver falhas simultâneas suficientes (ou o pai estiver fora), sai um único alerta pai
+    ("Falha em Massa: ...") e os alertas dos filhos são suprimidos (nenhuma linha no banco);
+  - o estado é incremental: cada amostra custa O(1) e o flush de cada ciclo só percorre os
+    candidatos retidos e os incidentes abertos.
+"""
+import copy
+import time
+import logging
+import ipaddress
+import threading
+from collections import Counter
+from datetime import datetime
+
+from models import Alert, Device
+from alert_manager import alert_manager
+from event_bus import event_bus
+
+logger = logging.getLogger("AlertCorrelator")
+
+# settings['correlation'] sobrescreve chave a chave
+DEFAULT_CONFIG = {
+    'enabled': True,
+    'metrics': ['availability', 'latency', 'packet_loss'],  # métricas de conectividade correlacionadas
+    'subnet_prefix': 24,        # agrupamento padrão quando não há pai configurado
+    'min_devices': 3,           # falhas simultâneas mínimas no grupo para virar incidente
+    'min_ratio': 0.5,           # fração mínima do grupo falhando
+    'hold_seconds': 30,         # retenção dos alertas candidatos antes de liberar individualmente
+    'parents': {},              # {ip, hostname ou CIDR do filho: ip ou hostname do pai}
+}
+
+# Releitura do inventário/gateways para a topologia (s)
+TOPOLOGY_SYNC_SECONDS = 300
+TITLE_PREFIX = "Falha em Massa"
+SEVERITY_ORDER = ['info', 'warning', 'average', 'high', 'disaster']
+# Filhos citados por nome na mensagem do alerta pai
+MESSAGE_SAMPLE = 5
+DOWN = 'down'
+
+
+def load_correlation_config():
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    try:
+        from utils import load_general_settings
+        config.update(load_general_settings().get('correlation') or {})
+    except Exception as e:
+        logger.debug(f"Usando configuração de correlação padrão: {e}")
+    return config
+
+
+def _gateways(nics):
+    """Gateways IPv4 declarados nas placas de rede auditadas (nics[].gateway: str ou lista)"""
+    found = []
+    for nic in nics or []:
+        if not isinstance(nic, dict):
+            continue
+        gateway = nic.get('gateway')
+        for gw in (gateway if isinstance(gateway, list) else [gateway]):
+            if gw and isinstance(gw, str) and '.' in gw:
+                found.append(gw.strip())
+    return found
+
+
+class Incident:
+    """Falha correlacionada de um grupo: um alerta pai, filhos suprimidos"""
+    __slots__ = ('group', 'alert_id', 'opened_at', 'children', 'suppressed', 'reported')
+
+    def __init__(self, group, alert_id, opened_at):
+        self.group = group
+        self.alert_id = alert_id
+        self.opened_at = opened_at
+        self.children = set()     # dispositivos que falharam durante o incidente
+        self.suppressed = 0       # alertas individuais que não foram criados
+        self.reported = None      # (filhos, suprimidos) já escritos na mensagem
+
+
+class AlertCorrelator:
+    """Agrupa falhas simultâneas por pai/sub-rede e emite um alerta pai por grupo"""
+
+    def __init__(self, config=None, clock=time.time):
+        """
+        Args:
+            config: Configuração fixa (testes); None = settings['correlation'] sobre DEFAULT_CONFIG
+            clock: Relógio em segundos (testes)
+        """
+        self._fixed_config = config
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.config.update(config or {})
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._loaded_at = None
+
+        # Topologia
+        self.group_of = {}          # device_id -> grupo (('parent', id) ou ('subnet', 'a.b.c.0/24'))
+        self.members = {}           # grupo -> quantidade de dispositivos monitorados
+        self.parent_of = {}         # grupo -> device_id do pai (switch/gateway), se conhecido
+        self.labels = {}            # grupo -> descrição para o alerta
+        self.hostnames = {}         # device_id -> hostname/ip
+
+        # Estado incremental
+        self._failing = {}          # device_id -> motivos ('down' ou trigger_id)
+        self._group_failing = {}    # grupo -> {device_id falhando}
+        self._pending = {}          # (device_id, trigger_id) -> [trigger, valor, desde]
+        self._suppressed = {}       # (device_id, trigger_id) -> grupo
+        self.incidents = {}         # grupo -> Incident
+        self.stats = {'held': 0, 'released': 0, 'suppressed': 0, 'incidents': 0, 'resolved': 0}
+
+    # ------------------------------------------------------------------ topologia
+
+    def refresh(self, session, force=False, now=None):
+        """
+        Recarrega a topologia do inventário (no máximo a cada TOPOLOGY_SYNC_SECONDS).
+
+        Returns:
+            bool: True se recarregou
+        """
+        now = now if now is not None else self.clock()
+        if not force and self._loaded_at is not None and now - self._loaded_at < TOPOLOGY_SYNC_SECONDS:
+            return False
+        if self._fixed_config is None:
+            self.config = load_correlation_config()
+        rows = session.query(Device.id, Device.ip, Device.hostname, Device.nics).all()
+        self.load_topology(rows)
+        first = self._loaded_at is None
+        self._loaded_at = now
+        if first:
+            self._adopt_open_incidents(session, now)
+        return True
+
+    def load_topology(self, rows):
+        """
+        Monta os grupos a partir de (id, ip, hostname, nics) do inventário.
+        O pai de uma sub-rede é o gateway mais citado pelos membros auditados, se estiver no inventário.
+        """
+        by_ip, by_name, hostnames = {}, {}, {}
+        for device_id, ip, hostname, _ in rows:
+            by_ip[ip] = device_id
+            if hostname:
+                by_name[hostname.lower()] = device_id
+            hostnames[device_id] = hostname or ip
+
+        def resolve(name):
+            name = str(name).strip()
+            return by_ip.get(name, by_name.get(name.lower()))
+
+        # Pais configurados: filho por ip/hostname exato ou por CIDR
+        exact, networks = {}, []
+        for child, parent in (self.config.get('parents') or {}).items():
+            parent_id = resolve(parent)
+            if parent_id is None:
+                logger.warning(f"Pai configurado '{parent}' de '{child}' não está no inventário")
+                continue
+            if '/' in str(child):
+                try:
+                    networks.append((ipaddress.ip_network(child, strict=False), parent_id))
+                except ValueError:
+                    logger.warning(f"Rede inválida na topologia configurada: {child}")
+            else:
+                exact[str(child).strip().lower()] = parent_id
+
+        prefix = int(self.config.get('subnet_prefix') or 24)
+        group_of, labels, gateways = {}, {}, {}
+        for device_id, ip, hostname, nics in rows:
+            try:
+                address = ipaddress.ip_address(ip)
+            except ValueError:
+                continue
+            parent_id = exact.get(ip) or exact.get((hostname or '').lower())
+            if parent_id is None:
+                parent_id = next((pid for net, pid in networks if address in net), None)
+            if parent_id is not None and parent_id != device_id:
+                group = ('parent', parent_id)
+            else:
+                net = ipaddress.ip_network(f"{ip}/{prefix if address.version == 4 else 64}", strict=False)
+                group = ('subnet', str(net))
+                gateways.setdefault(group, Counter()).update(_gateways(nics))
+            group_of[device_id] = group
+
+        parent_of = {}
+        for group in set(group_of.values()):
+            if group[0] == 'parent':
+                parent_of[group] = group[1]
+                labels[group] = hostnames[group[1]]
+                continue
+            learned = [by_ip[gw] for gw, _ in gateways.get(group, Counter()).most_common() if gw in by_ip]
+            if learned:
+                parent_of[group] = learned[0]
+            labels[group] = group[1] + (f" via {hostnames[learned[0]]}" if learned else "")
+
+        # O pai não é membro do próprio grupo: seus alertas seguem direto
+        for group, parent_id in parent_of.items():
+            if group_of.get(parent_id) == group:
+                del group_of[parent_id]
+        members = Counter(group_of.values())
+
+        with self._lock:
+            self.group_of, self.members, self.parent_of = group_of, members, parent_of
+            self.labels, self.hostnames = labels, hostnames
+            # Falhas em andamento reagrupadas pela topologia nova
+            self._group_failing = {}
+            for device_id in self._failing:
+                group = group_of.get(device_id)
+                if group is not None:
+                    self._group_failing.setdefault(group, set()).add(device_id)
+        logger.info(f"[Correlação] Topologia: {len(group_of)} dispositivos em {len(members)} grupos, "
+                    f"{len(parent_of)} com pai conhecido")
+
+    def _adopt_open_incidents(self, session, now):
+        """Alertas pai abertos antes de um restart voltam a ser acompanhados (e resolvidos)"""
+        by_title = {self._title(group): group for group in self.labels}
+        rows = session.query(Alert.id, Alert.title).filter(
+            Alert.resolved_at == None, Alert.title.like(f"{TITLE_PREFIX}:%")).all()
+        with self._lock:
+            for alert_id, title in rows:
+                group = by_title.get(title)
+                if group is not None and group not in self.incidents:
+                    self.incidents[group] = Incident(group, alert_id, now)
+
+    def _title(self, group):
+        return f"{TITLE_PREFIX}: {self.labels.get(group, group[1])}"
+
+    # ------------------------------------------------------------------ amostras
+
+    def _mark(self, device_id, reason):
+        self._failing.setdefault(device_id, set()).add(reason)
+        group = self.group_of.get(device_id)
+        if group is not None:
+            self._group_failing.setdefault(group, set()).add(device_id)
+
+    def _unmark(self, device_id, reason):
+        reasons = self._failing.get(device_id)
+        if not reasons or reason not in reasons:
+            return
+        reasons.discard(reason)
+        if reasons:
+            return
+        del self._failing[device_id]
+        group = self.group_of.get(device_id)
+        failing = self._group_failing.get(group)
+        if failing is not None:
+            failing.discard(device_id)
+            if not failing:
+                del self._group_failing[group]
+
+    def observe(self, device_id, online):
+        """Resultado da sonda de alcançabilidade do ciclo (online/offline)"""
+        if online and device_id not in self._failing:
+            return  # caminho comum: sem estado para atualizar
+        with self._lock:
+            if online:
+                self._unmark(device_id, DOWN)
+            else:
+                self._mark(device_id, DOWN)
+
+    def submit(self, session, device, trigger, current_value, now=None):
+        """
+        Trigger violado (já cobrindo a duração): cria o alerta, retém para correlação ou suprime.
+
+        Returns:
+            Alert criado na hora, ou None (retido, suprimido ou já existente)
+        """
+        group = self.group_of.get(device.id)
+        if (not self.config.get('enabled') or group is None
+                or trigger.metric_type not in self.config.get('metrics', ())):
+            return alert_manager.create_alert(device.id, trigger, current_value, session)
+
+        key = (device.id, trigger.id)
+        now = now if now is not None else self.clock()
+        with self._lock:
+            self._mark(device.id, trigger.id)
+            if key in self._suppressed or key in alert_manager.active_alerts:
+                return None
+            incident = self.incidents.get(group)
+            if incident is not None:
+                # Grupo já em incidente: o alerta pai cobre este filho
+                incident.children.add(device.id)
+                incident.suppressed += 1
+                self._suppressed[key] = group
+                self.stats['suppressed'] += 1
+                return None
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = [trigger, current_value, now]
+                self.stats['held'] += 1
+            else:
+                pending[1] = current_value
+        return None
+
+    def clear(self, device_id, trigger_id):
+        """Trigger não violado nesta amostra: o filho deixa de contar como falha"""
+        if device_id not in self._failing:
+            return
+        key = (device_id, trigger_id)
+        with self._lock:
+            self._unmark(device_id, trigger_id)
+            self._pending.pop(key, None)
+            self._suppressed.pop(key, None)
+
+    # ------------------------------------------------------------------ ciclo
+
+    def _is_storm(self, group):
+        failing = self._group_failing.get(group)
+        if not failing:
+            return False
+        parent_id = self.parent_of.get(group)
+        if parent_id is not None and DOWN in self._failing.get(parent_id, ()):
+            return True  # o pai está fora: causa raiz conhecida
+        count = len(failing)
+        return (count >= self.config['min_devices']
+                and count >= self.config['min_ratio'] * self.members.get(group, count))
+
+    def flush(self, session, now=None):
+        """
+        Fim do ciclo de coleta: abre incidentes dos grupos em tempestade, libera os candidatos
+        retidos há mais de hold_seconds e resolve incidentes sem filhos falhando.
+        Custo proporcional aos candidatos retidos + incidentes abertos.
+
+        Returns:
+            dict: {'opened', 'released', 'resolved'} deste ciclo
+        """
+        now = now if now is not None else self.clock()
+        hold = self.config['hold_seconds']
+        opened = released = resolved = 0
+        with self._lock:
+            by_group = {}
+            for key, pending in self._pending.items():
+                by_group.setdefault(self.group_of.get(key[0]), []).append((key, pending))
+
+            for group, items in by_group.items():
+                if group is not None and group not in self.incidents and self._is_storm(group):
+                    self._open_incident(session, group, items, now)
+                    opened += 1
+                    continue
+                for key, (trigger, value, since) in items:
+                    if now - since >= hold:
+                        del self._pending[key]
+                        alert_manager.create_alert(key[0], trigger, value, session)
+                        self.stats['released'] += 1
+                        released += 1
+
+            for group, incident in list(self.incidents.items()):
+                if self._group_failing.get(group):
+                    self._update_message(session, incident)
+                elif now - incident.opened_at >= hold:
+                    self._resolve_incident(session, incident)
+                    del self.incidents[group]
+                    resolved += 1
+
+        if opened or released or resolved:
+            session.commit()
+        return {'opened': opened, 'released': released, 'resolved': resolved}
+
+    def _open_incident(self, session, group, items, now):
+        worst = max((trigger for _, (trigger, _, _) in items),
+                    key=lambda t: SEVERITY_ORDER.index(t.severity) if t.severity in SEVERITY_ORDER else 0)
+        failing = self._group_failing.get(group, set())
+        # O alerta pai fica no pai (switch/gateway) quando conhecido; senão no primeiro filho
+        anchor = self.parent_of.get(group) or min(failing)
+        incident = Incident(group, None, now)
+        incident.children.update(failing)
+        for key, _ in items:
+            del self._pending[key]
+            self._suppressed[key] = group
+            incident.suppressed += 1
+        self.stats['suppressed'] += incident.suppressed
+        alert = alert_manager.create_group_alert(anchor, self._title(group), worst.severity,
+                                                 self._message(group, incident), worst, session)
+        incident.alert_id = alert.id if alert is not None else None
+        incident.reported = (len(incident.children), incident.suppressed)
+        self.incidents[group] = incident
+        self.stats['incidents'] += 1
+        logger.warning(f"[Correlação] {self._title(group)}: {len(failing)} dispositivos, "
+                       f"{incident.suppressed} alertas suprimidos")
+
+    def _message(self, group, incident):
+        names = sorted(self.hostnames.get(d, str(d)) for d in incident.children)
+        sample = ", ".join(names[:MESSAGE_SAMPLE]) + (f" (+{len(names) - MESSAGE_SAMPLE})" if len(names) > MESSAGE_SAMPLE else "")
+        parent_id = self.parent_of.get(group)
+        cause = ""
+        if parent_id is not None and DOWN in self._failing.get(parent_id, ()):
+            cause = f" O pai {self.hostnames.get(parent_id)} está inacessível."
+        return (f"{len(incident.children)} de {self.members.get(group, 0)} dispositivos de "
+                f"{self.labels.get(group, group[1])} falharam ao mesmo tempo.{cause} "
+                f"Alertas individuais suprimidos: {incident.suppressed}. Afetados: {sample}")
+
+    def _update_message(self, session, incident):
+        incident.children.update(self._group_failing.get(incident.group, ()))
+        current = (len(incident.children), incident.suppressed)
+        if incident.alert_id is None or current == incident.reported:
+            return
+        alert = session.get(Alert, incident.alert_id)
+        if alert is not None and alert.resolved_at is None:
+            alert.message = self._message(incident.group, incident)
+        incident.reported = current
+
+    def _resolve_incident(self, session, incident):
+        for key in [k for k, g in self._suppressed.items() if g == incident.group]:
+            del self._suppressed[key]
+        self.stats['resolved'] += 1
+        alert = session.get(Alert, incident.alert_id) if incident.alert_id is not None else None
+        if alert is None or alert.resolved_at is not None:
+            return
+        alert.resolved_at = datetime.now()
+        logger.info(f"✅ [Correlação] Incidente resolvido: {alert.title}")
+        event_bus.publish("alerts", {"event": "resolved", "id": alert.id, "device_id": alert.device_id,
+                                     "title": alert.title})
+
+    def snapshot(self):
+        """Incidentes abertos e contadores (API)"""
+        with self._lock:
+            return {
+                'groups': len(self.members),
+                'failing_devices': len(self._failing),
+                'held': len(self._pending),
+                'incidents': [{
+                    'title': self._title(i.group), 'alert_id': i.alert_id,
+                    'children': len(i.children), 'suppressed': i.suppressed,
+                } for i in self.incidents.values()],
+                'stats': dict(self.stats),
+            }
+
+
+# Instância global
+alert_correlator = AlertCorrelator()
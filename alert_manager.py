@@ -3,10 +3,14 @@ Alert Manager - Gerenciamento centralizado de alertas
 Responsável por criar, resolver e gerenciar alertas do sistema
 """
 import logging
-from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from models import Alert, Trigger, Device
+import threading
+from datetime import datetime
+from models import Alert, Device
 from database import get_session
+from event_bus import event_bus
+from trigger_index import trigger_index, compile_predicate
+from violation_tracker import violation_tracker
+from notification_dispatcher import notification_dispatcher
 
 logger = logging.getLogger("AlertManager")
 
@@ -15,8 +19,46 @@ class AlertManager:
     """Gerenciador centralizado de alertas"""
     
     def __init__(self):
-        self.active_violations = {}  # Track de violações ativas para triggers com duração
-        
+        # Janelas de violação de triggers com duração (thread-safe, com checkpoint em SQLite)
+        self.violations = violation_tracker
+        # Alertas abertos por (device_id, trigger_id) -> alert_id: amostras sem mudança de estado não consultam o banco
+        self.active_alerts = {}
+        self._alerts_loaded = False
+        self._alerts_lock = threading.Lock()
+
+    def sync_active_alerts(self, session):
+        """
+        Recarrega o mapa de alertas abertos a partir do banco (início e a cada recarga do
+        índice de triggers). O alerta é ligado ao trigger pelo título (= nome do trigger).
+        """
+        trigger_index.ensure_loaded(session)
+        rows = session.query(Alert.id, Alert.device_id, Alert.title).filter(Alert.resolved_at == None).all()
+        active = {}
+        for alert_id, device_id, title in rows:
+            for rule in trigger_index.by_name(title):
+                active[(device_id, rule.id)] = alert_id
+        with self._alerts_lock:
+            self.active_alerts = active
+            self._alerts_loaded = True
+
+    def _ensure_active_loaded(self, session):
+        if self._alerts_loaded:
+            return
+        own_session = session is None
+        if own_session:
+            session = get_session()
+        try:
+            self.sync_active_alerts(session)
+        finally:
+            if own_session:
+                session.close()
+
+    def _forget_alert(self, device_id, alert_id):
+        """Remove do mapa todas as chaves do dispositivo que apontam para o alerta"""
+        with self._alerts_lock:
+            for key in [k for k, v in self.active_alerts.items() if v == alert_id and k[0] == device_id]:
+                del self.active_alerts[key]
+
     def create_alert(self, device_id, trigger, current_value, session=None):
         """
         Cria novo alerta se não existir um ativo para o mesmo trigger+device
@@ -30,6 +72,11 @@ class AlertManager:
         Returns:
             Alert: Alerta criado ou None se já existe
         """
+        key = (device_id, trigger.id)
+        if key in self.active_alerts:
+            logger.debug(f"Alerta já existe para {trigger.name} no device {device_id}")
+            return None
+
         own_session = session is None
         if own_session:
             session = get_session()
@@ -43,6 +90,8 @@ class AlertManager:
             ).first()
             
             if existing_alert:
+                with self._alerts_lock:
+                    self.active_alerts[key] = existing_alert.id
                 logger.debug(f"Alerta já existe para {trigger.name} no device {device_id}")
                 return None
             
@@ -63,14 +112,22 @@ class AlertManager:
             )
             
             session.add(alert)
+            session.flush()  # id para o mapa de alertas abertos e para o outbox
+            
+            # Notificações entram no outbox na mesma transação do alerta (entrega assíncrona)
+            if trigger.notify_email or trigger.notify_webhook:
+                self._send_notifications(alert, trigger, session, hostname)
+            
             if own_session:
                 session.commit()
+            with self._alerts_lock:
+                self.active_alerts[key] = alert.id
                 
             logger.info(f"✅ Alerta criado: {trigger.name} para device {device_id} (valor: {current_value})")
-            
-            # Processar notificações se configurado
-            if trigger.notify_email or trigger.notify_webhook:
-                self._send_notifications(alert, trigger)
+            event_bus.publish("alerts", {
+                "event": "created", "device_id": device_id, "hostname": hostname,
+                "severity": trigger.severity, "title": trigger.name, "message": message
+            })
             
             return alert
             
@@ -83,9 +140,64 @@ class AlertManager:
             if own_session:
                 session.close()
     
+    def create_group_alert(self, device_id, title, severity, message, trigger=None, session=None):
+        """
+        Cria o alerta pai de uma falha correlacionada (alert_correlator), sem vínculo com um trigger
+
+        Args:
+            device_id: Dispositivo âncora (pai do grupo ou primeiro filho afetado)
+            title: Título do incidente
+            severity: Maior severidade entre os alertas suprimidos
+            message: Resumo do grupo afetado
+            trigger: Trigger de maior severidade (define e-mail/webhook); None = sem notificação
+            session: Sessão do banco (opcional)
+
+        Returns:
+            Alert: Alerta criado ou None em caso de erro
+        """
+        own_session = session is None
+        if own_session:
+            session = get_session()
+
+        try:
+            device = session.get(Device, device_id)
+            hostname = device.hostname if device else "Unknown Device"
+            alert = Alert(
+                device_id=device_id,
+                severity=severity,
+                title=title,
+                message=message,
+                triggered_at=datetime.now()
+            )
+            session.add(alert)
+            session.flush()
+
+            if trigger is not None and (trigger.notify_email or trigger.notify_webhook):
+                self._send_notifications(alert, trigger, session, hostname)
+
+            if own_session:
+                session.commit()
+
+            logger.info(f"✅ Alerta correlacionado criado: {title}")
+            event_bus.publish("alerts", {
+                "event": "created", "device_id": device_id, "hostname": hostname,
+                "severity": severity, "title": title, "message": message
+            })
+            return alert
+
+        except Exception as e:
+            logger.error(f"Erro ao criar alerta correlacionado: {e}")
+            if own_session:
+                session.rollback()
+            return None
+        finally:
+            if own_session:
+                session.close()
+
     def auto_resolve_alerts(self, device_id, metric_type, current_value, session=None):
         """
-        Resolve automaticamente alertas quando a condição normaliza
+        Resolve automaticamente alertas quando a condição normaliza.
+        Só acessa o banco quando há alerta aberto do dispositivo nesta métrica cuja condição voltou ao normal.
         
         Args:
             device_id: ID do dispositivo
@@ -93,35 +205,32 @@ class AlertManager:
             current_value: Valor atual da métrica
             session: Sessão do banco (opcional)
         """
+        self._ensure_active_loaded(session)
+        to_resolve = []
+        for rule in trigger_index.rules_for_metric(metric_type):
+            alert_id = self.active_alerts.get((device_id, rule.id))
+            # Verificar se condição não é mais violada
+            if alert_id is not None and self._check_condition_ok(rule, current_value):
+                to_resolve.append(alert_id)
+        if not to_resolve:
+            return
+
         own_session = session is None
         if own_session:
             session = get_session()
             
         try:
-            # Buscar alertas ativos relacionados a esta métrica
-            active_alerts = session.query(Alert).join(Device).filter(
-                Alert.device_id == device_id,
-                Alert.resolved_at == None
-            ).all()
-            
-            for alert in active_alerts:
-                # Buscar trigger correspondente
-                trigger = session.query(Trigger).filter(
-                    Trigger.name == alert.title,
-                    Trigger.metric_type == metric_type
-                ).first()
-                
-                if not trigger:
-                    continue
+            for alert_id in dict.fromkeys(to_resolve):
+                alert = session.get(Alert, alert_id)
+                self._forget_alert(device_id, alert_id)
+                if alert is None or alert.resolved_at is not None:
+                    continue  # já resolvido fora do Sentinel
                 
-                # Verificar se condição não é mais violada
-                condition_ok = self._check_condition_ok(trigger, current_value)
-                
-                if condition_ok:
-                    alert.resolved_at = datetime.now()
-                    if own_session:
-                        session.commit()
-                    logger.info(f"✅ Alerta auto-resolvido: {alert.title} para device {device_id}")
+                alert.resolved_at = datetime.now()
+                if own_session:
+                    session.commit()
+                logger.info(f"✅ Alerta auto-resolvido: {alert.title} para device {device_id}")
+                event_bus.publish("alerts", {"event": "resolved", "id": alert.id, "device_id": device_id, "title": alert.title})
                     
         except Exception as e:
             logger.error(f"Erro ao auto-resolver alertas: {e}")
@@ -172,73 +281,40 @@ class AlertManager:
             if own_session:
                 session.close()
     
-    def check_trigger_violation(self, device_id, trigger, current_value, session=None):
+    def check_trigger_violation(self, device_id, trigger, current_value, session=None, timestamp=None):
         """
         Verifica se um trigger foi violado considerando duração mínima
         
         Args:
             device_id: ID do dispositivo
-            trigger: Objeto Trigger
+            trigger: Objeto Trigger (ou regra compilada do trigger_index)
             current_value: Valor atual da métrica
             session: Sessão do banco
+            timestamp: Momento da amostra (a duração é medida entre amostras, padrão: agora)
             
         Returns:
             bool: True se deve criar alerta
         """
-        # Chave única para rastrear violação
-        violation_key = f"{device_id}_{trigger.id}"
-        
-        # Verificar se condição está violada
         is_violated = self._evaluate_condition(trigger, current_value)
-        
-        if not is_violated:
-            # Limpar rastreamento se existir
-            if violation_key in self.active_violations:
-                del self.active_violations[violation_key]
-            return False
-        
-        # Duração mínima configurada
-        if trigger.duration_seconds and trigger.duration_seconds > 0:
-            now = datetime.now()
-            
-            if violation_key not in self.active_violations:
-                # Primeira violação - iniciar rastreamento
-                self.active_violations[violation_key] = now
-                return False
-            else:
-                # Verificar se duração foi atingida
-                first_violation_time = self.active_violations[violation_key]
-                duration = (now - first_violation_time).total_seconds()
-                
-                if duration >= trigger.duration_seconds:
-                    # Duração atingida - criar alerta
-                    return True
-                else:
-                    return False
-        else:
-            # Sem duração mínima - criar alerta imediatamente
-            return True
+        return self.violations.observe(device_id, trigger.id, is_violated, trigger.duration_seconds, timestamp)
     
+    def pending_violation_window(self, device_id):
+        """
+        Menor duration_seconds entre as violações do dispositivo que ainda não atingiram a
+        duração mínima (o agendador acelera a coleta para confirmar ou descartar o alerta).
+
+        Returns:
+            int ou None se não há violação pendente
+        """
+        return self.violations.pending_window(device_id)
+
     def _evaluate_condition(self, trigger, current_value):
         """Avalia se condição do trigger está violada"""
-        if current_value is None:
-            return False
-            
-        operator = trigger.operator
-        threshold = trigger.threshold
-        
-        if operator == '>':
-            return current_value > threshold
-        elif operator == '>=':
-            return current_value >= threshold
-        elif operator == '<':
-            return current_value < threshold
-        elif operator == '<=':
-            return current_value <= threshold
-        elif operator == '==':
-            return current_value == threshold
-        else:
-            return False
+        violated = getattr(trigger, 'violated', None)
+        if violated is None:
+            # Trigger do ORM: compila na hora
+            violated = compile_predicate(trigger.operator, trigger.threshold)
+        return violated(current_value)
     
     def _check_condition_ok(self, trigger, current_value):
         """Verifica se condição está OK (inverso da violação)"""
@@ -248,11 +324,14 @@ class AlertManager:
         """Formata mensagem do alerta"""
         return f"[{hostname}] {trigger.description or trigger.name}: Valor atual é {current_value}{trigger.metric_type}, threshold: {trigger.operator} {trigger.threshold}"
     
-    def _send_notifications(self, alert, trigger):
-        """Envia notificações configuradas (placeholder para futura implementação)"""
-        # TODO: Implementar sistema de notificações real
-        logger.info(f"📧 Notificação deveria ser enviada para alerta: {alert.title}")
-        pass
+    def _send_notifications(self, alert, trigger, session, hostname=None):
+        """Enfileira as notificações do alerta (e-mail/webhook) no outbox do notification_dispatcher"""
+        try:
+            queued = notification_dispatcher.enqueue(session, alert, trigger, hostname)
+            if queued:
+                logger.info(f"📧 {queued} notificações enfileiradas para alerta: {alert.title}")
+        except Exception as e:
+            logger.error(f"Erro ao enfileirar notificações de {alert.title}: {e}")
     
     def get_active_alerts_count(self, session=None):
         """
@@ -1,11 +1,39 @@
 from flask import Blueprint, jsonify, request
 from database import get_session
-from models import Metric, Device, Alert
+from models import Metric, Device, Alert, DeviceMetricLatest, InterfaceMetric
 from sqlalchemy import desc
 from datetime import datetime, timedelta
 
 metrics_bp = Blueprint('metrics_bp', __name__)
 
+
+def device_metrics_query(session, device_id, metric_type=None, limit=20):
+    """Amostras mais recentes de um dispositivo (índice (device_id, metric_type, timestamp))"""
+    query = session.query(Metric).filter(Metric.device_id == device_id)
+    
+    if metric_type:
+        query = query.filter(Metric.metric_type == metric_type)
+        
+    # Ordenar por mais recente
+    return query.order_by(desc(Metric.timestamp)).limit(limit)
+
+
+def device_latest_query(session, device_id):
+    """Valores correntes de todas as métricas do dispositivo (chave primária (device_id, metric_type))"""
+    return session.query(DeviceMetricLatest).filter(DeviceMetricLatest.device_id == device_id)
+
+
+def device_interfaces_query(session, device_id, since, if_index=None):
+    """Série por interface de um dispositivo de rede (índice (device_id, if_index, timestamp))"""
+    query = session.query(InterfaceMetric).filter(
+        InterfaceMetric.device_id == device_id,
+        InterfaceMetric.timestamp >= since
+    )
+    if if_index is not None:
+        query = query.filter(InterfaceMetric.if_index == if_index)
+    return query.order_by(InterfaceMetric.if_index, InterfaceMetric.timestamp)
+
+
 @metrics_bp.route('/api/metrics/<int:device_id>', methods=['GET'])
 def get_device_metrics(device_id):
     """Retorna as últimas métricas de um dispositivo"""
@@ -15,18 +43,13 @@ def get_device_metrics(device_id):
         limit = request.args.get('limit', 20, type=int)
         metric_type = request.args.get('type')
         
-        query = session.query(Metric).filter(Metric.device_id == device_id)
-        
-        if metric_type:
-            query = query.filter(Metric.metric_type == metric_type)
-            
-        # Ordenar por mais recente
-        metrics = query.order_by(desc(Metric.timestamp)).limit(limit).all()
+        metrics = device_metrics_query(session, device_id, metric_type, limit).all()
         
         # Formatar resposta
         data = [{
             'id': m.id,
             'type': m.metric_type,
+            'drive': m.drive,
             'value': m.value,
             'unit': m.unit,
             'timestamp': m.timestamp.isoformat()
@@ -40,6 +63,55 @@ def get_device_metrics(device_id):
     finally:
         session.close()
 
+@metrics_bp.route('/api/metrics/<int:device_id>/latest', methods=['GET'])
+def get_device_latest_metrics(device_id):
+    """Retorna o valor corrente de cada métrica do dispositivo"""
+    session = get_session()
+    try:
+        data = {m.metric_type: {
+            'value': m.value,
+            'unit': m.unit,
+            'drive': m.drive,
+            'timestamp': m.timestamp.isoformat()
+        } for m in device_latest_query(session, device_id).all()}
+        
+        return jsonify({'success': True, 'data': data})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+    finally:
+        session.close()
+
+@metrics_bp.route('/api/metrics/<int:device_id>/interfaces', methods=['GET'])
+def get_device_interface_metrics(device_id):
+    """Retorna a série de tráfego/erros por interface (switches e roteadores)"""
+    session = get_session()
+    try:
+        hours = request.args.get('hours', 1, type=int)
+        if_index = request.args.get('if_index', type=int)
+        since = datetime.now() - timedelta(hours=hours)
+
+        data = {}
+        for m in device_interfaces_query(session, device_id, since, if_index):
+            iface = data.setdefault(m.if_index, {'if_index': m.if_index, 'name': m.if_name, 'samples': []})
+            iface['samples'].append({
+                'timestamp': m.timestamp.isoformat(),
+                'in_bps': m.in_bps,
+                'out_bps': m.out_bps,
+                'in_errors': m.in_errors,
+                'out_errors': m.out_errors,
+                'in_discards': m.in_discards,
+                'out_discards': m.out_discards,
+                'utilization': m.utilization
+            })
+        
+        return jsonify({'success': True, 'data': list(data.values())})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+    finally:
+        session.close()
+
 @metrics_bp.route('/api/alerts/active', methods=['GET'])
 def get_active_alerts():
     """Retorna alertas ativos"""
@@ -65,60 +137,39 @@ def get_active_alerts():
 
 @metrics_bp.route('/api/metrics/history', methods=['GET'])
 def get_metrics_history():
-    """Retorna histórico de métricas agregadas via Raw SQL para performance máxima"""
-    import sqlite3
-    from database import DB_PATH
+    """Retorna histórico de métricas agregadas lendo o tier de rollup mais adequado à janela"""
+    from metrics_rollup import metrics_rollup
     
     try:
         hours = request.args.get('hours', 24, type=int)
-        since = (datetime.now() - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Conexão direta veloz
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("PRAGMA busy_timeout = 5000")
-        cursor = conn.cursor()
-        
-        # Query otimizada usando o novo índice
-        # Agrupamos por data/hora para o gráfico global
-        sql = """
-            SELECT 
-                strftime('%Y-%m-%d %H:00', timestamp) as hour_bucket,
-                metric_type,
-                AVG(value)
-            FROM metrics
-            WHERE timestamp >= ? 
-              AND (metric_type = 'cpu_usage' OR metric_type = 'ram_usage' OR metric_type LIKE 'disk_usage%')
-            GROUP BY hour_bucket, metric_type
-            ORDER BY hour_bucket ASC
-        """
-        cursor.execute(sql, (since,))
-        rows = cursor.fetchall()
-        conn.close()
+        # Resolução do gráfico (s). Padrão: 1 ponto por hora
+        step = max(60, request.args.get('step', 3600, type=int))
+        device_id = request.args.get('device_id', type=int)
+        since = datetime.now() - timedelta(hours=hours)
+        
+        series = metrics_rollup.query_history(
+            since,
+            step=step,
+            metric_types=('cpu_usage', 'ram_usage', 'disk_usage'),
+            device_id=device_id
+        )
         
         # Estrutura para o Recharts
-        # { '2023-01-01 10:00': { time: '10:00', cpu: 0, ram: 0, disk: 0 } }
-        buckets = {}
-        for hour_bucket, m_type, m_val in rows:
-            display_time = hour_bucket.split(' ')[1] # Pega apenas o HH:00
-            
-            if hour_bucket not in buckets:
-                buckets[hour_bucket] = {'time': display_time, 'cpu': 0, 'ram': 0, 'disk': 0}
-            
-            val = round(m_val, 1)
-            if m_type == 'cpu_usage':
-                buckets[hour_bucket]['cpu'] = val
-            elif m_type == 'ram_usage':
-                buckets[hour_bucket]['ram'] = val
-            elif m_type.startswith('disk_usage'):
-                # Média entre diferentes discos/partições para o gráfico global
-                if buckets[hour_bucket]['disk'] == 0:
-                    buckets[hour_bucket]['disk'] = val
-                else:
-                    buckets[hour_bucket]['disk'] = round((buckets[hour_bucket]['disk'] + val) / 2, 1)
-
-        # Converter para lista ordenada
-        sorted_keys = sorted(buckets.keys())
-        sorted_data = [buckets[k] for k in sorted_keys]
+        # { '2023-01-01 10:00:00': { time: '10:00', cpu: 0, ram: 0, disk: 0 } }
+        totals = {}
+        for (bucket, m_type), (total, count) in series.items():
+            key = 'cpu' if m_type == 'cpu_usage' else 'ram' if m_type == 'ram_usage' else 'disk'
+            acc = totals.setdefault(bucket, {}).setdefault(key, [0.0, 0])
+            acc[0] += total
+            acc[1] += count
+
+        sorted_data = []
+        for bucket in sorted(totals):
+            point = {'time': bucket[11:16], 'cpu': 0, 'ram': 0, 'disk': 0}
+            for key, (total, count) in totals[bucket].items():
+                if count:
+                    point[key] = round(total / count, 1)
+            sorted_data.append(point)
         
         if not sorted_data:
             print(f"DEBUG: No metrics found in range {since}")
@@ -159,3 +210,29 @@ def get_device_processes():
         'device_id': device_id,
         'processes': processes
     })
+
+@metrics_bp.route('/api/metrics/ingest/stats', methods=['GET'])
+def get_ingest_stats():
+    """Contadores do buffer de ingestão (taxa de ingestão e latência de flush)"""
+    from metrics_ingest import metric_buffer
+    return jsonify({'success': True, 'stats': metric_buffer.get_stats()})
+
+@metrics_bp.route('/api/metrics/rollup/stats', methods=['GET'])
+def get_rollup_stats():
+    """Contadores do job de rollup/retenção e retenção efetiva por tier"""
+    from metrics_rollup import metrics_rollup
+    return jsonify({
+        'success': True,
+        'stats': metrics_rollup.stats,
+        'retention_days': metrics_rollup.retention_days()
+    })
+
+@metrics_bp.route('/api/metrics/scheduler/stats', methods=['GET'])
+def get_scheduler_stats():
+    """Estado da agenda adaptativa do Sentinel (atraso de despacho, backoff, timeouts)"""
+    from poll_scheduler import poll_scheduler
+    return jsonify({
+        'success': True,
+        'stats': poll_scheduler.snapshot(),
+        'intervals': poll_scheduler.intervals
+    })
@@ -14,7 +14,7 @@ from utils import logger, resource_path, load_general_settings, migrate_legacy_d
 migrate_legacy_data()
 
 from database import init_db, load_all_devices
-from shared_state import scan_status
+from shared_state import scan_status, device_store
 from scanner.scheduler import scheduler_loop, schedule_config
 from scanner.engine import rdp_gateway_loop
 from security import get_flask_secret_key
@@ -31,6 +31,7 @@ from blueprints.monitoring import monitoring_bp
 from blueprints.settings_management import settings_bp
 from blueprints.license_management import license_bp
 from blueprints.alerts import alerts_bp
+from blueprints.stream import stream_bp
 
 # Load Env
 load_dotenv()
@@ -94,6 +95,7 @@ app.register_blueprint(settings_bp)
 app.register_blueprint(license_bp)
 app.register_blueprint(ai_bp)
 app.register_blueprint(alerts_bp)
+app.register_blueprint(stream_bp)
 
 # Metrics Blueprint
 from api_metrics import metrics_bp
@@ -101,7 +103,7 @@ app.register_blueprint(metrics_bp)
 
 @app.route('/api/debug/state')
 def debug_state():
-    results = scan_status.get("results", [])
+    results = device_store.snapshot()
     online = sum(1 for d in results if d.get("status_code") == "ONLINE")
     print(f">>> [DEBUG API] Total: {len(results)}, Online: {online}")
     return jsonify({
@@ -146,10 +148,22 @@ def start_background_services():
         migrate_add_permissions()
     except Exception as e:
         logger.warning(f"Migration error (permissions): {e}")
+
+    try:
+        from migrate_metrics_indexes import migrate_metrics_indexes
+        migrate_metrics_indexes()
+    except Exception as e:
+        logger.warning(f"Migration error (metrics indexes): {e}")
+
+    try:
+        from migrate_metric_latest import migrate_metric_latest
+        migrate_metric_latest()
+    except Exception as e:
+        logger.warning(f"Migration error (metric latest): {e}")
     
     # Load devices into memory
-    scan_status["results"] = load_all_devices()
-    logger.info(f"Memória carregada: {len(scan_status['results'])} ativos.")
+    device_store.replace_all(load_all_devices())
+    logger.info(f"Memória carregada: {len(device_store)} ativos.")
 
     # Start background threads
     threading.Thread(target=scheduler_loop, daemon=True).start()
@@ -181,9 +195,21 @@ if __name__ == '__main__':
         migrate_add_permissions()
     except Exception as e:
         print(f"[WARN] Migration error (permissions): {e}")
+
+    try:
+        from migrate_metrics_indexes import migrate_metrics_indexes
+        migrate_metrics_indexes()
+    except Exception as e:
+        print(f"[WARN] Migration error (metrics indexes): {e}")
+
+    try:
+        from migrate_metric_latest import migrate_metric_latest
+        migrate_metric_latest()
+    except Exception as e:
+        print(f"[WARN] Migration error (metric latest): {e}")
     
-    scan_status["results"] = load_all_devices()
-    print(f"[SYSTEM] Memória carregada: {len(scan_status['results'])} ativos.")
+    device_store.replace_all(load_all_devices())
+    print(f"[SYSTEM] Memória carregada: {len(device_store)} ativos.")
 
     # Background Services
     threading.Thread(target=scheduler_loop, daemon=True).start()
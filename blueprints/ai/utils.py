@@ -29,13 +29,11 @@ def ping_ip(ip):
 
 def load_scan_data():
     try:
-        from shared_state import scan_status
-        results = scan_status.get("results", [])
-        if not results:
+        from shared_state import device_store
+        if not len(device_store):
             from database import load_all_devices
-            results = load_all_devices()
-            scan_status["results"] = results
-        return results
+            device_store.replace_all(load_all_devices())
+        return device_store.snapshot()
     except Exception as e:
         print(f"Erro ao carregar scan data: {e}")
         return []
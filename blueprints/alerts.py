@@ -62,3 +62,27 @@ def get_alerts_count():
     """
     counts = alert_manager.get_active_alerts_count()
     return jsonify(counts)
+
+@alerts_bp.route('/notifications/stats', methods=['GET'])
+def get_notification_stats():
+    """
+    Retorna o estado do outbox de notificações (pendentes/enviadas/descartadas por canal)
+    """
+    from notification_dispatcher import notification_dispatcher
+    try:
+        return jsonify(notification_dispatcher.snapshot())
+    except Exception as e:
+        logger.error(f"Erro ao consultar notificações: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@alerts_bp.route('/correlation', methods=['GET'])
+def get_correlation_state():
+    """
+    Retorna os incidentes de falha em massa abertos e os contadores da correlação por topologia
+    """
+    from alert_correlator import alert_correlator
+    try:
+        return jsonify(alert_correlator.snapshot())
+    except Exception as e:
+        logger.error(f"Erro ao consultar correlação de alertas: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify
 from core.decorators import login_required, ad_required, tickets_required, premium_required
-from shared_state import scan_status
+from shared_state import device_store, scan_status
 from utils import logger, load_general_settings
 from concurrent.futures import ThreadPoolExecutor
 import os
@@ -72,17 +72,16 @@ def api_dashboard_stats():
             future_users = executor.submit(fetch_users) if ad_enabled else None
             future_tickets = executor.submit(fetch_tickets) if tickets_enabled else None
             
-            # Recarrega se estiver vazio ou se o último refresh foi há mais de 30s
-            last_total = len(scan_status.get("results", []))
-            if not scan_status.get("results", []) or (time.time() - scan_status.get("last_refresh", 0) > 30):
+            # Recarrega se estiver vazio ou se o último refresh foi há mais de 30s. Nunca durante um scan:
+            # a memória está à frente do banco até o DeviceWriter gravar o lote
+            if not len(device_store) or (not scan_status["running"] and time.time() - device_store.loaded_at > 30):
                 from database import load_all_devices
-                scan_status["results"] = load_all_devices()
-                scan_status["last_refresh"] = time.time()
-                print(f"DEBUG: dashboard_stats - Cache recarregado. Total: {len(scan_status['results'])}")
+                device_store.replace_all(load_all_devices())
+                print(f"DEBUG: dashboard_stats - Cache recarregado. Total: {len(device_store)}")
 
             os_dist = {}
             type_dist = {}
-            online_devices = scan_status.get("results", [])
+            online_devices = device_store.snapshot()
             print(f"DEBUG: dashboard_stats - total devices: {len(online_devices)}")
             if online_devices:
                 print(f"DEBUG: first device status: {online_devices[0].get('status_code')} last_seen: {online_devices[0].get('last_seen')}")
@@ -2,7 +2,7 @@ from flask import Blueprint, render_template, request, jsonify, session
 from core.decorators import login_required
 from core.permissions import require_permission
 from scanner.engine import scan_thread, get_full_audit, save_db
-from shared_state import scan_status, scan_lock, results_lock, update_scan_status
+from shared_state import scan_status, scan_lock, device_store, update_scan_status, logs_since
 from ip_manager import get_ip_map, get_free_ips, suggest_next_ip
 from utils import logger, validate_subnet, rate_limiter, api_error_handler, load_general_settings
 import threading
@@ -65,7 +65,8 @@ def run_scan():
     admin_user = ad_config.get('username') or os.environ.get("NETAUDIT_SCAN_USER", "")
     admin_pass = ad_config.get('password') or os.environ.get("NETAUDIT_SCAN_PASS", "")
 
-    t = threading.Thread(target=scan_thread, args=(subnet, admin_user, admin_pass), daemon=True)
+    # full_audit: ignora as impressões digitais e audita todos os hosts
+    t = threading.Thread(target=scan_thread, args=(subnet, admin_user, admin_pass, bool(data.get('full_audit'))), daemon=True)
     t.start()
     
     return jsonify({"success": True, "message": "Sentinel Core: Processo disparado", "subnet": subnet})
@@ -88,6 +89,9 @@ def status():
             p = int((scan_status.get("scanned", 0) / scan_status["total"]) * 100)
             if p > 100: p = 100
     
+    # ?logs_since=<seq> envia só os logs novos; sem o parâmetro, a janela inteira
+    logs, logs_full = logs_since(request.args.get('logs_since', type=int))
+
     return jsonify({
         "running": scan_status["running"],
         # Frontend usa status para barra de progresso, results vem em outra chamada mas podemos mandar aqui também se quiser
@@ -98,15 +102,27 @@ def status():
         "total_ips": scan_status["total"],
         "etr": scan_status["etr"],
         "last_results": scan_status.get("last_results", {"updated": 0, "added": 0, "total_found": 0}),
-        "logs": scan_status.get("logs", [])
+        "logs": logs,
+        "logs_full": logs_full,
+        "log_seq": scan_status["log_seq"]
     })
 
 @inventory_bp.route('/api/scanner/results')
 @login_required
 @require_permission('view_all')
 def scanner_results():
-    # Retorna apenas a lista de dispositivos para a tabela
-    return jsonify(scan_status["results"])
+    # ?since=<version>&epoch=<epoch>: apenas dispositivos adicionados/alterados/removidos
+    if 'since' in request.args:
+        delta = device_store.changes_since(request.args.get('since', type=int), request.args.get('epoch'))
+        return jsonify(delta)
+
+    # Lista completa com ETag: inventário inalterado responde 304 sem serializar nada
+    etag = f"{device_store.epoch}-{device_store.version}"
+    if request.if_none_match.contains_weak(etag):
+        return '', 304, {'ETag': f'W/"{etag}"'}
+    response = jsonify(device_store.snapshot())
+    response.set_etag(etag, weak=True)
+    return response
 
 @inventory_bp.route('/ip-map')
 @login_required
@@ -157,16 +173,8 @@ def api_scan_individual():
 
     res = get_full_audit(ip, admin_user, admin_pass)
     if res:
-        with results_lock:
-            found = False
-            for i, existing in enumerate(scan_status["results"]):
-                if existing['ip'] == ip:
-                    scan_status["results"][i] = res
-                    found = True
-                    break
-            if not found:
-                scan_status["results"].append(res)
-            save_db(scan_status["results"])
+        device_store.upsert(res)
+        save_db([res])
         return jsonify({"success": True, "data": res})
     
     return jsonify({"success": False, "message": "Offline"})
@@ -1,13 +1,21 @@
 from flask import Blueprint, jsonify, render_template
 from core.decorators import login_required, premium_required
 from database import get_session
-from models import Device, Alert, Metric
-from sqlalchemy import desc, func
+from models import Device, Alert, DeviceMetricLatest
+from sqlalchemy import desc
 from alert_manager import alert_manager
 from utils import logger
 
 monitoring_bp = Blueprint('monitoring', __name__)
 
+
+def top_assets_query(session_db, metric_type, limit=5):
+    """Valor corrente de cada dispositivo para o tipo, maiores primeiro (índice (metric_type, value))"""
+    return session_db.query(DeviceMetricLatest, Device).join(
+        Device, DeviceMetricLatest.device_id == Device.id
+    ).filter(DeviceMetricLatest.metric_type == metric_type).order_by(desc(DeviceMetricLatest.value)).limit(limit)
+
+
 @monitoring_bp.route('/monitoring')
 @login_required
 def monitoring_page():
@@ -26,20 +34,7 @@ def api_monitoring_overview():
         ).distinct().count()
         
         def get_top_assets(metric_type, limit=5):
-            if metric_type == 'disk_usage':
-                latest_ids = session_db.query(
-                    func.max(Metric.id)
-                ).filter(
-                    (Metric.metric_type == 'disk_usage') | (Metric.metric_type.like('disk_usage_%'))
-                ).group_by(Metric.device_id).subquery()
-            else:
-                latest_ids = session_db.query(
-                    func.max(Metric.id)
-                ).filter(Metric.metric_type == metric_type).group_by(Metric.device_id).subquery()
-            
-            top_metrics = session_db.query(Metric, Device).join(
-                Device, Metric.device_id == Device.id
-            ).filter(Metric.id.in_(latest_ids)).order_by(desc(Metric.value)).limit(limit).all()
+            top_metrics = top_assets_query(session_db, metric_type, limit).all()
             
             return [{
                 'hostname': d.hostname or d.ip,
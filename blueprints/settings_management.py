@@ -38,3 +38,80 @@ def general_settings_route():
         return jsonify({"status": "success", "settings": current})
     
     return jsonify(load_general_settings())
+
+@settings_bp.route('/api/settings/oui', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def oui_registry_route():
+    """Estado da base offline de fabricantes (GET) ou atualização a partir do IEEE (POST)"""
+    from scanner.oui import oui_registry
+    if request.method == 'POST':
+        try:
+            stats = oui_registry.refresh()
+            return jsonify({"status": "success", "index": stats, "info": oui_registry.info()})
+        except Exception as e:
+            logger.error(f"Erro ao atualizar base OUI: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 502
+    return jsonify(oui_registry.info())
+
+@settings_bp.route('/api/settings/rdns', methods=['GET', 'DELETE'])
+@login_required
+@admin_required
+def reverse_dns_route():
+    """Estado do DNS reverso e do cache de nomes (GET) ou limpeza do cache (DELETE)"""
+    from scanner.rdns import reverse_dns
+    if request.method == 'DELETE':
+        reverse_dns.clear_cache()
+        reverse_dns.save_cache()
+        return jsonify({"status": "success", "info": reverse_dns.info()})
+    return jsonify(reverse_dns.info())
+
+# Campos dos canais editáveis pela tela de Configurações (o restante de settings['notifications'],
+# como janela de digest e limites por minuto, continua no general_settings.json)
+NOTIFICATION_FIELDS = {
+    'email': {'enabled': bool, 'smtp_host': str, 'smtp_port': int, 'use_ssl': bool, 'starttls': bool,
+              'username': str, 'password': str, 'from': str, 'to': list},
+    'webhook': {'enabled': bool, 'url': str, 'verify_ssl': bool},
+}
+
+def _notification_channels(config):
+    """Campos editáveis dos canais; a senha SMTP nunca volta para o navegador"""
+    channels = {name: {key: config[name].get(key) for key in fields} for name, fields in NOTIFICATION_FIELDS.items()}
+    channels['email']['password_set'] = bool(channels['email'].pop('password'))
+    return channels
+
+@settings_bp.route('/api/settings/notifications', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def notifications_settings_route():
+    """Canais de notificação de alertas (e-mail/webhook) salvos em settings['notifications']"""
+    from notification_dispatcher import load_notification_config, notification_dispatcher
+    if request.method == 'POST':
+        data = request.json or {}
+        current = load_general_settings()
+        stored = current.setdefault('notifications', {})
+        for name, fields in NOTIFICATION_FIELDS.items():
+            values = data.get(name) or {}
+            channel = stored.setdefault(name, {})
+            for key, kind in fields.items():
+                if key not in values:
+                    continue
+                value = values[key]
+                if key == 'password' and not value:
+                    continue  # vazio = mantém a senha salva
+                try:
+                    if kind is list:
+                        items = value.split(',') if isinstance(value, str) else value
+                        value = [str(v).strip() for v in items if str(v).strip()]
+                    else:
+                        value = kind(value)
+                except (TypeError, ValueError):
+                    return jsonify({"status": "error", "message": f"Valor inválido para {name}.{key}"}), 400
+                channel[key] = value
+
+        save_general_settings(current)
+        # O despachante aplica na próxima entrega, sem esperar a releitura periódica
+        notification_dispatcher.reload_config()
+        return jsonify({"status": "success", "channels": _notification_channels(load_notification_config())})
+
+    return jsonify(_notification_channels(load_notification_config()))
@@ -0,0 +1,68 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from core.decorators import login_required
+from event_bus import event_bus
+import threading
+import json
+import time
+
+stream_bp = Blueprint('stream', __name__)
+
+# Cada stream ocupa uma thread do waitress (12): limitamos para não esgotar o pool.
+# Acima do limite o cliente recebe 503 e continua no polling.
+MAX_STREAMS = 4
+# Conexões são recicladas periodicamente (EventSource reconecta sozinho)
+STREAM_LIFETIME = 300
+HEARTBEAT_INTERVAL = 15
+# Janela mínima entre envios: progresso de alta frequência é coalescido neste intervalo
+COALESCE_WINDOW = 0.25
+
+DEFAULT_TOPICS = ('scan', 'alerts', 'monitoring')
+
+_streams = threading.BoundedSemaphore(MAX_STREAMS)
+
+
+def _format_event(event_id, topic, data):
+    return f"id: {event_id}\nevent: {topic}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@stream_bp.route('/api/stream')
+@login_required
+def api_stream():
+    """Canal Server-Sent Events: ?topics=scan,alerts,monitoring"""
+    topics = [t for t in request.args.get('topics', '').split(',') if t] or list(DEFAULT_TOPICS)
+
+    if not _streams.acquire(blocking=False):
+        return jsonify({'success': False, 'message': 'Limite de streams atingido, use polling.'}), 503
+
+    sub = event_bus.subscribe(topics)
+    released = threading.Event()
+
+    def cleanup():
+        # Chamado pelo finally do gerador e pelo close() da resposta (cliente que cai antes do 1º byte)
+        if not released.is_set():
+            released.set()
+            event_bus.unsubscribe(sub)
+            _streams.release()
+
+    def generate():
+        try:
+            # retry: intervalo de reconexão sugerido ao EventSource (ms)
+            yield "retry: 3000\n: connected\n\n"
+            deadline = time.time() + STREAM_LIFETIME
+            while time.time() < deadline:
+                batch = sub.get(timeout=HEARTBEAT_INTERVAL)
+                if not batch:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield "".join(_format_event(*e) for e in batch)
+                time.sleep(COALESCE_WINDOW)
+        finally:
+            cleanup()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(cleanup)
+    return response
@@ -0,0 +1,110 @@
+"""
+Event Bus - Pub/sub em processo para push em tempo real (SSE)
+Publicadores (scanner, alertas, coletor) chamam publish(); cada conexão
+/api/stream mantém uma Subscription filtrada por tópico.
+"""
+import threading
+import logging
+from collections import deque, OrderedDict
+
+logger = logging.getLogger("EventBus")
+
+
+class Subscription:
+    """
+    Fila de eventos de um assinante.
+
+    Eventos comuns entram em uma deque limitada; eventos marcados como
+    coalesce (ex: progresso de scan) guardam só o valor mais recente por
+    tópico, então um cliente lento nunca acumula progresso desatualizado.
+    """
+
+    def __init__(self, topics, max_events=500):
+        self.topics = set(topics)
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=max_events)
+        self._latest = OrderedDict()
+        self.closed = False
+
+    def matches(self, topic):
+        # "scan" assina "scan.progress" e "scan.log"
+        return topic in self.topics or topic.split('.', 1)[0] in self.topics
+
+    def push(self, event_id, topic, data, coalesce=False):
+        with self._cond:
+            if coalesce:
+                self._latest.pop(topic, None)
+                self._latest[topic] = (event_id, topic, data)
+            else:
+                self._events.append((event_id, topic, data))
+            self._cond.notify()
+
+    def get(self, timeout):
+        """Bloqueia até haver eventos (ou timeout) e devolve todos os pendentes, em ordem de id"""
+        with self._cond:
+            if not self._events and not self._latest and not self.closed:
+                self._cond.wait(timeout)
+            batch = list(self._events) + list(self._latest.values())
+            self._events.clear()
+            self._latest.clear()
+        batch.sort(key=lambda e: e[0])
+        return batch
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class EventBus:
+    """Barramento pub/sub thread-safe; publicar sem assinantes custa apenas uma checagem"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs = []
+        self._seq = 0
+
+    def has_subscribers(self, topic):
+        subs = self._subs
+        return any(s.matches(topic) for s in subs)
+
+    def subscribe(self, topics):
+        sub = Subscription(topics)
+        with self._lock:
+            self._subs = self._subs + [sub]
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.close()
+        with self._lock:
+            self._subs = [s for s in self._subs if s is not sub]
+
+    @property
+    def subscriber_count(self):
+        return len(self._subs)
+
+    def publish(self, topic, data, coalesce=False):
+        """
+        Publica um evento.
+
+        Args:
+            topic: Ex: 'scan.progress', 'scan.log', 'alerts', 'monitoring'
+            data: Payload serializável em JSON
+            coalesce: Mantém só o último evento pendente deste tópico por assinante
+        """
+        subs = self._subs  # cópia imutável (copy-on-write), leitura sem lock
+        if not subs:
+            return
+        with self._lock:
+            self._seq += 1
+            event_id = self._seq
+        for sub in subs:
+            if sub.matches(topic):
+                try:
+                    sub.push(event_id, topic, data, coalesce)
+                except Exception as e:
+                    logger.debug(f"Falha ao entregar evento {topic}: {e}")
+
+
+# Instância global
+event_bus = EventBus()
@@ -1,5 +1,5 @@
 import { useNavigate } from 'react-router-dom'
-import { useQuery } from '@tanstack/react-query'
+import { useQuery, useQueryClient } from '@tanstack/react-query'
 import {
     Devices, Users, Warning, ClockCounterClockwise, Binoculars, CaretRight,
     ChartLine, Cpu, Memory, HardDrive, BellRinging, WarningOctagon
@@ -8,6 +8,7 @@ import {
     LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer
 } from 'recharts'
 import api from '../services/api'
+import { useEventStream } from '../services/stream'
 
 interface DashboardStats {
     total_users: number
@@ -32,6 +33,13 @@ interface MonitoringOverview {
 
 const Dashboard = () => {
     const navigate = useNavigate()
+    const queryClient = useQueryClient()
+
+    // Alertas e fim de ciclo do Sentinel chegam via SSE; o polling fica só como rede de segurança
+    const streamConnected = useEventStream(['alerts', 'monitoring'], {
+        alerts: () => queryClient.invalidateQueries({ queryKey: ['activeAlerts'] }),
+        monitoring: () => queryClient.invalidateQueries({ queryKey: ['monitoringOverview'] }),
+    })
 
     // 1. Fetch Stats Gerais
     const { data: stats, isLoading: isLoadingStats } = useQuery<DashboardStats>({
@@ -51,7 +59,7 @@ const Dashboard = () => {
             const response = await api.get('/api/monitoring/overview')
             return response.data
         },
-        refetchInterval: 30000
+        refetchInterval: streamConnected ? 300000 : 30000
     })
 
     // 3. Fetch Real Active Alerts
@@ -61,7 +69,7 @@ const Dashboard = () => {
             const response = await api.get('/api/alerts/active')
             return Array.isArray(response.data) ? response.data : response.data.alerts || []
         },
-        refetchInterval: 15000
+        refetchInterval: streamConnected ? 300000 : 15000
     })
 
     // 4. Fetch Performance History
@@ -7,7 +7,8 @@ import {
     PlusCircle, ArrowsClockwise, TerminalWindow
 } from '@phosphor-icons/react'
 import api from '../services/api'
-import type { ScanStatus, Device } from '../types'
+import { useEventStream } from '../services/stream'
+import type { ScanStatus, Device, InventoryDelta } from '../types'
 
 // Helper component for info rows to match ADUsers style
 const InfoRow = ({ label, value }: { label: string, value?: string }) => (
@@ -139,23 +140,66 @@ const Scanner = () => {
         localStorage.setItem('scannerViewMode', mode)
     }
 
+    // Push em tempo real: progresso e logs chegam via SSE; o polling só roda sem stream
+    const streamConnected = useEventStream(['scan'], {
+        'scan.progress': (data) => {
+            queryClient.setQueryData<ScanStatus>(['scanner-status'], (old) => old ? { ...old, ...data } : old)
+        },
+        'scan.log': (data) => {
+            queryClient.setQueryData<ScanStatus>(['scanner-status'], (old) => {
+                if (!old) return old
+                logSeq.current = data.seq
+                if (data.reset) return { ...old, logs: data.logs }
+                return { ...old, logs: [...(old.logs || []), data].slice(-100) }
+            })
+        },
+    })
+
+    // Status: pede apenas os logs novos (logs_since) e acumula localmente
+    const logSeq = useRef<number | null>(null)
     const { data: status } = useQuery<ScanStatus>({
         queryKey: ['scanner-status'],
         queryFn: async () => {
-            const response = await api.get('/api/scanner/status')
-            return response.data
+            const params = logSeq.current !== null ? { logs_since: logSeq.current } : {}
+            const response = await api.get('/api/scanner/status', { params })
+            const data = response.data
+            const previous = queryClient.getQueryData<ScanStatus>(['scanner-status'])
+            logSeq.current = data.log_seq
+            if (!data.logs_full && previous?.logs) {
+                data.logs = [...previous.logs, ...data.logs].slice(-100)
+            }
+            return data
         },
-        refetchInterval: 1000,
+        refetchInterval: streamConnected ? 15000 : 1000,
     })
 
-    // Resultados do Scan
+    // Resultados do Scan: delta por versão (?since=) aplicado sobre um mapa local por IP
+    const inventory = useRef<{ epoch: string | null; version: number | null; byIp: Map<string, Device> }>({
+        epoch: null, version: null, byIp: new Map()
+    })
     const { data: devices } = useQuery<Device[]>({
         queryKey: ['scanner-results'],
         queryFn: async () => {
-            const response = await api.get('/api/scanner/results')
-            return response.data
+            const inv = inventory.current
+            const params = inv.version !== null ? { since: inv.version, epoch: inv.epoch } : { since: '' }
+            const response = await api.get<InventoryDelta>('/api/scanner/results', { params })
+            const delta = response.data
+            if (delta.full) {
+                inv.byIp = new Map((delta.devices || []).map(d => [d.ip, d]))
+            } else {
+                for (const d of [...(delta.added || []), ...(delta.changed || [])]) inv.byIp.set(d.ip, d)
+                for (const ip of delta.removed || []) inv.byIp.delete(ip)
+                if (!delta.added?.length && !delta.changed?.length && !delta.removed?.length) {
+                    // Nada mudou: devolve a mesma referência para evitar re-render
+                    const cached = queryClient.getQueryData<Device[]>(['scanner-results'])
+                    if (cached) return cached
+                }
+            }
+            inv.epoch = delta.epoch
+            inv.version = delta.version
+            return Array.from(inv.byIp.values())
         },
-        refetchInterval: 2000,
+        refetchInterval: streamConnected && !status?.running ? 30000 : 2000,
     })
 
     const startScan = useMutation({
@@ -0,0 +1,45 @@
+import { useEffect, useRef, useState } from 'react';
+import api from './api';
+
+type StreamHandlers = Record<string, (data: any) => void>;
+
+/**
+ * Assina o canal SSE /api/stream para os tópicos informados.
+ * Retorna `connected`: enquanto true, as páginas podem desligar o polling;
+ * se o servidor recusar (limite de streams) ou cair, volta a false e o polling assume.
+ */
+export function useEventStream(topics: string[], handlers: StreamHandlers) {
+    const [connected, setConnected] = useState(false);
+    const handlersRef = useRef(handlers);
+    handlersRef.current = handlers;
+    const topicKey = topics.join(',');
+
+    useEffect(() => {
+        if (typeof EventSource === 'undefined') return;
+
+        const source = new EventSource(`${api.defaults.baseURL}/api/stream?topics=${topicKey}`, {
+            withCredentials: true,
+        });
+        source.onopen = () => setConnected(true);
+        source.onerror = () => setConnected(false);
+
+        const listeners: [string, (e: MessageEvent) => void][] = [];
+        for (const topic of Object.keys(handlersRef.current)) {
+            const listener = (e: MessageEvent) => {
+                try {
+                    handlersRef.current[topic]?.(JSON.parse(e.data));
+                } catch { /* evento malformado: ignora */ }
+            };
+            source.addEventListener(topic, listener);
+            listeners.push([topic, listener]);
+        }
+
+        return () => {
+            listeners.forEach(([topic, listener]) => source.removeEventListener(topic, listener));
+            source.close();
+            setConnected(false);
+        };
+    }, [topicKey]);
+
+    return connected;
+}
@@ -37,7 +37,9 @@ export interface ScanStatus {
     total_ips: number;
     etr: string;
     results: Device[];
-    logs?: { msg: string; time: string }[];
+    logs?: { msg: string; time: string; seq?: number }[];
+    logs_full?: boolean;
+    log_seq?: number;
     last_results?: {
         updated: number;
         added: number;
@@ -45,6 +47,16 @@ export interface ScanStatus {
     };
 }
 
+export interface InventoryDelta {
+    epoch: string;
+    version: number;
+    full: boolean;
+    devices?: Device[];
+    added?: Device[];
+    changed?: Device[];
+    removed?: string[];
+}
+
 export interface ADUser {
     samaccountname: string;
     name: string;
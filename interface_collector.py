@@ -0,0 +1,290 @@
+"""
+Interface Collector - Contadores IF-MIB de switches e roteadores para o Sentinel
+Uma rodada concorrente no cliente SNMP compartilhado lê, por GETBULK, as colunas de
+ifTable/ifXTable de toda a frota de rede; bps e taxas de erro/descarte por interface
+são calculados entre coletas consecutivas com aritmética segura contra wrap de contador.
+"""
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime
+
+from snmp_helper import snmp_client
+
+logger = logging.getLogger("InterfaceCollector")
+
+OID_SYS_UPTIME = '1.3.6.1.2.1.1.3.0'
+
+# Colunas lidas por dispositivo (todas na mesma PDU de GETBULK): {campo: coluna}
+IF_COLUMNS = {
+    'descr': '1.3.6.1.2.1.2.2.1.2',             # ifDescr
+    'oper_status': '1.3.6.1.2.1.2.2.1.8',       # ifOperStatus (1 = up)
+    'in_octets_32': '1.3.6.1.2.1.2.2.1.10',     # ifInOctets (fallback sem ifXTable)
+    'in_discards': '1.3.6.1.2.1.2.2.1.13',      # ifInDiscards
+    'in_errors': '1.3.6.1.2.1.2.2.1.14',        # ifInErrors
+    'out_octets_32': '1.3.6.1.2.1.2.2.1.16',    # ifOutOctets (fallback sem ifXTable)
+    'out_discards': '1.3.6.1.2.1.2.2.1.19',     # ifOutDiscards
+    'out_errors': '1.3.6.1.2.1.2.2.1.20',       # ifOutErrors
+    'name': '1.3.6.1.2.1.31.1.1.1.1',           # ifName
+    'in_octets': '1.3.6.1.2.1.31.1.1.1.6',      # ifHCInOctets
+    'out_octets': '1.3.6.1.2.1.31.1.1.1.10',    # ifHCOutOctets
+    'speed_mbps': '1.3.6.1.2.1.31.1.1.1.15',    # ifHighSpeed
+}
+
+# Largura de cada contador (define o módulo do wrap)
+COUNTER_BITS = {
+    'in_octets': 64, 'out_octets': 64,
+    'in_errors': 32, 'out_errors': 32, 'in_discards': 32, 'out_discards': 32,
+}
+
+# Linhas por GETBULK: 12 colunas x 10 = 120 varbinds por PDU
+IF_BULK_REPETITIONS = 10
+
+# Taxa acima de N x ifHighSpeed indica descontinuidade (contador zerado sem reboot)
+MAX_SPEED_FACTOR = 2
+
+
+def counter_delta(prev, cur, bits):
+    """
+    Diferença entre duas leituras de um contador SNMP.
+
+    Um Counter32 que "volta" deu a volta em 2^32. Um Counter64 não dá a volta na
+    prática, então recuo significa contador zerado: retorna None (amostra descartada).
+    """
+    if prev is None or cur is None:
+        return None
+    if cur >= prev:
+        return cur - prev
+    if bits == 32:
+        return cur + (1 << 32) - prev
+    return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_interfaces(table):
+    """
+    Converte o walk {coluna: [(índice, valor)]} em {if_index: contadores}.
+    Usa os contadores HC (64 bits) quando o agente tem ifXTable; senão os de 32 bits.
+    """
+    rows = {}
+    for field, oid in IF_COLUMNS.items():
+        for index, value in table.get(oid, []):
+            rows.setdefault(index, {})[field] = value
+
+    interfaces = {}
+    for index, row in rows.items():
+        if_index = _int(index)
+        if if_index is None:
+            continue
+        iface = {
+            'name': str(row.get('name') or row.get('descr') or index)[:64],
+            'up': row.get('oper_status') == '1',
+            'speed_mbps': _int(row.get('speed_mbps')),
+            'bits': {},
+        }
+        for direction in ('in', 'out'):
+            hc = _int(row.get(f'{direction}_octets'))
+            iface[f'{direction}_octets'] = hc if hc is not None else _int(row.get(f'{direction}_octets_32'))
+            iface['bits'][f'{direction}_octets'] = 64 if hc is not None else 32
+        for field in ('in_errors', 'out_errors', 'in_discards', 'out_discards'):
+            iface[field] = _int(row.get(field))
+        interfaces[if_index] = iface
+    return interfaces
+
+
+def compute_rates(prev, cur, elapsed):
+    """
+    Taxas de uma interface entre duas coletas.
+
+    Returns:
+        dict com in_bps, out_bps, erros/s, descartes/s e utilização, ou None se a
+        amostra não é confiável (intervalo inválido, contador zerado, taxa impossível)
+    """
+    if elapsed <= 0:
+        return None
+    rates = {}
+    for field, bits in COUNTER_BITS.items():
+        bits = cur['bits'].get(field, bits)
+        if prev['bits'].get(field, bits) != bits:
+            return None  # agente trocou HC <-> 32 bits entre coletas
+        delta = counter_delta(prev.get(field), cur.get(field), bits)
+        if field.endswith('octets'):
+            if delta is None:
+                return None
+            rates[field.replace('octets', 'bps')] = delta * 8 / elapsed
+        else:
+            rates[field] = round(delta / elapsed, 3) if delta is not None else None
+
+    speed = cur.get('speed_mbps')
+    peak = max(rates['in_bps'], rates['out_bps'])
+    rates['utilization'] = None
+    if speed:
+        if peak > speed * 1_000_000 * MAX_SPEED_FACTOR:
+            return None
+        rates['utilization'] = round(min(100.0, peak / (speed * 10_000)), 2)
+    rates['in_bps'] = round(rates['in_bps'], 1)
+    rates['out_bps'] = round(rates['out_bps'], 1)
+    return rates
+
+
+class InterfaceCollector:
+    """Coleta de interfaces da frota de rede com estado entre ciclos para o cálculo de taxas"""
+
+    def __init__(self, community='public', port=161, timeout=2.0, retries=1, max_concurrency=32):
+        """
+        Args:
+            community: Community SNMPv2c
+            port: Porta SNMP dos agentes
+            timeout: Timeout de cada PDU (s)
+            retries: Retransmissões por PDU
+            max_concurrency: Dispositivos consultados simultaneamente (cada um tem até uma PDU
+                em voo; limitar evita que respostas esperem na fila de decodificação além do timeout)
+        """
+        self.community = community
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.max_concurrency = max_concurrency
+        # Última amostra por dispositivo: {device_id: (sysUpTime em ticks, {if_index: contadores})}
+        self._last = {}
+        self._lock = threading.Lock()
+        self.stats = {"devices": 0, "responded": 0, "interfaces": 0, "rates": 0, "elapsed": 0.0}
+
+    async def _poll(self, ip):
+        """sysUpTime + tabela de interfaces de um dispositivo (GET e GETBULK concorrentes)"""
+        scalars, table = await asyncio.gather(
+            snmp_client.get(ip, [OID_SYS_UPTIME], self.community, self.port, self.timeout, self.retries),
+            snmp_client.walk_table(ip, list(IF_COLUMNS.values()), self.community, self.port,
+                                   self.timeout, self.retries, max_repetitions=IF_BULK_REPETITIONS)
+        )
+        uptime = _int(scalars.get(OID_SYS_UPTIME))
+        if uptime is None:
+            return None
+        return uptime, parse_interfaces(table)
+
+    async def _run(self, targets, deadline=None):
+        sem = asyncio.Semaphore(self.max_concurrency)
+        polled = {}
+
+        async def poll(key, ip):
+            async with sem:
+                try:
+                    polled[key] = await asyncio.wait_for(self._poll(ip), deadline)
+                except asyncio.TimeoutError:
+                    # Só este dispositivo fica sem amostra; os demais do lote seguem
+                    logger.debug(f"Prazo SNMP de {deadline}s esgotado em {ip}")
+                except Exception as e:
+                    logger.debug(f"Falha SNMP em {ip}: {e}")
+
+        await asyncio.gather(*(poll(k, ip) for k, ip in targets.items()))
+        return polled
+
+    def _rates(self, device_id, uptime, interfaces):
+        """Compara com a amostra anterior do dispositivo e guarda a atual como base"""
+        with self._lock:
+            previous = self._last.get(device_id)
+            self._last[device_id] = (uptime, interfaces)
+        if not previous:
+            return {}
+        prev_uptime, prev_ifaces = previous
+        if uptime <= prev_uptime:
+            # Reboot (sysUpTime recomeçou): contadores zerados, a amostra atual vira a nova base
+            return {}
+        elapsed = (uptime - prev_uptime) / 100.0  # relógio do agente, imune à latência da coleta
+
+        rates = {}
+        for if_index, iface in interfaces.items():
+            prev = prev_ifaces.get(if_index)
+            if not iface['up'] or not prev:
+                continue
+            r = compute_rates(prev, iface, elapsed)
+            if r:
+                r['if_name'] = iface['name']
+                rates[if_index] = r
+        return rates
+
+    def collect_all(self, targets, deadline=None):
+        """
+        Coleta a frota de rede em uma rodada.
+
+        Args:
+            targets: {device_id: ip}
+            deadline: Prazo de cada dispositivo (s), contado a partir da sua vez no semáforo;
+                      None = só os timeouts das PDUs
+
+        Returns:
+            dict: {device_id: {if_index: taxas}}; dispositivos sem amostra anterior
+                  (primeira coleta, reboot) voltam com {} e só atualizam a base
+        """
+        if not targets:
+            return {}
+        start = time.time()
+        polled = snmp_client.run(self._run(targets, deadline))
+
+        results = {}
+        interfaces = 0
+        for device_id, sample in polled.items():
+            if not sample:
+                continue
+            uptime, ifaces = sample
+            interfaces += len(ifaces)
+            results[device_id] = self._rates(device_id, uptime, ifaces)
+
+        self.stats.update({
+            "devices": len(targets),
+            "responded": len(results),
+            "interfaces": interfaces,
+            "rates": sum(len(r) for r in results.values()),
+            "elapsed": round(time.time() - start, 2),
+        })
+        return results
+
+    def forget(self, device_id):
+        """Descarta a base de um dispositivo (ex: removido do inventário)"""
+        with self._lock:
+            self._last.pop(device_id, None)
+
+
+def interface_rows(device_id, rates, timestamp=None):
+    """Linhas de InterfaceMetric (uma por interface) para inserção em lote"""
+    timestamp = timestamp or datetime.now()
+    return [
+        {
+            'device_id': device_id,
+            'if_index': if_index,
+            'if_name': r['if_name'],
+            'timestamp': timestamp,
+            'in_bps': r['in_bps'],
+            'out_bps': r['out_bps'],
+            'in_errors': r['in_errors'],
+            'out_errors': r['out_errors'],
+            'in_discards': r['in_discards'],
+            'out_discards': r['out_discards'],
+            'utilization': r['utilization'],
+        }
+        for if_index, r in rates.items()
+    ]
+
+
+def device_totals(rates):
+    """Agregados do dispositivo para a série principal: tráfego total (Mbps) e erros/s"""
+    if not rates:
+        return None
+    errors = sum((r['in_errors'] or 0) + (r['out_errors'] or 0) for r in rates.values())
+    return {
+        'traffic_in': round(sum(r['in_bps'] for r in rates.values()) / 1_000_000, 3),
+        'traffic_out': round(sum(r['out_bps'] for r in rates.values()) / 1_000_000, 3),
+        'interface_errors': round(errors, 3),
+        'interface_utilization': max((r['utilization'] or 0) for r in rates.values()),
+    }
+
+
+# Instância global (mantém a base de contadores entre os ciclos do Sentinel)
+interface_collector = InterfaceCollector()
@@ -0,0 +1,169 @@
+"""
+Latency Prober - Sondagem de latência em lote para o Sentinel
+Uma única rodada assíncrona mede RTT, perda e jitter de toda a frota:
+ICMP Echo quando há privilégio, tempo de conexão TCP (SYN -> SYN/ACK ou RST) como fallback.
+"""
+import asyncio
+import time
+import logging
+
+from scanner.discovery import ICMPProber, _socket_budget, DEFAULT_MAX_SOCKETS
+
+logger = logging.getLogger("LatencyProber")
+
+# Portas de fallback por tipo de dispositivo (conectadas ao mesmo tempo; a primeira que responder mede o RTT)
+TCP_PORTS_BY_TYPE = {
+    'windows': (135, 445, 3389),
+    'server': (135, 445, 3389, 22),
+    'printer': (9100, 80, 443),
+    'network': (22, 23, 80, 443),
+}
+DEFAULT_TCP_PORTS = (80, 443, 22, 445, 135)
+
+
+def summarize(rtts, sent):
+    """
+    Consolida uma série de RTTs (ms; None = perdido)
+
+    Returns:
+        dict: {'alive', 'rtt', 'min', 'max', 'loss', 'jitter'}
+    """
+    got = [r for r in rtts if r is not None]
+    loss = round((sent - len(got)) / sent * 100, 1) if sent else 100.0
+    if not got:
+        return {'alive': False, 'rtt': None, 'min': None, 'max': None, 'loss': loss, 'jitter': None}
+    # Jitter: média das variações entre amostras consecutivas (RFC 3550, simplificado)
+    diffs = [abs(b - a) for a, b in zip(got, got[1:])]
+    return {
+        'alive': True,
+        'rtt': round(sum(got) / len(got), 2),
+        'min': round(min(got), 2),
+        'max': round(max(got), 2),
+        'loss': loss,
+        'jitter': round(sum(diffs) / len(diffs), 2) if diffs else 0.0,
+    }
+
+
+class LatencyProber:
+    """Mede a frota inteira em uma rodada concorrente"""
+
+    def __init__(self, count=3, interval=0.2, timeout=1.0, max_concurrency=512):
+        """
+        Args:
+            count: Sondas por dispositivo (base para perda e jitter)
+            interval: Intervalo entre sondas do mesmo dispositivo (s)
+            timeout: Timeout de cada sonda (s)
+            max_concurrency: Dispositivos sondados simultaneamente
+        """
+        self.count = count
+        self.interval = interval
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.stats = {"devices": 0, "alive": 0, "icmp": False, "elapsed": 0.0}
+
+    async def _icmp_series(self, icmp, ip):
+        loop = asyncio.get_running_loop()
+        rtts = []
+        for i in range(self.count):
+            t0 = loop.time()
+            res = await icmp.ping(ip, self.timeout)
+            rtts.append((loop.time() - t0) * 1000 if res is not None else None)
+            if i < self.count - 1:
+                await asyncio.sleep(self.interval)
+        return rtts
+
+    async def _tcp_rtt(self, ip, port):
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), self.timeout)
+            writer.close()
+        except ConnectionRefusedError:
+            pass  # RST também fecha o round-trip
+        except (asyncio.TimeoutError, OSError):
+            return None
+        return (loop.time() - t0) * 1000
+
+    async def _first_answer(self, ip, ports):
+        """
+        Conecta em todas as portas ao mesmo tempo: um dispositivo offline custa um timeout,
+        não a soma deles. A primeira porta que responde (SYN/ACK ou RST) mede o RTT.
+
+        Returns:
+            tuple: (porta, rtt) ou (None, None)
+        """
+        tasks = {asyncio.ensure_future(self._tcp_rtt(ip, p)): p for p in ports}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                answered = [(t.result(), tasks[t]) for t in done if t.exception() is None and t.result() is not None]
+                if answered:
+                    rtt, port = min(answered)
+                    return port, rtt
+            return None, None
+        finally:
+            for t in pending:
+                t.cancel()
+
+    async def _tcp_series(self, ip, ports):
+        # Primeira sonda descobre uma porta que responde; as demais repetem nela
+        port, first = await self._first_answer(ip, ports)
+        if port is None:
+            return [None] * self.count
+        rtts = [first]
+        for _ in range(self.count - 1):
+            await asyncio.sleep(self.interval)
+            rtts.append(await self._tcp_rtt(ip, port))
+        return rtts
+
+    async def _run(self, targets):
+        start = time.time()
+        icmp = ICMPProber()
+        if not (icmp.open() and icmp.start(asyncio.get_running_loop())):
+            icmp.close()
+            icmp = None
+        self.stats["icmp"] = icmp is not None
+
+        # Cada dispositivo no fallback TCP abre uma conexão por porta ao mesmo tempo
+        widest = max(len(p) for p in list(TCP_PORTS_BY_TYPE.values()) + [DEFAULT_TCP_PORTS])
+        sem = asyncio.Semaphore(max(1, min(self.max_concurrency, _socket_budget(DEFAULT_MAX_SOCKETS) // widest)))
+        results = {}
+
+        async def probe(key, ip, device_type):
+            async with sem:
+                method = 'icmp'
+                rtts = await self._icmp_series(icmp, ip) if icmp else [None] * self.count
+                if not any(r is not None for r in rtts):
+                    # ICMP bloqueado/indisponível: mede pelo handshake TCP
+                    method = 'tcp'
+                    rtts = await self._tcp_series(ip, TCP_PORTS_BY_TYPE.get(device_type, DEFAULT_TCP_PORTS))
+                summary = summarize(rtts, self.count)
+                summary['method'] = method if summary['alive'] else None
+                results[key] = summary
+
+        try:
+            await asyncio.gather(*(probe(k, ip, dt) for k, (ip, dt) in targets.items()), return_exceptions=True)
+        finally:
+            if icmp:
+                icmp.close()
+        self.stats.update({
+            "devices": len(targets),
+            "alive": sum(1 for r in results.values() if r['alive']),
+            "elapsed": round(time.time() - start, 2),
+        })
+        return results
+
+    def probe_all(self, targets):
+        """
+        Sonda todos os alvos em uma rodada.
+
+        Args:
+            targets: {chave: (ip, device_type)}
+
+        Returns:
+            dict: {chave: resumo de summarize() + 'method'}
+        """
+        if not targets:
+            return {}
+        return asyncio.run(self._run(targets))
@@ -1,5 +1,7 @@
 import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.orm import Session
@@ -8,20 +10,48 @@ import psutil
 
 # Importar banco de dados e modelos
 from database import get_session
-from models import Device, Metric, Alert, Trigger
+from models import Device, Alert, InterfaceMetric
 
 # Importar alert manager
 from alert_manager import alert_manager
+from event_bus import event_bus
+from latency_prober import LatencyProber
+from metrics_ingest import metric_buffer
+from metrics_rollup import metrics_rollup
+from interface_collector import interface_collector, interface_rows, device_totals
+from poll_scheduler import poll_scheduler
+from wmi_helper import wmi_pool
+from trigger_index import trigger_index
+from violation_tracker import violation_tracker
+from notification_dispatcher import notification_dispatcher
+from alert_correlator import alert_correlator
 
 # Configuração de Log
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("MetricsCollector")
 
+LOCAL_IPS = ['127.0.0.1', 'localhost', '0.0.0.0']
+
+# Frequência com que o despachante olha a fila de vencimentos (s)
+DISPATCH_TICK_SECONDS = 2
+# Frequência de releitura do inventário e dos intervalos configurados (s)
+INVENTORY_SYNC_SECONDS = 30
+# Prazo SNMP de cada dispositivo de rede (fração do prazo do lote; o resto fica para a gravação)
+NETWORK_DEVICE_DEADLINE = 0.8
+# Threads de coleta (WMI/SNMP por dispositivo)
+MAX_WORKERS = 25
+
 class MetricsCollector:
     def __init__(self):
         self.scheduler = BackgroundScheduler()
         self.is_running = False
         self.process_cache = {} # Cache de processos em tempo real {device_id: [processes]}
+        self.latency_prober = LatencyProber()
+        self.sampled = {} # Valores coletados na última coleta deste coletor (fingerprint do agendador)
+        self.pool = None
+        self._inflight = {} # {device_id: [future, prazo em s, início no worker]}
+        self._inflight_lock = threading.Lock()
+        self._last_sync = 0
         
     def start(self):
         """Inicia o agendador com proteção total contra shutdown/restart"""
@@ -38,24 +68,54 @@ class MetricsCollector:
         # Garantir limpeza total antes de iniciar
         self.stop()
         
-        # Recriar agendador fresco (Garante que os executores/threadpools sejam novos)
+        # Recriar agendador e pool frescos (Garante que os executores/threadpools sejam novos)
         self.scheduler = BackgroundScheduler(daemon=True)
+        self.pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="SentinelWorker",
+                                       initializer=init_worker_com)
+        self._last_sync = 0
+        self._restore_violations()
         
         try:
+            # Despachante EDF: cada dispositivo vence no próprio intervalo (poll_scheduler)
             self.scheduler.add_job(
-                self.collect_all_metrics,
-                trigger=IntervalTrigger(seconds=60),
+                self.dispatch_due_polls,
+                trigger=IntervalTrigger(seconds=DISPATCH_TICK_SECONDS),
                 id='collect_metrics',
-                name='Coleta de Métricas Global',
+                name='Despachante de Coletas (EDF)',
                 replace_existing=True,
+                max_instances=1,
+                coalesce=True,
                 misfire_grace_time=30 # Tolerância para atrasos
             )
+            # Downsampling (5m/1h) e retenção da série temporal
+            self.scheduler.add_job(
+                metrics_rollup.run,
+                trigger=IntervalTrigger(minutes=5),
+                id='metrics_rollup',
+                name='Rollup e Retenção de Métricas',
+                replace_existing=True,
+                misfire_grace_time=120
+            )
             self.scheduler.start()
+            # Entrega assíncrona das notificações de alertas (outbox)
+            notification_dispatcher.start()
             self.is_running = True
-            logger.info("✅ Sentinel engine (Re-Born) ativa. Intervalo: 60s")
+            logger.info(f"✅ Sentinel engine (Re-Born) ativa. Agenda adaptativa, tick {DISPATCH_TICK_SECONDS}s")
         except Exception as e:
             logger.error(f"❌ Erro ao subir engine Sentinel: {e}")
 
+    def _restore_violations(self):
+        """Janelas de violação em andamento antes do último desligamento (triggers com duração)"""
+        if len(violation_tracker):
+            return  # restart do motor no mesmo processo: o estado em memória já é o mais novo
+        session = get_session()
+        try:
+            violation_tracker.restore(session)
+        except Exception as e:
+            logger.error(f"Erro ao restaurar violações de triggers: {e}")
+        finally:
+            session.close()
+
     def stop(self):
         """Para o agendador de forma limpa e libera recursos"""
         try:
@@ -67,89 +127,302 @@ class MetricsCollector:
             pass
         finally:
             self.is_running = False
-            self.scheduler = None 
+            self.scheduler = None
+            if self.pool:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
+            with self._inflight_lock:
+                for device_id in self._inflight:
+                    poll_scheduler.release(device_id)
+                self._inflight.clear()
+            wmi_pool.close_all()
+            violation_tracker.checkpoint()
+            notification_dispatcher.stop()
 
-    def collect_all_metrics(self):
-        """Função principal otimizada com processamento paralelo e inteligência de rede"""
-        import pythoncom
-        from concurrent.futures import ThreadPoolExecutor
-        
+    def dispatch_due_polls(self):
+        """
+        Tick do despachante: sincroniza o inventário, expira coletas fora do prazo e
+        despacha os dispositivos vencidos (latência em lote, rede em lote, demais no pool).
+        """
         session = get_session()
         try:
-            logger.info(">>> [Sentinel] Iniciando ciclo de monitoramento inteligente...")
-            
-            # Buscar apenas dispositivos mapeados pelo scan (já existentes na base)
-            devices = session.query(Device).all()
-            if not devices:
-                logger.warning("Nenhum ativo mapeado para monitoramento.")
-                return
+            now = time.time()
+            if now - self._last_sync >= INVENTORY_SYNC_SECONDS:
+                poll_scheduler.reload_config()
+                poll_scheduler.sync(session.query(Device.id, Device.device_type).all(), now)
+                # Alertas resolvidos/apagados fora do Sentinel voltam a poder disparar
+                trigger_index.refresh(session)
+                alert_manager.sync_active_alerts(session)
+                # Grupos por pai/sub-rede para a correlação de alertas (tem o próprio intervalo)
+                alert_correlator.refresh(session, now=now)
+                self._last_sync = now
+            elif trigger_index.refresh(session):
+                alert_manager.sync_active_alerts(session)
 
-            # Inicializar COM para a thread principal do job
-            pythoncom.CoInitialize()
-            
-            # Usar pool de THREADS para melhor performance com SQLite e WAL mode
-            from concurrent.futures import ThreadPoolExecutor
-            
-            # Coletar IDs para processar
-            device_ids = [d.id for d in devices]
-            
-            # Aumentar workers para lidar com 217 ativos em 60s
-            max_workers = 25 
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Submit tasks
-                futures = {executor.submit(worker_thread_task, dev_id): dev_id for dev_id in device_ids}
-                
-                # Wait for completion with GLOBAL TIMEOUT (e.g. 50s so it finishes before next 60s job)
-                from concurrent.futures import wait, FIRST_EXCEPTION
-                done, not_done = wait(futures.keys(), timeout=50)
-                
-                for future in not_done:
-                    # Tentar cancelar tasks que não terminaram
-                    future.cancel()
-                    logger.warning(f"Timeout forcado na coleta do device {futures[future]}")
-            
-            logger.info(f">>> [Sentinel] Ciclo finalizado. {len(done)} concluídos, {len(not_done)} timeouts.")
+            self._expire_overdue(now)
+
+            due = poll_scheduler.pop_due(now)
+            if due:
+                self._dispatch(session, due, now)
+            # Alertas de conectividade retidos: um alerta pai por grupo em falha ou liberação individual
+            alert_correlator.flush(session, now)
+
+            # Amostras concluídas desde o último tick em uma única transação
+            metric_buffer.flush()
+            # Janelas de violação alteradas desde o último tick
+            violation_tracker.checkpoint()
             
         except Exception as e:
-            logger.error(f"Erro crítico no motor Sentinel (ProcessPool): {e}")
+            logger.error(f"Erro crítico no motor Sentinel (despachante): {e}")
+        finally:
+            session.close()
+
+    def _dispatch(self, session: Session, due, now):
+        # O atraso de despacho (lag) fica só nas estatísticas do agendador (poll_scheduler.lag_stats,
+        # em /api/metrics/scheduler/stats); uma série por dispositivo multiplicaria as linhas a cada tick
+        lags = {device_id: lag for device_id, _, lag in due}
+        devices = session.query(Device).filter(Device.id.in_(list(lags))).all()
+        found = {d.id for d in devices}
+        for device_id in lags:
+            if device_id not in found:
+                poll_scheduler.release(device_id)
+
+        # Rodada de latência + envio das coletas no pool: com dispositivos offline a sonda
+        # leva segundos e o tick do despachante (2s) não pode esperar por ela
+        self.pool.submit(self._probe_and_submit, [d.id for d in devices])
+
+        stats = poll_scheduler.lag_stats()
+        logger.info(f">>> [Sentinel] {len(devices)} coletas despachadas. Atraso p95 {stats['p95']}s, máx {stats['max']}s")
+
+    def _probe_and_submit(self, device_ids):
+        """
+        Rodada única de latência para os vencidos (também serve de pre-check online/offline)
+        e envio das coletas ao pool (thread do pool).
+        """
+        submitted = set()
+        session = get_session()
+        try:
+            devices = session.query(Device).filter(Device.id.in_(device_ids)).all()
+            probe_results = self._probe_fleet(session, devices)
+
+            # Rede em lotes de até max_concurrency: todos consultados ao mesmo tempo, cada
+            # dispositivo com o próprio prazo SNMP dentro do prazo do lote
+            network = [d.id for d in devices if d.device_type == 'network' and d.ip not in LOCAL_IPS]
+            step = interface_collector.max_concurrency
+            for i in range(0, len(network), step):
+                chunk = network[i:i + step]
+                self._submit(chunk, poll_scheduler.deadline('network'), network_batch_task, chunk, probe_results)
+                submitted.update(chunk)
+
+            for d in devices:
+                if d.id in submitted:
+                    continue
+                self._submit([d.id], poll_scheduler.deadline(d.device_type),
+                             worker_thread_task, d.id, probe_results.get(d.id))
+                submitted.add(d.id)
+        except Exception as e:
+            logger.error(f"Erro no despacho das coletas: {e}")
         finally:
-            pythoncom.CoUninitialize()
             session.close()
+            # Não enviados (erro ou removidos do inventário): voltam para a fila como falha
+            for device_id in device_ids:
+                if device_id not in submitted:
+                    poll_scheduler.complete(device_id, online=False)
+
+    def _submit(self, device_ids, budget, fn, *args):
+        """Envia a coleta ao pool; o prazo (budget) só começa a contar quando um worker a inicia"""
+        with self._inflight_lock:
+            for device_id in device_ids:
+                self._inflight[device_id] = [None, budget, None]  # [future, budget, início]
+        future = self.pool.submit(self._run_timed, device_ids, fn, *args)
+        with self._inflight_lock:
+            for device_id in device_ids:
+                entry = self._inflight.get(device_id)
+                if entry:
+                    entry[0] = future
+        future.add_done_callback(lambda f: self._on_done(device_ids, f))
+
+    def _run_timed(self, device_ids, fn, *args):
+        started = time.time()
+        with self._inflight_lock:
+            for device_id in device_ids:
+                entry = self._inflight.get(device_id)
+                if entry:
+                    entry[2] = started
+        return fn(*args)
+
+    def _on_done(self, device_ids, future):
+        """Reagenda os dispositivos de uma coleta concluída (callback da thread do pool)"""
+        results = {}
+        if not future.cancelled():
+            try:
+                results = future.result() or {}
+            except Exception as e:
+                logger.error(f"Erro na coleta de {device_ids}: {e}")
+        done = 0
+        for device_id in device_ids:
+            with self._inflight_lock:
+                expired = self._inflight.pop(device_id, None) is None
+            if expired:
+                # Já reagendado pelo deadline; só libera o dispositivo
+                poll_scheduler.release(device_id)
+                continue
+            result = results.get(device_id) or {}
+            poll_scheduler.complete(
+                device_id,
+                online=result.get('online', True),
+                fingerprint=result.get('fingerprint'),
+                pending_window=alert_manager.pending_violation_window(device_id)
+            )
+            done += 1
+        if done:
+            event_bus.publish("monitoring", {"event": "cycle", "done": done, "timeouts": poll_scheduler.stats['timeouts']}, coalesce=True)
+
+    def _expire_overdue(self, now):
+        """Coletas além do prazo: contam como falha e o dispositivo volta para a fila com backoff"""
+        with self._inflight_lock:
+            overdue = [(device_id, future) for device_id, (future, budget, started) in self._inflight.items()
+                       if started is not None and now > started + budget]
+            for device_id, _ in overdue:
+                del self._inflight[device_id]
+        for device_id, future in overdue:
+            future.cancel()  # só tem efeito se ainda estiver na fila do pool
+            poll_scheduler.expire(device_id, now, alert_manager.pending_violation_window(device_id))
+            logger.warning(f"Timeout forcado na coleta do device {device_id}")
+
+    def _probe_fleet(self, session: Session, devices):
+        """
+        Mede latência, perda e jitter de todos os dispositivos remotos em uma rodada
+        e grava as métricas em uma transação.
+
+        Returns:
+            dict: {device_id: resumo da sonda} (dispositivos locais não entram)
+        """
+        targets = {d.id: (d.ip, d.device_type) for d in devices if d.ip not in LOCAL_IPS}
+        try:
+            results = self.latency_prober.probe_all(targets)
+        except Exception as e:
+            logger.error(f"Erro na sondagem de latência em lote: {e}")
+            return {}
+
+        now = datetime.now()
+        for d in devices:
+            probe = results.get(d.id)
+            if not probe:
+                continue
+            # Disponibilidade (1/0) alimenta triggers de inacessível e a correlação por topologia
+            alert_correlator.observe(d.id, probe['alive'])
+            availability = 1.0 if probe['alive'] else 0.0
+            self._check_triggers(session, d, 'availability', availability, now)
+            alert_manager.auto_resolve_alerts(d.id, 'availability', availability, session)
+            if not probe['alive']:
+                continue
+            metric_buffer.add(d.id, 'latency', probe['rtt'], 'ms', now)
+            metric_buffer.add(d.id, 'packet_loss', probe['loss'], '%', now)
+            metric_buffer.add(d.id, 'jitter', probe['jitter'], 'ms', now)
+            d.last_seen = now
+            self._check_triggers(session, d, 'latency', probe['rtt'], now)
+            alert_manager.auto_resolve_alerts(d.id, 'latency', probe['rtt'], session)
+        session.commit()
+
+        stats = self.latency_prober.stats
+        logger.info(f"[Sentinel] Latência: {stats['alive']}/{stats['devices']} online em {stats['elapsed']}s ({'ICMP' if stats['icmp'] else 'TCP'})")
+        return results
+
+    def _collect_network_fleet(self, session: Session, devices, probe_results):
+        """
+        Coleta IF-MIB de todos os dispositivos de rede online em uma rodada concorrente
+        e grava as taxas por interface em um único INSERT.
+
+        Returns:
+            dict: {device_id: {'online': bool}} para o agendador
+        """
+        status = {d.id: {'online': bool((probe_results.get(d.id) or {}).get('alive'))} for d in devices}
+        network = {d.id: d for d in devices if status[d.id]['online']}
+        if not network:
+            return status
+        try:
+            results = interface_collector.collect_all({d.id: d.ip for d in network.values()},
+                                                      deadline=NETWORK_DEVICE_DEADLINE * poll_scheduler.deadline('network'))
+        except Exception as e:
+            logger.error(f"Erro na coleta de interfaces em lote: {e}")
+            return status
+
+        now = datetime.now()
+        rows = []
+        for device_id, rates in results.items():
+            rows.extend(self._record_interface_rates(session, network[device_id], rates, now))
+        if rows:
+            session.execute(InterfaceMetric.__table__.insert(), rows)
+        session.commit()
+
+        stats = interface_collector.stats
+        logger.info(f"[Sentinel] Interfaces: {stats['responded']}/{stats['devices']} dispositivos, "
+                    f"{stats['interfaces']} interfaces, {stats['rates']} taxas em {stats['elapsed']}s")
+        return status
+
+    def _record_interface_rates(self, session: Session, device: Device, rates, now):
+        """Agregados do dispositivo na série principal (+ triggers); retorna as linhas por interface"""
+        totals = device_totals(rates)
+        if not totals:
+            return []
+        units = {'traffic_in': 'Mbps', 'traffic_out': 'Mbps', 'interface_errors': 'err/s', 'interface_utilization': '%'}
+        for metric_type, value in totals.items():
+            metric_buffer.add(device.id, metric_type, value, units[metric_type], now)
+            self._check_triggers(session, device, metric_type, value, now)
+            alert_manager.auto_resolve_alerts(device.id, metric_type, value, session)
+        return interface_rows(device.id, rates, now)
 
-    def collect_device_metrics(self, session: Session, device: Device):
-        """Coleta métricas de um único dispositivo com inteligência de skip"""
+    def collect_device_metrics(self, session: Session, device: Device, probe=None):
+        """Coleta métricas de um único dispositivo com inteligência de skip. Retorna False se offline."""
         
         # Monitoramento de Latência e Pre-Check (Ping)
-        # Se for remoto, verificamos se responde antes de tentar coletas pesadas
+        # Se for remoto, verificamos se responde antes de tentar coletas pesadas.
+        # No ciclo normal a sonda em lote já respondeu (probe); o ping individual é só fallback.
         is_online = True
-        if device.ip not in ['127.0.0.1', 'localhost', '0.0.0.0']:
-            is_online = self._collect_latency(session, device)
+        if device.ip not in LOCAL_IPS:
+            if probe is not None:
+                is_online = probe['alive']
+            else:
+                is_online = self._collect_latency(session, device)
 
         if not is_online:
             # Ativo offline: não perdemos tempo tentando WMI (que demora timeout) ou SNMP
             logger.debug(f"[Sentinel] Skip {device.ip}: Ativo offline.")
-            return
+            return False
 
         # 1. Monitoramento Local (Auto-monitoramento do Servidor)
-        if device.ip in ['127.0.0.1', 'localhost', '0.0.0.0']:
+        if device.ip in LOCAL_IPS:
             self._collect_local_metrics(session, device)
-            return
+            return True
 
         # 2. Monitoramento de Impressoras via SNMP
         if device.device_type == 'printer':
             self._collect_printer_metrics(session, device)
-            return
+            return True
 
         # 3. Monitoramento de Windows via WMI
         if device.device_type in ['windows', 'server']:
             self._collect_windows_metrics(session, device)
-            return
+            return True
 
         # 4. Monitoramento de Dispositivos de Rede via SNMP
         if device.device_type == 'network':
             self._collect_network_metrics(session, device)
-            return
+            return True
+
+        return True
+
+    def _add_metric(self, device_id, metric_type, value, unit=None, timestamp=None, drive=None):
+        """Enfileira a amostra e guarda o valor para o fingerprint da coleta"""
+        self.sampled[(metric_type, drive)] = value
+        metric_buffer.add(device_id, metric_type, value, unit, timestamp, drive=drive)
+
+    def fingerprint(self):
+        """Valores da última coleta (arredondados); igual ao anterior = dispositivo sem mudança"""
+        if not self.sampled:
+            return None
+        return tuple(sorted((k, round(float(v), 1)) for k, v in self.sampled.items()))
 
     def _collect_latency(self, session: Session, device: Device):
         """Mede a latência (ping) do dispositivo e retorna status online"""
@@ -166,13 +439,7 @@ class MetricsCollector:
             latency = (time.time() - start_time) * 1000 # em ms
             
             if res.returncode == 0:
-                metric = Metric(
-                    device_id=device.id,
-                    metric_type='latency',
-                    value=round(latency, 2),
-                    unit='ms'
-                )
-                session.add(metric)
+                metric_buffer.add(device.id, 'latency', round(latency, 2), 'ms')
                 device.last_seen = datetime.now()
                 return True
             return False
@@ -186,31 +453,13 @@ class MetricsCollector:
         disk_percent = psutil.disk_usage('/').percent
         
         # Salvar CPU
-        metric_cpu = Metric(
-            device_id=device.id,
-            metric_type='cpu_usage',
-            value=cpu_percent,
-            unit='%'
-        )
-        session.add(metric_cpu)
+        self._add_metric(device.id, 'cpu_usage', cpu_percent, '%')
         
         # Salvar RAM
-        metric_ram = Metric(
-            device_id=device.id,
-            metric_type='ram_usage',
-            value=ram_percent,
-            unit='%'
-        )
-        session.add(metric_ram)
+        self._add_metric(device.id, 'ram_usage', ram_percent, '%')
 
         # Salvar Disk
-        metric_disk = Metric(
-            device_id=device.id,
-            metric_type='disk_usage',
-            value=disk_percent,
-            unit='%'
-        )
-        session.add(metric_disk)
+        self._add_metric(device.id, 'disk_usage', disk_percent, '%')
         
         # Verificar Triggers
         self._check_triggers(session, device, 'cpu_usage', cpu_percent)
@@ -265,39 +514,23 @@ class MetricsCollector:
             
             # Salvar CPU
             if metrics.get('cpu_percent') is not None:
-                metric = Metric(
-                    device_id=device.id,
-                    metric_type='cpu_usage',
-                    value=metrics['cpu_percent'],
-                    unit='%'
-                )
-                session.add(metric)
+                self._add_metric(device.id, 'cpu_usage', metrics['cpu_percent'], '%')
                 self._check_triggers(session, device, 'cpu_usage', metrics['cpu_percent'])
                 alert_manager.auto_resolve_alerts(device.id, 'cpu_usage', metrics['cpu_percent'], session)
             
             # Salvar RAM
             if metrics.get('memory'):
                 ram_percent = metrics['memory'].get('percent', 0)
-                metric = Metric(
-                    device_id=device.id,
-                    metric_type='ram_usage',
-                    value=ram_percent,
-                    unit='%'
-                )
-                session.add(metric)
+                self._add_metric(device.id, 'ram_usage', ram_percent, '%')
                 self._check_triggers(session, device, 'ram_usage', ram_percent)
                 alert_manager.auto_resolve_alerts(device.id, 'ram_usage', ram_percent, session)
             
             # Salvar Disco (maior disco)
             if metrics.get('disks'):
+                # Mesmo timestamp para todas as unidades: o valor corrente fica com a mais cheia
+                collected_at = datetime.now()
                 for disk in metrics['disks']:
-                    metric = Metric(
-                        device_id=device.id,
-                        metric_type=f'disk_usage_{disk["drive"]}',
-                        value=disk['percent'],
-                        unit='%'
-                    )
-                    session.add(metric)
+                    self._add_metric(device.id, 'disk_usage', disk['percent'], '%', collected_at, drive=disk['drive'])
                     self._check_triggers(session, device, 'disk_usage', disk['percent'])
                     alert_manager.auto_resolve_alerts(device.id, 'disk_usage', disk['percent'], session)
             
@@ -330,25 +563,13 @@ class MetricsCollector:
             
             # Salvar contador de páginas
             if metrics.get('page_count'):
-                metric = Metric(
-                    device_id=device.id,
-                    metric_type='page_count',
-                    value=int(metrics['page_count']),
-                    unit='pages'
-                )
-                session.add(metric)
+                self._add_metric(device.id, 'page_count', int(metrics['page_count']), 'pages')
             
             # Salvar níveis de toner
             for color in ['black', 'cyan', 'magenta', 'yellow']:
                 level = metrics.get(f'toner_{color}')
                 if level is not None and level != -1:
-                    metric = Metric(
-                        device_id=device.id,
-                        metric_type=f'toner_{color}',
-                        value=level,
-                        unit='%'
-                    )
-                    session.add(metric)
+                    self._add_metric(device.id, f'toner_{color}', level, '%')
                     
                     # Verificar triggers de toner baixo
                     self._check_triggers(session, device, f'toner_{color}', level)
@@ -365,36 +586,39 @@ class MetricsCollector:
             logger.error(f"Erro ao coletar métricas SNMP de impressora {device.ip}: {e}")
 
     def _collect_network_metrics(self, session: Session, device: Device):
-        """Coleta métricas de dispositivo de rede via SNMP (placeholder)"""
-        # TODO: Implementar coleta de interfaces, latência, etc.
-        pass
+        """Coleta interfaces (IF-MIB) de um dispositivo de rede via SNMP"""
+        try:
+            rates = interface_collector.collect_all({device.id: device.ip}).get(device.id)
+            if rates is None:
+                logger.warning(f"Falha ao coletar interfaces SNMP de {device.ip}")
+                return
+            rows = self._record_interface_rates(session, device, rates, datetime.now())
+            if rows:
+                session.execute(InterfaceMetric.__table__.insert(), rows)
+            logger.info(f"✅ Interfaces SNMP coletadas de {device.hostname} ({device.ip}): {len(rows)} com tráfego")
+        except Exception as e:
+            logger.error(f"Erro ao coletar interfaces SNMP de {device.ip}: {e}")
 
-    def _check_triggers(self, session: Session, device: Device, metric_type: str, value: float):
-        """Verifica se alguma regra (trigger) foi violada"""
+    def _check_triggers(self, session: Session, device: Device, metric_type: str, value: float, timestamp=None):
+        """Verifica se alguma regra (trigger) foi violada (timestamp = momento da amostra)"""
         try:
-            # Buscar triggers ativos para este tipo de métrica
-            triggers = session.query(Trigger).filter(
-                Trigger.metric_type == metric_type,
-                Trigger.enabled == True
-            ).all()
-            
-            for trigger in triggers:
-                # Filtrar por tipo de dispositivo se configurado
-                if trigger.device_type_filter:
-                    if device.device_type != trigger.device_type_filter:
-                        continue
-                
+            # Regras habilitadas desta métrica para o tipo do dispositivo (índice em memória)
+            trigger_index.ensure_loaded(session)
+            for trigger in trigger_index.rules_for(metric_type, device.device_type):
                 # Verificar se trigger foi violado (considerando duração)
                 should_alert = alert_manager.check_trigger_violation(
                     device.id,
                     trigger,
                     value,
-                    session
+                    session,
+                    timestamp
                 )
                 
                 if should_alert:
-                    # Criar alerta
-                    alert_manager.create_alert(device.id, trigger, value, session)
+                    # Criar alerta (conectividade passa pela correlação por topologia antes)
+                    alert_correlator.submit(session, device, trigger, value)
+                else:
+                    alert_correlator.clear(device.id, trigger.id)
                     
         except Exception as e:
             logger.error(f"Erro ao verificar triggers: {e}")
@@ -445,15 +669,32 @@ class MetricsCollector:
 # Instância global
 collector = MetricsCollector()
 
+def init_worker_com():
+    """
+    Inicializador das threads do pool: entra no apartamento multithread do COM uma vez
+    por thread e não sai mais. As sessões WMI do pool (wmi_helper.wmi_pool) são criadas
+    e reaproveitadas por threads diferentes; um CoUninitialize por tarefa derrubaria o
+    MTA entre os ticks e com ele os proxies DCOM em cache.
+    """
+    try:
+        import pythoncom
+    except ImportError:
+        return  # fora do Windows não há WMI
+    pythoncom.CoInitializeEx(pythoncom.COINIT_MULTITHREADED)
+
+
 # Função Global para o Worker de Thread
-def worker_thread_task(device_id):
-    """Tarefa executada em uma thread do pool"""
-    import pythoncom
+def worker_thread_task(device_id, probe=None):
+    """
+    Tarefa executada em uma thread do pool
+
+    Returns:
+        dict: {device_id: {'online', 'fingerprint'}} para o agendador
+    """
     from database import get_session
     from models import Device
     
-    # Inicializa COM para esta thread
-    pythoncom.CoInitialize()
+    # COM já inicializado na thread pelo init_worker_com do pool
     session = get_session()
     try:
         # Instancia localmente para evitar problemas de thread safety
@@ -463,11 +704,25 @@ def worker_thread_task(device_id):
         dev = session.query(Device).filter(Device.id == device_id).first()
         if dev:
             # Executa a coleta no contexto desta thread
-            temp_collector.collect_device_metrics(session, dev)
+            online = temp_collector.collect_device_metrics(session, dev, probe)
             session.commit()
+            return {device_id: {'online': online is not False, 'fingerprint': temp_collector.fingerprint()}}
     except Exception as e:
         import logging
         logging.getLogger("MetricsWorker").error(f"Erro na thread worker ({device_id}): {e}")
     finally:
         session.close()
-        pythoncom.CoUninitialize()
+    return {}
+
+
+def network_batch_task(device_ids, probe_results):
+    """Coleta de interfaces dos dispositivos de rede vencidos em uma rodada (thread do pool)"""
+    session = get_session()
+    try:
+        devices = session.query(Device).filter(Device.id.in_(device_ids)).all()
+        return collector._collect_network_fleet(session, devices, probe_results)
+    except Exception as e:
+        logging.getLogger("MetricsWorker").error(f"Erro na coleta de rede em lote: {e}")
+        return {}
+    finally:
+        session.close()
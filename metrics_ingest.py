@@ -0,0 +1,155 @@
+"""
+Metrics Ingest - Buffer de ingestão em lote para a tabela metrics
+Os coletores acumulam amostras aqui em vez de criar objetos Metric no ORM;
+o ciclo do Sentinel grava tudo com um INSERT executemany em uma transação,
+que também atualiza o valor corrente em device_metric_latest.
+"""
+import threading
+import time
+import logging
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import Metric, DeviceMetricLatest
+
+logger = logging.getLogger("MetricsIngest")
+
+
+def latest_rows(batch):
+    """
+    Reduz um lote ao valor corrente por (device_id, metric_type).
+
+    Regra do valor corrente (a mesma do upsert abaixo e do backfill em
+    migrate_metric_latest): amostra de timestamp mais recente; no empate (vários
+    discos do mesmo ciclo) a de maior valor, ou seja, a unidade mais cheia;
+    persistindo o empate, a inserida por último.
+    """
+    latest = {}
+    for row in batch:
+        key = (row['device_id'], row['metric_type'])
+        current = latest.get(key)
+        if (current is None or row['timestamp'] > current['timestamp']
+                or (row['timestamp'] == current['timestamp'] and row['value'] >= current['value'])):
+            latest[key] = row
+    return list(latest.values())
+
+
+def _latest_upsert():
+    table = DeviceMetricLatest.__table__
+    stmt = sqlite_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=['device_id', 'metric_type'],
+        set_={c: stmt.excluded[c] for c in ('drive', 'value', 'unit', 'timestamp')},
+        # Mesma regra do latest_rows entre flushes: amostra atrasada nunca sobrescreve
+        # um valor mais novo, e no mesmo timestamp só a unidade mais cheia substitui
+        where=(table.c.timestamp < stmt.excluded.timestamp)
+        | ((table.c.timestamp == stmt.excluded.timestamp) & (table.c.value <= stmt.excluded.value))
+    )
+
+
+class MetricIngestBuffer:
+    """
+    Buffer thread-safe de amostras (device_id, metric_type, drive, value, unit, timestamp).
+    Mantém o schema do modelo Metric; apenas troca o caminho de escrita.
+
+    Um lote que falha (ex.: 'database is locked' durante o rollup) volta para o início
+    do buffer e é regravado no próximo flush (tick seguinte do Sentinel), até
+    max_retries vezes; só então é descartado.
+    """
+
+    def __init__(self, max_pending=20000, max_retries=3):
+        """
+        Args:
+            max_pending: Acima deste volume o próprio add() dispara um flush antecipado
+            max_retries: Novas tentativas de um lote que falhou antes de descartá-lo
+        """
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self.failures = 0           # falhas consecutivas do lote pendente
+        self.stats = {
+            "ingested": 0,          # amostras gravadas desde o início
+            "flushes": 0,
+            "errors": 0,
+            "retries": 0,
+            "dropped": 0,
+            "last_flush_rows": 0,
+            "last_flush_ms": 0.0,
+            "avg_flush_ms": 0.0,
+            "ingest_rate": 0.0,     # amostras/s entre os dois últimos flushes
+        }
+        self._last_flush_at = time.time()
+
+    def add(self, device_id, metric_type, value, unit=None, timestamp=None, drive=None):
+        row = {
+            'device_id': device_id,
+            'metric_type': metric_type,
+            'drive': drive,
+            'value': value,
+            'unit': unit,
+            'timestamp': timestamp or datetime.now(),
+        }
+        with self._lock:
+            self._pending.append(row)
+            # Com um lote em nova tentativa, espera o tick em vez de insistir a cada add()
+            overflow = len(self._pending) >= self.max_pending and not self.failures
+        if overflow:
+            self.flush()
+
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Grava todas as amostras pendentes em uma transação. Retorna o número de linhas."""
+        from database import engine
+
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            t0 = time.time()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(Metric.__table__.insert(), batch)
+                    conn.execute(_latest_upsert(), latest_rows(batch))
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.failures += 1
+                if self.failures > self.max_retries:
+                    logger.error(f"Erro ao gravar lote de métricas ({len(batch)} amostras), descartado após "
+                                 f"{self.max_retries} novas tentativas: {e}")
+                    self.stats["dropped"] += len(batch)
+                    self.failures = 0
+                    return 0
+                logger.warning(f"Erro ao gravar lote de métricas ({len(batch)} amostras), nova tentativa "
+                               f"{self.failures}/{self.max_retries}: {e}")
+                self.stats["retries"] += 1
+                with self._lock:
+                    # Amostras mais antigas na frente: latest_rows/upsert decidem pelo timestamp
+                    self._pending = batch + self._pending
+                return 0
+            self.failures = 0
+
+            now = time.time()
+            elapsed_ms = (now - t0) * 1000
+            s = self.stats
+            s["flushes"] += 1
+            s["ingested"] += len(batch)
+            s["last_flush_rows"] = len(batch)
+            s["last_flush_ms"] = round(elapsed_ms, 2)
+            s["avg_flush_ms"] = round(s["avg_flush_ms"] + (elapsed_ms - s["avg_flush_ms"]) / s["flushes"], 2)
+            window = now - self._last_flush_at
+            s["ingest_rate"] = round(len(batch) / window, 1) if window > 0 else 0.0
+            self._last_flush_at = now
+            return len(batch)
+
+    def get_stats(self):
+        return dict(self.stats, pending=self.pending())
+
+
+# Instância global compartilhada pelos coletores
+metric_buffer = MetricIngestBuffer()
@@ -0,0 +1,296 @@
+"""
+Metrics Rollup - Downsampling e retenção da série temporal de métricas
+Tiers: raw (1 amostra/min em `metrics`), 5 minutos (`metrics_5m`) e 1 hora (`metrics_1h`),
+cada agregado com min/max/avg/count e retenção configurável por tier.
+Consultas de longo alcance leem o tier mais grosso que atende à resolução pedida.
+"""
+import time
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+logger = logging.getLogger("MetricsRollup")
+
+# Ordem: do mais fino para o mais grosso. 'source' é o tier que alimenta o agregado.
+TIERS = [
+    {'name': 'raw', 'table': 'metrics', 'step': 60, 'time_col': 'timestamp', 'source': None},
+    {'name': '5m', 'table': 'metrics_5m', 'step': 300, 'time_col': 'bucket', 'source': 'raw'},
+    {'name': '1h', 'table': 'metrics_1h', 'step': 3600, 'time_col': 'bucket', 'source': '5m'},
+]
+TIERS_BY_NAME = {t['name']: t for t in TIERS}
+
+# Retenção padrão em dias (sobrescrita por settings['metrics_retention_days'])
+# 'interfaces' = série por interface dos dispositivos de rede (interface_metrics, sem rollup)
+DEFAULT_RETENTION_DAYS = {'raw': 7, '5m': 30, '1h': 365, 'interfaces': 7}
+
+# Buckets só são fechados após esta folga (amostras do ciclo ainda no buffer de ingestão)
+CLOSE_GRACE_SECONDS = 120
+# Janela máxima por transação ao agregar um backlog (primeira execução em base antiga)
+ROLLUP_CHUNK = timedelta(days=1)
+
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Série agregada da frota inteira, mantida dentro dos próprios tiers (gráficos globais
+# leem poucas linhas em vez de todos os dispositivos)
+FLEET_DEVICE_ID = 0
+
+
+def _bucket_expr(col, step):
+    """Expressão SQLite que trunca o timestamp `col` para o início do bucket de `step` segundos"""
+    return f"datetime((CAST(strftime('%s', {col}) AS INTEGER) / {int(step)}) * {int(step)}, 'unixepoch')"
+
+
+def _floor(dt, step):
+    epoch = datetime(1970, 1, 1)
+    secs = int((dt - epoch).total_seconds())
+    return epoch + timedelta(seconds=secs - secs % step)
+
+
+def _fmt(dt):
+    return dt.strftime(TS_FORMAT)
+
+
+def _parse(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.strptime(value[:19], TS_FORMAT)
+
+
+class MetricsRollup:
+    """Job de agregação/retenção e leitor de histórico por tier"""
+
+    def __init__(self, retention_days=None):
+        """
+        Args:
+            retention_days: {'raw': dias, '5m': dias, '1h': dias}; None = lê das configurações
+        """
+        self._retention_override = retention_days
+        self.stats = {
+            "runs": 0,
+            "last_run_ms": 0.0,
+            "rolled": {'5m': 0, '1h': 0},
+            "purged": {'raw': 0, '5m': 0, '1h': 0, 'interfaces': 0},
+        }
+
+    def retention_days(self):
+        days = dict(DEFAULT_RETENTION_DAYS)
+        if self._retention_override is not None:
+            days.update(self._retention_override)
+            return days
+        try:
+            from utils import load_general_settings
+            days.update(load_general_settings().get('metrics_retention_days') or {})
+        except Exception as e:
+            logger.debug(f"Usando retenção padrão: {e}")
+        return days
+
+    # ------------------------------------------------------------------
+    # Watermarks
+    # ------------------------------------------------------------------
+    def watermark(self, conn, tier_name):
+        """Fim do último bucket agregado no tier (None se vazio). Para 'raw' é o timestamp mais recente."""
+        tier = TIERS_BY_NAME[tier_name]
+        last = _parse(conn.execute(text(f"SELECT MAX({tier['time_col']}) FROM {tier['table']}")).scalar())
+        if last is None or tier_name == 'raw':
+            return last
+        return last + timedelta(seconds=tier['step'])
+
+    def _earliest(self, conn, tier_name):
+        tier = TIERS_BY_NAME[tier_name]
+        return _parse(conn.execute(text(f"SELECT MIN({tier['time_col']}) FROM {tier['table']}")).scalar())
+
+    # ------------------------------------------------------------------
+    # Agregação
+    # ------------------------------------------------------------------
+    def _rollup_sql(self, tier):
+        """Statements de agregação do tier a partir do tier de origem"""
+        source = TIERS_BY_NAME[tier['source']]
+        bucket = _bucket_expr(source['time_col'], tier['step'])
+        if source['name'] == 'raw':
+            aggregates = "MIN(value), MAX(value), AVG(value), COUNT(*)"
+        else:
+            # Média ponderada pelo count do tier de origem
+            aggregates = ("MIN(min_value), MAX(max_value), "
+                          "SUM(avg_value * count) / SUM(count), SUM(count)")
+        upsert = f"""
+            INSERT INTO {tier['table']} (device_id, metric_type, bucket, min_value, max_value, avg_value, count)
+            SELECT {{device}}, metric_type, {bucket} AS b, {aggregates}
+            FROM {source['table']}
+            WHERE {source['time_col']} >= :start AND {source['time_col']} < :end
+            GROUP BY {{group}}metric_type, b
+            ON CONFLICT(device_id, metric_type, bucket) DO UPDATE SET
+                min_value = excluded.min_value,
+                max_value = excluded.max_value,
+                avg_value = excluded.avg_value,
+                count = excluded.count
+        """
+        statements = [upsert.format(device="device_id", group="device_id, ")]
+        if source['name'] == 'raw':
+            # Nos tiers seguintes a série da frota é agregada junto, como mais um "dispositivo"
+            statements.append(upsert.format(device=FLEET_DEVICE_ID, group=""))
+        return [text(sql) for sql in statements]
+
+    def _rollup_tier(self, engine, tier, now):
+        """Agrega os buckets fechados desde o watermark do tier. Retorna o número de linhas gravadas."""
+        step = tier['step']
+        with engine.connect() as conn:
+            start = self.watermark(conn, tier['name'])
+            if start is None:
+                start = self._earliest(conn, tier['source'])
+            else:
+                # Reagrega o último bucket (idempotente via upsert) para absorver amostras atrasadas
+                start -= timedelta(seconds=step)
+            if tier['source'] != 'raw':
+                # Só agrega o que o tier de origem já fechou
+                source_end = self.watermark(conn, tier['source'])
+                end_limit = source_end
+            else:
+                end_limit = now - timedelta(seconds=CLOSE_GRACE_SECONDS)
+        if start is None or end_limit is None:
+            return 0
+
+        start = _floor(start, step)
+        end = _floor(end_limit, step)
+        statements = self._rollup_sql(tier)
+        written = 0
+        cursor = start
+        while cursor < end:
+            chunk_end = min(cursor + ROLLUP_CHUNK, end)
+            with engine.begin() as conn:
+                for sql in statements:
+                    written += conn.execute(sql, {'start': _fmt(cursor), 'end': _fmt(chunk_end)}).rowcount or 0
+            cursor = chunk_end
+        return written
+
+    def _purge(self, engine, now, retention):
+        """Aplica a retenção; nunca apaga dados de um tier que o tier seguinte ainda não agregou"""
+        purged = {}
+        with engine.begin() as conn:
+            for i, tier in enumerate(TIERS):
+                cutoff = now - timedelta(days=retention[tier['name']])
+                consumer = TIERS[i + 1] if i + 1 < len(TIERS) else None
+                if consumer:
+                    rolled_until = self.watermark(conn, consumer['name'])
+                    if rolled_until is None:
+                        purged[tier['name']] = 0
+                        continue
+                    cutoff = min(cutoff, rolled_until)
+                res = conn.execute(
+                    text(f"DELETE FROM {tier['table']} WHERE {tier['time_col']} < :cutoff"),
+                    {'cutoff': _fmt(cutoff)}
+                )
+                purged[tier['name']] = res.rowcount or 0
+            res = conn.execute(
+                text("DELETE FROM interface_metrics WHERE timestamp < :cutoff"),
+                {'cutoff': _fmt(now - timedelta(days=retention['interfaces']))}
+            )
+            purged['interfaces'] = res.rowcount or 0
+        return purged
+
+    def run(self, now=None):
+        """Ciclo completo: agrega 5m e 1h e aplica a retenção. Chamado pelo scheduler do Sentinel."""
+        from database import engine
+
+        t0 = time.time()
+        now = now or datetime.now()
+        try:
+            for tier in TIERS[1:]:
+                self.stats["rolled"][tier['name']] += self._rollup_tier(engine, tier, now)
+            purged = self._purge(engine, now, self.retention_days())
+            for name, n in purged.items():
+                self.stats["purged"][name] += n
+        except Exception as e:
+            logger.error(f"Erro no rollup de métricas: {e}")
+            return False
+
+        self.stats["runs"] += 1
+        self.stats["last_run_ms"] = round((time.time() - t0) * 1000, 2)
+        logger.info(f"[Rollup] Ciclo concluído em {self.stats['last_run_ms']}ms. Removidas: {purged}")
+        return True
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def pick_tier(self, since, step, now=None):
+        """
+        Tier mais grosso cuja resolução atende `step` e cuja retenção ainda cobre `since`.
+        Se nenhum cobrir (janela além de toda retenção), usa o mais grosso que atende a resolução.
+        """
+        now = now or datetime.now()
+        retention = self.retention_days()
+        candidates = [t for t in reversed(TIERS) if t['step'] <= step] or [TIERS[0]]
+        for tier in candidates:
+            if since >= now - timedelta(days=retention[tier['name']]):
+                return tier['name']
+        return candidates[0]['name']
+
+    def history_sql(self, tier_name, step, type_filter, device_id=None):
+        """SQL de leitura de um tier (exposto para a checagem de planos de consulta)"""
+        tier = TIERS_BY_NAME[tier_name]
+        if step == tier['step']:
+            bucket = tier['time_col']  # já está na resolução pedida
+        else:
+            bucket = _bucket_expr(tier['time_col'], step)
+        if tier['name'] == 'raw':
+            sums = "SUM(value), COUNT(*)"
+        else:
+            sums = "SUM(avg_value * count), SUM(count)"
+        sql = f"""
+            SELECT {bucket} AS b, metric_type, {sums}
+            FROM {tier['table']}
+            WHERE {tier['time_col']} >= :start AND {tier['time_col']} < :end AND ({type_filter})
+        """
+        if device_id is not None:
+            sql += " AND device_id = :device_id"
+        elif tier['name'] != 'raw':
+            sql += f" AND device_id = {FLEET_DEVICE_ID}"
+        return sql + " GROUP BY b, metric_type"
+
+    def _read_tier(self, conn, tier, step, start, end, type_filter, params):
+        sql = self.history_sql(tier['name'], step, type_filter, params.get('device_id'))
+        rows = conn.execute(text(sql), dict(params, start=_fmt(start), end=_fmt(end))).fetchall()
+        # Buckets lidos direto da coluna vêm como texto do SQLite; normaliza para 'YYYY-MM-DD HH:MM:SS'
+        return [(str(b)[:19], m_type, total, count) for b, m_type, total, count in rows]
+
+    def query_history(self, since, until=None, step=3600, metric_types=(), device_id=None):
+        """
+        Série agregada em buckets de `step` segundos.
+
+        O tier escolhido responde pela maior parte da janela; o trecho após o seu
+        watermark (buckets ainda não fechados) vem dos tiers mais finos, até o raw.
+
+        Sem device_id, lê a série da frota (FLEET_DEVICE_ID) nos tiers agregados.
+
+        Returns:
+            dict: {(bucket 'YYYY-MM-DD HH:MM:SS', metric_type): (soma, count)}
+        """
+        from database import engine
+
+        until = until or datetime.now()
+        chosen = self.pick_tier(since, step)
+        chain = [t for t in reversed(TIERS) if t['step'] <= TIERS_BY_NAME[chosen]['step']]
+
+        params = {f"mt{i}": mt for i, mt in enumerate(metric_types)}
+        type_filter = f"metric_type IN ({', '.join(':' + k for k in params)})" if params else "1 = 1"
+        if device_id is not None:
+            params['device_id'] = device_id
+
+        merged = {}
+        cursor = since
+        with engine.connect() as conn:
+            for tier in chain:
+                if cursor >= until:
+                    break
+                end = until if tier['name'] == 'raw' else min(until, self.watermark(conn, tier['name']) or cursor)
+                if end <= cursor:
+                    continue
+                for b, m_type, total, count in self._read_tier(conn, tier, step, cursor, end, type_filter, params):
+                    prev = merged.get((b, m_type), (0.0, 0))
+                    merged[(b, m_type)] = (prev[0] + (total or 0.0), prev[1] + (count or 0))
+                cursor = end
+        return merged
+
+
+# Instância global
+metrics_rollup = MetricsRollup()
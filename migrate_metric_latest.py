@@ -0,0 +1,47 @@
+import sqlite3
+import os
+from database import DB_PATH
+
+def migrate_metric_latest():
+    print(f"Iniciando migração em: {DB_PATH}")
+    
+    if not os.path.exists(DB_PATH):
+        print("Banco de dados não encontrado. Nada a migrar.")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    try:
+        # Só popula uma vez: depois disso a ingestão mantém a tabela atualizada
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM device_metric_latest)")
+        if cursor.fetchone()[0]:
+            print("Tabela 'device_metric_latest' já populada. Pulando migração.")
+            return
+        
+        print("Populando 'device_metric_latest' a partir do histórico...")
+        # Mesma regra de metrics_ingest.latest_rows: timestamp mais recente; no empate
+        # (discos do mesmo ciclo) a unidade mais cheia; persistindo o empate, a última inserida
+        cursor.execute("""
+            INSERT INTO device_metric_latest (device_id, metric_type, drive, value, unit, timestamp)
+            SELECT device_id, metric_type, drive, value, unit, timestamp
+            FROM (
+                SELECT device_id, metric_type, drive, value, unit, timestamp,
+                       ROW_NUMBER() OVER (PARTITION BY device_id, metric_type
+                                          ORDER BY timestamp DESC, value DESC, id DESC) AS rank
+                FROM metrics
+                WHERE device_id IS NOT NULL AND value IS NOT NULL AND timestamp IS NOT NULL
+            )
+            WHERE rank = 1
+        """)
+        conn.commit()
+        print(f"Migração concluída com sucesso! {cursor.rowcount} valores correntes.")
+            
+    except Exception as e:
+        print(f"Erro durante a migração: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_metric_latest()
@@ -0,0 +1,93 @@
+import sqlite3
+import os
+from database import DB_PATH
+
+# Índices compostos dos hot paths de monitoramento (mesmos nomes declarados em models.Metric)
+METRIC_INDEXES = {
+    'ix_metrics_type_device_id': 'metrics (metric_type, device_id, id)',
+    'ix_metrics_device_type_ts': 'metrics (device_id, metric_type, timestamp)',
+}
+# Índices de coluna única cobertos pelo prefixo dos compostos: só custam escrita
+REDUNDANT_INDEXES = ['ix_metrics_metric_type', 'ix_metrics_device_id']
+
+
+def _normalize_rollup_disks(cursor, table):
+    """Funde as séries 'disk_usage_<drive>' de um tier agregado em uma única 'disk_usage' por dispositivo"""
+    cursor.execute(f"""
+        INSERT INTO {table} (device_id, metric_type, bucket, min_value, max_value, avg_value, count)
+        SELECT device_id, 'disk_usage', bucket, MIN(min_value), MAX(max_value),
+               SUM(avg_value * count) / SUM(count), SUM(count)
+        FROM {table}
+        WHERE metric_type GLOB 'disk_usage_*'
+        GROUP BY device_id, bucket
+        ON CONFLICT(device_id, metric_type, bucket) DO UPDATE SET
+            min_value = MIN(min_value, excluded.min_value),
+            max_value = MAX(max_value, excluded.max_value),
+            avg_value = (avg_value * count + excluded.avg_value * excluded.count) / (count + excluded.count),
+            count = count + excluded.count
+    """)
+    cursor.execute(f"DELETE FROM {table} WHERE metric_type GLOB 'disk_usage_*'")
+
+
+def migrate_metrics_indexes():
+    print(f"Iniciando migração em: {DB_PATH}")
+
+    if not os.path.exists(DB_PATH):
+        print("Banco de dados não encontrado. Nada a migrar.")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("PRAGMA table_info(metrics)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if not columns:
+            print("Tabela 'metrics' não existe. Nada a migrar.")
+            return
+
+        # Disco normalizado: 'disk_usage_C:' -> metric_type 'disk_usage' + drive 'C:'
+        if 'drive' not in columns:
+            print("Adicionando coluna 'drive' à tabela 'metrics'...")
+            cursor.execute("ALTER TABLE metrics ADD COLUMN drive VARCHAR(10)")
+
+        cursor.execute("""
+            UPDATE metrics SET drive = substr(metric_type, 12), metric_type = 'disk_usage'
+            WHERE metric_type GLOB 'disk_usage_*'
+        """)
+        if cursor.rowcount:
+            print(f"{cursor.rowcount} amostras de disco normalizadas.")
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {row[0] for row in cursor.fetchall()}
+        for table in ('metrics_5m', 'metrics_1h'):
+            if table in tables:
+                _normalize_rollup_disks(cursor, table)
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'metrics'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in METRIC_INDEXES if name not in existing]
+        for name in missing:
+            print(f"Criando índice {name}...")
+            cursor.execute(f"CREATE INDEX {name} ON {METRIC_INDEXES[name]}")
+        for name in REDUNDANT_INDEXES:
+            if name in existing:
+                cursor.execute(f"DROP INDEX {name}")
+
+        if missing:
+            # Estatísticas atualizadas para o planner escolher os índices novos
+            cursor.execute("ANALYZE metrics")
+            conn.commit()
+            print("Migração concluída com sucesso!")
+        else:
+            conn.commit()
+            print("Índices de métricas já existem. Pulando migração.")
+
+    except Exception as e:
+        print(f"Erro durante a migração: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_metrics_indexes()
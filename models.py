@@ -1,7 +1,7 @@
 """
 Modelos de banco de dados SQLAlchemy para NetAudit System
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, JSON, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -55,10 +55,18 @@ class Metric(Base):
     """Métricas de monitoramento em tempo real"""
     __tablename__ = 'metrics'
     
+    __table_args__ = (
+        # "Último valor por dispositivo" (MAX(id) GROUP BY device_id) vira busca coberta pelo índice
+        Index('ix_metrics_type_device_id', 'metric_type', 'device_id', 'id'),
+        # Histórico de um dispositivo/tipo ordenado por tempo
+        Index('ix_metrics_device_type_ts', 'device_id', 'metric_type', 'timestamp'),
+    )
+    
     id = Column(Integer, primary_key=True)
-    device_id = Column(Integer, ForeignKey('devices.id'), nullable=False, index=True)
+    device_id = Column(Integer, ForeignKey('devices.id'), nullable=False)
     
-    metric_type = Column(String(50), nullable=False, index=True)  # cpu, ram, disk, latency
+    metric_type = Column(String(50), nullable=False)  # cpu_usage, ram_usage, disk_usage, latency
+    drive = Column(String(10))  # Unidade/partição para disk_usage (ex: "C:"); None nos demais tipos
     value = Column(Float, nullable=False)
     unit = Column(String(20))  # %, GB, ms, etc
     
@@ -71,6 +79,85 @@ class Metric(Base):
         return f"<Metric(device_id={self.device_id}, type='{self.metric_type}', value={self.value})>"
 
 
+class DeviceMetricLatest(Base):
+    """Valor corrente de cada métrica por dispositivo (espelho do último INSERT em metrics)"""
+    __tablename__ = 'device_metric_latest'
+    __table_args__ = (
+        # Rankings: WHERE metric_type = ? ORDER BY value DESC LIMIT n sem ordenação extra
+        Index('ix_device_metric_latest_type_value', 'metric_type', 'value'),
+    )
+    
+    device_id = Column(Integer, ForeignKey('devices.id'), primary_key=True)
+    metric_type = Column(String(50), primary_key=True)
+    drive = Column(String(10))  # disk_usage: unidade mais cheia na última coleta (regra em metrics_ingest.latest_rows)
+    value = Column(Float, nullable=False)
+    unit = Column(String(20))
+    timestamp = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<DeviceMetricLatest(device_id={self.device_id}, type='{self.metric_type}', value={self.value})>"
+
+
+class _MetricRollupMixin:
+    """Colunas comuns dos tiers agregados (uma linha por device/tipo/bucket)"""
+    id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, nullable=False)
+    metric_type = Column(String(50), nullable=False)
+    bucket = Column(DateTime, nullable=False)  # início do intervalo
+
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+    avg_value = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+
+
+class MetricRollup5m(_MetricRollupMixin, Base):
+    """Métricas agregadas em buckets de 5 minutos"""
+    __tablename__ = 'metrics_5m'
+    __table_args__ = (
+        UniqueConstraint('device_id', 'metric_type', 'bucket', name='uq_metrics_5m_key'),
+        Index('ix_metrics_5m_type_bucket', 'metric_type', 'bucket'),
+        Index('ix_metrics_5m_bucket', 'bucket'),
+    )
+
+
+class MetricRollup1h(_MetricRollupMixin, Base):
+    """Métricas agregadas em buckets de 1 hora"""
+    __tablename__ = 'metrics_1h'
+    __table_args__ = (
+        UniqueConstraint('device_id', 'metric_type', 'bucket', name='uq_metrics_1h_key'),
+        Index('ix_metrics_1h_type_bucket', 'metric_type', 'bucket'),
+        Index('ix_metrics_1h_bucket', 'bucket'),
+    )
+
+
+class InterfaceMetric(Base):
+    """Taxas por interface de dispositivos de rede (uma linha por interface por coleta)"""
+    __tablename__ = 'interface_metrics'
+    __table_args__ = (
+        # Série de uma interface ordenada por tempo
+        Index('ix_interface_metrics_device_if_ts', 'device_id', 'if_index', 'timestamp'),
+        Index('ix_interface_metrics_timestamp', 'timestamp'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, ForeignKey('devices.id'), nullable=False)
+    if_index = Column(Integer, nullable=False)
+    if_name = Column(String(64))
+    timestamp = Column(DateTime, nullable=False)
+
+    in_bps = Column(Float)
+    out_bps = Column(Float)
+    in_errors = Column(Float)     # erros/s
+    out_errors = Column(Float)
+    in_discards = Column(Float)   # descartes/s
+    out_discards = Column(Float)
+    utilization = Column(Float)   # % de ifHighSpeed (maior sentido)
+
+    def __repr__(self):
+        return f"<InterfaceMetric(device_id={self.device_id}, if='{self.if_name}', in={self.in_bps}, out={self.out_bps})>"
+
+
 class Alert(Base):
     """Alertas e notificações"""
     __tablename__ = 'alerts'
@@ -128,6 +215,65 @@ class Trigger(Base):
         return f"<Trigger(name='{self.name}', {self.metric_type} {self.operator} {self.threshold})>"
 
 
+class NotificationOutbox(Base):
+    """Fila persistente de notificações de alertas (entregue em lote pelo notification_dispatcher)"""
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        # Coleta das pendentes vencidas por canal
+        Index('ix_notification_outbox_status_due', 'status', 'channel', 'next_attempt_at'),
+        Index('ix_notification_outbox_dedup', 'channel', 'dedup_key', 'status'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    alert_id = Column(Integer)
+    channel = Column(String(20), nullable=False)  # email, webhook
+    dedup_key = Column(String(255), nullable=False)  # mesmo alerta pendente no canal = uma entrega
+    severity = Column(String(20))
+    subject = Column(String(255))
+    body = Column(Text)
+    payload = Column(JSON)
+    occurrences = Column(Integer, default=1)
+    
+    status = Column(String(20), default='pending', nullable=False)  # pending, sending, sent, dead
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.now, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    sent_at = Column(DateTime)
+    last_error = Column(Text)
+    
+    def __repr__(self):
+        return f"<NotificationOutbox(id={self.id}, channel='{self.channel}', status='{self.status}')>"
+
+
+class TriggerViolation(Base):
+    """Checkpoint das janelas de violação em andamento (triggers com duração mínima)"""
+    __tablename__ = 'trigger_violations'
+    
+    device_id = Column(Integer, primary_key=True)
+    trigger_id = Column(Integer, primary_key=True)
+    started_at = Column(DateTime, nullable=False)   # primeira amostra violando da janela
+    last_sample = Column(DateTime, nullable=False)  # última amostra violando
+    samples = Column(Integer, default=1)
+    duration_seconds = Column(Integer, nullable=False)
+    
+    def __repr__(self):
+        return f"<TriggerViolation(device_id={self.device_id}, trigger_id={self.trigger_id}, since={self.started_at})>"
+
+
+class DeviceFingerprint(Base):
+    """Impressão digital barata de cada dispositivo (rescan incremental do scanner)"""
+    __tablename__ = 'device_fingerprints'
+    
+    ip = Column(String(45), primary_key=True)
+    components = Column(JSON, nullable=False)  # mac, ttl_class, ports/bitmap, hostname, snmp_object, boot
+    audited_at = Column(DateTime)   # última auditoria profunda
+    checked_at = Column(DateTime)   # última verificação da impressão digital
+    skipped = Column(Integer, default=0)  # auditorias dispensadas desde a última profunda
+    
+    def __repr__(self):
+        return f"<DeviceFingerprint(ip='{self.ip}', audited_at={self.audited_at}, skipped={self.skipped})>"
+
+
 class MonitoringTemplate(Base):
     """Templates de monitoramento por tipo de dispositivo"""
     __tablename__ = 'monitoring_templates'
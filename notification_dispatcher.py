@@ -0,0 +1,477 @@
+"""
+Notification Dispatcher - Entrega assíncrona das notificações de alertas
+O AlertManager só grava a notificação na tabela notification_outbox, na mesma transação
+do alerta; um coordenador em segundo plano agrupa as pendentes por canal (um e-mail ou
+um POST de webhook com vários alertas), respeita o limite de envios por minuto de cada
+canal e reagenda falhas com backoff exponencial. As threads de coleta nunca esperam
+por SMTP/HTTP.
+"""
+import copy
+import time
+import random
+import smtplib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from sqlalchemy import select, update, delete, func
+
+from models import NotificationOutbox
+
+logger = logging.getLogger("NotificationDispatcher")
+
+# settings['notifications'] sobrescreve chave a chave
+DEFAULT_CONFIG = {
+    'batch_seconds': 60,            # janela de agrupamento: pendentes do canal saem juntas (digest)
+    'max_batch': 50,                # alertas por mensagem
+    'max_attempts': 6,              # depois disso a notificação fica 'dead'
+    'retry_base_seconds': 30,       # backoff: base * 2^(tentativas-1), com jitter
+    'retry_max_seconds': 3600,
+    'immediate_severities': ['disaster'],   # saem no próximo ciclo, sem esperar a janela
+    'rate_limit_per_minute': {'email': 6, 'webhook': 30},
+    'email': {
+        'enabled': False,
+        'smtp_host': '',
+        'smtp_port': 25,
+        'use_ssl': False,
+        'starttls': False,
+        'username': '',
+        'password': '',
+        'from': 'netaudit@localhost',
+        'to': [],
+        'timeout': 10,
+    },
+    'webhook': {
+        'enabled': False,
+        'url': '',
+        'headers': {},
+        'timeout': 10,
+        'verify_ssl': True,
+    },
+}
+
+POLL_SECONDS = 5
+CONFIG_RELOAD_SECONDS = 30
+WORKERS = 4
+# Linhas entregues/descartadas mantidas para consulta
+RETENTION_DAYS = 7
+PURGE_EVERY_SECONDS = 3600
+
+
+def _merge(base, override):
+    merged = copy.deepcopy(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_notification_config():
+    try:
+        from utils import load_general_settings
+        return _merge(DEFAULT_CONFIG, load_general_settings().get('notifications'))
+    except Exception as e:
+        logger.debug(f"Usando configuração de notificações padrão: {e}")
+        return copy.deepcopy(DEFAULT_CONFIG)
+
+
+def retry_delay(attempts, config):
+    """Atraso até a próxima tentativa (exponencial com jitter de ±20%)"""
+    delay = min(config['retry_max_seconds'], config['retry_base_seconds'] * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class RateLimiter:
+    """Token bucket: até `per_minute` envios por minuto, com rajada do mesmo tamanho"""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.tokens = float(max(1, per_minute))
+        self.updated = time.monotonic()
+
+    def try_take(self):
+        now = time.monotonic()
+        capacity = max(1, self.per_minute)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+# ----------------------------------------------------------------------
+# Canais
+# ----------------------------------------------------------------------
+class NotificationChannel(ABC):
+    """Canal de entrega: recebe um lote de notificações e levanta exceção se falhar"""
+
+    name = None
+
+    def __init__(self, config):
+        self.config = config
+
+    def enabled(self):
+        return bool(self.config.get('enabled'))
+
+    @abstractmethod
+    def send(self, items):
+        """Entrega o lote (levanta exceção se falhar)"""
+
+
+def _digest_subject(items):
+    if len(items) == 1:
+        return items[0]['subject']
+    by_severity = {}
+    for item in items:
+        by_severity[item['severity']] = by_severity.get(item['severity'], 0) + 1
+    summary = ', '.join(f"{n} {sev}" for sev, n in sorted(by_severity.items(), key=lambda kv: -kv[1]))
+    return f"[NetAudit] {len(items)} alertas ({summary})"
+
+
+class EmailChannel(NotificationChannel):
+    """Um e-mail por lote (digest) via SMTP"""
+
+    name = 'email'
+
+    def enabled(self):
+        return bool(self.config.get('enabled') and self.config.get('smtp_host') and self.config.get('to'))
+
+    def send(self, items):
+        cfg = self.config
+        msg = EmailMessage()
+        msg['Subject'] = _digest_subject(items)
+        msg['From'] = cfg['from']
+        recipients = cfg['to'] if isinstance(cfg['to'], list) else [cfg['to']]
+        msg['To'] = ', '.join(recipients)
+        lines = []
+        for item in items:
+            repeat = f" (x{item['occurrences']})" if item['occurrences'] > 1 else ""
+            lines.append(f"[{item['severity'].upper()}] {item['subject']}{repeat}\n{item['body']}\n")
+        msg.set_content("\n".join(lines))
+
+        smtp_cls = smtplib.SMTP_SSL if cfg.get('use_ssl') else smtplib.SMTP
+        with smtp_cls(cfg['smtp_host'], int(cfg['smtp_port']), timeout=cfg['timeout']) as smtp:
+            if cfg.get('starttls') and not cfg.get('use_ssl'):
+                smtp.starttls()
+            if cfg.get('username'):
+                smtp.login(cfg['username'], cfg['password'])
+            smtp.send_message(msg, to_addrs=recipients)
+
+
+class WebhookChannel(NotificationChannel):
+    """Um POST JSON por lote: {'source', 'count', 'alerts': [...]}"""
+
+    name = 'webhook'
+
+    def enabled(self):
+        return bool(self.config.get('enabled') and self.config.get('url'))
+
+    def send(self, items):
+        cfg = self.config
+        body = {
+            'source': 'netaudit',
+            'count': len(items),
+            'alerts': [dict(item['payload'] or {}, occurrences=item['occurrences']) for item in items],
+        }
+        r = requests.post(cfg['url'], json=body, headers=cfg.get('headers') or {},
+                          timeout=cfg['timeout'], verify=cfg.get('verify_ssl', True))
+        r.raise_for_status()
+
+
+CHANNELS = {'email': EmailChannel, 'webhook': WebhookChannel}
+
+
+# ----------------------------------------------------------------------
+# Despachante
+# ----------------------------------------------------------------------
+class NotificationDispatcher:
+    """Outbox de notificações com coordenador em thread própria e pool de entrega"""
+
+    def __init__(self, config=None, workers=WORKERS, poll_seconds=POLL_SECONDS):
+        """
+        Args:
+            config: Configuração fixa (testes); None = settings['notifications'] sobre DEFAULT_CONFIG
+            workers: Entregas simultâneas
+            poll_seconds: Intervalo do coordenador (enqueue acorda antes)
+        """
+        self._config_override = config
+        self.config = _merge(DEFAULT_CONFIG, config) if config is not None else load_notification_config()
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.channels = {name: cls(self.config[name]) for name, cls in CHANNELS.items()}
+        self._limiters = {}
+        self._config_loaded_at = time.monotonic()
+        self._last_purge = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._inflight = set()
+        self._inflight_lock = threading.Lock()
+        self.stats = {"enqueued": 0, "deduplicated": 0, "batches": 0, "sent": 0, "failed": 0,
+                      "dead": 0, "rate_limited": 0}
+
+    def _engine(self):
+        from database import engine
+        return engine
+
+    def _reload_config(self):
+        if time.monotonic() - self._config_loaded_at < CONFIG_RELOAD_SECONDS:
+            return
+        self.reload_config()
+
+    def reload_config(self):
+        """Relê settings['notifications'] (ex: salvo pela tela de Configurações) sem esperar o intervalo"""
+        if self._config_override is not None:
+            return
+        self.config = load_notification_config()
+        self.channels = {name: cls(self.config[name]) for name, cls in CHANNELS.items()}
+        self._config_loaded_at = time.monotonic()
+
+    def _limiter(self, channel):
+        per_minute = (self.config.get('rate_limit_per_minute') or {}).get(channel, 60)
+        limiter = self._limiters.get(channel)
+        if limiter is None or limiter.per_minute != per_minute:
+            limiter = self._limiters[channel] = RateLimiter(per_minute)
+        return limiter
+
+    # ------------------------------------------------------------------
+    # Produção (threads de coleta)
+    # ------------------------------------------------------------------
+    def enqueue(self, session, alert, trigger=None, hostname=None):
+        """
+        Grava as notificações do alerta no outbox, dentro da transação do chamador.
+        Alerta igual ainda pendente no canal só incrementa `occurrences`.
+
+        Args:
+            session: Sessão do chamador (o commit fica com ele)
+            alert: Alert recém-criado (com id)
+            trigger: Trigger/regra de origem (notify_email / notify_webhook); None = todos os canais
+
+        Returns:
+            int: Notificações novas gravadas
+        """
+        wanted = [name for name, channel in self.channels.items()
+                  if channel.enabled() and (trigger is None or getattr(trigger, f'notify_{name}', False))]
+        if not wanted:
+            return 0
+        dedup_key = f"{alert.device_id}:{alert.title}"[:255]
+        payload = {
+            'alert_id': alert.id,
+            'device_id': alert.device_id,
+            'hostname': hostname,
+            'severity': alert.severity,
+            'title': alert.title,
+            'message': alert.message,
+            'triggered_at': alert.triggered_at.isoformat() if alert.triggered_at else None,
+        }
+        created = 0
+        for channel in wanted:
+            existing = session.query(NotificationOutbox).filter(
+                NotificationOutbox.channel == channel,
+                NotificationOutbox.dedup_key == dedup_key,
+                NotificationOutbox.status == 'pending'
+            ).first()
+            if existing:
+                existing.occurrences = (existing.occurrences or 1) + 1
+                existing.body = alert.message
+                existing.payload = payload
+                self.stats["deduplicated"] += 1
+                continue
+            session.add(NotificationOutbox(
+                alert_id=alert.id, channel=channel, dedup_key=dedup_key, severity=alert.severity,
+                subject=f"[NetAudit] {alert.title}" + (f" - {hostname}" if hostname else ""),
+                body=alert.message, payload=payload, next_attempt_at=datetime.now()
+            ))
+            created += 1
+        self.stats["enqueued"] += created
+        self._wake.set()
+        return created
+
+    # ------------------------------------------------------------------
+    # Coordenador
+    # ------------------------------------------------------------------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="NotifyWorker")
+        self._recover()
+        self._thread = threading.Thread(target=self._loop, name="NotifyDispatcher", daemon=True)
+        self._thread.start()
+        logger.info("Despachante de notificações iniciado")
+
+    def stop(self, wait=False):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown(wait=wait, cancel_futures=not wait)
+            self._pool = None
+
+    def _recover(self):
+        """Entregas interrompidas (queda do processo durante o envio) voltam para a fila"""
+        with self._engine().begin() as conn:
+            n = conn.execute(update(NotificationOutbox.__table__)
+                             .where(NotificationOutbox.__table__.c.status == 'sending')
+                             .values(status='pending')).rowcount
+        if n:
+            logger.info(f"{n} notificações interrompidas voltaram para a fila")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Erro no despachante de notificações: {e}")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def run_once(self, now=None):
+        """
+        Um passo do coordenador: para cada canal, decide se as pendentes vencidas saem agora
+        (janela de agrupamento cheia, lote completo, severidade imediata ou retentativa) e
+        entrega em lotes enquanto houver cota no limite do canal.
+
+        Returns:
+            int: Lotes despachados
+        """
+        now = now or datetime.now()
+        self._reload_config()
+        self._purge(now)
+        table = NotificationOutbox.__table__
+        cfg = self.config
+        dispatched = 0
+        for name, channel in self.channels.items():
+            if not channel.enabled():
+                continue
+            with self._engine().connect() as conn:
+                due = conn.execute(
+                    select(table.c.id, table.c.severity, table.c.attempts, table.c.created_at)
+                    .where(table.c.status == 'pending', table.c.channel == name, table.c.next_attempt_at <= now)
+                    .order_by(table.c.id)
+                ).all()
+            if not due:
+                continue
+            window_full = due[0].created_at <= now - timedelta(seconds=cfg['batch_seconds'])
+            urgent = any(r.severity in cfg['immediate_severities'] or r.attempts for r in due)
+            if not (window_full or urgent or len(due) >= cfg['max_batch']):
+                continue
+            ids = [r.id for r in due]
+            limiter = self._limiter(name)
+            for start in range(0, len(ids), cfg['max_batch']):
+                if not limiter.try_take():
+                    # Sem cota: o restante espera e entra em um digest maior no próximo passo
+                    self.stats["rate_limited"] += 1
+                    break
+                batch = ids[start:start + cfg['max_batch']]
+                self._claim_and_submit(channel, batch)
+                dispatched += 1
+        return dispatched
+
+    def _claim_and_submit(self, channel, ids):
+        table = NotificationOutbox.__table__
+        with self._engine().begin() as conn:
+            conn.execute(update(table).where(table.c.id.in_(ids), table.c.status == 'pending')
+                         .values(status='sending'))
+            rows = [dict(r._mapping) for r in conn.execute(
+                select(table.c.id, table.c.subject, table.c.body, table.c.severity, table.c.payload,
+                       table.c.occurrences, table.c.attempts)
+                .where(table.c.id.in_(ids), table.c.status == 'sending'))]
+        if not rows:
+            return
+        self.stats["batches"] += 1
+        if self._pool is None:
+            self._deliver(channel, rows)  # sem start(): entrega síncrona (scripts/testes)
+            return
+        future = self._pool.submit(self._deliver, channel, rows)
+        with self._inflight_lock:
+            self._inflight.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        with self._inflight_lock:
+            self._inflight.discard(future)
+
+    def _deliver(self, channel, rows):
+        table = NotificationOutbox.__table__
+        ids = [r['id'] for r in rows]
+        try:
+            channel.send(rows)
+        except Exception as e:
+            self._reschedule(channel.name, rows, e)
+            return False
+        with self._engine().begin() as conn:
+            conn.execute(update(table).where(table.c.id.in_(ids))
+                         .values(status='sent', sent_at=datetime.now(), attempts=table.c.attempts + 1,
+                                 last_error=None))
+        self.stats["sent"] += len(rows)
+        return True
+
+    def _reschedule(self, channel_name, rows, error):
+        """Falha na entrega: backoff exponencial por notificação; esgotadas as tentativas, 'dead'"""
+        table = NotificationOutbox.__table__
+        now = datetime.now()
+        dead = 0
+        with self._engine().begin() as conn:
+            for row in rows:
+                attempts = (row['attempts'] or 0) + 1
+                if attempts >= self.config['max_attempts']:
+                    values = {'status': 'dead'}
+                    dead += 1
+                else:
+                    values = {'status': 'pending',
+                              'next_attempt_at': now + timedelta(seconds=retry_delay(attempts, self.config))}
+                conn.execute(update(table).where(table.c.id == row['id'])
+                             .values(attempts=attempts, last_error=str(error)[:500], **values))
+        self.stats["failed"] += len(rows)
+        self.stats["dead"] += dead
+        logger.warning(f"Falha ao entregar {len(rows)} notificações via {channel_name}: {error}")
+
+    def _purge(self, now):
+        if time.monotonic() - self._last_purge < PURGE_EVERY_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        table = NotificationOutbox.__table__
+        with self._engine().begin() as conn:
+            conn.execute(delete(table).where(table.c.status.in_(('sent', 'dead')),
+                                             table.c.created_at < now - timedelta(days=RETENTION_DAYS)))
+
+    def wait_idle(self, timeout=10):
+        """Espera as entregas em andamento terminarem (scripts/testes)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._inflight_lock:
+                if not self._inflight:
+                    return True
+            time.sleep(0.02)
+        return False
+
+    def snapshot(self):
+        """Contagem do outbox por canal/status + estatísticas do processo (API)"""
+        table = NotificationOutbox.__table__
+        with self._engine().connect() as conn:
+            rows = conn.execute(select(table.c.channel, table.c.status, func.count())
+                                .group_by(table.c.channel, table.c.status)).all()
+        outbox = {}
+        for channel, status, count in rows:
+            outbox.setdefault(channel, {})[status] = count
+        return {
+            **self.stats,
+            "outbox": outbox,
+            "channels": {name: channel.enabled() for name, channel in self.channels.items()},
+            "running": bool(self._thread and self._thread.is_alive()),
+        }
+
+
+# Instância global (iniciada e parada junto com o Sentinel)
+notification_dispatcher = NotificationDispatcher()
@@ -0,0 +1,285 @@
+"""
+Poll Scheduler - Agenda adaptativa por dispositivo para o Sentinel
+Fila de prioridade (earliest-deadline-first) com o próximo vencimento de cada ativo:
+intervalo por tipo/dispositivo, backoff para ativos offline ou sem mudança, aceleração
+enquanto um trigger com duração mínima está pendente e prazo (deadline) por coleta.
+"""
+import time
+import heapq
+import random
+import itertools
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger("PollScheduler")
+
+# Intervalo base por tipo de dispositivo (s); sobrescrito por settings['poll_intervals']
+DEFAULT_INTERVALS = {
+    'windows': 60,
+    'server': 60,
+    'network': 60,
+    'printer': 300,
+}
+DEFAULT_INTERVAL = 120
+
+# Tempo máximo de execução de uma coleta (contado do início no worker, não da fila)
+# antes de ser dada como perdida (WMI é o mais lento)
+DEADLINES = {
+    'windows': 45,
+    'server': 45,
+    'network': 30,
+    'printer': 20,
+}
+DEFAULT_DEADLINE = 30
+
+# Offline: intervalo dobra a cada falha consecutiva, até MAX_BACKOFF
+MAX_BACKOFF = 900
+# Sem mudança: intervalo cresce 1.5x por coleta idêntica, até UNCHANGED_MAX_FACTOR x base
+UNCHANGED_GROWTH = 1.5
+UNCHANGED_MAX_FACTOR = 4
+# Trigger pendente: pelo menos N amostras dentro de duration_seconds, nunca abaixo de MIN_INTERVAL
+PENDING_SAMPLES = 3
+MIN_INTERVAL = 10
+# Amostras de atraso mantidas para as estatísticas
+LAG_WINDOW = 1000
+
+
+class DeviceSchedule:
+    """Estado de agendamento de um dispositivo"""
+
+    __slots__ = ('device_id', 'device_type', 'due', 'interval', 'failures', 'unchanged',
+                 'fingerprint', 'version', 'running')
+
+    def __init__(self, device_id, device_type, due):
+        self.device_id = device_id
+        self.device_type = device_type
+        self.due = due
+        self.interval = None
+        self.failures = 0
+        self.unchanged = 0
+        self.fingerprint = None
+        self.version = None       # entradas do heap com outra versão estão obsoletas
+        self.running = False
+
+
+class PollScheduler:
+    """Fila EDF de coletas por dispositivo (thread-safe)"""
+
+    def __init__(self, intervals=None, device_intervals=None):
+        """
+        Args:
+            intervals: {device_type: s}; None = lê settings['poll_intervals']
+            device_intervals: {device_id: s}; None = lê settings['poll_device_intervals']
+        """
+        self._intervals_override = intervals
+        self._device_intervals_override = device_intervals
+        self._heap = []
+        self._devices = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._lags = deque(maxlen=LAG_WINDOW)
+        self.intervals = dict(DEFAULT_INTERVALS)
+        self.device_intervals = {}
+        self.stats = {"dispatched": 0, "completed": 0, "timeouts": 0, "skipped_running": 0}
+        if intervals is not None or device_intervals is not None:
+            self.reload_config()
+
+    # ------------------------------------------------------------------
+    # Configuração
+    # ------------------------------------------------------------------
+    def reload_config(self):
+        intervals = dict(DEFAULT_INTERVALS)
+        settings = {}
+        if self._intervals_override is None or self._device_intervals_override is None:
+            try:
+                from utils import load_general_settings
+                settings = load_general_settings()
+            except Exception as e:
+                logger.debug(f"Usando intervalos padrão: {e}")
+        intervals.update(self._intervals_override if self._intervals_override is not None
+                         else settings.get('poll_intervals') or {})
+        raw = (self._device_intervals_override if self._device_intervals_override is not None
+               else settings.get('poll_device_intervals') or {})
+        device_intervals = {int(k): v for k, v in raw.items()}
+        with self._lock:
+            self.intervals = intervals
+            self.device_intervals = device_intervals
+
+    def base_interval(self, device_id, device_type):
+        if device_id in self.device_intervals:
+            return self.device_intervals[device_id]
+        return self.intervals.get(device_type, DEFAULT_INTERVAL)
+
+    def deadline(self, device_type):
+        return DEADLINES.get(device_type, DEFAULT_DEADLINE)
+
+    def next_interval(self, state, pending_window=None):
+        """
+        Intervalo até a próxima coleta.
+
+        Args:
+            pending_window: menor duration_seconds entre triggers violados ainda não
+                disparados (None = nenhum); garante PENDING_SAMPLES amostras na janela
+        """
+        base = self.base_interval(state.device_id, state.device_type)
+        if state.failures:
+            interval = min(MAX_BACKOFF, base * (2 ** state.failures))
+        else:
+            interval = base * min(UNCHANGED_MAX_FACTOR, UNCHANGED_GROWTH ** state.unchanged)
+        # Vale também com backoff: um trigger de inacessível pendente precisa das amostras justamente offline
+        if pending_window:
+            interval = min(interval, max(MIN_INTERVAL, pending_window / PENDING_SAMPLES))
+        return interval
+
+    # ------------------------------------------------------------------
+    # Fila
+    # ------------------------------------------------------------------
+    def _push(self, state, due):
+        state.due = due
+        state.version = next(self._seq)
+        heapq.heappush(self._heap, (due, state.version, state.device_id))
+
+    def sync(self, devices, now=None):
+        """
+        Alinha a fila com o inventário.
+
+        Args:
+            devices: iterável de (device_id, device_type)
+        """
+        now = time.time() if now is None else now
+        seen = set()
+        with self._lock:
+            startup = not self._devices
+            for device_id, device_type in devices:
+                seen.add(device_id)
+                state = self._devices.get(device_id)
+                if state is None:
+                    state = DeviceSchedule(device_id, device_type, now)
+                    self._devices[device_id] = state
+                    # Startup: fase aleatória dentro do próprio intervalo (sem rajada de toda a frota);
+                    # dispositivos novos depois disso entram na hora
+                    spread = self.base_interval(device_id, device_type) if startup else 0
+                    self._push(state, now + random.uniform(0, spread))
+                elif state.device_type != device_type:
+                    state.device_type = device_type
+            for device_id in list(self._devices):
+                if device_id not in seen:
+                    # Removido do inventário: as entradas do heap ficam órfãs e são ignoradas
+                    del self._devices[device_id]
+
+    def pop_due(self, now=None):
+        """
+        Retira da fila os dispositivos vencidos, em ordem de vencimento.
+
+        Returns:
+            list: [(device_id, device_type, atraso em s)]
+        """
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, version, device_id = heapq.heappop(self._heap)
+                state = self._devices.get(device_id)
+                if state is None or state.version != version:
+                    continue
+                if state.running:
+                    # Coleta anterior ainda em andamento (após o deadline): tenta de novo depois
+                    self.stats["skipped_running"] += 1
+                    self._push(state, now + self.base_interval(device_id, state.device_type))
+                    continue
+                state.running = True
+                lag = now - when
+                self._lags.append(lag)
+                due.append((device_id, state.device_type, lag))
+            self.stats["dispatched"] += len(due)
+        return due
+
+    def complete(self, device_id, online=True, fingerprint=None, pending_window=None, now=None):
+        """
+        Registra o fim de uma coleta e reagenda o dispositivo.
+
+        Args:
+            online: False conta uma falha para o backoff
+            fingerprint: valores coletados (hashable); igual ao anterior = sem mudança
+            pending_window: ver next_interval
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._devices.get(device_id)
+            if state is None:
+                return None
+            state.running = False
+            if not online:
+                state.failures += 1
+                state.unchanged = 0
+            else:
+                state.failures = 0
+                if fingerprint is not None and fingerprint == state.fingerprint:
+                    state.unchanged += 1
+                else:
+                    state.unchanged = 0
+                state.fingerprint = fingerprint
+            state.interval = self.next_interval(state, pending_window)
+            self._push(state, now + state.interval)
+            self.stats["completed"] += 1
+            return state.interval
+
+    def expire(self, device_id, now=None, pending_window=None):
+        """Coleta que estourou o deadline: conta como falha; o dispositivo continua 'running' até a thread voltar"""
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._devices.get(device_id)
+            if state is None:
+                return
+            state.failures += 1
+            state.unchanged = 0
+            self._push(state, now + self.next_interval(state, pending_window))
+            self.stats["timeouts"] += 1
+
+    def release(self, device_id):
+        """Thread de uma coleta expirada terminou: libera o dispositivo sem reagendar"""
+        with self._lock:
+            state = self._devices.get(device_id)
+            if state is not None:
+                state.running = False
+
+    def next_due_in(self, now=None):
+        """Segundos até o próximo vencimento (None se a fila está vazia)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            while self._heap:
+                when, version, device_id = self._heap[0]
+                state = self._devices.get(device_id)
+                if state is not None and state.version == version:
+                    return max(0.0, when - now)
+                heapq.heappop(self._heap)
+        return None
+
+    def lag_stats(self):
+        lags = sorted(self._lags)
+        if not lags:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0, "samples": 0}
+        return {
+            "p50": round(lags[len(lags) // 2], 2),
+            "p95": round(lags[min(len(lags) - 1, int(len(lags) * 0.95))], 2),
+            "max": round(lags[-1], 2),
+            "samples": len(lags),
+        }
+
+    def snapshot(self):
+        """Estado resumido para a API"""
+        with self._lock:
+            states = list(self._devices.values())
+        return {
+            **self.stats,
+            "devices": len(states),
+            "running": sum(1 for s in states if s.running),
+            "backing_off": sum(1 for s in states if s.failures),
+            "unchanged": sum(1 for s in states if s.unchanged),
+            "lag": self.lag_stats(),
+        }
+
+
+# Instância global (configuração carregada pelo Sentinel a cada sincronização do inventário)
+poll_scheduler = PollScheduler()
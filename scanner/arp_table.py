@@ -0,0 +1,239 @@
+"""
+Sentinel ARP - Tabela ARP/vizinhos lida inteira uma vez por fase do scan
+
+Substitui o `arp -a <ip>` por host (um processo por dispositivo auditado). A tabela do sistema
+é lida de uma vez e vira um dict ip -> MAC; a resolução passa a ser O(1) sem processos:
+
+    Linux    /proc/net/arp (leitura de arquivo, sem processo)
+    Windows  um único `arp -a` (fallback: Get-NetNeighbor via PowerShell)
+    outros   um único `arp -an`
+
+Hosts descobertos depois da leitura entram por atualização incremental: um IP ausente
+aguarda a próxima releitura, no máximo uma a cada `refresh_seconds` (consultas concorrentes
+aproveitam a mesma releitura). IPs fora das redes diretamente conectadas não têm MAC visível
+(estão atrás de roteador) e retornam na hora, sem reler nada.
+"""
+import re
+import time
+import socket
+import logging
+import platform
+import ipaddress
+import threading
+import subprocess
+
+logger = logging.getLogger('NetAudit.ARP')
+
+PROC_ARP = '/proc/net/arp'
+CREATE_NO_WINDOW = 0x08000000 if platform.system() == 'Windows' else 0
+
+# Intervalo mínimo entre releituras disparadas por IP ausente (s)
+PROC_REFRESH_SECONDS = 0.5     # /proc: leitura de arquivo, barata
+SPAWN_REFRESH_SECONDS = 1.0    # arp -a / PowerShell: um processo por releitura
+COMMAND_TIMEOUT = 10
+
+# Flag ATF_COM do kernel: entrada completa (0x0 = resolução pendente/falhou)
+ATF_COM = 0x2
+
+_LINE_RE = re.compile(
+    r"(?P<ip>\b\d{1,3}(?:\.\d{1,3}){3}\b)\)?\s+(?:at\s+|ether\s+)?"
+    r"(?P<mac>[0-9a-fA-F]{1,2}(?:[:-][0-9a-fA-F]{1,2}){5})\b")
+
+_NETNEIGHBOR_CMD = ("Get-NetNeighbor -AddressFamily IPv4 | "
+                    "Where-Object { $_.State -ne 'Unreachable' -and $_.State -ne 'Incomplete' } | "
+                    "ForEach-Object { $_.IPAddress + ' ' + $_.LinkLayerAddress }")
+
+
+def normalize_mac(mac):
+    """'aa-bb-cc-d-e-f' / 'AA:BB:...' -> 'AA:BB:CC:0D:0E:0F' (None para vazio/broadcast)"""
+    parts = re.split(r"[:-]", mac.strip())
+    if len(parts) != 6:
+        return None
+    mac = ":".join(p.zfill(2) for p in parts).upper()
+    if mac in ("00:00:00:00:00:00", "FF:FF:FF:FF:FF:FF"):
+        return None
+    return mac
+
+
+def parse_proc_arp(text):
+    """Conteúdo de /proc/net/arp -> {ip: MAC} (só entradas completas)"""
+    table = {}
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        try:
+            if not int(fields[2], 16) & ATF_COM:
+                continue
+        except ValueError:
+            continue
+        mac = normalize_mac(fields[3])
+        if mac:
+            table[fields[0]] = mac
+    return table
+
+
+def parse_arp_output(text):
+    """
+    Saída de `arp -a` (Windows ou BSD/Linux) ou de Get-NetNeighbor -> {ip: MAC}.
+    Linhas sem MAC (incompletas) e multicast/broadcast são ignoradas.
+    """
+    table = {}
+    for line in text.splitlines():
+        m = _LINE_RE.search(line)
+        if not m:
+            continue
+        mac = normalize_mac(m.group('mac'))
+        if mac and not int(mac[:2], 16) & 0x01:
+            table[m.group('ip')] = mac
+    return table
+
+
+class ArpTable:
+    """Snapshot da tabela ARP/vizinhos com releitura incremental sob demanda"""
+
+    def __init__(self, source=None, refresh_seconds=None, clock=time.monotonic):
+        """
+        Args:
+            source: 'proc', 'arp' ou 'netneighbor'; None = melhor fonte do sistema
+            refresh_seconds: Intervalo mínimo entre releituras por IP ausente (None = pela fonte)
+        """
+        self.source = source or self._default_source()
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else (
+            PROC_REFRESH_SECONDS if self.source == 'proc' else SPAWN_REFRESH_SECONDS)
+        self.clock = clock
+        self.proc_path = PROC_ARP
+        self.local_networks = None  # redes das interfaces (None = descobrir via psutil)
+        self._entries = {}
+        self._read_at = None
+        self._lock = threading.Lock()
+        self.stats = {'reads': 0, 'spawns': 0, 'hits': 0, 'misses': 0, 'routed': 0, 'entries': 0, 'read_ms': 0.0}
+
+    @staticmethod
+    def _default_source():
+        system = platform.system()
+        if system == 'Linux':
+            return 'proc'
+        return 'arp'
+
+    # ------------------------------------------------------------------ leitura
+
+    def _read_proc(self):
+        with open(self.proc_path, 'r') as f:
+            return parse_proc_arp(f.read())
+
+    def _run(self, cmd):
+        self.stats['spawns'] += 1
+        proc = subprocess.run(cmd, capture_output=True, timeout=COMMAND_TIMEOUT, creationflags=CREATE_NO_WINDOW)
+        return proc.stdout.decode('latin-1')
+
+    def _read_system(self):
+        if self.source == 'proc':
+            try:
+                return self._read_proc()
+            except OSError as e:
+                logger.warning(f"{self.proc_path} indisponível ({e}), usando 'arp -an'")
+                self.source = 'arp'
+        if self.source == 'netneighbor':
+            return parse_arp_output(self._run(["powershell", "-NoProfile", "-Command", _NETNEIGHBOR_CMD]))
+        try:
+            args = ["arp", "-a"] if platform.system() == 'Windows' else ["arp", "-an"]
+            return parse_arp_output(self._run(args))
+        except (OSError, subprocess.SubprocessError) as e:
+            if platform.system() != 'Windows':
+                raise
+            logger.warning(f"'arp -a' falhou ({e}), usando Get-NetNeighbor")
+            self.source = 'netneighbor'
+            return self._read_system()
+
+    def snapshot(self):
+        """
+        Lê a tabela inteira (início de cada fase do scan).
+
+        Returns:
+            int: entradas na tabela
+        """
+        with self._lock:
+            return self._reload()
+
+    def _reload(self):
+        start = time.perf_counter()
+        try:
+            entries = self._read_system()
+        except Exception as e:
+            logger.error(f"Erro ao ler tabela ARP ({self.source}): {e}")
+            entries = None
+        self._read_at = self.clock()
+        self.stats['reads'] += 1
+        self.stats['read_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        if entries is not None:
+            # Entradas que expiraram no sistema continuam valendo até o fim do scan
+            self._entries.update(entries)
+            self.stats['entries'] = len(self._entries)
+        return len(self._entries)
+
+    # ------------------------------------------------------------------ consulta
+
+    def _interface_networks(self):
+        networks = []
+        try:
+            import psutil
+            for addrs in psutil.net_if_addrs().values():
+                for addr in addrs:
+                    if addr.family == socket.AF_INET and addr.netmask and not addr.address.startswith('127.'):
+                        networks.append(ipaddress.ip_network(f"{addr.address}/{addr.netmask}", strict=False))
+        except Exception as e:
+            logger.debug(f"Redes locais indisponíveis ({e}): toda consulta relê a tabela")
+        return networks
+
+    def is_local(self, ip):
+        """IP em uma rede diretamente conectada (sem interfaces conhecidas, assume que sim)"""
+        if self.local_networks is None:
+            self.local_networks = self._interface_networks()
+        if not self.local_networks:
+            return True
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return any(address in net for net in self.local_networks)
+
+    def get(self, ip):
+        """
+        MAC do IP ('AA:BB:CC:DD:EE:FF') ou None se o host não está no segmento L2.
+        IP ausente aguarda a próxima releitura (no máximo refresh_seconds depois da anterior).
+        """
+        mac = self._entries.get(ip)
+        if mac is not None:
+            self.stats['hits'] += 1
+            return mac
+        if not self.is_local(ip):
+            self.stats['routed'] += 1
+            return None
+
+        missed_at = self.clock()
+        while True:
+            with self._lock:
+                mac = self._entries.get(ip)
+                if mac is not None:
+                    break
+                if self._read_at is not None and self._read_at >= missed_at:
+                    break  # releitura feita depois da falta e o host não apareceu
+                wait = 0 if self._read_at is None else self._read_at + self.refresh_seconds - self.clock()
+                if wait <= 0:
+                    self._reload()
+                    mac = self._entries.get(ip)
+                    break
+            time.sleep(wait)
+        self.stats['hits' if mac else 'misses'] += 1
+        return mac
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._read_at = None
+            self.stats['entries'] = 0
+
+
+# Instância global
+arp_table = ArpTable()
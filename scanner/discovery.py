@@ -0,0 +1,339 @@
+"""
+Sentinel Discovery - Motor de descoberta assíncrono
+Um único event loop asyncio substitui o ping sweep por subprocesso:
+sondas TCP (asyncio.open_connection), ICMP bruto quando há privilégio
+e concorrência limitada por semáforo, sem teto de endereços.
+"""
+import asyncio
+import ipaddress
+import logging
+import os
+import platform
+import queue
+import socket
+import struct
+import threading
+import time
+
+from scanner.portprobe import probe_ports_async, any_answer, any_open, OPEN, CLOSED
+
+logger = logging.getLogger('NetAudit.Discovery')
+
+# Portas usadas como prova de vida quando o ICMP é bloqueado ou indisponível
+DEFAULT_TCP_PORTS = (80, 443, 445, 139, 135, 22, 3389, 9100)
+
+# Limite de sockets abertos simultaneamente (reduzido pelo RLIMIT_NOFILE no Linux)
+DEFAULT_MAX_SOCKETS = 4096
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+
+def _socket_budget(requested):
+    """Ajusta o orçamento de sockets ao limite de descritores do processo"""
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY:
+            return max(64, min(requested, soft - 128))
+    except (ImportError, ValueError, OSError):
+        pass
+    if platform.system() == 'Windows':
+        # Proactor (IOCP) não tem o teto de 512 do select(), mas evitamos esgotar portas efêmeras
+        return min(requested, 2048)
+    return requested
+
+
+def _icmp_checksum(data):
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class ICMPProber:
+    """
+    Sonda ICMP Echo assíncrona sobre um único socket compartilhado.
+    Usa SOCK_RAW (admin/root) ou SOCK_DGRAM (Linux com ping_group_range);
+    se nenhum estiver disponível, open() retorna False e o motor usa só TCP.
+    """
+
+    def __init__(self):
+        self.sock = None
+        self.raw = False
+        self.ident = os.getpid() & 0xFFFF
+        self.seq = 0
+        self.waiters = {}  # {seq: (ip, Future)}
+        self._reader = None
+
+    def open(self):
+        for sock_type, is_raw in ((socket.SOCK_RAW, True), (socket.SOCK_DGRAM, False)):
+            try:
+                s = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+                s.setblocking(False)
+                self.sock, self.raw = s, is_raw
+                return True
+            except (PermissionError, OSError):
+                continue
+        return False
+
+    def start(self, loop):
+        if not hasattr(loop, 'sock_recvfrom'):
+            return False
+        self._reader = loop.create_task(self._read_loop(loop))
+        return True
+
+    async def _read_loop(self, loop):
+        while True:
+            try:
+                data, addr = await loop.sock_recvfrom(self.sock, 2048)
+            except asyncio.CancelledError:
+                raise
+            except OSError:
+                await asyncio.sleep(0.01)
+                continue
+            self.handle_reply(data, addr[0])
+
+    def handle_reply(self, data, source):
+        """
+        Entrega um Echo Reply à sonda pendente com o mesmo identificador/sequência e origem.
+        Respostas atrasadas de sondas anteriores e de outros processos são descartadas.
+
+        Returns:
+            bool: True se alguma sonda foi resolvida
+        """
+        ttl = None
+        if self.raw:
+            # Socket bruto entrega o cabeçalho IP: extraímos o TTL (usado na classificação de SO)
+            if len(data) < 20:
+                return False
+            ihl = (data[0] & 0x0F) * 4
+            ttl = data[8]
+            data = data[ihl:]
+        if len(data) < 8:
+            return False
+        icmp_type, _, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+        if icmp_type != ICMP_ECHO_REPLY:
+            return False
+        # O socket bruto recebe os Echo Reply de todos os processos; no SOCK_DGRAM o kernel
+        # reescreve o identificador e já entrega só as respostas deste socket
+        if self.raw and ident != self.ident:
+            return False
+        waiter = self.waiters.get(seq)
+        if waiter is None or waiter[0] != source:
+            return False
+        del self.waiters[seq]
+        fut = waiter[1]
+        if fut.done():
+            return False
+        fut.set_result(ttl if ttl is not None else True)
+        return True
+
+    def _next_seq(self):
+        """Próxima sequência livre (as pendentes nunca são reaproveitadas)"""
+        for _ in range(0x10000):
+            self.seq = (self.seq + 1) & 0xFFFF
+            if self.seq not in self.waiters:
+                return self.seq
+        raise OSError("sem sequências ICMP livres")
+
+    async def ping(self, ip, timeout):
+        """Retorna o TTL (ou True sem cabeçalho IP) se o host responder, senão None"""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        try:
+            seq = self._next_seq()
+        except OSError:
+            return None
+        self.waiters[seq] = (ip, fut)
+        header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, self.ident, seq)
+        payload = b'NetAudit-Sentinel'
+        checksum = _icmp_checksum(header + payload)
+        packet = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, self.ident, seq) + payload
+        try:
+            self.sock.sendto(packet, (ip, 0))
+            return await asyncio.wait_for(fut, timeout)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self.waiters.pop(seq, None)
+
+    def close(self):
+        if self._reader:
+            self._reader.cancel()
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
+class AsyncDiscoveryEngine:
+    """
+    Descoberta de hosts em um único event loop.
+
+    Para cada endereço tenta ICMP (se disponível) e, em seguida, conexões TCP
+    concorrentes nas portas configuradas. Hosts vivos são entregues um a um
+    (callback ou iterador), permitindo que a auditoria comece imediatamente.
+    """
+
+    def __init__(self, ports=DEFAULT_TCP_PORTS, timeout=1.0, icmp_timeout=1.0,
+                 max_sockets=DEFAULT_MAX_SOCKETS, use_icmp=True, count_refused=True):
+        """
+        Args:
+            ports: Portas TCP usadas como prova de vida
+            timeout: Timeout de cada conexão TCP (s)
+            icmp_timeout: Timeout do Echo Reply (s)
+            max_sockets: Teto de sockets simultâneos
+            use_icmp: Tenta ICMP antes do TCP quando houver privilégio
+            count_refused: RST (conexão recusada) conta como host vivo
+        """
+        self.ports = tuple(ports)
+        self.timeout = timeout
+        self.icmp_timeout = icmp_timeout
+        self.use_icmp = use_icmp
+        self.count_refused = count_refused
+        budget = _socket_budget(max_sockets)
+        # Cada host pode abrir uma conexão por porta ao mesmo tempo
+        self.concurrency = max(1, budget // max(1, len(self.ports)))
+        self.stats = {"probed": 0, "alive": 0, "icmp": False, "elapsed": 0.0}
+
+    @staticmethod
+    def expand_targets(subnet):
+        """Expande CIDR/IP em endereços de host (sem teto de tamanho)"""
+        net = ipaddress.ip_network(subnet, strict=False)
+        if net.num_addresses == 1:
+            return iter([str(net.network_address)])
+        return (str(ip) for ip in net.hosts())
+
+    async def _tcp_alive(self, ip):
+        """Retorna a porta que provou vida (ou 0 para RST) ou None"""
+        results = await probe_ports_async(ip, self.ports, self.timeout,
+                                          any_answer if self.count_refused else any_open)
+        for port, state in results.items():
+            if state == OPEN:
+                return port
+        if self.count_refused and CLOSED in results.values():
+            return 0
+        return None
+
+    async def _probe(self, ip, icmp, on_host):
+        ttl = None
+        method = None
+        if icmp:
+            res = await icmp.ping(ip, self.icmp_timeout)
+            if res is not None:
+                method = "icmp"
+                ttl = res if isinstance(res, int) and not isinstance(res, bool) else None
+        if method is None:
+            port = await self._tcp_alive(ip)
+            if port is not None:
+                method = f"tcp:{port}" if port else "tcp:rst"
+
+        self.stats["probed"] += 1
+        if method:
+            self.stats["alive"] += 1
+            res = on_host({"IP": ip, "Status": "Online", "Hostname": "", "TTL": ttl, "Method": method})
+            if asyncio.iscoroutine(res):
+                # Consumidor lento: a sonda segura seu slot do semáforo (back-pressure)
+                await res
+
+    async def run(self, targets, on_host, should_stop=None):
+        """Sonda todos os alvos respeitando o limite de concorrência"""
+        start = time.time()
+        loop = asyncio.get_running_loop()
+
+        icmp = None
+        if self.use_icmp:
+            prober = ICMPProber()
+            if prober.open() and prober.start(loop):
+                icmp = prober
+        self.stats["icmp"] = icmp is not None
+
+        sem = asyncio.Semaphore(self.concurrency)
+        pending = set()
+
+        async def bounded(ip):
+            try:
+                await self._probe(ip, icmp, on_host)
+            except Exception as e:
+                logger.debug(f"Probe {ip} falhou: {e}")
+            finally:
+                sem.release()
+
+        try:
+            for ip in targets:
+                if should_stop and should_stop():
+                    break
+                # Adquirir antes de criar a task mantém a memória O(concorrência), não O(subnet)
+                await sem.acquire()
+                task = loop.create_task(bounded(ip))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            if icmp:
+                icmp.close()
+            self.stats["elapsed"] = round(time.time() - start, 2)
+        return self.stats
+
+    def discover(self, subnet, on_host, should_stop=None):
+        """Execução síncrona: bloqueia até terminar, chamando on_host a cada host vivo"""
+        return asyncio.run(self.run(self.expand_targets(subnet), on_host, should_stop))
+
+    def iter_hosts(self, subnet, should_stop=None, maxsize=0):
+        """
+        Gerador que entrega hosts vivos à medida que são encontrados.
+        O event loop roda em uma thread dedicada; o consumidor lê de uma fila.
+        Com maxsize > 0 a fila é limitada e a varredura desacelera quando o
+        consumidor não acompanha.
+        """
+        out = queue.Queue(maxsize)
+        closed = threading.Event()
+        done = object()
+
+        def blocking_put(item):
+            while not closed.is_set():
+                try:
+                    out.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        async def on_host(host):
+            try:
+                out.put_nowait(host)
+            except queue.Full:
+                await asyncio.to_thread(blocking_put, host)
+
+        def stop_requested():
+            return closed.is_set() or bool(should_stop and should_stop())
+
+        def runner():
+            try:
+                self.discover(subnet, on_host, stop_requested)
+            except Exception as e:
+                logger.error(f"Erro no motor de descoberta: {e}")
+            finally:
+                blocking_put(done)
+
+        threading.Thread(target=runner, daemon=True, name="SentinelDiscovery").start()
+        try:
+            while True:
+                item = out.get()
+                if item is done:
+                    return
+                yield item
+        finally:
+            closed.set()
+
+
+def discover_hosts(subnet, **kwargs):
+    """Atalho síncrono: retorna a lista completa de hosts vivos"""
+    found = []
+    AsyncDiscoveryEngine(**kwargs).discover(subnet, found.append)
+    return found
@@ -1,58 +1,51 @@
 import ipaddress
-import socket
 import subprocess
-import threading
 import time
 import platform
 import json
 import os
 import re
-import requests
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
-from shared_state import scan_status, scan_lock, update_scan_status
-from utils import logger, resource_path, safe_json_save
+from shared_state import scan_status, device_store, update_scan_status
+from utils import logger, resource_path
 from snmp_helper import get_printer_data
+from scanner.discovery import AsyncDiscoveryEngine, DEFAULT_TCP_PORTS
+from scanner.pipeline import ScanPipeline
+from scanner.persistence import DeviceWriter, upsert_devices
+from scanner.oui import oui_registry
+from scanner.arp_table import arp_table
+from scanner.portprobe import port_prober, OPEN
+from scanner.rdns import reverse_dns
+from scanner.fingerprint import fingerprints
 
 # Windows specific
 CREATE_NO_WINDOW = 0x08000000 if platform.system() == 'Windows' else 0
 
+# Pipeline descoberta -> auditoria
+AUDIT_WORKERS = 8
+PIPELINE_QUEUE_SIZE = 64
+AUDIT_TIMEOUT = 60  # Cada host tem 1 min p/ responder auditoria
+
 class DeviceIntelligence:
     @staticmethod
     def get_mac_address(ip):
-        """Tenta pegar o MAC Address via tabela ARP local"""
+        """MAC Address pelo snapshot da tabela ARP local (lida uma vez por scan, sem processo por host)"""
         try:
-            pid = subprocess.Popen(["arp", "-a", ip], stdout=subprocess.PIPE, stderr=subprocess.PIPE, creationflags=CREATE_NO_WINDOW)
-            output, _ = pid.communicate(timeout=3)
-            output = output.decode('latin-1')
-            mac_regex = re.search(r"(([a-fA-F0-9]{2}[:-]){5}[a-fA-F0-9]{2})", output)
-            if mac_regex:
-                return mac_regex.group(1).replace('-', ':').upper()
-        except:
-            pass
-        return None
+            return arp_table.get(ip)
+        except Exception:
+            return None
 
     @staticmethod
     def get_vendor(mac):
-        """Consulta API pública para descobrir fabricante pelo MAC"""
-        if not mac or mac == "-": return "Desconhecido"
-        try:
-            url = f"https://api.macvendors.com/{mac}"
-            r = requests.get(url, timeout=1)
-            if r.status_code == 200:
-                return r.text.strip()
-        except:
-            pass
-        return "Genérico"
+        """Fabricante pelo prefixo do MAC (base IEEE offline, sem rede)"""
+        return oui_registry.vendor(mac)
 
     @staticmethod
     def check_port(ip, port):
         """Verifica se uma porta específica está aberta"""
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(0.5) 
-                return s.connect_ex((ip, port)) == 0
-        except:
+            return port_prober.probe(ip, [port]).get(port) == OPEN
+        except Exception:
             return False
 
     @staticmethod
@@ -67,26 +60,31 @@ class DeviceIntelligence:
                 return "server_windows", "ph-hard-drives", "Alta (WMI)"
             return "windows", "ph-windows-logo", "Alta (WMI)"
 
-        is_printer = DeviceIntelligence.check_port(ip, 9100) or DeviceIntelligence.check_port(ip, 515)
-        is_web = DeviceIntelligence.check_port(ip, 80) or DeviceIntelligence.check_port(ip, 443)
-        is_ssh = DeviceIntelligence.check_port(ip, 22)
-        is_rtsp = DeviceIntelligence.check_port(ip, 554)
-        
         os_guess = "Desconhecido"
         if ttl:
             if 60 <= ttl <= 70: os_guess = "Linux/Unix Based"
             elif 120 <= ttl <= 130: os_guess = "Windows Based"
             elif ttl > 250: os_guess = "Cisco/Network"
 
-        if is_printer:
+        # Todas as portas em uma sonda concorrente; só entram as classes que ainda podem decidir
+        # (SSH só conta com TTL Linux; com TTL Windows a porta web nunca decide)
+        classes = ["printer", "camera"]
+        if "Linux" in os_guess: classes.append("ssh")
+        if "Windows" not in os_guess: classes.append("web")
+        try:
+            matched, _ = port_prober.match(ip, classes)
+        except Exception:
+            matched = None
+
+        if matched == "printer":
             device_type = "printer"
             icon = "ph-printer"
             confidence = "Média (Porta 9100)"
-        elif is_rtsp:
+        elif matched == "camera":
             device_type = "camera"
             icon = "ph-video-camera"
             confidence = "Média (Porta RTSP)"
-        elif is_ssh and "Linux" in os_guess:
+        elif matched == "ssh":
             device_type = "linux"
             icon = "ph-linux-logo"
             confidence = "Média (SSH + TTL)"
@@ -94,17 +92,17 @@ class DeviceIntelligence:
             device_type = "windows_locked"
             icon = "ph-windows-logo"
             confidence = "Baixa (Apenas TTL)"
-        elif is_web:
+        elif matched == "web":
             device_type = "web_device"
             icon = "ph-wifi-high"
             confidence = "Baixa (Web)"
         
         return device_type, icon, confidence
 
-def get_full_audit(ip, user, password, pre_ping_success=False, pre_hostname=None):
+def get_full_audit(ip, user, password, pre_ping_success=False, pre_hostname=None, pre_ttl=None):
     is_online = pre_ping_success
     param = '-n' if platform.system().lower() == 'windows' else '-c'
-    ttl_val = None
+    ttl_val = pre_ttl
     
     # 1. Try ICMP Ping
     if not is_online:
@@ -126,16 +124,12 @@ def get_full_audit(ip, user, password, pre_ping_success=False, pre_hostname=None
 
     # 2. Fallback: Try TCP Ports if Ping verification failed
     # (Firewalls often block ICMP but allow services)
+    # Todas as portas de 'liveness' ao mesmo tempo: a primeira resposta (aceite ou RST) encerra
     if not is_online:
-        common_ports = [9100, 80, 443, 445, 139, 135, 22, 3389]
-        for p in common_ports:
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(0.5)
-                    if s.connect_ex((ip, p)) == 0:
-                        is_online = True
-                        break
-            except: pass
+        try:
+            is_online = port_prober.is_alive(ip)
+        except Exception:
+            pass
 
     if not is_online:
          return None
@@ -153,8 +147,9 @@ def get_full_audit(ip, user, password, pre_ping_success=False, pre_hostname=None
         if pre_hostname and pre_hostname != 'N/A' and pre_hostname != '':
             info["hostname"] = pre_hostname
         else:
-            try: info["hostname"] = socket.gethostbyaddr(ip)[0]
-            except: pass
+            # Normalmente já resolvido em paralelo (prefetch do scan_thread) ou em cache
+            name = reverse_dns.resolve(ip)
+            if name: info["hostname"] = name
     except: pass
 
     # Only attempt WMI if TTL suggests Windows, but proceed to SNMP regardless
@@ -230,51 +225,20 @@ def get_full_audit(ip, user, password, pre_ping_success=False, pre_hostname=None
     }
 
 def save_db(data):
-    """Grava/Atualiza dispositivos no SQLite de forma atômica"""
-    from database import get_session
-    from models import Device
-    session = get_session()
+    """Grava/Atualiza dispositivos no SQLite de forma atômica (upsert em uma transação)"""
     try:
-        for item in data:
-            device = session.query(Device).filter_by(ip=item['ip']).first()
-            if not device:
-                device = Device(ip=item['ip'])
-                session.add(device)
-            
-            device.hostname = item.get('hostname', device.hostname)
-            device.device_type = item.get('device_type', device.device_type)
-            device.icon = item.get('icon', device.icon)
-            device.vendor = item.get('vendor', device.vendor)
-            device.mac = item.get('mac', device.mac)
-            device.os_detail = item.get('os_detail', device.os_detail)
-            device.model = item.get('model', device.model)
-            device.user = item.get('user', device.user)
-            device.ram = item.get('ram', device.ram)
-            device.cpu = str(item.get('cpu', device.cpu))
-            device.uptime = item.get('uptime', device.uptime)
-            device.bios = item.get('bios', device.bios)
-            device.shares = item.get('shares', device.shares)
-            device.disks = item.get('disks', device.disks)
-            device.nics = item.get('nics', device.nics)
-            device.services = item.get('services', device.services)
-            device.errors = item.get('errors', device.errors)
-            device.printer_data = item.get('printer_data', device.printer_data)
-            device.confidence = item.get('confidence', device.confidence)
-            device.last_seen = datetime.now()
-            
-        session.commit()
+        upsert_devices(data)
         return True
     except Exception as e:
         logger.error(f"Erro ao salvar no SQLite: {e}")
-        session.rollback()
         return False
-    finally:
-        session.close()
 
-def scan_thread(subnet, admin_user="", admin_pass=""):
+def scan_thread(subnet, admin_user="", admin_pass="", full_audit=False):
     """
     Sentinel Engine 2.1 - O motor de scan definitivo.
     Design resiliente para subredes grandes (/22, /23, /24).
+    Hosts com impressão digital inalterada e auditoria recente não são auditados de novo,
+    a menos que full_audit seja pedido.
     """
     start_time = time.time()
     update_scan_status({
@@ -297,70 +261,73 @@ def scan_thread(subnet, admin_user="", admin_pass=""):
         update_scan_status({"etr": "Descobrindo...", "logs": {"msg": f"🛰️ Analisando topologia: {subnet}", "time": time.strftime("%H:%M:%S")}})
         discovered_hosts = []
         
-        # --- PHASE 1: POWERSHELL DISCOVERY ---
-        try:
-            ps_script = resource_path(os.path.join("scripts", "scan_network.ps1"))
-            if os.path.exists(ps_script):
-                update_scan_status({"logs": {"msg": "📡 Sentinel PS Core: Disparando varredura rápida...", "time": time.strftime("%H:%M:%S")}})
-                cmd = ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", ps_script, "-Subnet", subnet]
-                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, creationflags=CREATE_NO_WINDOW)
-                try:
-                    stdout, stderr = proc.communicate(timeout=180)
-                    if stdout and stdout.strip():
-                        # Robusteza: extrair o primeiro JSON válido (ignorar lixo)
-                        match = re.search(r'\[.*\]', stdout.replace('\n', '').replace('\r', ''))
-                        if match:
-                            data = json.loads(match.group(0))
-                            # Normalizar: PS pode retornar listas aninhadas em alguns casos
-                            raw_list = data if isinstance(data, list) else [data]
-                            for item in raw_list:
-                                if isinstance(item, list): discovered_hosts.extend(item)
-                                else: discovered_hosts.append(item)
-                            
-                            update_scan_status({"logs": {"msg": f"✅ Fase 1 completa: {len(discovered_hosts)} ativos detectados via PS.", "time": time.strftime("%H:%M:%S")}})
-                        else:
-                            update_scan_status({"logs": {"msg": "⚠️ Falha no sinal JSON do PS Engine.", "time": time.strftime("%H:%M:%S")}})
-                    else:
-                        update_scan_status({"logs": {"msg": "⚠️ PS Engine retornou silêncio (Rede protegida?).", "time": time.strftime("%H:%M:%S")}})
-                except subprocess.TimeoutExpired:
-                    proc.kill()
-                    update_scan_status({"logs": {"msg": "⏰ Tempo limite do PS excedido (Segmento muito grande).", "time": time.strftime("%H:%M:%S")}})
-            else:
-                update_scan_status({"logs": {"msg": "🔴 Script Sentinel PS não encontrado.", "time": time.strftime("%H:%M:%S")}})
-        except Exception as e:
-            logger.error(f"Erro PS: {e}")
-            update_scan_status({"logs": {"msg": f"❌ Falha crítica PS: {str(e)}", "time": time.strftime("%H:%M:%S")}})
-
-        # --- PHASE 1.5: PYTHON FALLBACK ---
-        if not discovered_hosts:
-            update_scan_status({"logs": {"msg": "🛠️ Ativando Fallback Engine (Ping Sweep Nativo)...", "time": time.strftime("%H:%M:%S")}})
-            def quick_ping(ip):
-                param = '-n' if platform.system().lower() == 'windows' else '-c'
-                try:
-                    res = subprocess.run(['ping', param, '1', '-w', '200', str(ip)], capture_output=True, creationflags=CREATE_NO_WINDOW)
-                    if res.returncode == 0: return {"IP": str(ip), "Status": "Online", "Hostname": ""}
-                except: pass
-                return None
+        # Backend de descoberta: "auto" usa o PS apenas onde ele cobre a subnet inteira (limite interno de 1024)
+        from utils import load_general_settings
+        backend = load_general_settings().get("discovery_backend", "auto")
+        use_ps = backend == "powershell" or (backend == "auto" and platform.system() == 'Windows' and total_ips <= 1024)
 
+        # --- PHASE 1: POWERSHELL DISCOVERY ---
+        if use_ps:
             try:
-                ips_to_ping = list(net.hosts())[:1024] # Safety cap
-                with ThreadPoolExecutor(max_workers=64) as discovery_executor:
-                    discovered_hosts = [h for h in discovery_executor.map(quick_ping, ips_to_ping) if h]
-                update_scan_status({"logs": {"msg": f"✅ Fallback finalizado: {len(discovered_hosts)} ativos encontrados.", "time": time.strftime("%H:%M:%S")}})
+                ps_script = resource_path(os.path.join("scripts", "scan_network.ps1"))
+                if os.path.exists(ps_script):
+                    update_scan_status({"logs": {"msg": "📡 Sentinel PS Core: Disparando varredura rápida...", "time": time.strftime("%H:%M:%S")}})
+                    cmd = ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", ps_script, "-Subnet", subnet]
+                    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, creationflags=CREATE_NO_WINDOW)
+                    try:
+                        stdout, stderr = proc.communicate(timeout=180)
+                        if stdout and stdout.strip():
+                            # Robusteza: extrair o primeiro JSON válido (ignorar lixo)
+                            match = re.search(r'\[.*\]', stdout.replace('\n', '').replace('\r', ''))
+                            if match:
+                                data = json.loads(match.group(0))
+                                # Normalizar: PS pode retornar listas aninhadas em alguns casos
+                                raw_list = data if isinstance(data, list) else [data]
+                                for item in raw_list:
+                                    if isinstance(item, list): discovered_hosts.extend(item)
+                                    else: discovered_hosts.append(item)
+                                
+                                update_scan_status({"logs": {"msg": f"✅ Fase 1 completa: {len(discovered_hosts)} ativos detectados via PS.", "time": time.strftime("%H:%M:%S")}})
+                            else:
+                                update_scan_status({"logs": {"msg": "⚠️ Falha no sinal JSON do PS Engine.", "time": time.strftime("%H:%M:%S")}})
+                        else:
+                            update_scan_status({"logs": {"msg": "⚠️ PS Engine retornou silêncio (Rede protegida?).", "time": time.strftime("%H:%M:%S")}})
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+                        update_scan_status({"logs": {"msg": "⏰ Tempo limite do PS excedido (Segmento muito grande).", "time": time.strftime("%H:%M:%S")}})
+                else:
+                    update_scan_status({"logs": {"msg": "🔴 Script Sentinel PS não encontrado.", "time": time.strftime("%H:%M:%S")}})
             except Exception as e:
-                update_scan_status({"logs": {"msg": f"❌ Erro no Fallback: {str(e)}", "time": time.strftime("%H:%M:%S")}})
+                logger.error(f"Erro PS: {e}")
+                update_scan_status({"logs": {"msg": f"❌ Falha crítica PS: {str(e)}", "time": time.strftime("%H:%M:%S")}})
 
-        if not discovered_hosts:
-            update_scan_status({
-                "logs": {"msg": "🔍 Fim da varredura: Nenhum dispositivo respondeu.", "time": time.strftime("%H:%M:%S")},
-                "total": 1, "scanned": 1, "etr": "Concluído"
-            })
-            time.sleep(10)
-            return
-            
-        # --- PHASE 2: AUDIT ---
-        total_discovered = len(discovered_hosts)
-        
+        # --- PHASE 1.5: ASYNC DISCOVERY ENGINE (streaming) ---
+        engine = None
+        if discovered_hosts:
+            host_source = discovered_hosts
+        else:
+            update_scan_status({"logs": {"msg": "🛠️ Ativando Async Discovery Engine (ICMP/TCP)...", "time": time.strftime("%H:%M:%S")}})
+            engine = AsyncDiscoveryEngine(ports=port_prober.ports('liveness') or DEFAULT_TCP_PORTS)
+            # Fila limitada: se a auditoria não acompanhar, a varredura desacelera
+            host_source = engine.iter_hosts(subnet, should_stop=lambda: not scan_status["running"], maxsize=PIPELINE_QUEUE_SIZE)
+
+        # Hosts sem nome entram na resolução reversa (PTR) assim que são descobertos
+        reverse_dns.reload()
+
+        def with_reverse_dns(hosts):
+            for host in hosts:
+                if not (host.get('Hostname') or host.get('hostname')):
+                    reverse_dns.prefetch(host.get('IP') or host.get('ip'))
+                yield host
+
+        if engine:
+            host_source = with_reverse_dns(host_source)
+        else:
+            for host in host_source:
+                if not (host.get('Hostname') or host.get('hostname')):
+                    reverse_dns.prefetch(host.get('IP') or host.get('ip'))
+
+        # --- PHASE 2: AUDIT (pipeline: cada host entra na auditoria assim que é descoberto) ---
         # Pre-fetch existing IPs to determine NEW/UPDATED status quickly
         from database import get_session
         from models import Device
@@ -368,66 +335,142 @@ def scan_thread(subnet, admin_user="", admin_pass=""):
         existing_ips = {d.ip for d in db_session.query(Device.ip).all()}
         db_session.close()
 
+        # Portas por classe de dispositivo (settings['port_probe']) valem para o scan inteiro
+        port_prober.reload()
+
+        # Tabela ARP lida uma vez; hosts descobertos depois entram pelas releituras incrementais
+        arp_table.clear()
+        arp_table.snapshot()
+
+        # Rescan incremental: impressões digitais gravadas no scan anterior. Com full_audit
+        # nada é pulado, mas as impressões são regravadas (base nova para o próximo scan)
+        fingerprinting = False
+        try:
+            fingerprints.load()
+            fingerprinting = fingerprints.enabled
+        except Exception as e:
+            logger.error(f"Impressões digitais indisponíveis, auditando tudo: {e}")
+        incremental = fingerprinting and not full_audit
+
         update_scan_status({
-            "total": total_discovered,
             "scanned": 0,
-            "logs": {"msg": f"🔍 Iniciando auditoria profunda em {total_discovered} alvos...", "time": time.strftime("%H:%M:%S")}
+            "logs": {"msg": f"🔍 Auditoria profunda em streaming ({AUDIT_WORKERS} auditores{', incremental' if incremental else ''})...", "time": time.strftime("%H:%M:%S")}
         })
-        
-        audit_executor = ThreadPoolExecutor(max_workers=8)
-        futures = []
+
+        skipped_ips = set()
 
         def audit_worker(host_data):
             ip = host_data.get('IP') or host_data.get('ip')
             hostname = host_data.get('Hostname') or host_data.get('hostname') or ''
+            ttl = host_data.get('TTL')
             try:
-                return get_full_audit(ip, admin_user, admin_pass, pre_ping_success=True, pre_hostname=hostname)
+                components = None
+                previous = device_store.get(ip) if incremental else None
+                # Sem registro anterior não há o que pular: a sonda só serve de base e fica para depois da auditoria
+                if previous and fingerprints.known(ip):
+                    components = fingerprints.compute(ip, ttl, hostname or reverse_dns.resolve(ip),
+                                                      snmp=previous.get('device_type') == 'printer')
+                    if fingerprints.should_skip(ip, components):
+                        fingerprints.record(ip, components, audited=False)
+                        skipped_ips.add(ip)
+                        return dict(previous, status_code="ONLINE", last_seen=datetime.now().isoformat())
+                r = get_full_audit(ip, admin_user, admin_pass, pre_ping_success=True, pre_hostname=hostname, pre_ttl=ttl)
+                if r and fingerprinting:
+                    if components is None:
+                        components = fingerprints.compute(ip, ttl, hostname or reverse_dns.resolve(ip),
+                                                          snmp=r["device_type"] == "printer")
+                    elif r["device_type"] == "printer" and "snmp_object" not in components:
+                        components.update(fingerprints.snmp_components(ip))
+                    fingerprints.record(ip, components, audited=True)
+                return r
             except Exception as e:
                 logger.error(f"Audit Fail {ip}: {e}")
                 return None
 
-        for h in discovered_hosts:
-            futures.append(audit_executor.submit(audit_worker, h))
-            
-        updated, added, completed = 0, 0, 0
-        
-        for f in futures:
-            try:
-                r = f.result(timeout=60) # Cada host tem 1 min p/ responder auditoria
-                completed += 1
-                if r:
-                    with results_lock:
-                        # Mark as NEW or UPDATED based on pre-fetched state
-                        r['scan_type'] = 'new' if r['ip'] not in existing_ips else 'updated'
-
-                        found_idx = next((i for i, x in enumerate(scan_status["results"]) if x['ip'] == r['ip']), -1)
-                        if found_idx >= 0:
-                            scan_status["results"][found_idx] = r
-                            updated += 1
-                        else:
-                            scan_status["results"].append(r)
-                            added += 1
-                        
-                        update_scan_status({"logs": {"msg": f"Auditado: {r['ip']} ({r['hostname']})", "time": time.strftime("%H:%M:%S")}})
-                        save_db([r]) 
-
-                # Update progress
-                elapsed = time.time() - start_time
-                rate = elapsed / completed if completed > 0 else 1
-                rem = int((total_discovered - completed) * rate)
-                update_scan_status({
-                    "scanned": completed,
-                    "etr": f"{rem}s",
-                    "last_results": {"updated": updated, "added": added, "total_found": updated + added}
-                })
-            except Exception as e:
-                completed += 1
-                logger.error(f"Worker Error: {e}")
+        counters = {"updated": 0, "added": 0, "skipped": 0}
+        writer = DeviceWriter()
+
+        def on_result(host_data, r):
+            if not r:
+                return
+            if r['ip'] in skipped_ips:
+                # Inalterado: só o last_seen é renovado no banco
+                counters["skipped"] += 1
+                device_store.upsert(r)
+                writer.add({'ip': r['ip']})
+                return
+            # Mark as NEW or UPDATED based on pre-fetched state
+            r['scan_type'] = 'new' if r['ip'] not in existing_ips else 'updated'
 
-        audit_executor.shutdown(wait=False)
+            if device_store.upsert(r):
+                counters["added"] += 1
+            else:
+                counters["updated"] += 1
+
+            update_scan_status({"logs": {"msg": f"Auditado: {r['ip']} ({r['hostname']})", "time": time.strftime("%H:%M:%S")}})
+            writer.add(r)
+
+        def on_progress(p):
+            writer.maybe_flush()
+            # ETA considera os dois estágios: descoberta restante e fila de auditoria
+            probed = engine.stats["probed"] if engine else None
+            rem, expected = p.estimate_remaining(total_ips if engine else None, probed)
+            update_scan_status({
+                "scanned": p.stats["audited"],
+                "total": max(1, expected),
+                "etr": f"{rem}s",
+                "last_results": {"updated": counters["updated"], "added": counters["added"], "skipped": counters["skipped"],
+                                 "total_found": counters["updated"] + counters["added"] + counters["skipped"]}
+            })
+
+        pipeline = ScanPipeline(audit_worker, audit_workers=AUDIT_WORKERS, queue_size=PIPELINE_QUEUE_SIZE,
+                                audit_timeout=AUDIT_TIMEOUT)
+        try:
+            pipeline.run(host_source, on_result, on_progress, should_stop=lambda: not scan_status["running"])
+        finally:
+            writer.close()
+            # Fabricantes resolvidos neste scan (cache persistente do OUI)
+            oui_registry.save_cache()
+            reverse_dns.save_cache()
+            if fingerprinting:
+                fingerprints.flush()
+        ports = port_prober.stats
+        logger.info(f"[Portas] {ports['probes']} sondas ({ports['sockets']} conexões, {ports['early']} encerradas "
+                    f"antes do timeout) em {ports['elapsed']:.1f}s somados")
+        rdns = reverse_dns.stats
+        logger.info(f"[rDNS] {rdns['queries']} consultas, {rdns['cache_hits']} do cache, {rdns['found']} nomes, "
+                    f"{rdns['negative']} sem PTR, {rdns['failed']} falhas; auditoria esperou {rdns['wait_ms']:.0f}ms somados")
+        if incremental:
+            fp = fingerprints.stats
+            logger.info(f"[Incremental] {fp['checked']} verificados em {fp['elapsed']:.1f}s somados: {fp['skipped']} sem auditoria, "
+                        f"{fp['new']} novos, {fp['stale']} vencidos, mudanças {fp['changed']}")
+        arp = arp_table.stats
+        logger.info(f"[ARP] {arp['entries']} MACs em {arp['reads']} leituras ({arp['spawns']} processos), "
+                    f"{arp['hits']} resolvidos, {arp['misses']} sem entrada, {arp['routed']} fora do segmento")
+        if pipeline.stats["timed_out"]:
+            update_scan_status({"logs": {"msg": f"⏱️ {pipeline.stats['timed_out']} auditorias sem resposta em {AUDIT_TIMEOUT}s foram descartadas.", "time": time.strftime("%H:%M:%S")}})
+        if writer.stats["rows"]:
+            update_scan_status({"logs": {"msg": f"💾 Persistência: {writer.stats['rows']} ativos em {writer.stats['flushes']} lotes ({writer.rows_per_sec} linhas/s).", "time": time.strftime("%H:%M:%S")}})
+
+        total_discovered = pipeline.stats["discovered"]
+        if engine:
+            icmp_state = "ICMP+TCP" if engine.stats["icmp"] else "TCP"
+            update_scan_status({"logs": {"msg": f"✅ Descoberta finalizada ({icmp_state}): {total_discovered} ativos em {engine.stats['elapsed']}s.", "time": time.strftime("%H:%M:%S")}})
+
+        if not total_discovered:
+            update_scan_status({
+                "logs": {"msg": "🔍 Fim da varredura: Nenhum dispositivo respondeu.", "time": time.strftime("%H:%M:%S")},
+                "total": 1, "scanned": 1, "etr": "Concluído"
+            })
+            time.sleep(10)
+            return
+
+        added, updated, skipped = counters["added"], counters["updated"], counters["skipped"]
+        unchanged = f", {skipped} inalterados (auditoria dispensada)" if incremental else ""
         update_scan_status({
-            "logs": {"msg": f"📢 SCAN CONCLUÍDO: {added} novos, {updated} atualizados.", "time": time.strftime("%H:%M:%S")},
+            "logs": {"msg": f"📢 SCAN CONCLUÍDO: {added} novos, {updated} atualizados{unchanged} em {int(time.time() - start_time)}s.", "time": time.strftime("%H:%M:%S")},
             "etr": "Concluído",
+            "total": total_discovered,
             "scanned": total_discovered
         })
         time.sleep(15) 
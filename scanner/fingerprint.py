@@ -0,0 +1,259 @@
+"""
+Sentinel Fingerprint - Rescan incremental por impressão digital do dispositivo
+
+Antes da auditoria profunda (WMI/PowerShell, dump SNMP da impressora, identificação, fabricante)
+o scan calcula uma impressão digital barata do host:
+
+    mac          snapshot da tabela ARP (O(1))
+    ttl_class    família do TTL da descoberta (linux/windows/network)
+    ports        bitmap das portas abertas (uma sonda concorrente, settings['port_probe'])
+    hostname     nome da descoberta ou do DNS reverso (cache)
+    snmp_object  sysObjectID + boot (agora - sysUpTime), só para quem já respondeu SNMP/impressoras
+
+Se ela bate com a gravada e a última auditoria profunda é mais nova que `max_age_hours`, o
+host não é auditado de novo: o registro anterior só tem o last_seen renovado. Qualquer
+componente diferente, reboot (boot fora da tolerância) ou auditoria vencida força a profunda.
+
+As impressões ficam em device_fingerprints e são gravadas em uma transação no fim do scan.
+"""
+import copy
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from scanner.portprobe import port_prober, OPEN
+
+logger = logging.getLogger('NetAudit.Fingerprint')
+
+DEFAULT_CONFIG = {
+    'enabled': True,
+    'max_age_hours': 24,            # auditoria profunda obrigatória depois disso
+    'boot_tolerance_seconds': 300,  # variação aceita no boot calculado pelo sysUpTime
+    'snmp_timeout': 1.0,
+}
+
+OID_SYS_OBJECT_ID = '1.3.6.1.2.1.1.2.0'
+OID_SYS_UPTIME = '1.3.6.1.2.1.1.3.0'
+
+# Componentes comparados por igualdade (boot tem tolerância)
+EXACT_COMPONENTS = ('mac', 'ttl_class', 'ports', 'bitmap', 'hostname', 'snmp_object')
+
+
+def load_fingerprint_config():
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    try:
+        from utils import load_general_settings
+        config.update(load_general_settings().get('incremental_scan') or {})
+    except Exception as e:
+        logger.debug(f"Usando configuração de rescan incremental padrão: {e}")
+    return config
+
+
+def ttl_class(ttl):
+    """Mesmas faixas do identify_type"""
+    if not ttl:
+        return None
+    if 60 <= ttl <= 70:
+        return 'linux'
+    if 120 <= ttl <= 130:
+        return 'windows'
+    if ttl > 250:
+        return 'network'
+    return 'other'
+
+
+def port_bitmap(results, ports):
+    return sum(1 << i for i, port in enumerate(ports) if results.get(port) == OPEN)
+
+
+def fingerprint_ports():
+    """Portas da sonda: perfil 'fingerprint' ou a união de todas as classes"""
+    ports = port_prober.ports('fingerprint')
+    if not ports:
+        ports = sorted({p for name in port_prober.config['profiles'] for p in port_prober.ports(name)})
+    return ports
+
+
+class FingerprintStore:
+    """Impressões digitais gravadas + decisão de pular a auditoria profunda"""
+
+    def __init__(self, config=None, clock=time.time):
+        """
+        Args:
+            config: Configuração fixa (testes); None = settings['incremental_scan'] sobre DEFAULT_CONFIG
+            clock: Relógio em segundos (boot pelo sysUpTime)
+        """
+        self._fixed_config = config
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.config.update(config or {})
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._rows = {}       # ip -> {'components', 'audited_at', 'skipped'}
+        self._pending = {}    # ip -> linha a gravar no flush
+        self.stats = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats = {'checked': 0, 'skipped': 0, 'audited': 0, 'new': 0, 'stale': 0, 'changed': {},
+                      'elapsed': 0.0}
+
+    @property
+    def enabled(self):
+        return bool(self.config.get('enabled', True))
+
+    def load(self, session=None):
+        """Relê configuração e impressões gravadas (início de cada scan, uma consulta)"""
+        from models import DeviceFingerprint
+        if self._fixed_config is None:
+            self.config = load_fingerprint_config()
+        own = session is None
+        if own:
+            from database import get_session
+            session = get_session()
+        try:
+            rows = session.query(DeviceFingerprint).all()
+            with self._lock:
+                self._rows = {r.ip: {'components': r.components or {}, 'audited_at': r.audited_at,
+                                     'skipped': r.skipped or 0} for r in rows}
+                self._pending = {}
+                self._reset_stats()
+        finally:
+            if own:
+                session.close()
+        return len(self._rows)
+
+    # ------------------------------------------------------------------ cálculo
+
+    def snmp_components(self, ip):
+        """sysObjectID e boot do agente ({} se não responde)"""
+        try:
+            from snmp_helper import snmp_client
+            timeout = self.config['snmp_timeout']
+            data = snmp_client.run(snmp_client.get(ip, [OID_SYS_OBJECT_ID, OID_SYS_UPTIME], timeout=timeout, retries=0),
+                                   timeout=timeout + 2)
+        except Exception as e:
+            logger.debug(f"SNMP da impressão digital {ip} falhou: {e}")
+            return {}
+        if not data or 'error' in data or OID_SYS_OBJECT_ID not in data:
+            return {}
+        components = {'snmp_object': str(data[OID_SYS_OBJECT_ID])}
+        try:
+            components['boot'] = round(self.clock() - int(data[OID_SYS_UPTIME]) / 100)
+        except (KeyError, ValueError, TypeError):
+            pass
+        return components
+
+    def compute(self, ip, ttl=None, hostname=None, snmp=False):
+        """
+        Impressão digital barata do host.
+
+        Args:
+            snmp: Inclui sysObjectID/boot (hosts que já responderam SNMP ou impressoras)
+        """
+        from scanner.arp_table import arp_table
+        start = time.perf_counter()
+        ports = fingerprint_ports()
+        results = port_prober.probe(ip, ports)
+        components = {
+            'mac': arp_table.get(ip),
+            'ttl_class': ttl_class(ttl),
+            'ports': ports,
+            'bitmap': port_bitmap(results, ports),
+            'hostname': (hostname or '').lower() or None,
+        }
+        previous = self._rows.get(ip)
+        if snmp or (previous and 'snmp_object' in previous['components']):
+            components.update(self.snmp_components(ip))
+        with self._lock:
+            self.stats['elapsed'] += time.perf_counter() - start
+        return components
+
+    def known(self, ip):
+        """Há impressão gravada para comparar (sem ela a auditoria profunda é certa)"""
+        with self._lock:
+            return ip in self._rows
+
+    def differences(self, old, new):
+        """Componentes que mudaram entre duas impressões digitais"""
+        changed = [k for k in EXACT_COMPONENTS if old.get(k) != new.get(k)]
+        if 'boot' in old or 'boot' in new:
+            if old.get('boot') is None or new.get('boot') is None \
+                    or abs(old['boot'] - new['boot']) > self.config['boot_tolerance_seconds']:
+                changed.append('boot')
+        return changed
+
+    # ------------------------------------------------------------------ decisão
+
+    def should_skip(self, ip, components):
+        """
+        True se a auditoria profunda pode ser dispensada (impressão igual e auditoria recente).
+        Sempre conta o motivo nas estatísticas.
+        """
+        with self._lock:
+            self.stats['checked'] += 1
+            if not self.enabled:
+                return False
+            previous = self._rows.get(ip)
+            if previous is None:
+                return False
+            changed = self.differences(previous['components'], components)
+            if changed:
+                for name in changed:
+                    self.stats['changed'][name] = self.stats['changed'].get(name, 0) + 1
+                return False
+            audited_at = previous['audited_at']
+            if audited_at is None or datetime.now() - audited_at > timedelta(hours=self.config['max_age_hours']):
+                self.stats['stale'] += 1
+                return False
+            return True
+
+    def record(self, ip, components, audited):
+        """Registra o resultado do host (gravado no flush)"""
+        now = datetime.now()
+        with self._lock:
+            previous = self._rows.get(ip) or {}
+            if not previous:
+                # Host novo: auditado sem sonda prévia, a impressão é a base do próximo scan
+                self.stats['checked'] += 1
+                self.stats['new'] += 1
+            if audited:
+                self.stats['audited'] += 1
+                row = {'components': components, 'audited_at': now, 'skipped': 0}
+            else:
+                self.stats['skipped'] += 1
+                row = {'components': components, 'audited_at': previous.get('audited_at'),
+                       'skipped': previous.get('skipped', 0) + 1}
+            self._rows[ip] = row
+            self._pending[ip] = dict(row, ip=ip, checked_at=now)
+
+    def flush(self):
+        """Grava as impressões do scan em uma transação (upsert por IP)"""
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        from database import engine
+        from models import DeviceFingerprint
+        with self._lock:
+            rows = list(self._pending.values())
+            self._pending = {}
+        if not rows:
+            return 0
+        table = DeviceFingerprint.__table__
+        try:
+            stmt = sqlite_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.ip],
+                set_={k: stmt.excluded[k] for k in ('components', 'audited_at', 'checked_at', 'skipped')}
+            )
+            with engine.begin() as conn:
+                conn.execute(stmt, rows)
+        except Exception as e:
+            logger.error(f"Erro ao gravar impressões digitais: {e}")
+            with self._lock:
+                for row in rows:
+                    self._pending.setdefault(row['ip'], row)
+            return 0
+        return len(rows)
+
+
+# Instância global
+fingerprints = FingerprintStore()
@@ -0,0 +1,421 @@
+"""
+Sentinel OUI - Base offline de fabricantes por prefixo MAC (IEEE MA-L / MA-M / MA-S)
+
+Substitui a consulta HTTP ao api.macvendors.com (limitada por taxa, 1s de timeout por host).
+Os CSVs públicos do IEEE são compilados em um índice binário compacto (oui.idx):
+
+    cabeçalho | por tier: prefixos ordenados (uint64) + id do fabricante (uint32) | nomes (UTF-8)
+
+Na carga cada tier ganha um diretório pelos 16 bits altos do prefixo (início de cada faixa no
+array ordenado); a consulta vira o MAC em um inteiro de 48 bits e percorre só a sua faixa (em
+média menos de uma entrada, sem busca no array inteiro). Só os blocos MA-L subdivididos (MA-M/MA-S) consultam
+os tiers de 28/36 bits, então a maioria dos MACs custa uma única busca. Fabricantes resolvidos
+ficam em um cache persistente (vendor_cache.json), usado quando o índice ainda não existe ou não
+conhece o prefixo.
+
+Atualização:  python -m scanner.oui --refresh            (baixa os três registros do IEEE)
+              python -m scanner.oui --from <dir>         (CSVs já baixados)
+"""
+import os
+import sys
+import csv
+import json
+import time
+import array
+import struct
+import logging
+import argparse
+import tempfile
+import threading
+from bisect import bisect_left
+
+logger = logging.getLogger('NetAudit.OUI')
+
+REGISTRY_URLS = {
+    'MA-L': 'https://standards-oui.ieee.org/oui/oui.csv',
+    'MA-M': 'https://standards-oui.ieee.org/oui28/mam.csv',
+    'MA-S': 'https://standards-oui.ieee.org/oui36/oui36.csv',
+}
+# Tamanho do prefixo por tier, do mais específico ao mais genérico
+TIER_BITS = (36, 28, 24)
+# Bits altos do prefixo usados no diretório de faixas de cada tier
+BUCKET_BITS = 16
+
+INDEX_FILE = 'oui.idx'
+CACHE_FILE = 'vendor_cache.json'
+MAGIC = b'NAOUI\x01\x00\x00'
+# magic, gerado em (epoch), entradas de 36/28/24 bits, fabricantes
+HEADER = struct.Struct('<8sIIIII')
+DOWNLOAD_TIMEOUT = 60
+
+UNKNOWN = "Desconhecido"       # sem MAC (host fora do segmento L2)
+GENERIC = "Genérico"           # MAC fora do registro
+PRIVATE = "MAC Aleatório (Privado)"
+
+
+def _mac_to_int(mac):
+    """'AA:BB:CC:DD:EE:FF', 'aa-bb-...' ou 'aabb.ccdd.eeff' -> inteiro de 48 bits (None se inválido)"""
+    digits = mac.replace(':', '').replace('-', '').replace('.', '')
+    if len(digits) != 12:
+        return None
+    try:
+        return int(digits, 16)
+    except ValueError:
+        return None
+
+
+def parse_registry_csv(path):
+    """
+    Lê um CSV do IEEE (Registry, Assignment, Organization Name, ...).
+
+    Returns:
+        list: [(bits, prefixo, fabricante)] com bits 24 (MA-L), 28 (MA-M) ou 36 (MA-S)
+    """
+    entries = []
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        for row in csv.DictReader(f):
+            assignment = (row.get('Assignment') or '').strip()
+            name = ' '.join((row.get('Organization Name') or '').split())
+            bits = len(assignment) * 4
+            if bits not in TIER_BITS or not name:
+                continue
+            try:
+                entries.append((bits, int(assignment, 16), name))
+            except ValueError:
+                continue
+    return entries
+
+
+def compile_index(sources, out_path):
+    """
+    Compila os CSVs do IEEE no índice binário (escrita atômica: temporário + rename).
+
+    Returns:
+        dict: entradas por tier e fabricantes distintos
+    """
+    tiers = {bits: {} for bits in TIER_BITS}
+    for path in sources:
+        for bits, prefix, name in parse_registry_csv(path):
+            tiers[bits][prefix] = name
+
+    names = sorted({name for tier in tiers.values() for name in tier.values()})
+    name_id = {name: i for i, name in enumerate(names)}
+    blob, offsets = bytearray(), array.array('I', [0])
+    for name in names:
+        blob += name.encode('utf-8')
+        offsets.append(len(blob))
+
+    body = bytearray()
+    for bits in TIER_BITS:
+        keys = sorted(tiers[bits])
+        body += _little(array.array('Q', keys)).tobytes()
+        body += _little(array.array('I', (name_id[tiers[bits][k]] for k in keys))).tobytes()
+    body += _little(offsets).tobytes() + blob
+
+    header = HEADER.pack(MAGIC, int(time.time()), *(len(tiers[bits]) for bits in TIER_BITS), len(names))
+    directory = os.path.dirname(os.path.abspath(out_path))
+    fd, tmp = tempfile.mkstemp(prefix='oui_', suffix='.tmp', dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(header + bytes(body))
+    os.replace(tmp, out_path)
+    stats = {f'ma_{bits}': len(tiers[bits]) for bits in TIER_BITS}
+    stats.update(vendors=len(names), bytes=HEADER.size + len(body))
+    return stats
+
+
+def _little(arr):
+    """Arrays são gravados em little-endian independentemente da plataforma"""
+    if sys.byteorder == 'big':
+        arr = array.array(arr.typecode, arr)
+        arr.byteswap()
+    return arr
+
+
+def download_registries(directory, urls=None, timeout=DOWNLOAD_TIMEOUT):
+    """Baixa os CSVs do IEEE para `directory`; retorna os caminhos gravados"""
+    import requests
+    paths = []
+    for registry, url in (urls or REGISTRY_URLS).items():
+        r = requests.get(url, timeout=timeout, headers={'User-Agent': 'NetAudit-OUI/1.0'})
+        r.raise_for_status()
+        path = os.path.join(directory, f"{registry}.csv")
+        with open(path, 'wb') as f:
+            f.write(r.content)
+        paths.append(path)
+    return paths
+
+
+class _Index:
+    """Índice carregado em memória (imutável: recargas trocam a instância inteira)"""
+    __slots__ = ('tiers', 'split', 'names', 'built_at', 'entries', '_ma_l')
+
+    def __init__(self, data):
+        magic, built_at, *counts = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("arquivo não é um índice OUI do NetAudit")
+        n_vendors = counts.pop()
+        pos = HEADER.size
+        self.tiers = []
+        for bits, count in zip(TIER_BITS, counts):
+            keys = array.array('Q')
+            keys.frombytes(data[pos:pos + count * 8])
+            pos += count * 8
+            ids = array.array('I')
+            ids.frombytes(data[pos:pos + count * 4])
+            pos += count * 4
+            if sys.byteorder == 'big':
+                keys.byteswap()
+                ids.byteswap()
+            # Listas na memória: indexar list é mais barato que array (sem criar int a cada acesso)
+            self.tiers.append((bits, keys.tolist(), ids, self._buckets(keys, bits - BUCKET_BITS)))
+        offsets = array.array('I')
+        offsets.frombytes(data[pos:pos + (n_vendors + 1) * 4])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        blob = data[pos + (n_vendors + 1) * 4:]
+        self.names = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(n_vendors)]
+        # Blocos MA-L subdivididos: só eles precisam dos tiers de 28/36 bits
+        self.split = frozenset(k >> (bits - 24) for bits, keys, _, _ in self.tiers if bits > 24 for k in keys)
+        self.built_at = built_at
+        self.entries = sum(counts)
+        self._ma_l = self.tiers[-1][1:]
+
+    @staticmethod
+    def _buckets(keys, shift):
+        """starts[b]..starts[b + 1] = faixa do array ordenado cujos prefixos têm os 16 bits altos = b"""
+        starts = array.array('I', bytes(4 * ((1 << BUCKET_BITS) + 1)))
+        for key in keys:
+            starts[(key >> shift) + 1] += 1
+        total = 0
+        for b in range(len(starts)):
+            total += starts[b]
+            starts[b] = total
+        return starts.tolist()
+
+    def lookup(self, value):
+        """(fabricante, bits do prefixo) do MAC de 48 bits, ou (None, 0)"""
+        key = value >> 24
+        if key in self.split:
+            for bits, keys, ids, starts in self.tiers[:-1]:
+                sub = value >> (48 - bits)
+                bucket = sub >> (bits - BUCKET_BITS)
+                i = bisect_left(keys, sub, starts[bucket], starts[bucket + 1])
+                if i < starts[bucket + 1] and keys[i] == sub:
+                    return self.names[ids[i]], bits
+        # Caminho comum: MA-L (24 bits), faixa curta percorrida direto
+        keys, ids, starts = self._ma_l
+        bucket = key >> 8
+        i, hi = starts[bucket], starts[bucket + 1]
+        while i < hi:
+            if keys[i] == key:
+                return self.names[ids[i]], 24
+            i += 1
+        return None, 0
+
+
+class OuiRegistry:
+    """Resolve fabricantes pelo índice offline + cache persistente de fabricantes resolvidos"""
+
+    def __init__(self, index_path=None, cache_path=None):
+        """
+        Args:
+            index_path: Índice fixo (testes); None = oui.idx do diretório de dados ou o empacotado
+            cache_path: Cache fixo (testes); None = vendor_cache.json no diretório de dados
+        """
+        self._index_path = index_path
+        self._cache_path = cache_path
+        self._index = None
+        self._loaded = False
+        self._cache = None
+        self._cache_dirty = False
+        self._cached = set()  # (bits, prefixo) já conferidos contra o cache nesta execução
+        self._lock = threading.Lock()
+        self.stats = {'lookups': 0, 'index_hits': 0, 'cache_hits': 0, 'misses': 0}
+
+    # ------------------------------------------------------------------ arquivos
+
+    def _data_path(self, filename):
+        from utils import get_data_dir
+        return os.path.join(get_data_dir(), filename)
+
+    def index_candidates(self):
+        """Índice atualizado pelo refresh (diretório de dados) antes do empacotado com o instalador"""
+        if self._index_path:
+            return [self._index_path]
+        from utils import resource_path
+        return [self._data_path(INDEX_FILE), resource_path(INDEX_FILE)]
+
+    @property
+    def cache_path(self):
+        return self._cache_path or self._data_path(CACHE_FILE)
+
+    def load(self, path=None):
+        """
+        Carrega o índice (primeiro candidato existente). Sem índice, só o cache responde.
+
+        Returns:
+            bool: True se há índice carregado
+        """
+        with self._lock:
+            for candidate in ([path] if path else self.index_candidates()):
+                if not candidate or not os.path.exists(candidate):
+                    continue
+                try:
+                    with open(candidate, 'rb') as f:
+                        self._index = _Index(f.read())
+                    self._cached = set()  # nomes podem ter mudado no registro novo
+                    logger.info(f"Índice OUI carregado: {self._index.entries} prefixos ({candidate})")
+                    break
+                except Exception as e:
+                    logger.error(f"Índice OUI inválido em {candidate}: {e}")
+            else:
+                if self._index is None:
+                    logger.warning("Índice OUI ausente: rode 'python -m scanner.oui --refresh'")
+            self._loaded = True
+            return self._index is not None
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+        if self._cache is None:
+            self._load_cache()
+
+    def _load_cache(self):
+        with self._lock:
+            if self._cache is not None:
+                return
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    self._cache = json.load(f)
+            except FileNotFoundError:
+                self._cache = {}
+            except Exception as e:
+                logger.error(f"Cache de fabricantes ilegível, recriando: {e}")
+                self._cache = {}
+
+    def save_cache(self):
+        """Grava o cache se mudou (fim do scan); escrita atômica"""
+        with self._lock:
+            if not self._cache_dirty:
+                return False
+            data = dict(self._cache)
+            self._cache_dirty = False
+        try:
+            directory = os.path.dirname(os.path.abspath(self.cache_path))
+            fd, tmp = tempfile.mkstemp(prefix='vendors_', suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, sort_keys=True)
+            os.replace(tmp, self.cache_path)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao salvar cache de fabricantes: {e}")
+            with self._lock:
+                self._cache_dirty = True
+            return False
+
+    # ------------------------------------------------------------------ consulta
+
+    def lookup(self, mac):
+        """
+        Fabricante registrado do MAC (índice, depois cache).
+
+        Returns:
+            str ou None se o prefixo não é conhecido
+        """
+        value = _mac_to_int(mac) if isinstance(mac, str) else None
+        if value is None:
+            return None
+        self._ensure_loaded()
+        self.stats['lookups'] += 1
+        index = self._index
+        if index is not None:
+            name, bits = index.lookup(value)
+            if name is not None:
+                self.stats['index_hits'] += 1
+                prefix = (bits, value >> (48 - bits))
+                if prefix not in self._cached:
+                    key = f"{prefix[1]:0{bits // 4}X}"
+                    with self._lock:
+                        self._cached.add(prefix)
+                        if self._cache.get(key) != name:
+                            self._cache[key] = name
+                            self._cache_dirty = True
+                return name
+        for bits in TIER_BITS:
+            name = self._cache.get(f"{value >> (48 - bits):0{bits // 4}X}")
+            if name is not None:
+                self.stats['cache_hits'] += 1
+                return name
+        self.stats['misses'] += 1
+        return None
+
+    def vendor(self, mac):
+        """Nome exibido no inventário: fabricante, MAC aleatório/privado, genérico ou desconhecido"""
+        if not mac or mac == "-":
+            return UNKNOWN
+        value = _mac_to_int(mac)
+        if value is None:
+            return GENERIC
+        name = self.lookup(mac)
+        if name is not None:
+            return name
+        # Bit "localmente administrado": MAC aleatório de celulares/VMs, nunca está no registro
+        if (value >> 40) & 0x02:
+            return PRIVATE
+        return GENERIC
+
+    # ------------------------------------------------------------------ atualização
+
+    def refresh(self, source_dir=None, out_path=None, urls=None):
+        """
+        Recompila o índice a partir do IEEE (ou de CSVs locais) e recarrega sem reiniciar.
+
+        Returns:
+            dict: estatísticas do índice gerado
+        """
+        out_path = out_path or self._index_path or self._data_path(INDEX_FILE)
+        with tempfile.TemporaryDirectory(prefix='netaudit_oui_') as tmp:
+            if source_dir:
+                sources = [os.path.join(source_dir, name) for name in sorted(os.listdir(source_dir))
+                           if name.lower().endswith('.csv')]
+            else:
+                sources = download_registries(tmp, urls)
+            if not sources:
+                raise ValueError(f"Nenhum CSV do IEEE encontrado em {source_dir}")
+            stats = compile_index(sources, out_path)
+        self.load(out_path)
+        logger.info(f"Índice OUI atualizado: {stats}")
+        return stats
+
+    def info(self):
+        self._ensure_loaded()
+        index = self._index
+        return {
+            'loaded': index is not None,
+            'entries': index.entries if index else 0,
+            'vendors': len(index.names) if index else 0,
+            'built_at': index.built_at if index else None,
+            'cached_prefixes': len(self._cache or {}),
+            'stats': dict(self.stats),
+        }
+
+
+# Instância global
+oui_registry = OuiRegistry()
+
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Base offline de fabricantes (IEEE OUI)")
+    parser.add_argument('--refresh', action='store_true', help="baixa os registros do IEEE e recompila o índice")
+    parser.add_argument('--from', dest='source_dir', help="compila a partir dos CSVs deste diretório")
+    parser.add_argument('--output', help="caminho do índice gerado (padrão: diretório de dados)")
+    parser.add_argument('--lookup', nargs='*', default=[], help="MACs para consultar")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.refresh or args.source_dir:
+        print(json.dumps(oui_registry.refresh(source_dir=args.source_dir, out_path=args.output), indent=2))
+    for mac in args.lookup:
+        print(f"{mac}  {oui_registry.vendor(mac)}")
+    if not (args.refresh or args.source_dir or args.lookup):
+        print(json.dumps(oui_registry.info(), indent=2, default=str))
@@ -0,0 +1,151 @@
+"""
+Sentinel Persistence - Gravação em lote (write-behind) dos resultados de scan
+Dispositivos auditados são acumulados e gravados em uma única transação com
+INSERT ... ON CONFLICT(ip) DO UPDATE do SQLite.
+"""
+import threading
+import time
+import logging
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+logger = logging.getLogger('NetAudit.Persistence')
+
+# Campos do resultado de auditoria que são colunas de Device
+DEVICE_FIELDS = (
+    'hostname', 'device_type', 'icon', 'vendor', 'mac', 'os_detail', 'model', 'user',
+    'ram', 'cpu', 'uptime', 'bios', 'shares', 'disks', 'nics', 'services', 'errors',
+    'printer_data', 'confidence'
+)
+
+
+def _to_row(item, now):
+    row = {'ip': item['ip'], 'last_seen': now}
+    for field in DEVICE_FIELDS:
+        if field in item:
+            row[field] = item[field]
+    if 'cpu' in row:
+        row['cpu'] = str(row['cpu'])
+    return row
+
+
+def upsert_devices(items):
+    """
+    Grava/Atualiza dispositivos em uma única transação.
+    Campos ausentes no item preservam o valor já gravado.
+
+    Returns:
+        int: Número de linhas gravadas
+    """
+    from database import engine
+    from models import Device
+
+    if not items:
+        return 0
+
+    now = datetime.now()
+    # Deduplica por IP (último resultado vence) e agrupa por conjunto de campos,
+    # pois cada executemany exige as mesmas colunas em todas as linhas
+    latest = {}
+    for item in items:
+        latest[item['ip']] = _to_row(item, now)
+    groups = {}
+    for row in latest.values():
+        groups.setdefault(tuple(sorted(row.keys())), []).append(row)
+
+    table = Device.__table__
+    with engine.begin() as conn:
+        for keys, rows in groups.items():
+            stmt = sqlite_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.ip],
+                set_={k: stmt.excluded[k] for k in keys if k != 'ip'}
+            )
+            conn.execute(stmt, rows)
+    return len(latest)
+
+
+class DeviceWriter:
+    """
+    Estágio write-behind: acumula resultados e grava em lote quando o buffer
+    atinge max_batch itens ou quando max_delay segundos se passaram.
+
+    Um lote que falha (ex.: 'database is locked' com o coletor gravando ao mesmo
+    tempo) volta para o início do buffer e é regravado depois de retry_delay
+    (crescente), até max_retries vezes; só então é descartado.
+    """
+
+    def __init__(self, max_batch=100, max_delay=2.0, max_retries=3, retry_delay=1.0):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.last_flush = time.time()
+        self.failures = 0        # falhas consecutivas do lote pendente
+        self.retry_after = 0.0
+        self.stats = {"rows": 0, "flushes": 0, "errors": 0, "retries": 0, "dropped": 0, "busy": 0.0}
+
+    def add(self, item):
+        with self.lock:
+            self.buffer.append(item)
+            full = len(self.buffer) >= self.max_batch
+        if full and time.time() >= self.retry_after:
+            self.flush()
+        else:
+            self.maybe_flush()
+
+    def maybe_flush(self):
+        """Grava se o item mais antigo no buffer já esperou max_delay (ou se a nova tentativa venceu)"""
+        if not self.buffer or time.time() < self.retry_after:
+            return
+        if self.failures or time.time() - self.last_flush >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            batch, self.buffer = self.buffer, []
+            self.last_flush = time.time()
+        if not batch:
+            return 0
+        t0 = time.time()
+        try:
+            written = upsert_devices(batch)
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.failures += 1
+            if self.failures > self.max_retries:
+                logger.error(f"Erro ao gravar lote no SQLite ({len(batch)} itens), descartado após "
+                             f"{self.max_retries} novas tentativas: {e}")
+                self.stats["dropped"] += len(batch)
+                self.failures = 0
+                self.retry_after = 0.0
+                return 0
+            logger.warning(f"Erro ao gravar lote no SQLite ({len(batch)} itens), nova tentativa "
+                           f"{self.failures}/{self.max_retries}: {e}")
+            self.stats["retries"] += 1
+            self.retry_after = time.time() + self.retry_delay * self.failures
+            with self.lock:
+                # Itens mais antigos na frente: no upsert o resultado mais novo do IP vence
+                self.buffer = batch + self.buffer
+            return 0
+        self.failures = 0
+        self.retry_after = 0.0
+        self.stats["busy"] += time.time() - t0
+        self.stats["rows"] += written
+        self.stats["flushes"] += 1
+        return written
+
+    def close(self):
+        """Grava o restante, esperando as novas tentativas de um lote que falhou"""
+        written = self.flush()
+        while self.buffer and self.failures:
+            time.sleep(max(0.0, self.retry_after - time.time()))
+            written += self.flush()
+        return written
+
+    @property
+    def rows_per_sec(self):
+        busy = self.stats["busy"]
+        return round(self.stats["rows"] / busy, 1) if busy > 0 else 0.0
@@ -0,0 +1,202 @@
+"""
+Sentinel Pipeline - Descoberta e auditoria em estágios concorrentes
+Cada host descoberto entra em uma fila limitada e é auditado imediatamente;
+o tempo total tende a max(descoberta, auditoria) em vez da soma.
+"""
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger('NetAudit.Pipeline')
+
+_DONE = object()
+
+
+class ScanPipeline:
+    """
+    Três estágios ligados por filas:
+
+        descoberta (1 thread) -> [fila limitada] -> auditoria (N threads) -> resultados (thread chamadora)
+
+    A fila entre descoberta e auditoria é limitada: quando os auditores não
+    acompanham, o produtor bloqueia (back-pressure) em vez de acumular hosts.
+
+    Cada auditoria tem um prazo (audit_timeout). Um auditor que passa do prazo
+    (WMI/SNMP/PowerShell travado) é abandonado: o host conta como falha, o
+    resultado que vier depois é descartado e outra thread assume o lugar dele.
+    """
+
+    def __init__(self, audit_fn, audit_workers=8, queue_size=64, audit_timeout=60):
+        """
+        Args:
+            audit_fn: Função host_data -> resultado (ou None se offline)
+            audit_workers: Threads do estágio de auditoria
+            queue_size: Capacidade da fila descoberta -> auditoria
+            audit_timeout: Prazo de cada auditoria (s); None = sem prazo
+        """
+        self.audit_fn = audit_fn
+        self.audit_workers = audit_workers
+        self.audit_timeout = audit_timeout
+        self.audit_queue = queue.Queue(maxsize=queue_size)
+        self.result_queue = queue.Queue()
+        self.stats = {
+            "discovered": 0,
+            "audited": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "discovery_done": False,
+            "started_at": None,
+            "discovery_elapsed": 0.0,
+            "audit_busy": 0.0,   # soma do tempo gasto auditando (todas as threads)
+        }
+        self._lock = threading.Lock()
+        self._active = {}        # auditor -> (host, início da auditoria)
+        self._abandoned = set()  # auditores que passaram do prazo
+        self._next_worker = 0
+
+    def _producer(self, host_source, should_stop):
+        start = time.time()
+        try:
+            for host in host_source:
+                if should_stop and should_stop():
+                    break
+                self.audit_queue.put(host)  # bloqueia quando a fila está cheia
+                with self._lock:
+                    self.stats["discovered"] += 1
+        except Exception as e:
+            logger.error(f"Erro no estágio de descoberta: {e}")
+        finally:
+            with self._lock:
+                self.stats["discovery_done"] = True
+                self.stats["discovery_elapsed"] = time.time() - start
+            for _ in range(self.audit_workers):
+                self.audit_queue.put(_DONE)
+
+    def _start_auditor(self):
+        with self._lock:
+            worker = self._next_worker
+            self._next_worker += 1
+        threading.Thread(target=self._auditor, args=(worker,), daemon=True, name=f"PipelineAudit-{worker}").start()
+
+    def _auditor(self, worker):
+        while True:
+            host = self.audit_queue.get()
+            if host is _DONE:
+                self.result_queue.put(_DONE)
+                return
+            t0 = time.time()
+            with self._lock:
+                self._active[worker] = (host, t0)
+            try:
+                result = self.audit_fn(host)
+            except Exception as e:
+                logger.error(f"Audit Fail {host}: {e}")
+                result = None
+            with self._lock:
+                if worker in self._abandoned:
+                    # Já contado como falha pelo prazo; o substituto segue com a fila
+                    self._abandoned.discard(worker)
+                    return
+                self._active.pop(worker, None)
+                self.stats["audit_busy"] += time.time() - t0
+                self.stats["audited"] += 1
+                if result is None:
+                    self.stats["failed"] += 1
+            self.result_queue.put((host, result))
+
+    def _expire_audits(self):
+        """Abandona auditorias vencidas e repõe os auditores (chamado pela thread de run)"""
+        if not self.audit_timeout:
+            return []
+        now = time.time()
+        expired = []
+        with self._lock:
+            for worker, (host, t0) in list(self._active.items()):
+                if now - t0 < self.audit_timeout:
+                    continue
+                del self._active[worker]
+                self._abandoned.add(worker)
+                self.stats["audit_busy"] += now - t0
+                self.stats["audited"] += 1
+                self.stats["failed"] += 1
+                self.stats["timed_out"] += 1
+                expired.append(host)
+        for host in expired:
+            logger.error(f"Audit Fail {host}: sem resposta em {self.audit_timeout}s, auditor abandonado")
+            self._start_auditor()
+        return expired
+
+    def estimate_remaining(self, total_targets=None, probed=None):
+        """
+        ETA combinando os dois estágios.
+
+        Args:
+            total_targets: Endereços a sondar (None se a descoberta não for incremental)
+            probed: Endereços já sondados pela descoberta
+
+        Returns:
+            tuple: (segundos restantes, total estimado de hosts)
+        """
+        with self._lock:
+            s = dict(self.stats)
+        elapsed = time.time() - (s["started_at"] or time.time())
+        discovered, audited = s["discovered"], s["audited"]
+
+        # Estágio 1: projeta o restante da descoberta e quantos hosts ainda virão
+        disc_rem = 0.0
+        expected_hosts = discovered
+        if not s["discovery_done"] and total_targets and probed:
+            disc_rem = elapsed / probed * max(0, total_targets - probed)
+            expected_hosts = discovered + int(discovered / probed * max(0, total_targets - probed))
+
+        # Estágio 2: tempo médio por host dividido pelos auditores em paralelo
+        audit_rem = 0.0
+        if audited:
+            per_host = s["audit_busy"] / audited / self.audit_workers
+            audit_rem = max(0, expected_hosts - audited) * per_host
+
+        return int(max(disc_rem, audit_rem)), max(expected_hosts, audited)
+
+    def run(self, host_source, on_result, on_progress=None, should_stop=None, progress_interval=1.0):
+        """
+        Executa o pipeline até esgotar a fonte de hosts e todas as auditorias.
+
+        Args:
+            host_source: Iterável de host_data (pode ser um gerador em streaming)
+            on_result: Callback (host_data, resultado) chamado na thread chamadora
+            on_progress: Callback opcional chamado a cada progress_interval segundos
+            should_stop: Callable que interrompe a descoberta quando True
+        """
+        self.stats["started_at"] = time.time()
+        threading.Thread(target=self._producer, args=(host_source, should_stop), daemon=True, name="PipelineDiscovery").start()
+        for _ in range(self.audit_workers):
+            self._start_auditor()
+
+        finished = 0
+        last_progress = 0.0
+        while finished < self.audit_workers:
+            try:
+                item = self.result_queue.get(timeout=progress_interval)
+                if item is _DONE:
+                    finished += 1
+                else:
+                    on_result(*item)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                logger.error(f"Worker Error: {e}")
+
+            for host in self._expire_audits():
+                try:
+                    on_result(host, None)
+                except Exception as e:
+                    logger.error(f"Worker Error: {e}")
+
+            if on_progress and time.time() - last_progress >= progress_interval:
+                last_progress = time.time()
+                on_progress(self)
+
+        if on_progress:
+            on_progress(self)
+        return self.stats
@@ -0,0 +1,228 @@
+"""
+Sentinel Ports - Sonda TCP de várias portas ao mesmo tempo
+
+Substitui as conexões sequenciais (uma porta por vez, 0.5s de timeout cada) da auditoria:
+todas as portas do conjunto são testadas em paralelo com sockets não bloqueantes e um
+único `select` (selectors: epoll no Linux, select no Windows), e a sonda retorna assim
+que a evidência coletada basta (predicado `until`). Um host com firewall custa um
+timeout, não um por porta.
+
+A mesma semântica existe em asyncio (probe_ports_async) para o motor de descoberta.
+
+Estados: OPEN (conexão aceita), CLOSED (RST: host vivo, porta fechada) e FILTERED
+(timeout/inalcançável). Portas sem estado no resultado não chegaram a ser decididas
+porque a sonda retornou antes.
+
+As portas por classe de dispositivo ficam em settings['port_probe']['profiles'].
+"""
+import copy
+import time
+import errno
+import socket
+import asyncio
+import logging
+import selectors
+
+logger = logging.getLogger('NetAudit.Ports')
+
+OPEN = 'open'
+CLOSED = 'closed'
+FILTERED = 'filtered'
+
+# Classes em ordem de prioridade na identificação (identify_type) + prova de vida
+DEFAULT_PROFILES = {
+    'printer': [9100, 515],
+    'camera': [554],
+    'ssh': [22],
+    'web': [80, 443],
+    'liveness': [9100, 80, 443, 445, 139, 135, 22, 3389],
+}
+DEFAULT_CONFIG = {
+    'timeout': 0.5,     # uma espera para o conjunto inteiro (s)
+    'profiles': DEFAULT_PROFILES,
+}
+
+# connect_ex não bloqueante: conexão em andamento (WSAEWOULDBLOCK = 10035 no Windows)
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035}
+_REFUSED = {errno.ECONNREFUSED, 10061}
+
+
+def load_port_config():
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    try:
+        from utils import load_general_settings
+        custom = load_general_settings().get('port_probe') or {}
+        config['profiles'].update(custom.get('profiles') or {})
+        config.update({k: v for k, v in custom.items() if k != 'profiles'})
+    except Exception as e:
+        logger.debug(f"Usando portas padrão: {e}")
+    return config
+
+
+def _state(err):
+    if err == 0:
+        return OPEN
+    return CLOSED if err in _REFUSED else FILTERED
+
+
+def any_open(results):
+    return OPEN in results.values()
+
+
+def any_answer(results):
+    """Prova de vida: conexão aceita ou RST"""
+    return any(state != FILTERED for state in results.values())
+
+
+def first_match(classes):
+    """
+    Predicado para classes em ordem de prioridade (listas de portas): decide quando a classe
+    mais prioritária ainda em aberto tem uma porta aberta, ou quando todas foram descartadas.
+    """
+    def until(results):
+        for ports in classes:
+            states = [results.get(p) for p in ports]
+            if OPEN in states:
+                return True
+            if None in states:
+                return False
+        return True
+    return until
+
+
+def probe_ports(ip, ports, timeout, until=None):
+    """
+    Conecta em todas as portas ao mesmo tempo.
+
+    Args:
+        ip: Endereço do host
+        ports: Portas TCP (duplicadas são ignoradas)
+        timeout: Espera máxima pelo conjunto inteiro (s)
+        until: Predicado sobre o resultado parcial; True encerra a sonda na hora
+
+    Returns:
+        dict: {porta: OPEN|CLOSED|FILTERED} na ordem em que foram decididas
+    """
+    results = {}
+    pending = {}
+    family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+    selector = selectors.DefaultSelector()
+    try:
+        for port in dict.fromkeys(ports):
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            try:
+                err = sock.connect_ex((ip, port))
+            except OSError as e:
+                err = e.errno
+            if err in _IN_PROGRESS:
+                selector.register(sock, selectors.EVENT_WRITE, port)
+                pending[sock] = port
+            else:
+                results[port] = _state(err)
+                sock.close()
+
+        deadline = time.monotonic() + timeout
+        while pending and not (until and until(results)):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                for port in pending.values():
+                    results[port] = FILTERED
+                break
+            for key, _ in selector.select(remaining):
+                sock = key.fileobj
+                results[key.data] = _state(sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR))
+                selector.unregister(sock)
+                sock.close()
+                del pending[sock]
+                if until and until(results):
+                    break
+    finally:
+        for sock in pending:
+            sock.close()
+        selector.close()
+    return results
+
+
+async def probe_ports_async(ip, ports, timeout, until=None):
+    """Mesma sonda dentro de um event loop (descoberta); cancela as conexões restantes ao decidir"""
+    async def attempt(port):
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+            writer.close()
+            return port, OPEN
+        except ConnectionRefusedError:
+            return port, CLOSED
+        except (asyncio.TimeoutError, OSError):
+            return port, FILTERED
+
+    results = {}
+    tasks = [asyncio.ensure_future(attempt(p)) for p in dict.fromkeys(ports)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            port, state = await next_done
+            results[port] = state
+            if until and until(results):
+                break
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+    return results
+
+
+class PortProber:
+    """Sondas por classe de dispositivo com as portas e o timeout da configuração"""
+
+    def __init__(self, config=None):
+        """
+        Args:
+            config: Configuração fixa (testes); None = settings['port_probe'] sobre DEFAULT_CONFIG
+        """
+        self._fixed_config = config
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        if config:
+            self.config['profiles'].update(config.get('profiles') or {})
+            self.config.update({k: v for k, v in config.items() if k != 'profiles'})
+        self.stats = {'probes': 0, 'early': 0, 'sockets': 0, 'elapsed': 0.0}
+
+    def reload(self):
+        """Relê as portas das configurações (início de cada scan)"""
+        if self._fixed_config is None:
+            self.config = load_port_config()
+
+    def ports(self, name):
+        return list(self.config['profiles'].get(name) or [])
+
+    def probe(self, ip, ports, until=None, timeout=None):
+        start = time.perf_counter()
+        ports = list(dict.fromkeys(ports))
+        results = probe_ports(ip, ports, self.config['timeout'] if timeout is None else timeout, until)
+        self.stats['probes'] += 1
+        self.stats['sockets'] += len(ports)
+        if len(results) < len(ports):
+            self.stats['early'] += 1
+        self.stats['elapsed'] += time.perf_counter() - start
+        return results
+
+    def match(self, ip, classes, timeout=None):
+        """
+        Primeira classe (em ordem de prioridade) com alguma porta aberta.
+
+        Returns:
+            tuple: (classe ou None, resultados da sonda)
+        """
+        profiles = [self.ports(name) for name in classes]
+        results = self.probe(ip, [p for ports in profiles for p in ports], first_match(profiles), timeout)
+        for name, ports in zip(classes, profiles):
+            if any(results.get(p) == OPEN for p in ports):
+                return name, results
+        return None, results
+
+    def is_alive(self, ip, timeout=None):
+        """Prova de vida por TCP (conexão aceita ou RST em qualquer porta de 'liveness')"""
+        return any_answer(self.probe(ip, self.ports('liveness'), any_answer, timeout))
+
+
+# Instância global
+port_prober = PortProber()
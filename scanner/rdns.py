@@ -0,0 +1,479 @@
+"""
+Sentinel rDNS - Resolução reversa (PTR) concorrente com cache persistente
+
+Substitui o `socket.gethostbyaddr` bloqueante da auditoria, que segura o auditor pelo timeout
+do resolver em hosts sem registro PTR. Os hosts descobertos sem nome entram na resolução
+assim que chegam (prefetch); quando a auditoria pede o nome ele normalmente já está pronto.
+
+    dns      cliente PTR assíncrono (UDP) nos servidores de settings['reverse_dns'],
+             /etc/resolv.conf ou registro do Windows; TTL vem da resposta
+    system   pool de threads com socket.gethostbyaddr (quando não há servidor conhecido);
+             TTL fixo
+
+O cache (rdns_cache.json no diretório de dados) guarda respostas positivas pelo TTL do
+registro e negativas (NXDOMAIN/sem PTR) pelo TTL negativo do SOA (RFC 2308), limitado a
+`max_entries` (LRU). Falhas (timeout, SERVFAIL) ficam em cache por pouco tempo.
+"""
+import os
+import copy
+import json
+import time
+import random
+import socket
+import struct
+import asyncio
+import logging
+import platform
+import ipaddress
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+logger = logging.getLogger('NetAudit.rDNS')
+
+CACHE_FILE = 'rdns_cache.json'
+RESOLV_CONF = '/etc/resolv.conf'
+
+DEFAULT_CONFIG = {
+    'enabled': True,
+    'backend': 'auto',          # 'auto' (dns se houver servidor conhecido), 'dns' ou 'system'
+    'nameservers': [],          # vazio = servidores do sistema; aceita 'ip' ou 'ip:porta'
+    'timeout': 1.0,             # por tentativa (s)
+    'attempts': 2,              # rodadas sobre a lista de servidores
+    'concurrency': 128,         # consultas simultâneas
+    'max_entries': 20000,       # teto do cache (LRU)
+    'min_ttl': 300,             # TTL positivo mínimo (s): PTRs costumam ter TTL curto
+    'max_ttl': 86400,
+    'negative_ttl': 3600,       # sem SOA na resposta / teto do TTL negativo
+    'failure_ttl': 120,         # timeout/SERVFAIL
+    'system_ttl': 3600,         # backend system (sem TTL na resposta)
+}
+
+TYPE_CNAME = 5
+TYPE_SOA = 6
+TYPE_PTR = 12
+RCODE_NOERROR = 0
+RCODE_NXDOMAIN = 3
+
+FOUND = 'found'
+NEGATIVE = 'negative'
+FAILED = 'failed'
+
+
+def load_rdns_config():
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    try:
+        from utils import load_general_settings
+        config.update(load_general_settings().get('reverse_dns') or {})
+    except Exception as e:
+        logger.debug(f"Usando configuração de DNS reverso padrão: {e}")
+    return config
+
+
+# ---------------------------------------------------------------------- protocolo DNS
+
+def reverse_name(ip):
+    """'10.1.2.3' -> '3.2.1.10.in-addr.arpa'"""
+    return ipaddress.ip_address(ip).reverse_pointer
+
+
+def build_query(qid, name, qtype=TYPE_PTR):
+    header = struct.pack('!HHHHHH', qid, 0x0100, 1, 0, 0, 0)  # RD
+    labels = b''.join(bytes([len(p)]) + p.encode('ascii') for p in name.rstrip('.').split('.'))
+    return header + labels + b'\x00' + struct.pack('!HH', qtype, 1)
+
+
+def _read_name(msg, offset):
+    labels = []
+    end = None
+    for _ in range(128):
+        length = msg[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | msg[offset + 1]
+            continue
+        offset += 1
+        if not length:
+            return '.'.join(labels), end if end is not None else offset
+        labels.append(msg[offset:offset + length].decode('ascii', 'replace'))
+        offset += length
+    raise ValueError("nome DNS com ponteiros em laço")
+
+
+def parse_response(msg, qid):
+    """
+    Resposta de uma consulta PTR.
+
+    Returns:
+        tuple: (FOUND, nome, ttl) | (NEGATIVE, None, ttl do SOA ou None) | (FAILED, None, None)
+    """
+    qid_got, flags, qdcount, ancount, nscount, _ = struct.unpack('!HHHHHH', msg[:12])
+    if qid_got != qid or not flags & 0x8000:
+        raise ValueError("resposta DNS não corresponde à consulta")
+    rcode = flags & 0x000F
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = _read_name(msg, offset)
+        offset += 4
+
+    def records(count, offset):
+        out = []
+        for _ in range(count):
+            _, offset = _read_name(msg, offset)
+            rtype, _, ttl, rdlength = struct.unpack('!HHIH', msg[offset:offset + 10])
+            offset += 10
+            out.append((rtype, ttl, offset, rdlength))
+            offset += rdlength
+        return out, offset
+
+    answers, offset = records(ancount, offset)
+    if rcode not in (RCODE_NOERROR, RCODE_NXDOMAIN):
+        return FAILED, None, None
+    # Delegação sem classe (RFC 2317) responde CNAME -> PTR: o TTL efetivo é o menor da cadeia
+    chain_ttl = None
+    for rtype, ttl, start, _ in answers:
+        chain_ttl = ttl if chain_ttl is None else min(chain_ttl, ttl)
+        if rtype == TYPE_PTR:
+            name, _ = _read_name(msg, start)
+            return FOUND, name.rstrip('.'), chain_ttl
+    authority, _ = records(nscount, offset)
+    for rtype, ttl, start, rdlength in authority:
+        if rtype == TYPE_SOA:
+            minimum = struct.unpack('!I', msg[start + rdlength - 4:start + rdlength])[0]
+            return NEGATIVE, None, min(ttl, minimum)
+    return NEGATIVE, None, None
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, qid, future):
+        self.qid = qid
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 12 and struct.unpack('!H', data[:2])[0] == self.qid and not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+# ---------------------------------------------------------------------- servidores
+
+def _parse_server(text):
+    text = str(text).strip()
+    if text.count(':') == 1:
+        host, port = text.split(':')
+        return host, int(port)
+    return text, 53
+
+
+def _resolv_conf_servers(path=RESOLV_CONF):
+    servers = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver' and '%' not in fields[1]:
+                    servers.append(fields[1])
+    except OSError:
+        pass
+    return servers
+
+
+def _windows_servers():
+    servers = []
+    try:
+        import winreg
+        base = r"SYSTEM\CurrentControlSet\Services\Tcpip\Parameters"
+
+        def read(key):
+            for value in ('NameServer', 'DhcpNameServer'):
+                try:
+                    data = winreg.QueryValueEx(key, value)[0]
+                except OSError:
+                    continue
+                for server in data.replace(',', ' ').split():
+                    if server not in servers:
+                        servers.append(server)
+
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, base) as root:
+            read(root)
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, base + r"\Interfaces") as interfaces:
+            for i in range(winreg.QueryInfoKey(interfaces)[0]):
+                with winreg.OpenKey(interfaces, winreg.EnumKey(interfaces, i)) as key:
+                    read(key)
+    except Exception as e:
+        logger.debug(f"Servidores DNS do registro indisponíveis: {e}")
+    return servers
+
+
+def system_nameservers():
+    if platform.system() == 'Windows':
+        return _windows_servers()
+    return _resolv_conf_servers()
+
+
+# ---------------------------------------------------------------------- resolvedor
+
+class ReverseDNS:
+    """Resolução PTR concorrente (event loop próprio) com cache TTL persistente"""
+
+    def __init__(self, config=None, cache_path=None, clock=time.time):
+        """
+        Args:
+            config: Configuração fixa (testes); None = settings['reverse_dns'] sobre DEFAULT_CONFIG
+            cache_path: Cache fixo (testes); None = rdns_cache.json no diretório de dados
+            clock: Relógio de parede (validade das entradas persistidas)
+        """
+        self._fixed_config = config
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.config.update(config or {})
+        self._cache_path = cache_path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._cache = None            # OrderedDict ip -> [nome ou None, expira_em]
+        self._cache_dirty = False
+        self._inflight = {}
+        self._servers = None
+        self._loop = None
+        self._sem = None
+        self._pool = None
+        self.stats = {'queries': 0, 'cache_hits': 0, 'found': 0, 'negative': 0, 'failed': 0,
+                      'waited': 0, 'wait_ms': 0.0}
+
+    def reload(self):
+        """Relê configuração e servidores (início de cada scan)"""
+        if self._fixed_config is None:
+            self.config = load_rdns_config()
+        self._servers = None
+
+    @property
+    def cache_path(self):
+        if self._cache_path:
+            return self._cache_path
+        from utils import get_data_dir
+        return os.path.join(get_data_dir(), CACHE_FILE)
+
+    def nameservers(self):
+        if self._servers is None:
+            configured = self.config.get('nameservers') or []
+            self._servers = [_parse_server(s) for s in (configured or system_nameservers())]
+        return self._servers
+
+    @property
+    def backend(self):
+        backend = self.config.get('backend', 'auto')
+        if backend == 'auto':
+            return 'dns' if self.nameservers() else 'system'
+        return backend
+
+    # ------------------------------------------------------------------ cache
+
+    def _load_cache(self):
+        if self._cache is not None:
+            return
+        self._cache = OrderedDict()
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = self.clock()
+            # Mais antigas primeiro: a ordem do LRU segue a expiração
+            for ip, (name, expires) in sorted(data.items(), key=lambda kv: kv[1][1]):
+                if expires > now:
+                    self._cache[ip] = [name, expires]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Cache de DNS reverso ilegível, recriando: {e}")
+            self._cache = OrderedDict()
+
+    def cached(self, ip):
+        """(True, nome ou None) se há resposta válida em cache; (False, None) caso contrário"""
+        with self._lock:
+            self._load_cache()
+            entry = self._cache.get(ip)
+            if entry is None:
+                return False, None
+            if entry[1] <= self.clock():
+                del self._cache[ip]
+                self._cache_dirty = True
+                return False, None
+            self._cache.move_to_end(ip)
+            return True, entry[0]
+
+    def _store(self, ip, status, name, ttl):
+        cfg = self.config
+        if status == FOUND:
+            ttl = min(max(ttl or 0, cfg['min_ttl']), cfg['max_ttl'])
+        elif status == NEGATIVE:
+            ttl = min(ttl if ttl is not None else cfg['negative_ttl'], cfg['negative_ttl'])
+        else:
+            ttl = cfg['failure_ttl']
+        with self._lock:
+            self._load_cache()
+            self._cache[ip] = [name, self.clock() + ttl]
+            self._cache.move_to_end(ip)
+            while len(self._cache) > cfg['max_entries']:
+                self._cache.popitem(last=False)
+            self._cache_dirty = True
+            self.stats[status] += 1
+
+    def save_cache(self):
+        """Grava o cache se mudou (fim do scan); escrita atômica, só entradas válidas"""
+        with self._lock:
+            if not self._cache_dirty or self._cache is None:
+                return False
+            now = self.clock()
+            data = {ip: entry for ip, entry in self._cache.items() if entry[1] > now}
+            self._cache_dirty = False
+        try:
+            directory = os.path.dirname(os.path.abspath(self.cache_path))
+            fd, tmp = tempfile.mkstemp(prefix='rdns_', suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.cache_path)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao salvar cache de DNS reverso: {e}")
+            with self._lock:
+                self._cache_dirty = True
+            return False
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache = OrderedDict()
+            self._cache_dirty = True
+
+    # ------------------------------------------------------------------ event loop
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True, name="SentinelRDNS").start()
+                self._sem = asyncio.Semaphore(self.config['concurrency'])
+                self._pool = ThreadPoolExecutor(max_workers=min(32, self.config['concurrency']),
+                                                thread_name_prefix="rdns")
+                self._loop = loop
+            return self._loop
+
+    async def _udp_query(self, server, query, qid, timeout):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        family = socket.AF_INET6 if ':' in server[0] else socket.AF_INET
+        transport, _ = await loop.create_datagram_endpoint(lambda: _QueryProtocol(qid, future),
+                                                           remote_addr=server, family=family)
+        try:
+            transport.sendto(query)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            transport.close()
+
+    async def _query_dns(self, ip):
+        name = reverse_name(ip)
+        for _ in range(max(1, self.config['attempts'])):
+            for server in self.nameservers():
+                qid = random.getrandbits(16)
+                try:
+                    msg = await self._udp_query(server, build_query(qid, name), qid, self.config['timeout'])
+                    status, host, ttl = parse_response(msg, qid)
+                except (asyncio.TimeoutError, OSError, ValueError, struct.error, IndexError):
+                    continue
+                if status != FAILED:
+                    return status, host, ttl
+        return FAILED, None, None
+
+    async def _query_system(self, ip):
+        loop = asyncio.get_running_loop()
+        try:
+            host = (await loop.run_in_executor(self._pool, socket.gethostbyaddr, ip))[0]
+            return FOUND, host, self.config['system_ttl']
+        except (socket.herror, socket.gaierror):
+            return NEGATIVE, None, None
+        except OSError:
+            return FAILED, None, None
+
+    async def _resolve(self, ip):
+        async with self._sem:
+            self.stats['queries'] += 1
+            if self.backend == 'dns':
+                status, name, ttl = await self._query_dns(ip)
+            else:
+                status, name, ttl = await self._query_system(ip)
+        self._store(ip, status, name, ttl)
+        return name
+
+    # ------------------------------------------------------------------ API
+
+    def prefetch(self, ip):
+        """Dispara a resolução em segundo plano (sem bloquear); devolve o future ou None"""
+        if not ip or not self.config.get('enabled', True):
+            return None
+        hit, _ = self.cached(ip)
+        if hit:
+            return None
+        loop = self._ensure_loop()
+        with self._lock:
+            future = self._inflight.get(ip)
+            if future is None:
+                future = asyncio.run_coroutine_threadsafe(self._resolve(ip), loop)
+                self._inflight[ip] = future
+                future.add_done_callback(lambda _f, ip=ip: self._inflight.pop(ip, None))
+        return future
+
+    def _wait_limit(self):
+        cfg = self.config
+        return cfg['timeout'] * max(1, cfg['attempts']) * max(1, len(self.nameservers())) + 0.5
+
+    def resolve(self, ip, timeout=None):
+        """
+        Nome do host (None se não há PTR ou a resolução não terminou a tempo).
+        Consulta em andamento (prefetch) é aproveitada; nunca abre duas para o mesmo IP.
+        """
+        if not ip or not self.config.get('enabled', True):
+            return None
+        hit, name = self.cached(ip)
+        if hit:
+            self.stats['cache_hits'] += 1
+            return name
+        future = self.prefetch(ip)
+        if future is None:
+            return self.cached(ip)[1]
+        start = time.perf_counter()
+        try:
+            return future.result(self._wait_limit() if timeout is None else timeout)
+        except FutureTimeout:
+            return None
+        except Exception as e:
+            logger.debug(f"rDNS {ip} falhou: {e}")
+            return None
+        finally:
+            self.stats['waited'] += 1
+            self.stats['wait_ms'] += (time.perf_counter() - start) * 1000
+
+    def resolve_many(self, ips, timeout=None):
+        """Resolve um conjunto inteiro em paralelo -> {ip: nome ou None}"""
+        ips = list(dict.fromkeys(ip for ip in ips if ip))
+        for ip in ips:
+            self.prefetch(ip)
+        return {ip: self.resolve(ip, timeout) for ip in ips}
+
+    def info(self):
+        with self._lock:
+            self._load_cache()
+            now = self.clock()
+            valid = [entry for entry in self._cache.values() if entry[1] > now]
+        return {
+            'backend': self.backend,
+            'nameservers': [f"{h}:{p}" for h, p in self.nameservers()],
+            'cached': len(valid),
+            'cached_negative': sum(1 for entry in valid if entry[0] is None),
+            'stats': dict(self.stats),
+        }
+
+
+# Instância global
+reverse_dns = ReverseDNS()
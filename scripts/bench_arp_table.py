@@ -0,0 +1,195 @@
+"""
+Benchmark da resolução de MAC no scan: `arp -a <ip>` por host (antigo) x snapshot da tabela ARP.
+
+Simula uma /22 (1022 hosts) com a tabela de vizinhos em um arquivo no formato de /proc/net/arp
+(e na saída de `arp -a` do Windows para a leitura por processo único) e mede o custo por host:
+
+  antigo    um processo `arp -a <ip>` + regex por host auditado (medido em --sample hosts)
+  /proc     uma leitura de arquivo + dict (Linux)
+  arp -a    um processo para a tabela inteira + dict (Windows/outros)
+
+Também confere os parsers (Windows pt-BR, `arp -an`, Get-NetNeighbor, flags do /proc), a
+releitura incremental e o compartilhamento da releitura entre threads.
+
+Uso: python scripts/bench_arp_table.py [--subnet 10.30.0.0/22] [--sample 100]
+"""
+import sys
+import os
+import re
+import time
+import random
+import argparse
+import ipaddress
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.arp_table import ArpTable, parse_arp_output, parse_proc_arp
+
+RNG = random.Random(7)
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def legacy_get_mac_address(ip):
+    """Implementação antiga de DeviceIntelligence.get_mac_address (um processo por host)"""
+    try:
+        pid = subprocess.Popen(["arp", "-a", ip], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, _ = pid.communicate(timeout=3)
+        output = output.decode('latin-1')
+        mac_regex = re.search(r"(([a-fA-F0-9]{2}[:-]){5}[a-fA-F0-9]{2})", output)
+        if mac_regex:
+            return mac_regex.group(1).replace('-', ':').upper()
+    except Exception:
+        pass
+    return None
+
+
+def random_mac():
+    return ":".join(f"{b:02X}" for b in [RNG.randrange(256) & 0xFC] + [RNG.randrange(256) for _ in range(5)])
+
+
+def write_proc(path, table, incomplete=()):
+    lines = ["IP address       HW type     Flags       HW address            Mask     Device"]
+    for ip, mac in table.items():
+        lines.append(f"{ip:<16} 0x1         0x2         {mac.lower()}     *        eth0")
+    for ip in incomplete:
+        lines.append(f"{ip:<16} 0x1         0x0         00:00:00:00:00:00     *        eth0")
+    with open(path, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def write_windows_arp(path, table):
+    lines = ["", "Interface: 10.30.0.10 --- 0x5", "  Endereço IP           Endereço físico       Tipo"]
+    for ip, mac in table.items():
+        lines.append(f"  {ip:<21} {mac.replace(':', '-').lower()}     dinâmico")
+    lines.append("  10.30.3.255           ff-ff-ff-ff-ff-ff     estático")
+    lines.append("  224.0.0.22            01-00-5e-00-00-16     estático")
+    with open(path, 'w', encoding='latin-1') as f:
+        f.write("\r\n".join(lines) + "\r\n")
+
+
+def parser_checks():
+    results = []
+    print("Parsers:")
+    windows = ("Interface: 192.168.0.10 --- 0x5\r\n  Endereço IP           Endereço físico       Tipo\r\n"
+               "  192.168.0.1           a4-2b-b0-11-22-33     dinâmico\r\n"
+               "  192.168.0.77          00-00-00-00-00-00     inválido\r\n"
+               "  192.168.0.255         ff-ff-ff-ff-ff-ff     estático\r\n"
+               "  224.0.0.251           01-00-5e-00-00-fb     estático\r\n")
+    results.append(check("arp -a (Windows pt-BR): só entradas válidas",
+                         parse_arp_output(windows) == {'192.168.0.1': 'A4:2B:B0:11:22:33'}))
+    unix = ("? (10.0.0.1) at 0:1b:21:a:b:c [ether] on eth0\n"
+            "gw.local (10.0.0.254) at 00:1b:21:aa:bb:cc on en0 ifscope [ethernet]\n"
+            "? (10.0.0.9) at <incomplete> on eth0\n")
+    results.append(check("arp -an / BSD: octetos sem zero à esquerda normalizados, incompletas fora",
+                         parse_arp_output(unix) == {'10.0.0.1': '00:1B:21:0A:0B:0C', '10.0.0.254': '00:1B:21:AA:BB:CC'}))
+    neighbor = "192.168.0.1 A4-2B-B0-11-22-33\r\n192.168.0.5 \r\n"
+    results.append(check("Get-NetNeighbor", parse_arp_output(neighbor) == {'192.168.0.1': 'A4:2B:B0:11:22:33'}))
+    proc = ("IP address       HW type     Flags       HW address            Mask     Device\n"
+            "192.0.2.1        0x1         0x2         02:fc:00:00:00:05     *        eth0\n"
+            "192.0.2.9        0x1         0x0         00:00:00:00:00:00     *        eth0\n")
+    results.append(check("/proc/net/arp: flag ATF_COM", parse_proc_arp(proc) == {'192.0.2.1': '02:FC:00:00:00:05'}))
+    return results
+
+
+def benchmark(subnet, sample, workdir):
+    results = []
+    net = ipaddress.ip_network(subnet)
+    hosts = [str(h) for h in net.hosts()]
+    table = {ip: random_mac() for ip in hosts if RNG.random() < 0.9}   # 90% respondem
+    absent = [ip for ip in hosts if ip not in table]
+    proc_path = os.path.join(workdir, 'arp')
+    write_proc(proc_path, table, incomplete=absent[:20])
+    win_path = os.path.join(workdir, 'arp_windows.txt')
+    write_windows_arp(win_path, table)
+    print(f"\n/{net.prefixlen}: {len(hosts)} hosts, {len(table)} na tabela de vizinhos")
+
+    # Antigo: um processo por host (amostra, extrapolado para a sub-rede)
+    subset = RNG.sample(hosts, min(sample, len(hosts)))
+    start = time.perf_counter()
+    for ip in subset:
+        legacy_get_mac_address(ip)
+    legacy = (time.perf_counter() - start) / len(subset)
+
+    proc_table = ArpTable(source='proc')
+    proc_table.proc_path = proc_path
+    proc_table.local_networks = [net]
+    start = time.perf_counter()
+    proc_table.snapshot()
+    found = [proc_table.get(ip) for ip in hosts if ip in table]
+    proc_cost = (time.perf_counter() - start) / len(hosts)
+
+    spawn_table = ArpTable(source='arp')
+    spawn_table.local_networks = [net]
+    spawn_table._read_system = lambda: parse_arp_output(spawn_table._run(["cat", win_path]))
+    start = time.perf_counter()
+    spawn_table.snapshot()
+    spawned = [spawn_table.get(ip) for ip in hosts if ip in table]
+    spawn_cost = (time.perf_counter() - start) / len(hosts)
+
+    print(f"\n{'método':<28}{'por host':>12}{'/' + str(net.prefixlen) + ' inteira':>16}{'processos':>12}")
+    print(f"  {'arp -a <ip> (antigo)':<26}{legacy * 1e3:>10.2f}ms{legacy * len(hosts):>14.2f}s{len(hosts):>12}")
+    print(f"  {'/proc/net/arp (snapshot)':<26}{proc_cost * 1e6:>10.2f}us{proc_cost * len(hosts) * 1e3:>13.2f}ms"
+          f"{proc_table.stats['spawns']:>12}")
+    print(f"  {'arp -a único (snapshot)':<26}{spawn_cost * 1e6:>10.2f}us{spawn_cost * len(hosts) * 1e3:>13.2f}ms"
+          f"{spawn_table.stats['spawns']:>12}")
+    print()
+    results.append(check(f"Snapshot resolve todos os {len(table)} MACs com {proc_table.stats['reads']} leitura "
+                         f"e 0 processos", found == [table[ip] for ip in hosts if ip in table]
+                         and proc_table.stats['reads'] == 1 and proc_table.stats['spawns'] == 0))
+    results.append(check(f"Windows: 1 processo para a tabela inteira ({len(spawned)} MACs)",
+                         spawn_table.stats['spawns'] == 1 and all(spawned)))
+    results.append(check(f"Por host: {legacy / proc_cost:.0f}x mais barato que o arp -a por IP", proc_cost * 10 < legacy))
+    return results, net, table, absent, proc_path
+
+
+def incremental_checks(net, table, absent, proc_path):
+    results = []
+    print("\nReleitura incremental:")
+    arp = ArpTable(source='proc', refresh_seconds=0.2)
+    arp.proc_path = proc_path
+    arp.local_networks = [net]
+    arp.snapshot()
+
+    # Hosts que responderam depois do snapshot (descoberta em streaming)
+    late = {ip: random_mac() for ip in absent[:30]}
+    write_proc(proc_path, {**table, **late})
+    reads = arp.stats['reads']
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        answers = list(pool.map(arp.get, late))
+    results.append(check(f"30 hosts novos consultados por 8 threads: {arp.stats['reads'] - reads} releitura(s)",
+                         answers == list(late.values()) and arp.stats['reads'] - reads == 1))
+
+    start = time.time()
+    missing = arp.get(absent[-1])
+    waited = time.time() - start
+    results.append(check(f"Host sem entrada: uma releitura após a janela ({waited * 1000:.0f}ms), depois None",
+                         missing is None and waited < 0.5))
+
+    reads = arp.stats['reads']
+    start = time.perf_counter()
+    routed = [arp.get(f"172.16.{i}.1") for i in range(200)]
+    results.append(check(f"IPs roteados (fora do segmento): None em {(time.perf_counter() - start) * 1e3:.1f}ms "
+                         f"sem releitura", not any(routed) and arp.stats['reads'] == reads))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da resolução de MAC (tabela ARP)")
+    parser.add_argument('--subnet', default='10.30.0.0/22')
+    parser.add_argument('--sample', type=int, default=100, help="hosts medidos no método antigo")
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp(prefix='netaudit_arp_')
+    results = parser_checks()
+    more, net, table, absent, proc_path = benchmark(args.subnet, args.sample, workdir)
+    results += more
+    results += incremental_checks(net, table, absent, proc_path)
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,145 @@
+"""
+Benchmark do histórico de métricas com tiers de rollup.
+
+Gera uma base sintética em diretório temporário com N dispositivos:
+  - raw (1 amostra/min) para --raw-days
+  - tier 5m para 30 dias, tier 1h para 90 dias (volume que a retenção padrão mantém)
+e mede a latência de /api/metrics/history (query_history) para janelas de 24h, 7, 30 e 90 dias,
+comparando com a consulta antiga (strftime GROUP BY sobre a tabela raw).
+
+Uso: python scripts/bench_metrics_history.py [--devices 500] [--raw-days 1]
+"""
+import sys
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+# Base isolada: nunca toca no netaudit.db real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_bench_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import init_db, DB_PATH
+from metrics_rollup import metrics_rollup, _floor, _fmt
+
+METRIC_TYPES = ['cpu_usage', 'ram_usage', 'disk_usage']
+
+LEGACY_SQL = """
+    SELECT strftime('%Y-%m-%d %H:00', timestamp) as hour_bucket, metric_type, AVG(value)
+    FROM metrics
+    WHERE timestamp >= ?
+      AND (metric_type = 'cpu_usage' OR metric_type = 'ram_usage' OR metric_type LIKE 'disk_usage%')
+    GROUP BY hour_bucket, metric_type
+"""
+
+
+def _tier_rows(devices, start, end, step):
+    t = start
+    while t < end:
+        b = _fmt(t)
+        # device 0 = série agregada da frota (FLEET_DEVICE_ID), mantida pelo próprio rollup
+        for dev in range(0, devices + 1):
+            for mt in METRIC_TYPES:
+                v = random.uniform(5, 95)
+                yield (dev, mt, b, v * 0.8, min(100.0, v * 1.2), v, step // 60)
+        t += timedelta(seconds=step)
+
+
+def _raw_rows(devices, start, end):
+    t = start
+    while t < end:
+        ts = t.strftime('%Y-%m-%d %H:%M:%S.%f')
+        for dev in range(1, devices + 1):
+            for mt in METRIC_TYPES:
+                yield (dev, mt, random.uniform(5, 95), '%', ts)
+        t += timedelta(seconds=60)
+
+
+def build_dataset(devices, raw_days, now):
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany("INSERT INTO devices (id, ip) VALUES (?, ?)",
+                     [(i, f"10.{i // 65536}.{(i // 256) % 256}.{i % 256}") for i in range(1, devices + 1)])
+
+    # Cada tier cobre a própria retenção; os mais finos ficam com a parte recente
+    raw_start = _floor(now - timedelta(days=raw_days), 3600)
+    five_end = _floor(now - timedelta(seconds=600), 300)
+    hour_end = _floor(five_end, 3600)
+    plan = [
+        ('metrics_1h', _tier_rows(devices, _floor(now - timedelta(days=90), 3600), hour_end, 3600)),
+        ('metrics_5m', _tier_rows(devices, _floor(now - timedelta(days=30), 300), five_end, 300)),
+    ]
+    for table, rows in plan:
+        t0 = time.time()
+        cur = conn.executemany(
+            f"INSERT INTO {table} (device_id, metric_type, bucket, min_value, max_value, avg_value, count) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+        print(f"  {table}: {cur.rowcount} linhas em {time.time() - t0:.1f}s")
+
+    t0 = time.time()
+    cur = conn.executemany("INSERT INTO metrics (device_id, metric_type, value, unit, timestamp) VALUES (?, ?, ?, ?, ?)",
+                           _raw_rows(devices, raw_start, now))
+    conn.commit()
+    print(f"  metrics (raw, {raw_days}d): {cur.rowcount} linhas em {time.time() - t0:.1f}s")
+    conn.close()
+
+
+def timed(fn, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - t0) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmark(devices, raw_days):
+    init_db()
+    now = datetime.now()
+    print(f"Gerando base sintética: {devices} dispositivos x {len(METRIC_TYPES)} métricas em {DB_PATH}")
+    build_dataset(devices, raw_days, now)
+
+    print("\nRollup incremental + retenção (um ciclo do job):")
+    ms, _ = timed(lambda: metrics_rollup.run(), repeat=1)
+    print(f"  {ms:.0f}ms  rolled={metrics_rollup.stats['rolled']} purged={metrics_rollup.stats['purged']}")
+
+    print("\nHistórico fleet-wide (step 1h, melhor de 3):")
+    for label, hours in (('24h', 24), ('7d', 24 * 7), ('30d', 24 * 30), ('90d', 24 * 90)):
+        since = datetime.now() - timedelta(hours=hours)
+        tier = metrics_rollup.pick_tier(since, 3600)
+        ms, res = timed(lambda: metrics_rollup.query_history(
+            since, step=3600, metric_types=('cpu_usage', 'ram_usage', 'disk_usage')))
+        print(f"  {label:>4}: {ms:8.1f}ms  tier={tier:<3}  pontos={len(res)}")
+
+    print("\nHistórico de um dispositivo (step 1h):")
+    for label, hours in (('30d', 24 * 30), ('90d', 24 * 90)):
+        since = datetime.now() - timedelta(hours=hours)
+        ms, res = timed(lambda: metrics_rollup.query_history(
+            since, step=3600, metric_types=('cpu_usage', 'ram_usage', 'disk_usage'), device_id=1))
+        print(f"  {label:>4}: {ms:8.1f}ms  pontos={len(res)}")
+
+    # Consulta antiga: custo linear no volume raw da janela
+    conn = sqlite3.connect(DB_PATH)
+    since = (datetime.now() - timedelta(days=raw_days)).strftime('%Y-%m-%d %H:%M:%S')
+    ms, _ = timed(lambda: conn.execute(LEGACY_SQL, (since,)).fetchall())
+    conn.close()
+    per_day = ms / raw_days
+    print(f"\nConsulta antiga (raw, {raw_days}d): {ms:.1f}ms -> estimativa 30d: {per_day * 30 / 1000:.1f}s, "
+          f"90d: {per_day * 90 / 1000:.1f}s (sem retenção, o raw cresceria indefinidamente)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de histórico de métricas por tier")
+    parser.add_argument('--devices', type=int, default=500)
+    parser.add_argument('--raw-days', type=int, default=1)
+    args = parser.parse_args()
+    run_benchmark(args.devices, args.raw_days)
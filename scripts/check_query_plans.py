@@ -0,0 +1,121 @@
+"""
+Checagem de regressão dos planos de consulta (EXPLAIN QUERY PLAN) dos hot paths de monitoramento.
+
+Cria uma base temporária com o schema atual, aplica a migração de índices e falha (exit 1)
+se alguma consulta sobre as tabelas de métricas cair em varredura completa (SCAN).
+Roda duas vezes: sem estatísticas e após ANALYZE, já que o planner pode mudar de ideia.
+
+Uso: python scripts/check_query_plans.py
+"""
+import sys
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+# Base isolada: nunca toca no netaudit.db real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_plans_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.dialects import sqlite
+
+from database import init_db, engine, get_session
+from migrate_metrics_indexes import migrate_metrics_indexes
+from migrate_metric_latest import migrate_metric_latest
+from models import Device
+from metrics_ingest import MetricIngestBuffer
+from metrics_rollup import metrics_rollup
+from api_metrics import device_metrics_query, device_latest_query, device_interfaces_query
+from blueprints.monitoring import top_assets_query
+
+METRIC_TABLES = ('metrics', 'metrics_5m', 'metrics_1h', 'device_metric_latest', 'interface_metrics')
+TYPE_FILTER = "metric_type IN ('cpu_usage', 'ram_usage', 'disk_usage')"
+
+
+def _compile(query):
+    return str(query.statement.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+def hot_path_queries(session):
+    """(nome, SQL, parâmetros) das consultas que precisam de índice"""
+    window = {'start': '2000-01-01 00:00:00', 'end': '2100-01-01 00:00:00', 'device_id': 1}
+    queries = []
+    for metric_type in ('cpu_usage', 'disk_usage', 'latency'):
+        queries.append((f"overview: top assets ({metric_type})", _compile(top_assets_query(session, metric_type)), {}))
+    queries.append(("device latest values", _compile(device_latest_query(session, 1)), {}))
+    queries.append(("device history (type)", _compile(device_metrics_query(session, 1, 'cpu_usage')), {}))
+    queries.append(("device history (all)", _compile(device_metrics_query(session, 1)), {}))
+    since = datetime(2000, 1, 1)
+    queries.append(("device interfaces", _compile(device_interfaces_query(session, 1, since)), {}))
+    queries.append(("device interface (one)", _compile(device_interfaces_query(session, 1, since, 3)), {}))
+    for tier in ('raw', '5m', '1h'):
+        queries.append((f"history fleet ({tier})", metrics_rollup.history_sql(tier, 3600, TYPE_FILTER), window))
+        queries.append((f"history device ({tier})", metrics_rollup.history_sql(tier, 3600, TYPE_FILTER, 1), window))
+    return queries
+
+
+def full_scans(conn, sql, params):
+    """Linhas do plano que varrem uma tabela de métricas por completo"""
+    plan = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).fetchall()
+    details = [row[-1] for row in plan]
+    bad = [d for d in details if d.startswith('SCAN') and any(f" {t} " in f" {d} " or d.endswith(f" {t}") for t in METRIC_TABLES)]
+    return bad, details
+
+
+def seed(devices=20, samples=60):
+    session = get_session()
+    try:
+        for i in range(1, devices + 1):
+            session.add(Device(id=i, ip=f"10.0.0.{i}", hostname=f"host{i}"))
+        session.commit()
+    finally:
+        session.close()
+
+    buffer = MetricIngestBuffer()
+    base = datetime.now() - timedelta(minutes=samples)
+    for m in range(samples):
+        ts = base + timedelta(minutes=m)
+        for dev in range(1, devices + 1):
+            buffer.add(dev, 'cpu_usage', random.uniform(0, 100), '%', ts)
+            buffer.add(dev, 'ram_usage', random.uniform(0, 100), '%', ts)
+            buffer.add(dev, 'latency', random.uniform(0, 50), 'ms', ts)
+            for drive in ('C:', 'D:'):
+                buffer.add(dev, 'disk_usage', random.uniform(0, 100), '%', ts, drive=drive)
+    buffer.flush()
+    metrics_rollup.run()
+
+
+def check_plans(label):
+    session = get_session()
+    failures = 0
+    try:
+        with engine.connect() as conn:
+            for name, sql, params in hot_path_queries(session):
+                bad, details = full_scans(conn, sql, params)
+                status = "FALHA" if bad else "ok"
+                print(f"  [{status:>5}] {name}: {' | '.join(details)}")
+                failures += bool(bad)
+    finally:
+        session.close()
+    print(f"{label}: {failures} consulta(s) com varredura completa\n")
+    return failures
+
+
+def run_check():
+    init_db()
+    migrate_metrics_indexes()
+    migrate_metric_latest()
+    seed()
+
+    failures = check_plans("Sem estatísticas")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    failures += check_plans("Após ANALYZE")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if run_check() else 0)
@@ -0,0 +1,131 @@
+"""
+Backend WMI falso para testes em Linux (implementa wmi_helper.WmiTransport).
+
+Cada host é um dicionário {classe: [linhas]} e as consultas são avaliadas por um
+subconjunto de WQL: SELECT <props|*> FROM <classe> [WHERE <prop> <op> <valor>].
+Conta conexões, consultas e linhas devolvidas e simula latência, hosts fora do ar
+e sessões derrubadas (reboot/RPC) para exercitar o pool.
+"""
+import re
+import sys
+import os
+import time
+import random
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wmi_helper import WmiTransport, WmiSession, wql_properties
+
+_WQL_RE = re.compile(r"^\s*SELECT\s+(.+?)\s+FROM\s+(\w+)(?:\s+WHERE\s+(\w+)\s*(=|>|<|>=|<=|<>)\s*'?([^']*?)'?\s*)?$",
+                     re.IGNORECASE)
+
+_OPS = {
+    '=': lambda a, b: a == b,
+    '<>': lambda a, b: a != b,
+    '>': lambda a, b: a > b,
+    '<': lambda a, b: a < b,
+    '>=': lambda a, b: a >= b,
+    '<=': lambda a, b: a <= b,
+}
+
+
+def _coerce(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class FakeWmiError(Exception):
+    """Equivalente ao x_wmi / com_error do pacote wmi"""
+
+
+class FakeWmiSession(WmiSession):
+    def __init__(self, transport, host):
+        self.transport = transport
+        self.host = host
+        self.generation = transport.generation.get(host, 0)
+        self.closed = False
+
+    def query(self, wql):
+        t = self.transport
+        if self.closed or t.generation.get(self.host, 0) != self.generation:
+            raise FakeWmiError(f"The RPC server is unavailable ({self.host})")
+        match = _WQL_RE.match(wql)
+        if not match:
+            raise FakeWmiError(f"Invalid query: {wql}")
+        _, cls, prop, op, value = match.groups()
+        time.sleep(t.query_latency)
+        rows = t.hosts[self.host].get(cls, [])
+        if prop:
+            rows = [r for r in rows if _OPS[op](_coerce(r.get(prop)), _coerce(value))]
+        props = wql_properties(wql)
+        if props != ['*']:
+            rows = [{p: r.get(p) for p in props} for r in rows]
+        with t.lock:
+            t.stats['queries'] += 1
+            t.stats['rows'] += len(rows)
+            t.stats['by_class'][cls] = t.stats['by_class'].get(cls, 0) + 1
+        return [dict(r) for r in rows]
+
+    def close(self):
+        self.closed = True
+        with self.transport.lock:
+            self.transport.stats['closed'] += 1
+
+
+class FakeWmiTransport(WmiTransport):
+    def __init__(self, hosts, connect_latency=0.0, query_latency=0.0, down=()):
+        """
+        Args:
+            hosts: {host: {classe: [linhas]}}
+            connect_latency: Tempo de cada conexão DCOM simulada (s)
+            query_latency: Tempo de cada consulta (s)
+            down: Hosts que recusam conexão
+        """
+        self.hosts = hosts
+        self.connect_latency = connect_latency
+        self.query_latency = query_latency
+        self.down = set(down)
+        self.generation = {}
+        self.lock = threading.Lock()
+        self.stats = {'connects': 0, 'closed': 0, 'queries': 0, 'rows': 0, 'by_class': {}}
+
+    def connect(self, host, user=None, password=None):
+        time.sleep(self.connect_latency)
+        if host in self.down or host not in self.hosts:
+            raise FakeWmiError(f"The RPC server is unavailable ({host})")
+        with self.lock:
+            self.stats['connects'] += 1
+        return FakeWmiSession(self, host)
+
+    def drop_sessions(self, host):
+        """Invalida as sessões abertas com o host (reboot, queda de RPC)"""
+        self.generation[host] = self.generation.get(host, 0) + 1
+
+
+def windows_host(rng, processes=300, disks=2, cpus=2, caption='Microsoft Windows 10 Pro'):
+    """Host Windows sintético com as classes usadas pelo wmi_helper"""
+    total_kb = rng.choice([8, 16, 32]) * 1024 * 1024
+    return {
+        'Win32_Processor': [{'DeviceID': f'CPU{i}', 'LoadPercentage': rng.randint(0, 100), 'Name': 'Xeon'}
+                            for i in range(cpus)],
+        'Win32_OperatingSystem': [{
+            'Caption': caption,
+            'BuildNumber': '19045',
+            'ServicePackMajorVersion': 0,
+            'TotalVisibleMemorySize': str(total_kb),
+            'FreePhysicalMemory': str(int(total_kb * rng.uniform(0.1, 0.9))),
+            'LastBootUpTime': '20260101080000.500000-180',
+            'Version': '10.0.19045',
+        }],
+        'Win32_LogicalDisk': (
+            [{'DeviceID': f'{chr(67 + i)}:', 'DriveType': 3, 'Size': str(500 * 1024**3),
+              'FreeSpace': str(int(500 * 1024**3 * rng.uniform(0.05, 0.9)))} for i in range(disks)]
+            + [{'DeviceID': 'Z:', 'DriveType': 4, 'Size': str(2 * 1024**4), 'FreeSpace': str(1024**4)}]
+        ),
+        'Win32_Process': [{'Name': f'proc{i}.exe', 'ProcessId': 1000 + i, 'CommandLine': 'x' * 200,
+                           'WorkingSetSize': str(int(rng.paretovariate(1.2) * 4 * 1024 * 1024))}
+                          for i in range(processes)],
+    }
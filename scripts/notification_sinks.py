@@ -0,0 +1,152 @@
+"""
+Destinos locais para testar o notification_dispatcher sem servidores externos.
+
+  SmtpSink      - servidor SMTP mínimo (EHLO/MAIL/RCPT/DATA) que guarda as mensagens recebidas
+  HttpReceiver  - receptor HTTP de webhooks que guarda os JSON recebidos e pode falhar as N
+                  primeiras requisições (500) para exercitar as retentativas
+
+Uso direto: python scripts/notification_sinks.py [--smtp-port 2525] [--http-port 8025]
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import socketserver
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        sink = self.server.sink
+        self._reply("220 netaudit-sink ESMTP")
+        mail_from, rcpts = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode(errors='replace').strip()
+            verb = cmd[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 netaudit-sink")
+            elif verb == "MAIL":
+                mail_from, rcpts = cmd[10:].strip(' <>'), []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                rcpts.append(cmd[8:].strip(' <>'))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b".\r\n", b".\n", b""):
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                time.sleep(sink.delay)
+                with sink.lock:
+                    sink.messages.append({'from': mail_from, 'to': rcpts,
+                                          'message': message_from_bytes(b"".join(data))})
+                self._reply("250 OK queued")
+            elif verb == "RSET":
+                mail_from, rcpts = None, []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class SmtpSink:
+    """SMTP local que aceita tudo e guarda as mensagens em `messages`"""
+
+    def __init__(self, port=2525, host='127.0.0.1', delay=0.0):
+        self.delay = delay
+        self.messages = []
+        self.lock = threading.Lock()
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), _SmtpHandler)
+        self.server.daemon_threads = True
+        self.server.sink = self
+        self.port = self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _HttpHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        receiver = self.server.receiver
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(receiver.delay)
+        with receiver.lock:
+            receiver.requests += 1
+            fail = receiver.fail_first > 0
+            if fail:
+                receiver.fail_first -= 1
+            else:
+                receiver.received.append({'headers': dict(self.headers), 'json': json.loads(body or b'{}')})
+        self.send_response(500 if fail else 200)
+        self.end_headers()
+        self.wfile.write(b'{"ok": false}' if fail else b'{"ok": true}')
+
+
+class HttpReceiver:
+    """Receptor de webhooks local; `received` guarda os corpos aceitos"""
+
+    def __init__(self, port=8025, host='127.0.0.1', delay=0.0, fail_first=0):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.requests = 0
+        self.received = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _HttpHandler)
+        self.server.daemon_threads = True
+        self.server.receiver = self
+        self.port = self.server.server_address[1]
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/hook"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SMTP e HTTP locais para notificações")
+    parser.add_argument('--smtp-port', type=int, default=2525)
+    parser.add_argument('--http-port', type=int, default=8025)
+    args = parser.parse_args()
+    smtp = SmtpSink(args.smtp_port).start()
+    http = HttpReceiver(args.http_port).start()
+    print(f"SMTP em 127.0.0.1:{smtp.port}, webhook em {http.url} (Ctrl+C para sair)", flush=True)
+    seen = (0, 0)
+    try:
+        while True:
+            time.sleep(1)
+            if (len(smtp.messages), len(http.received)) != seen:
+                seen = (len(smtp.messages), len(http.received))
+                print(f"  e-mails: {seen[0]}  webhooks: {seen[1]}", flush=True)
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -51,6 +51,16 @@ def seed_default_triggers():
             'duration_seconds': 60,
             'severity': 'warning',
             'enabled': True
+        },
+        {
+            'name': 'Dispositivo Inacessível',
+            'description': 'Sem resposta à sonda de latência por 2 min',
+            'metric_type': 'availability',
+            'operator': '<',
+            'threshold': 1.0,
+            'duration_seconds': 120,
+            'severity': 'high',
+            'enabled': True
         }
     ]
     
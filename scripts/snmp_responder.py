@@ -0,0 +1,263 @@
+"""
+Responder SNMPv2c de teste (estilo snmpsim) para loopback.
+
+Serve um dicionário {oid: valor} com GET, GETNEXT e GETBULK, opcionalmente com
+atraso por resposta (para verificar multiplexação) e limite de varbinds por
+resposta (acima dele o GETBULK devolve tooBig, como agentes com PDU pequena). Pode ouvir em vários aliases
+de 127.0.0.0/8 ao mesmo tempo, cada um fazendo o papel de um agente diferente.
+
+Uso direto: python scripts/snmp_responder.py [--agents N] [--port 1161] [--delay 0.2] [--fixture network]
+"""
+import time
+import asyncio
+import bisect
+import threading
+
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api
+
+pMod = api.protoModules[api.protoVersion2c]
+
+
+def _oid_key(oid):
+    return tuple(int(x) for x in oid.strip('.').split('.'))
+
+
+_T0 = time.monotonic()
+_WRAP = {'counter32': 1 << 32, 'counter64': 1 << 64, 'timeticks': 1 << 32}
+
+
+def _to_asn1(value):
+    """
+    Converte valores Python do fixture em tipos SNMP (tuplas ('tipo', valor) forçam o tipo).
+    ('tipo', início, taxa) vira um contador que avança `taxa` por segundo (com wrap do tipo).
+    """
+    if isinstance(value, tuple):
+        kind, raw = value[0], value[1]
+        cls = {
+            'counter32': pMod.Counter32, 'counter64': pMod.Counter64, 'gauge': pMod.Gauge32,
+            'timeticks': pMod.TimeTicks, 'oid': pMod.ObjectIdentifier,
+        }[kind]
+        if len(value) == 3:
+            rate = value[2]
+            return lambda: cls((raw + int(rate * (time.monotonic() - _T0))) % _WRAP[kind])
+        return cls(raw)
+    if isinstance(value, int):
+        return pMod.Integer(value)
+    return pMod.OctetString(str(value))
+
+
+# Printer-MIB reduzido: 1 impressora com 5 suprimentos, 2 bandejas, 1 saída e 2 tampas
+PRINTER_FIXTURE = {
+    '1.3.6.1.2.1.1.1.0': 'HP LaserJet M428fdw',
+    '1.3.6.1.2.1.1.2.0': ('oid', '1.3.6.1.4.1.11.2.3.9.1'),
+    '1.3.6.1.2.1.1.3.0': ('timeticks', 123456789),
+    '1.3.6.1.2.1.1.4.0': 'ti@empresa.local',
+    '1.3.6.1.2.1.1.5.0': 'PRN-FINANCEIRO',
+    '1.3.6.1.2.1.1.6.0': 'Andar 2',
+    '1.3.6.1.2.1.25.3.5.1.1.1': 3,
+    '1.3.6.1.2.1.25.3.5.1.2.1': '\x00',
+    '1.3.6.1.2.1.43.5.1.1.17.1': 'BRBSN12345',
+    '1.3.6.1.2.1.43.6.1.1.2.1.1': 'Tampa frontal',
+    '1.3.6.1.2.1.43.6.1.1.2.1.2': 'Porta traseira',
+    '1.3.6.1.2.1.43.6.1.1.3.1.1': 4,
+    '1.3.6.1.2.1.43.6.1.1.3.1.2': 3,
+    '1.3.6.1.2.1.43.8.2.1.9.1.1': 250,
+    '1.3.6.1.2.1.43.8.2.1.9.1.2': 100,
+    '1.3.6.1.2.1.43.8.2.1.10.1.1': 125,
+    '1.3.6.1.2.1.43.8.2.1.10.1.2': -3,
+    '1.3.6.1.2.1.43.8.2.1.18.1.1': 'Bandeja 1',
+    '1.3.6.1.2.1.43.8.2.1.18.1.2': 'Bandeja Manual',
+    '1.3.6.1.2.1.43.9.2.1.5.1.1': 150,
+    '1.3.6.1.2.1.43.9.2.1.6.1.1': 'Saida Superior',
+    '1.3.6.1.2.1.43.10.2.1.4.1.1': ('counter32', 48213),
+    '1.3.6.1.2.1.43.11.1.1.6.1.1': 'Black Cartridge HP 58A',
+    '1.3.6.1.2.1.43.11.1.1.6.1.2': 'Cyan Cartridge',
+    '1.3.6.1.2.1.43.11.1.1.6.1.3': 'Magenta Cartridge',
+    '1.3.6.1.2.1.43.11.1.1.6.1.4': 'Imaging Drum',
+    '1.3.6.1.2.1.43.11.1.1.8.1.1': 3000,
+    '1.3.6.1.2.1.43.11.1.1.8.1.2': 2000,
+    '1.3.6.1.2.1.43.11.1.1.8.1.3': 2000,
+    '1.3.6.1.2.1.43.11.1.1.8.1.4': 20000,
+    '1.3.6.1.2.1.43.11.1.1.9.1.1': 150,
+    '1.3.6.1.2.1.43.11.1.1.9.1.2': 1800,
+    '1.3.6.1.2.1.43.11.1.1.9.1.3': -3,
+    '1.3.6.1.2.1.43.11.1.1.9.1.4': 16000,
+    # Índice além dos 20 slots fixos antigos: só aparece com descoberta dinâmica
+    '1.3.6.1.2.1.43.11.1.1.6.1.25': 'Waste Toner Box',
+    '1.3.6.1.2.1.43.11.1.1.8.1.25': -2,
+    '1.3.6.1.2.1.43.11.1.1.9.1.25': -3,
+    '1.3.6.1.2.1.43.16.5.1.2.1.1': 'Pronto',
+    '1.3.6.1.2.1.43.18.1.1.8.1.1': 'Toner preto baixo',
+    '1.3.6.1.4.1.2699.1.1.1.1.6.1.1': 'maria',
+    '1.3.6.1.4.1.2699.1.1.1.1.6.1.2': 'joao',
+    '1.3.6.1.4.1.2699.1.1.1.1.6.1.3': 'maria',
+}
+
+
+def network_fixture(interfaces=48):
+    """
+    IF-MIB de um switch com `interfaces` portas de 1 Gbps, contadores avançando em tempo real.
+
+    Porta 1: sem ifXTable (só contadores de 32 bits). Porta 2: ifInErrors perto do wrap de 2^32.
+    Porta 3: oper down. Demais: tráfego de (índice x 100 kbit/s) de entrada e metade disso de saída.
+    """
+    records = {
+        '1.3.6.1.2.1.1.1.0': 'Cisco IOS Software, C2960X',
+        '1.3.6.1.2.1.1.3.0': ('timeticks', 500000, 100),
+        '1.3.6.1.2.1.1.5.0': 'SW-CORE-01',
+    }
+    for i in range(1, interfaces + 1):
+        in_rate = i * 12500  # bytes/s = i x 100 kbit/s
+        records[f'1.3.6.1.2.1.2.2.1.2.{i}'] = f'GigabitEthernet1/0/{i}'
+        records[f'1.3.6.1.2.1.2.2.1.8.{i}'] = 2 if i == 3 else 1
+        records[f'1.3.6.1.2.1.2.2.1.10.{i}'] = ('counter32', 1000 * i, in_rate)
+        records[f'1.3.6.1.2.1.2.2.1.13.{i}'] = ('counter32', 0, 1)
+        records[f'1.3.6.1.2.1.2.2.1.14.{i}'] = ('counter32', (1 << 32) - 5 if i == 2 else 0, 10 if i == 2 else 0)
+        records[f'1.3.6.1.2.1.2.2.1.16.{i}'] = ('counter32', 500 * i, in_rate // 2)
+        records[f'1.3.6.1.2.1.2.2.1.19.{i}'] = ('counter32', 0, 0)
+        records[f'1.3.6.1.2.1.2.2.1.20.{i}'] = ('counter32', 0, 0)
+        if i == 1:
+            continue
+        records[f'1.3.6.1.2.1.31.1.1.1.1.{i}'] = f'Gi1/0/{i}'
+        records[f'1.3.6.1.2.1.31.1.1.1.6.{i}'] = ('counter64', (1 << 40) + i, in_rate)
+        records[f'1.3.6.1.2.1.31.1.1.1.10.{i}'] = ('counter64', (1 << 40) + i, in_rate // 2)
+        records[f'1.3.6.1.2.1.31.1.1.1.15.{i}'] = ('gauge', 1000)
+    return records
+
+
+class LoopbackSnmpResponder:
+    """Agente SNMPv2c mínimo servindo um snapshot estático de OIDs"""
+
+    def __init__(self, records, hosts=('127.0.0.1',), port=1161, community='public', delay=0.0, max_varbinds=None):
+        self.keys = sorted(_oid_key(o) for o in records)
+        self.values = {_oid_key(o): _to_asn1(v) for o, v in records.items()}
+        self.hosts = hosts
+        self.port = port
+        self.community = community
+        self.delay = delay
+        self.max_varbinds = max_varbinds
+        self.requests = 0
+        self._loop = None
+        self._thread = None
+        self._transports = []
+        self._ready = threading.Event()
+
+    # --- MIB ---
+    def _value(self, key):
+        value = self.values[key]
+        return value() if callable(value) else value
+
+    def _get(self, key):
+        return self._value(key) if key in self.values else pMod.NoSuchObject()
+
+    def _next(self, key):
+        i = bisect.bisect_right(self.keys, key)
+        if i >= len(self.keys):
+            return key, pMod.EndOfMibView()
+        nxt = self.keys[i]
+        return nxt, self._value(nxt)
+
+    # --- Protocolo ---
+    def _handle(self, data):
+        msg, _ = decoder.decode(data, asn1Spec=pMod.Message())
+        if str(pMod.apiMessage.getCommunity(msg)) != self.community:
+            return None
+        req = pMod.apiMessage.getPDU(msg)
+        rsp_msg = pMod.apiMessage.getResponse(msg)
+        rsp = pMod.apiMessage.getPDU(rsp_msg)
+        req_binds = [tuple(oid) for oid, _ in pMod.apiPDU.getVarBinds(req)]
+
+        binds = []
+        if req.isSameTypeWith(pMod.GetRequestPDU()):
+            binds = [(k, self._get(k)) for k in req_binds]
+        elif req.isSameTypeWith(pMod.GetNextRequestPDU()):
+            binds = [self._next(k) for k in req_binds]
+        elif req.isSameTypeWith(pMod.GetBulkRequestPDU()):
+            non_rep = int(pMod.apiBulkPDU.getNonRepeaters(req))
+            max_rep = int(pMod.apiBulkPDU.getMaxRepetitions(req))
+            binds = [self._next(k) for k in req_binds[:non_rep]]
+            cursors = list(req_binds[non_rep:])
+            for _ in range(max_rep):
+                row = [self._next(k) for k in cursors]
+                binds.extend(row)
+                cursors = [k for k, _ in row]
+                if all(isinstance(v, pMod.EndOfMibView) for _, v in row):
+                    break
+            if self.max_varbinds and len(binds) > self.max_varbinds:
+                pMod.apiPDU.setErrorStatus(rsp, 1)  # tooBig
+                binds = []
+        pMod.apiPDU.setVarBinds(rsp, [(pMod.ObjectIdentifier(k), v) for k, v in binds])
+        return encoder.encode(rsp_msg)
+
+    def _protocol(self):
+        responder = self
+
+        class _Proto(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                self.transport = transport
+
+            def datagram_received(self, data, addr):
+                responder.requests += 1
+                try:
+                    out = responder._handle(data)
+                except Exception:
+                    return
+                if out is None:
+                    return
+                if responder.delay:
+                    responder._loop.call_later(responder.delay, self.transport.sendto, out, addr)
+                else:
+                    self.transport.sendto(out, addr)
+
+        return _Proto
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        for host in self.hosts:
+            transport, _ = self._loop.run_until_complete(
+                self._loop.create_datagram_endpoint(self._protocol(), local_addr=(host, self.port))
+            )
+            self._transports.append(transport)
+        self._ready.set()
+        self._loop.run_forever()
+        for t in self._transports:
+            t.close()
+        self._loop.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+
+
+if __name__ == "__main__":
+    import time
+    import argparse
+    parser = argparse.ArgumentParser(description="Responder SNMPv2c de teste em loopback")
+    parser.add_argument('--port', type=int, default=1161)
+    parser.add_argument('--agents', type=int, default=1, help="Quantidade de aliases a partir de 127.0.0.2 (1 = só 127.0.0.1)")
+    parser.add_argument('--delay', type=float, default=0.0, help="Atraso por resposta (s)")
+    parser.add_argument('--max-varbinds', type=int, default=None, help="Acima disso o GETBULK responde tooBig")
+    parser.add_argument('--fixture', choices=('printer', 'network'), default='printer')
+    parser.add_argument('--interfaces', type=int, default=48, help="Portas por switch (fixture network)")
+    args = parser.parse_args()
+
+    hosts = ('127.0.0.1',) if args.agents <= 1 else tuple(f'127.0.0.{i}' for i in range(2, 2 + args.agents))
+    records = PRINTER_FIXTURE if args.fixture == 'printer' else network_fixture(args.interfaces)
+    responder = LoopbackSnmpResponder(records, hosts=hosts, port=args.port, delay=args.delay,
+                                       max_varbinds=args.max_varbinds).start()
+    print(f"Responder SNMP em {len(hosts)} endereço(s), porta {responder.port} ({len(records)} OIDs). Ctrl+C para sair.",
+          flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        responder.stop()
@@ -0,0 +1,253 @@
+"""
+Verificação da correlação de alertas por topologia (base isolada).
+
+Cenário: switch sw-andar2 (10.20.2.1, gateway aprendido das nics) com 200 estações atrás,
+40 impressoras em 10.20.3.0/24 sem pai conhecido e 30 dispositivos em 10.20.4.0/24 com pai
+configurado (ap-core). A sonda de latência é simulada e o ciclo roda pelo caminho real do
+Sentinel (_probe_fleet -> _check_triggers -> correlator.submit -> flush).
+
+1. Queda do switch: um alerta pai + o alerta do próprio switch, nenhum dos 200 filhos.
+2. Falhas isoladas abaixo do limiar saem individualmente após a retenção.
+3. Pai configurado fora do ar correlaciona mesmo com poucos filhos.
+4. Recuperação resolve o incidente; tempestade de latência (sem o pai cair) vira incidente.
+5. Custo por dispositivo constante (linear) e retomada do incidente aberto após restart.
+
+Uso: python scripts/test_alert_correlation.py
+"""
+import sys
+import os
+import time
+import logging
+import tempfile
+
+# Base isolada: nunca toca no netaudit.db real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_correlation_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import init_db, get_session
+from models import Device, Trigger, Alert
+import metrics_collector as mc
+from alert_correlator import AlertCorrelator, TITLE_PREFIX
+
+# Um log por alerta criado poluiria a saída
+logging.disable(logging.WARNING)
+
+HOLD = 30
+CONFIG = {'hold_seconds': HOLD, 'min_devices': 3, 'min_ratio': 0.5, 'parents': {'10.20.4.0/24': 'ap-core'}}
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1_000_000.0
+
+    def __call__(self):
+        return self.t
+
+
+class FakeProber:
+    """Sonda em lote simulada: down = ids sem resposta, slow = ids com latência alta"""
+
+    def __init__(self):
+        self.down, self.slow = set(), set()
+        self.stats = {'alive': 0, 'devices': 0, 'elapsed': 0.0, 'icmp': True}
+
+    def probe_all(self, targets):
+        results = {}
+        for device_id in targets:
+            alive = device_id not in self.down
+            results[device_id] = {'alive': alive, 'rtt': 800.0 if device_id in self.slow else 2.0,
+                                  'loss': 0.0 if alive else 100.0, 'jitter': 0.1}
+        self.stats.update(alive=sum(r['alive'] for r in results.values()), devices=len(results))
+        return results
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def setup(session):
+    devices = [Device(ip='10.20.2.1', hostname='sw-andar2', device_type='network'),
+               Device(ip='10.20.9.1', hostname='ap-core', device_type='network')]
+    nics = [{'description': 'Intel(R) Ethernet', 'ip': [], 'gateway': ['10.20.2.1']}]
+    for i in range(200):
+        devices.append(Device(ip=f'10.20.2.{i + 10}', hostname=f'est{i:03d}', device_type='generic',
+                              nics=[dict(nics[0], ip=[f'10.20.2.{i + 10}'])]))
+    for i in range(40):
+        devices.append(Device(ip=f'10.20.3.{i + 10}', hostname=f'imp{i:02d}', device_type='generic'))
+    for i in range(30):
+        devices.append(Device(ip=f'10.20.4.{i + 10}', hostname=f'ap{i:02d}', device_type='generic'))
+    session.add_all(devices)
+    session.add_all([
+        Trigger(name='Dispositivo Inacessível', metric_type='availability', operator='<', threshold=1,
+                duration_seconds=0, severity='high', notify_email=False),
+        Trigger(name='Latência Alta', metric_type='latency', operator='>', threshold=500,
+                duration_seconds=0, severity='warning', notify_email=False),
+    ])
+    session.commit()
+    return {d.hostname: d.id for d in devices}
+
+
+class Cycle:
+    """Um ciclo do Sentinel sobre a frota inteira (sonda + flush da correlação)"""
+
+    def __init__(self, session, correlator, clock):
+        self.session, self.correlator, self.clock = session, correlator, clock
+        self.collector = mc.MetricsCollector()
+        self.prober = self.collector.latency_prober = FakeProber()
+        self.devices = session.query(Device).all()
+
+    def run(self, advance=0):
+        self.clock.t += advance
+        self.collector._probe_fleet(self.session, self.devices)
+        return self.correlator.flush(self.session)
+
+
+def alerts(session, **filters):
+    session.expire_all()
+    q = session.query(Alert)
+    for k, v in filters.items():
+        q = q.filter(getattr(Alert, k) == v)
+    return q.all()
+
+
+def open_alerts(session, prefix=None):
+    return [a for a in alerts(session, resolved_at=None) if prefix is None or a.title.startswith(prefix)]
+
+
+def storm_checks(session, ids):
+    results = []
+    clock = Clock()
+    correlator = mc.alert_correlator = AlertCorrelator(config=CONFIG, clock=clock)
+    correlator.refresh(session, force=True)
+    cycle = Cycle(session, correlator, clock)
+    station = [ids[f'est{i:03d}'] for i in range(200)]
+    printers = [ids[f'imp{i:02d}'] for i in range(40)]
+    aps = [ids[f'ap{i:02d}'] for i in range(30)]
+
+    snap = correlator.snapshot()
+    print(f"Topologia: {snap['groups']} grupos")
+    results.append(check("Gateway aprendido das nics vira pai da sub-rede; CIDR configurado aponta para ap-core",
+                         correlator.parent_of.get(('subnet', '10.20.2.0/24')) == ids['sw-andar2']
+                         and correlator.group_of[aps[0]] == ('parent', ids['ap-core'])
+                         and ids['sw-andar2'] not in correlator.group_of))
+
+    cycle.run()
+    results.append(check("Frota saudável: nenhum alerta", not alerts(session)))
+
+    print("\nQueda do switch sw-andar2 (200 estações atrás):")
+    cycle.prober.down = {ids['sw-andar2'], *station}
+    start = time.time()
+    cycle.run(2)
+    elapsed = time.time() - start
+    parents = open_alerts(session, TITLE_PREFIX)
+    individual = alerts(session, title='Dispositivo Inacessível')
+    results.append(check(f"1 alerta pai ({parents[0].title if parents else '-'}) + 1 do próprio switch, "
+                         f"{len(alerts(session))} linhas em alerts ({elapsed * 1000:.0f}ms no ciclo)",
+                         len(parents) == 1 and len(individual) == 1 and individual[0].device_id == ids['sw-andar2']
+                         and parents[0].device_id == ids['sw-andar2'] and parents[0].severity == 'high'))
+    results.append(check(f"Mensagem do pai: {parents[0].message[:70]}...",
+                         parents[0].message.startswith('200 de 200') and 'sw-andar2 está inacessível' in parents[0].message))
+    cycle.run(HOLD)
+    results.append(check(f"Ciclos seguintes não gravam nada (suprimidos: {correlator.stats['suppressed']})",
+                         len(alerts(session)) == 2 and correlator.stats['suppressed'] == 200))
+
+    print("\nFalhas isoladas e pai configurado:")
+    cycle.prober.down |= set(printers[:2])
+    cycle.run(2)
+    held = len(alerts(session))
+    cycle.run(HOLD)
+    printer_alerts = [a for a in alerts(session, title='Dispositivo Inacessível') if a.device_id in printers]
+    results.append(check(f"2 de 40 impressoras: retidas no 1º ciclo ({held - 2} novos), individuais após {HOLD}s "
+                         f"({len(printer_alerts)})", held == 2 and len(printer_alerts) == 2))
+
+    cycle.prober.down |= {ids['ap-core'], aps[0]}
+    cycle.run(2)
+    ap_parent = [a for a in open_alerts(session, TITLE_PREFIX) if a.device_id == ids['ap-core']]
+    results.append(check(f"ap-core fora + 1 filho: incidente pelo pai configurado ({ap_parent[0].title if ap_parent else '-'})",
+                         len(ap_parent) == 1 and not any(a.device_id == aps[0] for a in alerts(session))))
+
+    print("\nRecuperação e tempestade de latência:")
+    cycle.prober.down = set()
+    cycle.run(2)
+    cycle.run(HOLD)
+    results.append(check(f"Tudo de volta: incidentes e alertas individuais resolvidos "
+                         f"({correlator.stats['resolved']} incidentes)",
+                         not open_alerts(session) and correlator.stats['resolved'] == 2 and not correlator.incidents))
+
+    before = len(alerts(session))
+    cycle.prober.slow = set(station[:150])
+    cycle.run(2)
+    latency_parent = open_alerts(session, TITLE_PREFIX)
+    results.append(check(f"150 de 200 com latência alta (switch respondendo): 1 alerta pai "
+                         f"({len(alerts(session)) - before} novo, severidade {latency_parent[0].severity if latency_parent else '-'})",
+                         len(alerts(session)) - before == 1 and latency_parent and latency_parent[0].severity == 'warning'
+                         and 'sw-andar2 está inacessível' not in latency_parent[0].message))
+    cycle.prober.slow = set()
+    cycle.run(2)
+    cycle.run(HOLD)
+    return results, correlator
+
+
+def scale_checks():
+    results = []
+    print("\nCusto por ciclo (sonda + submit + flush, 20% da frota falhando):")
+    rule = type('R', (), {'id': 1, 'metric_type': 'availability', 'severity': 'high'})
+    timings = {}
+    for count in (2000, 20000):
+        rows = [(i, f'10.{i // 62500}.{i // 250 % 250}.{i % 250 + 1}', f'h{i}', None) for i in range(1, count + 1)]
+        correlator = AlertCorrelator(config={'hold_seconds': 3600}, clock=Clock())
+        correlator.load_topology(rows)
+        device = type('D', (), {})()
+        start = time.perf_counter()
+        for device_id in range(1, count + 1):
+            down = device_id % 5 == 0
+            correlator.observe(device_id, not down)
+            device.id = device_id
+            if down:
+                correlator.submit(None, device, rule, 0.0)
+            else:
+                correlator.clear(device_id, rule.id)
+        correlator.flush(None)
+        timings[count] = (time.perf_counter() - start) / count
+        print(f"  {count} dispositivos: {timings[count] * 1e6:.1f}us por dispositivo")
+    results.append(check("Custo por dispositivo não cresce com a frota (linear)", timings[20000] < timings[2000] * 3))
+    return results
+
+
+def restart_checks(session, ids, correlator):
+    results = []
+    print("\nRestart com incidente aberto:")
+    clock = Clock()
+    station = [ids[f'est{i:03d}'] for i in range(200)]
+    cycle = Cycle(session, correlator, correlator.clock)
+    cycle.prober.down = set(station)
+    cycle.run(2)
+    opened = open_alerts(session, TITLE_PREFIX)
+
+    fresh = mc.alert_correlator = AlertCorrelator(config=CONFIG, clock=clock)
+    fresh.refresh(session)
+    cycle = Cycle(session, fresh, clock)
+    cycle.run(2)
+    adopted = bool(fresh.incidents) and len(open_alerts(session, TITLE_PREFIX)) == 1
+    cycle.run(HOLD)
+    results.append(check("Incidente aberto antes do restart é reassumido e resolvido quando a rede volta",
+                         len(opened) == 1 and adopted and not open_alerts(session, TITLE_PREFIX)))
+    return results
+
+
+if __name__ == "__main__":
+    init_db()
+    session = get_session()
+    session.expire_on_commit = False
+    ids = setup(session)
+    try:
+        results, correlator = storm_checks(session, ids)
+        results += scale_checks()
+        results += restart_checks(session, ids, correlator)
+    finally:
+        session.close()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
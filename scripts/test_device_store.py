@@ -0,0 +1,145 @@
+"""
+Verificação do inventário em memória versionado (shared_state.DeviceStore), sem banco.
+
+1. upsert/remove: versão global, índice por MAC (troca de MAC), snapshot reaproveitado.
+2. changes_since: added/changed/removed desde uma versão; lista completa para epoch
+   diferente, versão do futuro ou delta anterior às tombstones descartadas.
+3. replace_all (recarga do banco): só versiona o que mudou de fato; dicts da auditoria
+   em memória não são substituídos pelo formato do banco; last_seen sozinho não conta.
+
+Uso: python scripts/test_device_store.py
+"""
+import sys
+import os
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_state import DeviceStore
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def audit_dict(i, **extra):
+    """Formato do resultado da auditoria"""
+    return dict({'ip': f"10.0.0.{i}", 'hostname': f"pc{i}", 'mac': f"AA:BB:CC:00:00:{i:02X}",
+                 'device_type': 'windows', 'status_code': 'ONLINE', 'scan_type': 'new'}, **extra)
+
+
+def db_dict(i, **extra):
+    """Formato do load_all_devices (id, defaults 'N/A', last_seen)"""
+    return dict({'id': i, 'ip': f"10.0.0.{i}", 'hostname': f"pc{i}", 'mac': f"AA:BB:CC:00:00:{i:02X}",
+                 'device_type': 'windows', 'status_code': 'ONLINE', 'vendor': 'Unknown', 'model': 'N/A',
+                 'last_seen': '2026-01-01T10:00:00'}, **extra)
+
+
+def write_checks():
+    results = []
+    print("Escritas:")
+    store = DeviceStore()
+    new = [store.upsert(audit_dict(i)) for i in range(1, 6)]
+    again = store.upsert(audit_dict(3, hostname='pc3-novo'))
+    results.append(check(f"5 inserções + 1 atualização: versão {store.version}, entrada 10.0.0.3 na versão "
+                         f"{store.entry_version('10.0.0.3')}",
+                         all(new) and not again and store.version == 6 and store.entry_version('10.0.0.3') == 6))
+    store.upsert(audit_dict(2, mac='AA:BB:CC:FF:FF:02'))
+    results.append(check("Troca de MAC: índice novo aponta o IP, o antigo some",
+                         store.get_by_mac('AA:BB:CC:FF:FF:02')['ip'] == '10.0.0.2'
+                         and store.get_by_mac('AA:BB:CC:00:00:02') is None))
+    first = store.snapshot()
+    same = store.snapshot()
+    store.remove('10.0.0.5')
+    results.append(check("Snapshot reaproveitado sem escrita e refeito depois dela",
+                         first is same and len(store.snapshot()) == 4 and store.snapshot() is not first
+                         and not store.remove('10.0.0.5')))
+    return results
+
+
+def delta_checks():
+    results = []
+    print("\nchanges_since:")
+    store = DeviceStore()
+    for i in range(1, 6):
+        store.upsert(audit_dict(i))
+    since = store.version
+    store.upsert(audit_dict(6))
+    store.upsert(audit_dict(2, hostname='pc2-novo'))
+    store.upsert(audit_dict(6, hostname='pc6-novo'))   # entrou e mudou depois de since: continua 'added'
+    store.remove('10.0.0.4')
+    delta = store.changes_since(since, store.epoch)
+    results.append(check(f"Delta: added {[d['ip'] for d in delta['added']]}, changed {[d['ip'] for d in delta['changed']]}, "
+                         f"removed {delta['removed']}",
+                         not delta['full'] and [d['ip'] for d in delta['added']] == ['10.0.0.6']
+                         and delta['added'][0]['hostname'] == 'pc6-novo'
+                         and [d['ip'] for d in delta['changed']] == ['10.0.0.2'] and delta['removed'] == ['10.0.0.4']))
+    empty = store.changes_since(store.version, store.epoch)
+    results.append(check("Cliente em dia: delta vazio",
+                         not empty['full'] and not (empty['added'] or empty['changed'] or empty['removed'])))
+    results.append(check("Epoch diferente, sem since ou versão do futuro: lista completa",
+                         store.changes_since(since, 'outra')['full'] and store.changes_since(None, store.epoch)['full']
+                         and store.changes_since(store.version + 1, store.epoch)['full']
+                         and len(store.changes_since(None)['devices']) == 5))
+
+    small = DeviceStore()
+    small.MAX_TOMBSTONES = 3
+    for i in range(1, 11):
+        small.upsert(audit_dict(i))
+    old_since = small.version
+    for i in range(1, 6):
+        small.remove(f"10.0.0.{i}")
+    results.append(check("Delta anterior às tombstones descartadas: lista completa",
+                         small.changes_since(old_since, small.epoch)['full']
+                         and not small.changes_since(small.version - 2, small.epoch)['full']))
+    return results
+
+
+def reload_checks():
+    results = []
+    print("\nreplace_all (recarga do banco a cada 30s):")
+    store = DeviceStore()
+    store.replace_all([db_dict(i) for i in range(1, 21)])
+    loaded = store.version
+    store.replace_all([db_dict(i) for i in range(1, 21)])
+    results.append(check(f"Recarga idêntica: nenhuma versão nova ({store.version - loaded})", store.version == loaded))
+
+    # Scan: auditoria escreve o formato da auditoria na memória (e o DeviceWriter grava no banco)
+    store.upsert(audit_dict(3, hostname='pc3-auditado'))
+    after_scan = store.version
+    store.replace_all([db_dict(i, hostname='pc3-auditado') if i == 3 else db_dict(i) for i in range(1, 21)])
+    first_reload = store.version - after_scan
+    mid = store.version
+    store.replace_all([db_dict(i, hostname='pc3-auditado') if i == 3 else db_dict(i) for i in range(1, 21)])
+    results.append(check(f"Depois do scan: 1ª recarga versiona só o host gravado ({first_reload}), a 2ª nada "
+                         f"({store.version - mid})", first_reload == 1 and store.version == mid))
+
+    store.upsert(audit_dict(4, hostname='pc4'))   # auditado sem mudança gravada: formato da auditoria em memória
+    kept = store.version
+    store.replace_all([db_dict(i, hostname='pc3-auditado') if i == 3 else db_dict(i) for i in range(1, 21)])
+    results.append(check("Banco igual à recarga anterior: dict da auditoria em memória mantido",
+                         store.version == kept and store.get('10.0.0.4').get('scan_type') == 'new'))
+
+    heartbeat = store.version
+    store.replace_all([db_dict(i, last_seen='2026-01-01T10:05:00', hostname='pc3-auditado' if i == 3 else f"pc{i}")
+                       for i in range(1, 21)])
+    delta = store.changes_since(heartbeat, store.epoch)
+    results.append(check("Só last_seen renovado pelo coletor: nenhum delta para os clientes ?since=",
+                         store.version == heartbeat and not delta['changed']))
+
+    store.replace_all([db_dict(i, status_code='OFFLINE' if i == 7 else 'ONLINE', hostname='pc3-auditado' if i == 3 else f"pc{i}")
+                       for i in range(1, 20)])
+    delta = store.changes_since(heartbeat, store.epoch)
+    results.append(check(f"Mudança real (status) e remoção: changed {[d['ip'] for d in delta['changed']]}, "
+                         f"removed {delta['removed']}",
+                         [d['ip'] for d in delta['changed']] == ['10.0.0.7'] and delta['removed'] == ['10.0.0.20']))
+    return results
+
+
+if __name__ == "__main__":
+    results = write_checks()
+    results += delta_checks()
+    results += reload_checks()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,171 @@
+"""
+Verificação do push em tempo real (event_bus.py + blueprints/stream.py), via cliente de teste Flask.
+
+1. Coalescência: progresso de alta frequência guarda só o valor mais recente por assinante;
+   logs não são coalescidos e chegam em ordem.
+2. scan.progress traz os mesmos campos do /api/scanner/status (scanned_ips/total_ips);
+   scan.log de reset traz o seq para o próximo ?logs_since=.
+3. Filtro por tópico; publicar sem assinantes não cria evento.
+4. /api/stream: limite de MAX_STREAMS conexões (503 acima dele), vaga liberada ao fechar.
+
+Uso: python scripts/test_event_stream.py
+"""
+import sys
+import os
+import json
+import queue
+import logging
+import threading
+import tempfile
+
+# Configurações isoladas: nunca toca no diretório de dados real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_stream_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from event_bus import event_bus, EventBus
+from shared_state import update_scan_status, scan_status
+from blueprints.stream import stream_bp, MAX_STREAMS
+
+logging.disable(logging.WARNING)
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def bus_checks():
+    results = []
+    print("Barramento:")
+    bus = EventBus()
+    bus.publish('scan.progress', {'scanned': 1}, coalesce=True)
+    results.append(check("Sem assinantes: nada é numerado nem guardado", bus._seq == 0))
+
+    sub = bus.subscribe(['scan'])
+    other = bus.subscribe(['alerts'])
+    for i in range(500):
+        bus.publish('scan.progress', {'scanned': i}, coalesce=True)
+        if i % 100 == 0:
+            bus.publish('scan.log', {'msg': f"log {i}"})
+    batch = sub.get(timeout=0)
+    progress = [e for e in batch if e[1] == 'scan.progress']
+    logs = [e[2]['msg'] for e in batch if e[1] == 'scan.log']
+    results.append(check(f"500 progressos + 5 logs: entregues {len(progress)} progresso (scanned={progress[0][2]['scanned']}) "
+                         f"e {len(logs)} logs em ordem",
+                         len(progress) == 1 and progress[0][2]['scanned'] == 499
+                         and logs == [f"log {i}" for i in range(0, 500, 100)]
+                         and [e[0] for e in batch] == sorted(e[0] for e in batch)))
+    results.append(check("Assinante de outro tópico não recebe nada", other.get(timeout=0) == []))
+    bus.unsubscribe(sub)
+    bus.unsubscribe(other)
+    results.append(check("Sem assinantes depois do unsubscribe", not bus.has_subscribers('scan')))
+    return results
+
+
+def progress_checks():
+    results = []
+    print("\nscan.progress:")
+    sub = event_bus.subscribe(['scan'])
+    try:
+        update_scan_status({"running": True, "scanned": 40, "total": 254, "etr": "12s"})
+        update_scan_status({"scanned": 64})
+        batch = sub.get(timeout=0)
+    finally:
+        event_bus.unsubscribe(sub)
+    progress = [e[2] for e in batch if e[1] == 'scan.progress']
+    data = progress[-1] if progress else {}
+    results.append(check(f"Payload: {data.get('scanned_ips')} / {data.get('total_ips')} IPs, {data.get('progress')}%",
+                         len(progress) == 1 and data.get('scanned_ips') == 64 and data.get('total_ips') == 254
+                         and data.get('progress') == 25 and data.get('scanned') == 64 and data.get('total') == 254))
+
+    sub = event_bus.subscribe(['scan'])
+    try:
+        update_scan_status({"logs": [{"msg": "novo scan", "time": "10:00:00"}]})
+        batch = sub.get(timeout=0)
+    finally:
+        event_bus.unsubscribe(sub)
+    reset = next((e[2] for e in batch if e[1] == 'scan.log' and e[2].get('reset')), {})
+    results.append(check(f"scan.log de reset: {len(reset.get('logs', []))} logs, seq {reset.get('seq')} "
+                         f"(log_seq {scan_status['log_seq']})",
+                         reset.get('seq') == scan_status['log_seq'] and reset['logs'][-1]['seq'] == reset['seq']))
+    return results
+
+
+class StreamClient(threading.Thread):
+    """Uma conexão /api/stream por thread, como no waitress (o contexto Flask é por thread)"""
+
+    def __init__(self, app):
+        super().__init__(daemon=True)
+        self.app = app
+        self.status = None
+        self.chunks = queue.Queue()
+        self.ready = threading.Event()
+        self.stop = threading.Event()
+
+    def run(self):
+        c = self.app.test_client()
+        with c.session_transaction() as s:
+            s['username'] = 'admin'
+        response = c.get('/api/stream?topics=scan', buffered=False)
+        self.status = response.status_code
+        self.ready.set()
+        try:
+            if self.status != 200:
+                return
+            for chunk in response.response:
+                self.chunks.put(chunk.decode())
+                if self.stop.is_set():
+                    break
+        finally:
+            response.close()
+
+    def close(self):
+        self.stop.set()
+        update_scan_status({"etr": "fechando"})  # acorda o gerador parado no sub.get
+        self.join(timeout=5)
+
+
+def stream_checks():
+    results = []
+    print(f"\n/api/stream (limite {MAX_STREAMS}):")
+    app = Flask(__name__)
+    app.secret_key = 'teste'
+    app.register_blueprint(stream_bp)
+
+    def connect():
+        client = StreamClient(app)
+        client.start()
+        client.ready.wait(5)
+        return client
+
+    streams = [connect() for _ in range(MAX_STREAMS)]
+    first_chunk = streams[0].chunks.get(timeout=5)
+    extra = connect()
+    results.append(check(f"{MAX_STREAMS} streams abertos, o seguinte recebe {extra.status}",
+                         all(s.status == 200 for s in streams) and extra.status == 503 and 'retry:' in first_chunk))
+
+    update_scan_status({"scanned": 80, "total": 254})
+    chunk = streams[0].chunks.get(timeout=5)
+    event = next((line for line in chunk.splitlines() if line.startswith('data:')), 'data: {}')
+    payload = json.loads(event[5:])
+    results.append(check(f"Evento entregue no stream: {chunk.splitlines()[1]!r}, total_ips={payload.get('total_ips')}",
+                         'event: scan.progress' in chunk and payload.get('total_ips') == 254))
+
+    streams[0].close()
+    again = connect()
+    results.append(check(f"Stream fechado libera a vaga: {again.status}", again.status == 200))
+    for s in streams[1:] + [again]:
+        s.close()
+    results.append(check(f"Todos fechados: {event_bus.subscriber_count} assinantes", event_bus.subscriber_count == 0))
+    return results
+
+
+if __name__ == "__main__":
+    results = bus_checks()
+    results += progress_checks()
+    results += stream_checks()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
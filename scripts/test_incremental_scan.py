@@ -0,0 +1,174 @@
+"""
+Verificação do rescan incremental por impressão digital (scanner/fingerprint.py), base isolada.
+
+Roda o scan_thread de verdade sobre 127.0.0.0/28 (em Linux todo alias de loopback responde,
+com RST, às sondas TCP). A auditoria profunda é embrulhada para custar AUDIT_COST segundos,
+como o WMI/SNMP custariam em produção.
+
+1. Primeiro scan: todos auditados sem sonda prévia (nada a comparar), impressões gravadas
+   em device_fingerprints depois da auditoria.
+2. Segundo scan sem mudanças: nenhuma auditoria profunda, tempo cai na proporção.
+3. Porta nova em um host, auditoria vencida em outro: só esses dois são auditados.
+4. full_audit ignora as impressões mas as regrava: o scan incremental seguinte compara
+   com a base nova; boot (sysUpTime) com tolerância.
+
+Uso: python scripts/test_incremental_scan.py
+"""
+import sys
+import os
+import time
+import socket
+import logging
+import tempfile
+from datetime import datetime, timedelta
+
+# Base isolada: nunca toca no netaudit.db real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_incremental_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import init_db, get_session
+from models import DeviceFingerprint
+from utils import save_general_settings
+from shared_state import scan_status
+import scanner.engine as engine
+from scanner.fingerprint import FingerprintStore, fingerprint_ports, ttl_class
+
+logging.disable(logging.WARNING)
+
+SUBNET = '127.0.0.0/28'
+AUDIT_COST = 0.3
+HOSTS = 14
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+class _NoSleepTime:
+    """time do engine sem as pausas de exibição do fim do scan"""
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    @staticmethod
+    def sleep(seconds):
+        pass
+
+
+audited = []
+_real_audit = engine.get_full_audit
+
+
+def slow_audit(ip, *args, **kwargs):
+    audited.append(ip)
+    time.sleep(AUDIT_COST)
+    return _real_audit(ip, *args, **kwargs)
+
+
+def run_scan(full_audit=False):
+    audited.clear()
+    scan_status["running"] = True
+    start = time.perf_counter()
+    engine.scan_thread(SUBNET, full_audit=full_audit)
+    return sorted(set(audited)), time.perf_counter() - start
+
+
+def fingerprint_rows():
+    session = get_session()
+    try:
+        return {r.ip: r for r in session.query(DeviceFingerprint).all()}
+    finally:
+        session.close()
+
+
+def scan_checks():
+    results = []
+    print(f"Scans em {SUBNET} (auditoria profunda simulada: {AUDIT_COST}s por host):")
+    probed_before_audit = []
+    compute = engine.fingerprints.compute
+    engine.fingerprints.compute = lambda ip, *a, **kw: (probed_before_audit.append(ip) if ip not in audited else None,
+                                                        compute(ip, *a, **kw))[1]
+    try:
+        first, t_first = run_scan()
+    finally:
+        engine.fingerprints.compute = compute
+    rows = fingerprint_rows()
+    stats = engine.fingerprints.stats
+    results.append(check(f"1º scan: {len(first)} auditados em {t_first:.2f}s, {len(rows)} impressões gravadas, "
+                         f"{len(probed_before_audit)} sondados antes da auditoria ({stats['new']} novos)",
+                         len(first) == HOSTS and len(rows) == HOSTS and not probed_before_audit
+                         and stats['new'] == HOSTS))
+
+    second, t_second = run_scan()
+    last = scan_status.get("last_results", {})
+    stats = engine.fingerprints.stats
+    results.append(check(f"2º scan sem mudanças: {len(second)} auditados, {last.get('skipped')} dispensados em "
+                         f"{t_second:.2f}s ({t_first / t_second:.1f}x mais rápido)",
+                         not second and last.get('skipped') == HOSTS and t_second < t_first / 2))
+    summary = next((entry['msg'] for entry in reversed(scan_status['logs']) if 'CONCLUÍDO' in entry['msg']), '')
+    results.append(check(f"Resumo: {summary[2:]}", f"{HOSTS} inalterados" in summary))
+    results.append(check(f"Dispensados: last_seen renovado, contador de pulos {fingerprint_rows()['127.0.0.3'].skipped}",
+                         fingerprint_rows()['127.0.0.3'].skipped == 1 and stats['checked'] == HOSTS))
+
+    # Porta nova em um host (serviço instalado) e auditoria vencida em outro
+    port = next(p for p in fingerprint_ports() if p > 1024)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.5', port))
+    listener.listen(16)
+    session = get_session()
+    session.query(DeviceFingerprint).filter_by(ip='127.0.0.9').update(
+        {'audited_at': datetime.now() - timedelta(hours=engine.fingerprints.config['max_age_hours'] + 1)})
+    session.commit()
+    session.close()
+    try:
+        third, t_third = run_scan()
+    finally:
+        listener.close()
+    stats = engine.fingerprints.stats
+    results.append(check(f"Porta {port} aberta em 127.0.0.5 + auditoria vencida em 127.0.0.9: auditados {third} "
+                         f"em {t_third:.2f}s (mudanças {stats['changed']}, vencidos {stats['stale']})",
+                         third == ['127.0.0.5', '127.0.0.9'] and stats['changed'] == {'bitmap': 1} and stats['stale'] == 1))
+
+    # 127.0.0.5 fechou a porta depois do 3º scan: só a auditoria completa a vê
+    started = datetime.now()
+    full, t_full = run_scan(full_audit=True)
+    rows = fingerprint_rows()
+    results.append(check(f"full_audit: {len(full)} auditados em {t_full:.2f}s, impressões regravadas",
+                         len(full) == HOSTS and all(r.audited_at >= started for r in rows.values())))
+    after_full, _ = run_scan()
+    results.append(check(f"Incremental depois do full_audit compara com a base nova: auditados {after_full}",
+                         not after_full))
+    return results
+
+
+def unit_checks():
+    results = []
+    print("\nComparação:")
+    store = FingerprintStore(config={'boot_tolerance_seconds': 300})
+    base = {'mac': 'AA:BB:CC:00:00:01', 'ttl_class': 'linux', 'ports': [22, 80], 'bitmap': 2,
+            'hostname': 'imp01', 'snmp_object': '1.3.6.1.4.1.11.2.3.9.1', 'boot': 1_700_000_000}
+    results.append(check("Boot recalculado com atraso de rede (+40s): igual",
+                         not store.differences(base, dict(base, boot=base['boot'] + 40))))
+    results.append(check("Reboot (boot 2h depois), troca de MAC ou SNMP que parou de responder: diferente",
+                         store.differences(base, dict(base, boot=base['boot'] + 7200)) == ['boot']
+                         and store.differences(base, dict(base, mac='AA:BB:CC:00:00:02')) == ['mac']
+                         and set(store.differences(base, {k: v for k, v in base.items()
+                                                          if k not in ('snmp_object', 'boot')})) == {'snmp_object', 'boot'}))
+    results.append(check("Classes de TTL iguais às do identify_type",
+                         [ttl_class(t) for t in (None, 64, 128, 255, 32)] == [None, 'linux', 'windows', 'network', 'other']))
+    return results
+
+
+if __name__ == "__main__":
+    init_db()
+    save_general_settings({'reverse_dns': {'enabled': False}})
+    engine.get_full_audit = slow_audit
+    engine.time = _NoSleepTime()
+    results = scan_checks()
+    results += unit_checks()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
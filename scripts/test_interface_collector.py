@@ -0,0 +1,119 @@
+"""
+Verificação do coletor de interfaces (IF-MIB) contra switches simulados em loopback.
+
+Sobe o responder SNMP em processo separado com N switches de 48 portas cujos contadores
+avançam em tempo real, roda dois ciclos do coletor e confere:
+  - primeira coleta só forma a base; a segunda produz taxas
+  - bps corretos (HC de 64 bits e fallback de 32 bits), wrap de Counter32 em ifInErrors
+  - interface oper down ignorada
+  - frota inteira coletada dentro do orçamento do ciclo (60s)
+  - prazo por dispositivo: um agente mudo não segura nem derruba os demais do lote
+
+Uso: python scripts/test_interface_collector.py [--switches 100]
+"""
+import sys
+import os
+import time
+import socket
+import argparse
+import subprocess
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snmp_helper import snmp_client
+from interface_collector import (InterfaceCollector, counter_delta, interface_rows, device_totals)
+
+PORT = 1163
+INTERFACES = 48
+CYCLE_BUDGET = 60
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def start_responder(switches):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snmp_responder.py')
+    proc = subprocess.Popen([sys.executable, script, '--fixture', 'network', '--agents', str(switches),
+                             '--interfaces', str(INTERFACES), '--port', str(PORT)],
+                            stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()  # linha de "pronto"
+    return proc
+
+
+def run_interface_test(switches):
+    results = []
+
+    print("Aritmética de contadores:")
+    results.append(check("Counter32 com wrap", counter_delta((1 << 32) - 10, 5, 32) == 15))
+    results.append(check("Counter64 que recua = contador zerado (descarta)", counter_delta(10_000, 5, 64) is None))
+
+    responder = start_responder(switches)
+    targets = {i: f'127.0.0.{i + 1}' for i in range(1, switches + 1)}
+    collector = InterfaceCollector(port=PORT)
+    print(f"\n{switches} switches x {INTERFACES} portas em loopback (porta {PORT})")
+
+    try:
+        first = collector.collect_all(targets)
+        stats = dict(collector.stats)
+        results.append(check(f"Ciclo 1 (base): {stats['interfaces']} interfaces em {stats['elapsed']}s, sem taxas",
+                             stats['responded'] == switches and stats['interfaces'] == switches * INTERFACES
+                             and not any(first.values())))
+
+        time.sleep(3)
+        cpu = time.process_time()
+        second = collector.collect_all(targets)
+        cpu = time.process_time() - cpu
+        stats = dict(collector.stats)
+        results.append(check(f"Ciclo 2: {stats['rates']} taxas em {stats['elapsed']}s (orçamento {CYCLE_BUDGET}s)",
+                             stats['rates'] == switches * (INTERFACES - 1) and stats['elapsed'] < CYCLE_BUDGET))
+        # Com agentes reais o custo do ciclo é a CPU do cliente (aqui o responder divide a mesma máquina)
+        per_iface = cpu / max(stats['interfaces'], 1) * 1000
+        print(f"       CPU do cliente: {cpu:.2f}s ({per_iface:.2f}ms/interface) -> "
+              f"~{int(CYCLE_BUDGET / per_iface * 1000)} interfaces por ciclo de {CYCLE_BUDGET}s")
+
+        rates = second[1]
+        port10 = rates[10]
+        results.append(check(f"Gi1/0/10 (HC): in={port10['in_bps']:.0f} bps out={port10['out_bps']:.0f} bps, "
+                             f"utilização {port10['utilization']}%",
+                             abs(port10['in_bps'] - 1_000_000) < 20_000 and abs(port10['out_bps'] - 500_000) < 20_000
+                             and port10['if_name'] == 'Gi1/0/10'))
+        port1 = rates[1]
+        results.append(check(f"Porta 1 sem ifXTable (32 bits): in={port1['in_bps']:.0f} bps, nome '{port1['if_name']}'",
+                             abs(port1['in_bps'] - 100_000) < 5_000 and port1['if_name'] == 'GigabitEthernet1/0/1'))
+        results.append(check(f"Wrap de ifInErrors na porta 2: {rates[2]['in_errors']} erros/s",
+                             abs(rates[2]['in_errors'] - 10) < 1))
+        results.append(check("Porta 3 (oper down) ignorada", 3 not in rates))
+
+        # Agente mudo (datagramas descartados): sem prazo custaria timeout x (retries + 1)
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        silent.bind(('127.0.0.250', PORT))
+        try:
+            start = time.time()
+            mixed = collector.collect_all({1: targets[1], 2: targets[2], 250: '127.0.0.250'}, deadline=1.0)
+            elapsed = time.time() - start
+        finally:
+            silent.close()
+        results.append(check(f"Prazo por dispositivo (1s): agente mudo sem amostra, outros 2 coletados em {elapsed:.2f}s",
+                             sorted(mixed) == [1, 2] and elapsed < collector.timeout))
+
+        rows = interface_rows(1, rates)
+        totals = device_totals(rates)
+        results.append(check(f"{len(rows)} linhas compactas por coleta; totais {totals}",
+                             len(rows) == INTERFACES - 1 and totals['interface_errors'] > 0))
+    finally:
+        responder.terminate()
+        responder.wait(5)
+        snmp_client.stop()
+
+    print(f"\n{sum(results)}/{len(results)} verificações OK. Estatísticas SNMP: {snmp_client.stats}")
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verificação do coletor de interfaces")
+    parser.add_argument('--switches', type=int, default=100)
+    args = parser.parse_args()
+    sys.exit(0 if run_interface_test(args.switches) else 1)
@@ -0,0 +1,152 @@
+"""
+Verificação da sondagem de latência em lote (latency_prober.py) em aliases de loopback.
+
+Portas "filtradas" são listeners de backlog cheio (o kernel descarta o SYN, como um
+firewall em DROP); portas fechadas respondem RST.
+
+1. Fallback TCP: as portas do tipo são conectadas ao mesmo tempo; dispositivo offline
+   custa um timeout, não a soma; a primeira porta que responde mede o RTT.
+2. Rodada da frota: dispositivos concorrentes, perda/jitter pelo summarize.
+3. ICMP (com privilégio): RTT de cada sonda vem da própria resposta, mesmo com várias
+   sondas simultâneas ao mesmo host.
+
+Uso: python scripts/test_latency_prober.py
+"""
+import sys
+import os
+import time
+import socket
+import asyncio
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency_prober import LatencyProber, summarize
+from scanner.discovery import ICMPProber
+
+TIMEOUT = 0.4
+_keep = []
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def listener(ip, backlog_full=False):
+    """Porta aberta; com backlog_full o SYN é descartado (filtrada)"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind((ip, 0))
+    s.listen(0 if backlog_full else 128)
+    _keep.append(s)
+    port = s.getsockname()[1]
+    if backlog_full:
+        for _ in range(3):
+            c = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            c.setblocking(False)
+            c.connect_ex((ip, port))
+            _keep.append(c)
+        time.sleep(0.05)
+    return port
+
+
+def closed_port(ip):
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind((ip, 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def tcp_checks():
+    results = []
+    print("Fallback TCP:")
+    prober = LatencyProber(count=3, interval=0.01, timeout=TIMEOUT)
+
+    ip = '127.0.0.91'
+    filtered = [listener(ip, backlog_full=True) for _ in range(5)]
+    rtts, elapsed = timed(lambda: asyncio.run(prober._tcp_series(ip, filtered)))
+    results.append(check(f"Offline (5 portas em DROP): {elapsed:.2f}s, sequencial custaria {5 * TIMEOUT:.1f}s",
+                         rtts == [None] * 3 and elapsed < TIMEOUT * 2))
+
+    ip = '127.0.0.92'
+    ports = [listener(ip, backlog_full=True) for _ in range(4)] + [listener(ip)]
+    (port, rtt), elapsed = timed(lambda: asyncio.run(prober._first_answer(ip, ports)))
+    results.append(check(f"Só a última porta responde: porta certa em {elapsed * 1000:.1f}ms (RTT {rtt:.2f}ms)",
+                         port == ports[-1] and elapsed < TIMEOUT / 2))
+
+    ip = '127.0.0.93'
+    refused = [listener(ip, backlog_full=True), closed_port(ip)]
+    rtts, elapsed = timed(lambda: asyncio.run(prober._tcp_series(ip, refused)))
+    results.append(check(f"RST também mede o round-trip: {len(rtts)} amostras em {elapsed * 1000:.0f}ms",
+                         all(r is not None for r in rtts) and elapsed < TIMEOUT))
+    return results
+
+
+def fleet_checks():
+    results = []
+    print("\nRodada da frota:")
+    prober = LatencyProber(count=2, interval=0.01, timeout=TIMEOUT)
+    # Sem ICMP: força o fallback TCP (portas do tipo 'printer' trocadas pelas do teste)
+    import latency_prober
+    offline = [listener('127.0.0.95', backlog_full=True) for _ in range(3)]
+    latency_prober.TCP_PORTS_BY_TYPE['teste'] = tuple(offline)
+    original = latency_prober.ICMPProber
+    latency_prober.ICMPProber = type('NoICMP', (ICMPProber,), {'open': lambda self: False})
+    try:
+        targets = {i: (f"127.0.0.{100 + i}", 'teste') for i in range(20)}
+        for i in range(10):
+            targets[i] = ('127.0.0.95', 'teste')   # metade offline (DROP em todas as portas)
+        res, elapsed = timed(lambda: prober.probe_all(targets))
+    finally:
+        latency_prober.ICMPProber = original
+        del latency_prober.TCP_PORTS_BY_TYPE['teste']
+    alive = sum(1 for r in res.values() if r['alive'])
+    results.append(check(f"20 dispositivos (10 offline) em {elapsed:.2f}s: {alive} vivos via "
+                         f"{sorted({r['method'] for r in res.values() if r['method']})}",
+                         alive == 10 and elapsed < TIMEOUT * 3 and prober.stats['devices'] == 20))
+    s = summarize([1.0, None, 3.0, 2.0], 4)
+    results.append(check(f"summarize: {s}", s['loss'] == 25.0 and s['rtt'] == 2.0 and s['jitter'] == 1.5))
+    return results
+
+
+def icmp_checks():
+    results = []
+    print("\nICMP:")
+
+    async def run():
+        icmp = ICMPProber()
+        if not (icmp.open() and icmp.start(asyncio.get_running_loop())):
+            return None
+        prober = LatencyProber(count=3, interval=0.01, timeout=1.0)
+        try:
+            return await asyncio.gather(*(prober._icmp_series(icmp, '127.0.0.1') for _ in range(4)))
+        finally:
+            icmp.close()
+
+    series = asyncio.run(run())
+    if series is None:
+        print("  (sem privilégio para ICMP: não verificado)")
+        return results
+    flat = [r for s in series for r in s]
+    results.append(check(f"4 séries simultâneas ao mesmo host: {len(flat)} respostas, RTT máx {max(flat):.2f}ms",
+                         all(r is not None for r in flat) and max(flat) < 100))
+    return results
+
+
+if __name__ == "__main__":
+    try:
+        results = tcp_checks()
+        results += fleet_checks()
+        results += icmp_checks()
+    finally:
+        for s in _keep:
+            s.close()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,222 @@
+"""
+Verificação do buffer de ingestão de métricas (metrics_ingest.py), base isolada.
+
+1. add() só acumula; flush() grava tudo em uma transação (executemany) e atualiza
+   device_metric_latest.
+2. max_pending: o próprio add() dispara o flush antecipado.
+3. Flush concorrente com add(): nenhuma amostra perdida ou duplicada.
+4. Falha de gravação (ex.: 'database is locked'): o lote volta ao buffer e entra no
+   flush seguinte; lote que sempre falha é descartado após max_retries; estatísticas.
+5. Valor corrente de disco: mesma regra (mais recente; no empate, unidade mais cheia)
+   no lote, entre flushes e no backfill de migrate_metric_latest.
+
+Uso: python scripts/test_metric_ingest.py
+"""
+import io
+import sys
+import os
+import logging
+import contextlib
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+# Base isolada: nunca toca no netaudit.db real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_ingest_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from database import init_db, engine
+from metrics_ingest import MetricIngestBuffer, latest_rows
+from migrate_metric_latest import migrate_metric_latest
+
+logging.disable(logging.ERROR)
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def scalar(sql):
+    with engine.connect() as conn:
+        return conn.execute(text(sql)).scalar()
+
+
+def count_commits(fn):
+    commits = []
+    listener = lambda conn: commits.append(1)
+    event.listen(engine, 'commit', listener)
+    try:
+        value = fn()
+    finally:
+        event.remove(engine, 'commit', listener)
+    return value, len(commits)
+
+
+def buffer_checks():
+    results = []
+    print("Buffer:")
+    buf = MetricIngestBuffer()
+    now = datetime.now()
+    for device in range(1, 101):
+        for i, metric in enumerate(('cpu_usage', 'ram_usage', 'latency')):
+            buf.add(device, metric, float(device + i), '%', now)
+    stored_before = scalar("SELECT COUNT(*) FROM metrics")
+    written, commits = count_commits(buf.flush)
+    results.append(check(f"300 amostras acumuladas ({stored_before} no banco antes do flush), gravadas em {commits} transação",
+                         stored_before == 0 and written == 300 and commits == 1
+                         and scalar("SELECT COUNT(*) FROM metrics") == 300 and buf.pending() == 0))
+    results.append(check(f"Valor corrente: {scalar('SELECT COUNT(*) FROM device_metric_latest')} linhas em device_metric_latest",
+                         scalar("SELECT COUNT(*) FROM device_metric_latest") == 300
+                         and scalar("SELECT value FROM device_metric_latest WHERE device_id = 7 AND metric_type = 'ram_usage'") == 8.0))
+
+    later = now + timedelta(seconds=60)
+    buf.add(7, 'ram_usage', 55.0, '%', later)
+    buf.add(7, 'ram_usage', 12.0, '%', now - timedelta(seconds=60))   # amostra atrasada
+    buf.flush()
+    results.append(check("Amostra atrasada não sobrescreve o valor corrente mais novo",
+                         scalar("SELECT value FROM device_metric_latest WHERE device_id = 7 AND metric_type = 'ram_usage'") == 55.0))
+    results.append(check("Flush vazio não abre transação", count_commits(buf.flush) == (0, 0)))
+    return results
+
+
+def overflow_checks():
+    results = []
+    print("\nFlush antecipado e concorrência:")
+    buf = MetricIngestBuffer(max_pending=50)
+    before = scalar("SELECT COUNT(*) FROM metrics")
+    for i in range(120):
+        buf.add(500 + i % 10, 'latency', float(i), 'ms')
+    results.append(check(f"max_pending=50: {buf.stats['flushes']} flushes pelo add(), {buf.pending()} pendentes",
+                         buf.stats['flushes'] == 2 and buf.pending() == 20))
+    buf.flush()
+
+    buf = MetricIngestBuffer(max_pending=10 ** 6)
+    stop = threading.Event()
+
+    def flusher():
+        while not stop.is_set():
+            buf.flush()
+
+    t = threading.Thread(target=flusher)
+    t.start()
+    threads = [threading.Thread(target=lambda n=n: [buf.add(600 + n, 'jitter', float(i), 'ms') for i in range(500)])
+               for n in range(4)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    stop.set()
+    t.join()
+    buf.flush()
+    total = scalar("SELECT COUNT(*) FROM metrics") - before
+    results.append(check(f"4 coletores x 500 amostras com flush contínuo: {total - 120} gravadas ({buf.stats['flushes']} flushes)",
+                         total - 120 == 2000))
+    return results
+
+
+def error_checks():
+    results = []
+    print("\nFalha de gravação:")
+    buf = MetricIngestBuffer()
+    before = scalar("SELECT COUNT(*) FROM metrics")
+    for device in range(700, 710):
+        buf.add(device, 'cpu_usage', 10.0, '%')
+
+    def locked(conn, cursor, statement, *args):
+        if statement.startswith('INSERT INTO metrics'):
+            raise OperationalError(statement, None, Exception('database is locked'))
+
+    event.listen(engine, 'before_cursor_execute', locked)
+    try:
+        written = buf.flush()
+    finally:
+        event.remove(engine, 'before_cursor_execute', locked)
+    results.append(check(f"Banco travado: flush retorna {written}, {buf.pending()} amostras de volta ao buffer "
+                         f"(nova tentativa {buf.failures}/{buf.max_retries})",
+                         written == 0 and buf.pending() == 10 and buf.stats['errors'] == 1 and buf.stats['retries'] == 1))
+    buf.add(700, 'cpu_usage', 20.0, '%', datetime.now() + timedelta(seconds=5))
+    written = buf.flush()
+    results.append(check(f"Flush seguinte grava o lote que falhou + a amostra nova: {written} linhas",
+                         written == 11 and scalar("SELECT COUNT(*) FROM metrics") - before == 11
+                         and scalar("SELECT value FROM device_metric_latest WHERE device_id = 700") == 20.0
+                         and buf.failures == 0 and buf.pending() == 0))
+
+    buf = MetricIngestBuffer(max_retries=2)
+    buf.add(1, 'cpu_usage', 10.0, '%')
+    buf.add(None, 'cpu_usage', 10.0, '%')   # device_id nulo viola o schema: o lote sempre falha
+    attempts = [buf.flush() for _ in range(3)]
+    results.append(check(f"Lote inválido: {buf.stats['errors']} falhas, {buf.stats['dropped']} amostras descartadas "
+                         f"após {buf.max_retries} novas tentativas, sem exceção",
+                         attempts == [0, 0, 0] and buf.stats['dropped'] == 2 and buf.pending() == 0))
+    buf.add(1, 'cpu_usage', 11.0, '%')
+    buf.flush()
+    stats = buf.get_stats()
+    results.append(check(f"Estatísticas: {stats['ingested']} gravadas, último flush {stats['last_flush_rows']} linhas "
+                         f"em {stats['last_flush_ms']}ms",
+                         stats['ingested'] == 1 and stats['last_flush_rows'] == 1 and stats['pending'] == 0))
+    return results
+
+
+def current_disk(device_id):
+    with engine.connect() as conn:
+        return tuple(conn.execute(text("SELECT drive, value FROM device_metric_latest "
+                                       "WHERE device_id = :d AND metric_type = 'disk_usage'"), {'d': device_id}).one())
+
+
+def latest_rule_checks():
+    results = []
+    print("\nValor corrente de disco (unidade mais cheia):")
+    t1 = datetime(2026, 1, 1, 10, 0)
+    t2 = t1 + timedelta(minutes=5)
+    # Ciclo 1: D: mais cheia; ciclo 2: C: mais cheia, mas gravada antes de D: (ordem da consulta WMI)
+    cycles = [(t1, [('C:', 40.0), ('D:', 70.0), ('E:', 10.0)]),
+              (t2, [('C:', 85.0), ('D:', 60.0), ('E:', 20.0)])]
+    rows = [{'device_id': 900, 'metric_type': 'disk_usage', 'drive': d, 'value': v, 'unit': '%', 'timestamp': t}
+            for t, disks in cycles for d, v in disks]
+    picked = latest_rows(rows)
+    results.append(check(f"latest_rows no lote: {[(r['drive'], r['value']) for r in picked]}",
+                         [(r['drive'], r['value']) for r in picked] == [('C:', 85.0)]))
+
+    buf = MetricIngestBuffer()
+    for t, disks in cycles:
+        for drive, value in disks:
+            buf.add(901, 'disk_usage', value, '%', t, drive=drive)
+            buf.flush()   # pior caso: cada unidade em um flush
+    results.append(check(f"Uma unidade por flush: {current_disk(901)}", current_disk(901) == ('C:', 85.0)))
+
+    buf = MetricIngestBuffer()
+    for t, disks in cycles:
+        for drive, value in disks:
+            buf.add(902, 'disk_usage', value, '%', t, drive=drive)
+    buf.flush()
+    ingested = current_disk(902)
+
+    # Backfill: mesmo histórico gravado sem device_metric_latest, depois a migração
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM device_metric_latest"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate_metric_latest()
+    migrated = current_disk(902)
+    results.append(check(f"Ingestão {ingested} e backfill {migrated} concordam (MAX(id) daria E:)",
+                         ingested == migrated == ('C:', 85.0) and current_disk(901) == ('C:', 85.0)))
+
+    buf.add(902, 'disk_usage', 30.0, '%', t2 + timedelta(minutes=5), drive='C:')
+    buf.flush()
+    results.append(check(f"Primeiro flush depois da migração segue a mesma regra: {current_disk(902)}",
+                         current_disk(902) == ('C:', 30.0)))
+    return results
+
+
+if __name__ == "__main__":
+    init_db()
+    results = buffer_checks()
+    results += overflow_checks()
+    results += error_checks()
+    results += latest_rule_checks()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
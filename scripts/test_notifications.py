@@ -0,0 +1,283 @@
+"""
+Verificação do despachante de notificações contra SMTP e webhook locais (base isolada).
+
+1. Criar alertas só grava no outbox: a thread de coleta não espera SMTP/HTTP lentos.
+2. Digest: alertas da janela saem em poucos e-mails/POSTs, cada alerta exatamente uma vez.
+3. Dedup de alerta igual pendente, severidade imediata sem esperar a janela.
+4. Retentativa com backoff (webhook falhando), 'dead' após esgotar tentativas (SMTP fora do ar),
+   limite de envios por minuto e recuperação de entregas interrompidas.
+5. /api/settings/notifications: canais salvos em settings['notifications'], senha nunca devolvida,
+   valor inválido recusado, despachante enxerga a mudança sem esperar a releitura.
+
+Uso: python scripts/test_notifications.py [--alerts 200]
+"""
+import sys
+import os
+import time
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+# Base isolada: nunca toca no netaudit.db real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_notify_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import init_db, get_session
+from models import Device, Trigger, NotificationOutbox
+from notification_dispatcher import NotificationDispatcher, NotificationChannel
+import alert_manager as am
+from notification_sinks import SmtpSink, HttpReceiver
+
+# Um log por alerta criado poluiria a saída
+logging.disable(logging.WARNING)
+
+SMTP_PORT = 2526
+HTTP_PORT = 8026
+SLOW = 1.0  # atraso de cada entrega nos destinos
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def config(**overrides):
+    cfg = {
+        'batch_seconds': 0.5,
+        'max_batch': 50,
+        'retry_base_seconds': 0.2,
+        'retry_max_seconds': 1,
+        'rate_limit_per_minute': {'email': 600, 'webhook': 600},
+        'email': {'enabled': True, 'smtp_host': '127.0.0.1', 'smtp_port': SMTP_PORT, 'to': ['noc@example.com']},
+        'webhook': {'enabled': True, 'url': f'http://127.0.0.1:{HTTP_PORT}/hook', 'headers': {'X-Token': 'abc'}},
+    }
+    for key, value in overrides.items():
+        cfg[key] = dict(cfg[key], **value) if isinstance(value, dict) and isinstance(cfg.get(key), dict) else value
+    return cfg
+
+
+def outbox(session, **filters):
+    session.expire_all()
+    q = session.query(NotificationOutbox)
+    for k, v in filters.items():
+        q = q.filter(getattr(NotificationOutbox, k) == v)
+    return q.all()
+
+
+def reset(session):
+    for obj in [o for o in session.identity_map.values() if isinstance(o, NotificationOutbox)]:
+        session.expunge(obj)
+    session.query(NotificationOutbox).delete()
+    session.commit()
+
+
+def drain(dispatcher, session, timeout=15):
+    """Roda o coordenador até não restar pendência"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        dispatcher.run_once()
+        dispatcher.wait_idle()
+        if not outbox(session, status='pending') and not outbox(session, status='sending'):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def setup(session, count):
+    session.add_all([Device(ip=f'10.4.{i // 250}.{i % 250 + 1}', hostname=f'srv{i}', device_type='server')
+                     for i in range(count)])
+    session.add_all([
+        Trigger(name='CPU Alta', metric_type='cpu_usage', operator='>', threshold=95, duration_seconds=0,
+                severity='warning', notify_email=True, notify_webhook=True),
+        Trigger(name='Servidor Parado', metric_type='latency', operator='>', threshold=1000, duration_seconds=0,
+                severity='disaster', notify_email=True, notify_webhook=True),
+    ])
+    session.commit()
+    return session.query(Device).order_by(Device.id).all(), session.query(Trigger).order_by(Trigger.id).all()
+
+
+def delivery_checks(session, devices, triggers, smtp, http):
+    results = []
+    dispatcher = NotificationDispatcher(config=config(), workers=4)
+    am.notification_dispatcher = dispatcher
+    dispatcher.start()
+    smtp.delay = http.delay = SLOW
+    cpu = triggers[0]
+
+    start = time.time()
+    for d in devices:
+        am.alert_manager.create_alert(d.id, cpu, 99.0, session)
+    session.commit()
+    elapsed = time.time() - start
+    count = len(devices)
+    print(f"{count} alertas criados (destinos com {SLOW}s de atraso por entrega):")
+    results.append(check(f"Cada alerta gravado no outbox uma vez por canal: {len(outbox(session))} linhas",
+                         len(outbox(session)) == count * 2))
+    # Entrega síncrona custaria SLOW por alerta; o limite fica uma ordem de grandeza abaixo disso
+    per_alert = elapsed / count
+    results.append(check(f"Thread de coleta não espera a entrega: {per_alert * 1000:.2f}ms por alerta "
+                         f"(limite {SLOW * 100:.0f}ms)", per_alert < SLOW / 10))
+
+    deadline = time.time() + 20
+    while time.time() < deadline and len(outbox(session, status='sent')) < count * 2:
+        time.sleep(0.2)
+    dispatcher.stop(wait=True)
+    emails = smtp.messages
+    posts = http.received
+    alert_ids = [a['alert_id'] for p in posts for a in p['json']['alerts']]
+    body = "".join(m['message'].get_payload() for m in emails)
+    results.append(check(f"Digest: {len(emails)} e-mails e {len(posts)} POSTs para {count} alertas "
+                         f"(assunto: {emails[0]['message']['Subject'] if emails else '-'!r})",
+                         0 < len(emails) <= -(-count // 50) + 1 and 0 < len(posts) <= -(-count // 50) + 1))
+    results.append(check("Cada alerta entregue exatamente uma vez por canal",
+                         sorted(alert_ids) == sorted(set(alert_ids)) and len(alert_ids) == count
+                         and all(f"srv{i}" in body for i in range(count))))
+    results.append(check("Cabeçalhos do webhook e destinatários do e-mail aplicados",
+                         posts[0]['headers'].get('X-Token') == 'abc' and emails[0]['to'] == ['noc@example.com']))
+    smtp.delay = http.delay = 0
+    return results
+
+
+def policy_checks(session, devices, triggers, smtp, http):
+    results = []
+    print("\nPolítica de entrega:")
+    reset(session)
+    dispatcher = NotificationDispatcher(config=config(batch_seconds=3600))
+    alert = type('A', (), {'id': 1, 'device_id': devices[0].id, 'title': 'CPU Alta', 'severity': 'warning',
+                           'message': 'm', 'triggered_at': datetime.now()})
+    dispatcher.enqueue(session, alert, triggers[0])
+    dispatcher.enqueue(session, alert, triggers[0])
+    session.commit()
+    rows = outbox(session, channel='email')
+    results.append(check(f"Dedup: mesmo alerta pendente = 1 linha com {rows[0].occurrences} ocorrências",
+                         len(rows) == 1 and rows[0].occurrences == 2))
+    results.append(check("Janela de 1h aberta: nada sai ainda", dispatcher.run_once() == 0))
+    urgent = type('A', (), {'id': 2, 'device_id': devices[1].id, 'title': 'Servidor Parado', 'severity': 'disaster',
+                            'message': 'down', 'triggered_at': datetime.now()})
+    dispatcher.enqueue(session, urgent, triggers[1])
+    session.commit()
+    sent_before = len(smtp.messages)
+    results.append(check("Severidade disaster sai sem esperar a janela (levando as pendentes junto)",
+                         dispatcher.run_once() == 2 and len(smtp.messages) == sent_before + 1
+                         and not outbox(session, status='pending')))
+
+    reset(session)
+    http.fail_first = 2
+    dispatcher = NotificationDispatcher(config=config(email={'enabled': False}))
+    dispatcher.enqueue(session, urgent, triggers[1])
+    session.commit()
+    dispatcher.run_once()
+    row = outbox(session)[0]
+    first_retry = row.next_attempt_at
+    results.append(check(f"Webhook 500: volta para a fila com backoff (tentativa {row.attempts}, "
+                         f"próxima em {(first_retry - datetime.now()).total_seconds():.2f}s)",
+                         row.status == 'pending' and row.attempts == 1 and first_retry > datetime.now()))
+    results.append(check("Retentativas até entregar (3ª tentativa)",
+                         drain(dispatcher, session) and outbox(session)[0].status == 'sent'
+                         and outbox(session)[0].attempts == 3))
+
+    reset(session)
+    dispatcher = NotificationDispatcher(config=config(max_attempts=3, webhook={'enabled': False},
+                                                      email={'smtp_port': 1}))
+    dispatcher.enqueue(session, urgent, triggers[1])
+    session.commit()
+    drain(dispatcher, session)
+    row = outbox(session)[0]
+    results.append(check(f"SMTP fora do ar: 'dead' após {row.attempts} tentativas ({row.last_error[:40]}...)",
+                         row.status == 'dead' and row.attempts == 3))
+
+    reset(session)
+    dispatcher = NotificationDispatcher(config=config(max_batch=5, rate_limit_per_minute={'webhook': 2},
+                                                      email={'enabled': False}, batch_seconds=0))
+    posts_before = len(http.received)
+    for i in range(20):
+        a = type('A', (), {'id': 100 + i, 'device_id': devices[i].id, 'title': 'CPU Alta', 'severity': 'warning',
+                           'message': 'x', 'triggered_at': datetime.now()})
+        dispatcher.enqueue(session, a, triggers[0])
+    session.commit()
+    dispatcher.run_once()
+    dispatcher.run_once()
+    results.append(check(f"Limite de 2/min: {len(http.received) - posts_before} POSTs, "
+                         f"{len(outbox(session, status='pending'))} aguardando a cota",
+                         len(http.received) - posts_before == 2 and len(outbox(session, status='pending')) == 10
+                         and dispatcher.stats['rate_limited'] >= 1))
+
+    reset(session)
+    session.add(NotificationOutbox(channel='webhook', dedup_key='x', severity='high', subject='s', body='b',
+                                   payload={}, status='sending', next_attempt_at=datetime.now() - timedelta(minutes=1)))
+    session.commit()
+    dispatcher = NotificationDispatcher(config=config(email={'enabled': False}), poll_seconds=0.1)
+    dispatcher.start()
+    time.sleep(1.5)
+    dispatcher.stop(wait=True)
+    results.append(check("Entrega interrompida ('sending' após queda) é retomada no start",
+                         outbox(session)[0].status == 'sent'))
+    return results
+
+
+def settings_checks():
+    results = []
+    print("\nConfiguração pela tela:")
+    from flask import Flask
+    from utils import load_general_settings
+    from blueprints.settings_management import settings_bp
+    app = Flask(__name__)
+    app.secret_key = 'teste'
+    app.register_blueprint(settings_bp)
+    c = app.test_client()
+    with c.session_transaction() as s:
+        s['username'] = 'admin'
+        s['role'] = 'admin'
+
+    dispatcher = NotificationDispatcher()
+    saved = c.post('/api/settings/notifications', json={
+        'email': {'enabled': True, 'smtp_host': 'smtp.local', 'smtp_port': '587', 'starttls': True,
+                  'password': 'segredo', 'to': 'noc@example.com, ti@example.com'},
+        'webhook': {'enabled': True, 'url': 'https://hooks.example.com/x'}})
+    stored = load_general_settings().get('notifications', {})
+    results.append(check(f"POST grava settings['notifications']: to={stored.get('email', {}).get('to')}",
+                         saved.status_code == 200 and stored['email']['smtp_port'] == 587
+                         and stored['email']['to'] == ['noc@example.com', 'ti@example.com']
+                         and stored['email']['password'] == 'segredo'))
+    got = c.get('/api/settings/notifications').get_json()
+    c.post('/api/settings/notifications', json={'email': {'password': ''}})
+    results.append(check(f"GET sem a senha (password_set={got['email'].get('password_set')}); senha vazia mantém a salva",
+                         'password' not in got['email'] and got['email']['password_set']
+                         and load_general_settings()['notifications']['email']['password'] == 'segredo'))
+    bad = c.post('/api/settings/notifications', json={'email': {'smtp_port': 'abc'}})
+    results.append(check(f"Porta inválida: {bad.status_code}", bad.status_code == 400))
+    dispatcher.reload_config()
+    results.append(check("Despachante com os dois canais habilitados após reload_config()",
+                         dispatcher.channels['email'].enabled() and dispatcher.channels['webhook'].enabled()))
+    try:
+        type('SemSend', (NotificationChannel,), {})({})
+        abstract = False
+    except TypeError:
+        abstract = True
+    results.append(check("Canal sem send() não é instanciável", abstract))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verificação do despachante de notificações")
+    parser.add_argument('--alerts', type=int, default=200)
+    args = parser.parse_args()
+    init_db()
+    session = get_session()
+    session.expire_on_commit = False
+    devices, triggers = setup(session, args.alerts)
+    smtp = SmtpSink(SMTP_PORT).start()
+    http = HttpReceiver(HTTP_PORT).start()
+    try:
+        results = delivery_checks(session, devices, triggers, smtp, http)
+        results += policy_checks(session, devices, triggers, smtp, http)
+        results += settings_checks()
+    finally:
+        smtp.stop()
+        http.stop()
+        session.close()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,160 @@
+"""
+Verificação da gravação em lote dos resultados de scan (scanner/persistence.py), base isolada.
+
+1. upsert_devices: uma transação, deduplicação por IP (último vence), campos ausentes
+   preservam o valor gravado, lotes com conjuntos de campos diferentes.
+2. DeviceWriter: grava ao encher o buffer ou depois de max_delay.
+3. Falha de gravação ('database is locked'): o lote volta ao buffer e é regravado;
+   descartado só depois de max_retries; close() espera as novas tentativas.
+
+Uso: python scripts/test_persistence.py
+"""
+import sys
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+
+# Base isolada: nunca toca no netaudit.db real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_persistence_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import init_db, get_session, engine
+from models import Device
+import scanner.persistence as persistence
+from scanner.persistence import DeviceWriter, upsert_devices
+
+logging.disable(logging.ERROR)
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def devices():
+    session = get_session()
+    try:
+        return {d.ip: d for d in session.query(Device).all()}
+    finally:
+        session.close()
+
+
+def count_commits(fn):
+    commits = []
+    from sqlalchemy import event
+    listener = lambda conn: commits.append(1)
+    event.listen(engine, 'commit', listener)
+    try:
+        value = fn()
+    finally:
+        event.remove(engine, 'commit', listener)
+    return value, len(commits)
+
+
+def upsert_checks():
+    results = []
+    print("upsert_devices:")
+    full = [{'ip': f"10.1.0.{i}", 'hostname': f"pc{i}", 'device_type': 'windows', 'vendor': 'Dell',
+             'os_detail': 'Windows 11', 'cpu': 8, 'ram': '16 GB'} for i in range(1, 51)]
+    written, commits = count_commits(lambda: upsert_devices(full + [dict(full[0], hostname='pc1-novo')]))
+    rows = devices()
+    results.append(check(f"{written} dispositivos em {commits} transação, duplicado do lote: último vence",
+                         written == 50 and commits == 1 and rows['10.1.0.1'].hostname == 'pc1-novo'
+                         and rows['10.1.0.2'].cpu == '8'))
+
+    seen_before = rows['10.1.0.3'].last_seen
+    time.sleep(0.01)
+    partial = [{'ip': '10.1.0.3'},                                   # dispensado pelo incremental
+               {'ip': '10.1.0.4', 'hostname': 'pc4', 'os_detail': 'Windows 10'},
+               {'ip': '10.1.0.99', 'hostname': 'novo', 'device_type': 'printer'}]
+    written, commits = count_commits(lambda: upsert_devices(partial))
+    rows = devices()
+    results.append(check("Só last_seen: resto preservado",
+                         rows['10.1.0.3'].hostname == 'pc3' and rows['10.1.0.3'].vendor == 'Dell'
+                         and rows['10.1.0.3'].last_seen > seen_before))
+    results.append(check("Campos parciais: informados atualizados, ausentes preservados; novo IP inserido",
+                         rows['10.1.0.4'].os_detail == 'Windows 10' and rows['10.1.0.4'].ram == '16 GB'
+                         and rows['10.1.0.99'].device_type == 'printer' and written == 3 and commits == 1))
+    return results
+
+
+def writer_checks():
+    results = []
+    print("\nDeviceWriter:")
+    writer = DeviceWriter(max_batch=10, max_delay=0.2)
+    for i in range(25):
+        writer.add({'ip': f"10.2.0.{i}", 'hostname': f"h{i}"})
+    results.append(check(f"Buffer cheio: {writer.stats['flushes']} lotes gravados, {len(writer.buffer)} aguardando",
+                         writer.stats['flushes'] == 2 and len(writer.buffer) == 5))
+    writer.maybe_flush()
+    early = len(writer.buffer)
+    time.sleep(0.25)
+    writer.maybe_flush()
+    results.append(check("max_delay: não grava antes, grava depois", early == 5 and not writer.buffer
+                         and len([ip for ip in devices() if ip.startswith('10.2.0.')]) == 25))
+    return results
+
+
+def retry_checks():
+    results = []
+    print("\nFalha de gravação:")
+    real = persistence.upsert_devices
+    failures = {'left': 0, 'calls': 0}
+
+    def flaky(items):
+        failures['calls'] += 1
+        if failures['left']:
+            failures['left'] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return real(items)
+
+    persistence.upsert_devices = flaky
+    try:
+        failures['left'] = 2
+        writer = DeviceWriter(max_batch=5, max_delay=10, max_retries=3, retry_delay=0.05)
+        for i in range(5):
+            writer.add({'ip': f"10.3.0.{i}", 'hostname': f"v{i}"})
+        kept = len(writer.buffer)
+        writer.add({'ip': '10.3.0.0', 'hostname': 'v0-novo'})   # chega durante a espera: não força gravação
+        calls_waiting = failures['calls']
+        time.sleep(0.06)
+        writer.maybe_flush()
+        time.sleep(0.11)
+        writer.maybe_flush()
+        rows = devices()
+        results.append(check(f"Lote bloqueado volta ao buffer ({kept} itens) e é regravado na 3ª tentativa",
+                             kept == 5 and calls_waiting == 1 and not writer.buffer and writer.stats['retries'] == 2
+                             and all(f"10.3.0.{i}" in rows for i in range(5))))
+        results.append(check("Resultado mais novo do IP vence após a regravação", rows['10.3.0.0'].hostname == 'v0-novo'))
+
+        failures['left'] = 2
+        writer = DeviceWriter(max_batch=100, max_delay=10, max_retries=3, retry_delay=0.05)
+        writer.add({'ip': '10.3.1.1', 'hostname': 'fim'})
+        start = time.time()
+        writer.close()
+        results.append(check(f"close() espera as novas tentativas ({time.time() - start:.2f}s) e grava",
+                             not writer.buffer and '10.3.1.1' in devices()))
+
+        failures['left'] = 100
+        writer = DeviceWriter(max_batch=100, max_delay=10, max_retries=2, retry_delay=0.01)
+        writer.add({'ip': '10.3.2.1'})
+        writer.close()
+        results.append(check(f"Falha persistente: descartado após {writer.max_retries} novas tentativas "
+                             f"({writer.stats['dropped']} itens), close() retorna",
+                             not writer.buffer and writer.stats['dropped'] == 1 and writer.stats['errors'] == 3))
+    finally:
+        persistence.upsert_devices = real
+    return results
+
+
+if __name__ == "__main__":
+    init_db()
+    results = upsert_checks()
+    results += writer_checks()
+    results += retry_checks()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,180 @@
+"""
+Verificação do pipeline descoberta -> auditoria (scanner/pipeline.py), sem rede.
+
+1. Estágios sobrepostos: o tempo total tende a max(descoberta, auditoria), não à soma;
+   a auditoria começa antes do fim da descoberta e os resultados chegam na thread chamadora.
+2. Back-pressure: a fila limitada segura o produtor quando os auditores não acompanham.
+3. Encerramento: should_stop interrompe a descoberta, exceções viram falha, run() sempre retorna.
+4. Prazo por auditoria: um host travado vira falha e não segura o scan.
+
+Uso: python scripts/test_pipeline.py
+"""
+import sys
+import os
+import time
+import logging
+import threading
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.pipeline import ScanPipeline
+
+logging.disable(logging.ERROR)
+
+HOSTS = 40
+DISCOVERY_GAP = 0.01
+AUDIT_COST = 0.04
+WORKERS = 4
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def slow_source(count, gap=DISCOVERY_GAP, log=None):
+    for i in range(count):
+        time.sleep(gap)
+        if log is not None:
+            log.append(('discovered', i, time.time()))
+        yield {'IP': f"10.0.0.{i + 1}", 'n': i}
+
+
+def overlap_checks():
+    results = []
+    print(f"Estágios sobrepostos ({HOSTS} hosts, {WORKERS} auditores):")
+    events = []
+    caller = threading.current_thread()
+    threads = set()
+
+    def audit(host):
+        events.append(('audit', host['n'], time.time()))
+        time.sleep(AUDIT_COST)
+        return {'ip': host['IP']}
+
+    def on_result(host, result):
+        threads.add(threading.current_thread())
+
+    pipeline = ScanPipeline(audit, audit_workers=WORKERS, queue_size=8)
+    start = time.time()
+    stats = pipeline.run(slow_source(HOSTS, log=events), on_result, progress_interval=0.05)
+    elapsed = time.time() - start
+    discovery = HOSTS * DISCOVERY_GAP
+    audit_total = HOSTS * AUDIT_COST / WORKERS
+    first_audit = min(t for kind, _, t in events if kind == 'audit')
+    last_discovery = max(t for kind, _, t in events if kind == 'discovered')
+    results.append(check(f"{elapsed:.2f}s contra {discovery + audit_total:.2f}s em série "
+                         f"(descoberta {discovery:.2f}s, auditoria {audit_total:.2f}s)",
+                         elapsed < (discovery + audit_total) * 0.85))
+    results.append(check("Auditoria começa antes do fim da descoberta", first_audit < last_discovery))
+    results.append(check(f"Todos auditados ({stats['audited']}/{HOSTS}), resultados só na thread chamadora",
+                         stats['audited'] == HOSTS and stats['discovered'] == HOSTS and threads == {caller}))
+    return results
+
+
+def backpressure_checks():
+    results = []
+    print("\nBack-pressure:")
+    queue_size = 4
+    gate = threading.Event()
+    peak = [0]
+
+    def audit(host):
+        gate.wait()
+        return {'ip': host['IP']}
+
+    pipeline = ScanPipeline(audit, audit_workers=2, queue_size=queue_size)
+
+    def watch():
+        while not gate.is_set():
+            peak[0] = max(peak[0], pipeline.stats['discovered'])
+            time.sleep(0.01)
+
+    def release():
+        time.sleep(0.3)
+        peak[0] = pipeline.stats['discovered']
+        gate.set()
+
+    threading.Thread(target=watch, daemon=True).start()
+    threading.Thread(target=release, daemon=True).start()
+    stats = pipeline.run(slow_source(HOSTS, gap=0), lambda h, r: None, progress_interval=0.05)
+    # 2 hosts presos nos auditores + fila cheia (+1 put em andamento)
+    results.append(check(f"Auditores parados: descoberta segurou em {peak[0]} hosts (fila {queue_size})",
+                         peak[0] <= queue_size + 2 + 1))
+    results.append(check(f"Liberados: {stats['audited']}/{HOSTS} auditados", stats['audited'] == HOSTS))
+    return results
+
+
+def shutdown_checks():
+    results = []
+    print("\nEncerramento:")
+    stop = threading.Event()
+
+    def audit(host):
+        if host['n'] == 3:
+            raise RuntimeError("falha simulada")
+        if host['n'] == 5:
+            stop.set()
+        return None if host['n'] == 4 else {'ip': host['IP']}
+
+    got = []
+    pipeline = ScanPipeline(audit, audit_workers=2, queue_size=2)
+    start = time.time()
+    stats = pipeline.run(slow_source(HOSTS), lambda h, r: got.append((h['n'], r)),
+                         should_stop=stop.is_set, progress_interval=0.05)
+    elapsed = time.time() - start
+    results.append(check(f"should_stop: descoberta parou em {stats['discovered']} de {HOSTS} e run() retornou em {elapsed:.2f}s",
+                         stats['discovered'] < HOSTS and stats['discovery_done'] and elapsed < 1))
+    results.append(check(f"Exceção e host offline contam como falha ({stats['failed']}), todos entregues",
+                         stats['failed'] == 2 and len(got) == stats['discovered'] == stats['audited']))
+
+    def broken_source():
+        yield {'IP': '10.0.0.1', 'n': 0}
+        raise OSError("descoberta quebrou")
+
+    stats = ScanPipeline(lambda h: {'ip': h['IP']}, audit_workers=2).run(broken_source(), lambda h, r: None,
+                                                                        progress_interval=0.05)
+    results.append(check("Erro na descoberta: auditores encerram com o que já chegou",
+                         stats['discovery_done'] and stats['audited'] == 1))
+    return results
+
+
+def deadline_checks():
+    results = []
+    print("\nPrazo por auditoria:")
+    hang = threading.Event()
+
+    def audit(host):
+        if host['n'] in (2, 7):
+            hang.wait()  # WMI/SNMP travado
+            return {'ip': host['IP'], 'late': True}
+        time.sleep(0.02)
+        return {'ip': host['IP']}
+
+    got = {}
+    progress = []
+    pipeline = ScanPipeline(audit, audit_workers=2, queue_size=4, audit_timeout=0.3)
+    start = time.time()
+    stats = pipeline.run(slow_source(20), lambda h, r: got.__setitem__(h['n'], r),
+                         on_progress=lambda p: progress.append(p.stats['audited']), progress_interval=0.05)
+    elapsed = time.time() - start
+    hang.set()
+    time.sleep(0.05)
+    results.append(check(f"2 auditorias travadas: run() retornou em {elapsed:.2f}s com {stats['timed_out']} vencidas",
+                         elapsed < 1.5 and stats['timed_out'] == 2 and stats['failed'] == 2))
+    results.append(check(f"Hosts vencidos entregues como falha, os outros {sum(1 for r in got.values() if r)} auditados",
+                         got.get(2) is None and got.get(7) is None and len(got) == 20
+                         and sum(1 for r in got.values() if r) == 18 and stats['audited'] == 20))
+    results.append(check("Resultado tardio do auditor abandonado é descartado",
+                         not any(r and r.get('late') for r in got.values()) and pipeline.stats['audited'] == 20))
+    return results
+
+
+if __name__ == "__main__":
+    results = overlap_checks()
+    results += backpressure_checks()
+    results += shutdown_checks()
+    results += deadline_checks()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,205 @@
+"""
+Verificação da agenda adaptativa do Sentinel (poll_scheduler) com relógio simulado.
+
+1. Política: ordem EDF, backoff de offline, crescimento para ativos sem mudança,
+   aceleração com trigger pendente, deadline expirado e inventário removido.
+2. Simulação de 1h de uma frota mista em um pool de 25 workers (eventos discretos),
+   comparada ao ciclo fixo antigo (todos a cada 60s, espera global de 50s).
+
+Uso: python scripts/test_poll_scheduler.py
+"""
+import sys
+import os
+import heapq
+import random
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poll_scheduler import PollScheduler, MAX_BACKOFF, MIN_INTERVAL, DEADLINES
+
+WORKERS = 25
+TICK = 2
+HOUR = 3600
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def policy_checks():
+    results = []
+    sched = PollScheduler(intervals={'windows': 60, 'printer': 300}, device_intervals={3: 30})
+    sched.sync([(1, 'windows'), (2, 'printer'), (3, 'windows')], now=0)  # startup: fase aleatória no próprio intervalo
+    early = len(sched.pop_due(now=0))
+    for device_id in (1, 2, 3):
+        sched.release(device_id)
+    due = sched.pop_due(now=300)
+    results.append(check(f"Startup: fase espalhada no próprio intervalo ({early} vencidos em t=0, todos até t=300)",
+                         len(due) + early == 3))
+    for device_id in (1, 2, 3):
+        sched.complete(device_id, fingerprint=('v', device_id), now=300)
+    order = []
+    for t in range(301, 700):
+        order += [d for d, _, _ in sched.pop_due(now=t)]
+    results.append(check(f"EDF: override por dispositivo (30s) vence antes de windows (60s) e printer (300s): {order[:3]}",
+                         order[:3] == [3, 1, 2]))
+
+    s = PollScheduler(intervals={'windows': 60})
+    s.sync([(1, 'windows')], now=0)
+    s.pop_due(now=100)
+    intervals = []
+    for i in range(6):
+        intervals.append(s.complete(1, online=False, now=100))
+        s.pop_due(now=10_000_000)
+    results.append(check(f"Offline: backoff {intervals} (teto {MAX_BACKOFF}s)",
+                         intervals[:3] == [120, 240, 480] and intervals[-1] == MAX_BACKOFF))
+    s.complete(1, online=True, fingerprint='a', now=0)
+    results.append(check("Voltou online: intervalo base", s.complete(1, fingerprint='b', now=0) == 60))
+
+    grow = []
+    for i in range(5):
+        s.pop_due(now=10_000_000)
+        grow.append(s.complete(1, fingerprint='b', now=0))
+    results.append(check(f"Sem mudança: {grow} (até 4x base)", grow[0] == 90 and grow[-1] == 240))
+    s.pop_due(now=10_000_000)
+    fast = s.complete(1, fingerprint='b', pending_window=90, now=0)
+    results.append(check(f"Trigger pendente (duração 90s): próximo em {fast}s", fast == 30))
+    s.pop_due(now=10_000_000)
+    results.append(check(f"Trigger pendente curto (15s): piso de {MIN_INTERVAL}s",
+                         s.complete(1, fingerprint='c', pending_window=15, now=0) == MIN_INTERVAL))
+
+    offline = []
+    for i in range(3):
+        s.pop_due(now=10_000_000)
+        offline.append(s.complete(1, online=False, pending_window=120, now=0))
+    results.append(check(f"Offline com trigger de inacessível pendente (120s): {offline}, sem backoff além de 120/3",
+                         offline == [40, 40, 40]))
+    s.pop_due(now=10_000_000)
+    s.expire(1, now=0, pending_window=120)
+    results.append(check("Deadline expirado com trigger pendente: reagendado no mesmo teto",
+                         s._devices[1].due == 40))
+    s.release(1)
+    s.complete(1, fingerprint='d', now=0)
+
+    s.pop_due(now=10_000_000)
+    s.expire(1, now=0)
+    results.append(check("Deadline expirado: fica 'running' até a thread voltar; não é redespachado",
+                         s.pop_due(now=10_000_000) == [] and s.stats['skipped_running'] == 1))
+    s.release(1)
+    results.append(check("Após release volta a ser despachado", len(s.pop_due(now=20_000_000)) == 1))
+
+    s.sync([], now=0)
+    results.append(check("Removido do inventário: entradas antigas ignoradas", s.pop_due(now=30_000_000) == []))
+    return results
+
+
+def build_fleet(rng):
+    """[(device_id, tipo, duração da coleta em s, online, estável)]"""
+    fleet = []
+    n = 0
+    for kind, count, duration, offline, stable in (
+        ('windows', 290, 3.0, 0, False),
+        ('windows', 10, 60.0, 0, False),   # hosts WMI lentos (travam até o timeout)
+        ('windows', 40, 1.0, 40, False),   # desligados
+        ('server', 30, 4.0, 0, False),
+        ('printer', 200, 1.5, 10, True),
+        ('network', 100, 2.0, 0, False),
+    ):
+        for i in range(count):
+            n += 1
+            fleet.append((n, kind, duration * rng.uniform(0.7, 1.3), i >= offline, stable))
+    return fleet
+
+
+def simulate_adaptive(fleet, rng):
+    by_id = {d[0]: d for d in fleet}
+    sched = PollScheduler(intervals={})
+    sched.sync([(d[0], d[1]) for d in fleet], now=0)
+    workers = [0.0] * WORKERS        # instante em que cada worker fica livre
+    finish = []                      # (fim, device_id, deadline)
+    polls = {}
+    expired = []                     # (deadline, device_id): o despachante expira no tick seguinte
+    slow_timeouts = 0
+    t = 0.0
+    while t < HOUR:
+        for deadline, device_id in [e for e in expired if e[0] <= t]:
+            expired.remove((deadline, device_id))
+            sched.expire(device_id, now=t)
+            slow_timeouts += by_id[device_id][2] > 30
+        while finish and finish[0][0] <= t:
+            end, device_id, deadline = heapq.heappop(finish)
+            if end > deadline:
+                sched.release(device_id)
+                continue
+            _, kind, _, online, stable = by_id[device_id]
+            fp = 'same' if stable else rng.random()
+            pending = 90 if device_id % 97 == 0 else None
+            sched.complete(device_id, online=online, fingerprint=fp, pending_window=pending, now=end)
+        for device_id, kind, lag in sched.pop_due(now=t):
+            _, _, duration, online, _ = by_id[device_id]
+            duration = duration if online else 1.0
+            w = min(range(WORKERS), key=workers.__getitem__)
+            start = max(t, workers[w])
+            deadline = start + DEADLINES.get(kind, 30)  # prazo conta do início no worker
+            workers[w] = start + duration
+            heapq.heappush(finish, (start + duration, device_id, deadline))
+            if start + duration > deadline:
+                expired.append((deadline, device_id))
+            polls[kind] = polls.get(kind, 0) + 1
+        t += TICK
+    return polls, sched, slow_timeouts
+
+
+def simulate_legacy(fleet):
+    """Ciclo antigo: a cada 60s todos vão para o pool; o que não termina em 50s é descartado"""
+    polls = {}
+    missed = 0
+    for cycle in range(HOUR // 60):
+        workers = [0.0] * WORKERS
+        for device_id, kind, duration, online, _ in fleet:
+            w = min(range(WORKERS), key=workers.__getitem__)
+            workers[w] += duration if online else 1.0
+            if workers[w] > 50:
+                missed += 1
+            else:
+                polls[kind] = polls.get(kind, 0) + 1
+    return polls, missed
+
+
+def simulation_checks():
+    results = []
+    rng = random.Random(7)
+    fleet = build_fleet(rng)
+    legacy, missed = simulate_legacy(fleet)
+    polls, sched, slow_timeouts = simulate_adaptive(fleet, rng)
+    snap = sched.snapshot()
+    lag = snap['lag']
+
+    print(f"\nFrota de {len(fleet)} ativos, 1h, {WORKERS} workers:")
+    print(f"  Ciclo fixo antigo: {sum(legacy.values())} coletas, {missed} perdidas no timeout global de 50s")
+    print(f"  Agenda adaptativa: {sum(polls.values())} coletas, {snap['timeouts']} deadlines estourados")
+    for kind in ('windows', 'server', 'printer', 'network'):
+        print(f"    {kind:<8} antigo {legacy.get(kind, 0):>6}  adaptativo {polls.get(kind, 0):>6}")
+    print(f"  Atraso de despacho: p50 {lag['p50']}s, p95 {lag['p95']}s, máx {lag['max']}s")
+
+    results.append(check("Ciclo antigo perde coletas quando o pool satura", missed > 0))
+    results.append(check(f"Adaptativo: atraso p95 ({lag['p95']}s) abaixo de um tick + folga", lag['p95'] <= TICK * 2))
+    results.append(check(f"Timeouts só nos hosts WMI lentos ({slow_timeouts}/{snap['timeouts']}), espaçados pelo backoff",
+                         slow_timeouts == snap['timeouts'] and snap['timeouts'] <= 10 * 8))
+    nominal = lambda kind: sum(1 for d in fleet if d[1] == kind) * HOUR // 60
+    results.append(check(f"Impressoras estáveis: {polls.get('printer', 0)} coletas vs {nominal('printer')} no ciclo fixo",
+                         polls.get('printer', 0) < nominal('printer') / 8))
+    results.append(check("Rede/servidores saudáveis mantêm ~1 coleta/min (intervalo + duração)",
+                         polls.get('network', 0) >= nominal('network') * 0.9
+                         and polls.get('server', 0) >= nominal('server') * 0.9))
+    return results
+
+
+if __name__ == "__main__":
+    print("Política de agendamento:")
+    results = policy_checks()
+    results += simulation_checks()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,179 @@
+"""
+Verificação da sonda TCP concorrente (scanner/portprobe.py) em aliases de loopback.
+
+Portas "filtradas" são simuladas com listeners de backlog cheio (o kernel descarta o SYN,
+como um firewall em DROP); portas fechadas respondem RST. Os perfis usam portas altas
+no lugar de 9100/554/22/80 para não depender de privilégio.
+
+1. Host com firewall: prova de vida e identificação custam um timeout, não um por porta.
+2. Retorno antecipado: a primeira evidência suficiente encerra a sonda.
+3. identify_type mantém a prioridade antiga (impressora > câmera > SSH+TTL > Windows > web).
+4. Variante asyncio (descoberta) com a mesma semântica; perfis lidos das configurações.
+
+Uso: python scripts/test_port_probe.py
+"""
+import sys
+import os
+import time
+import socket
+import asyncio
+import tempfile
+
+# Configurações isoladas: nunca toca no diretório de dados real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_ports_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.portprobe import (PortProber, probe_ports, probe_ports_async, any_answer, load_port_config,
+                               OPEN, CLOSED, FILTERED)
+import scanner.engine as engine
+
+TIMEOUT = 0.5
+_keep = []
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def listener(ip, backlog_full=False):
+    """Porta aberta; com backlog_full o SYN é descartado (filtrada)"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind((ip, 0))
+    s.listen(0 if backlog_full else 128)
+    _keep.append(s)
+    port = s.getsockname()[1]
+    if backlog_full:
+        for _ in range(3):
+            c = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            c.setblocking(False)
+            c.connect_ex((ip, port))
+            _keep.append(c)
+        time.sleep(0.05)
+    return port
+
+
+def closed_port(ip):
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind((ip, 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def legacy_alive(ip, ports):
+    """Fallback antigo do get_full_audit: uma conexão por vez, 0.5s cada"""
+    for p in ports:
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.settimeout(0.5)
+                if s.connect_ex((ip, p)) == 0:
+                    return True
+        except Exception:
+            pass
+    return False
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def liveness_checks():
+    results = []
+    print("Prova de vida (fallback TCP do get_full_audit):")
+    ip = '127.0.0.61'
+    filtered = [listener(ip, backlog_full=True) for _ in range(8)]
+    prober = PortProber(config={'timeout': TIMEOUT, 'profiles': {'liveness': filtered}})
+
+    legacy, legacy_time = timed(lambda: legacy_alive(ip, filtered))
+    alive, elapsed = timed(lambda: prober.is_alive(ip))
+    results.append(check(f"Host com firewall (8 portas em DROP): {elapsed:.2f}s contra {legacy_time:.2f}s sequencial",
+                         not alive and not legacy and elapsed < TIMEOUT * 2 and legacy_time > TIMEOUT * 6))
+
+    ip = '127.0.0.62'
+    mixed = [listener(ip, backlog_full=True) for _ in range(7)] + [listener(ip)]
+    prober.config['profiles']['liveness'] = mixed
+    alive, elapsed = timed(lambda: prober.is_alive(ip))
+    results.append(check(f"Só a última porta aberta: vivo em {elapsed * 1000:.1f}ms (sequencial: ~3.5s)",
+                         alive and elapsed < TIMEOUT / 2))
+
+    ip = '127.0.0.63'
+    refused = [closed_port(ip) for _ in range(8)]
+    res, elapsed = timed(lambda: probe_ports(ip, refused, TIMEOUT, any_answer))
+    results.append(check(f"Tudo fechado (RST): vivo pela 1ª resposta em {elapsed * 1000:.1f}ms, "
+                         f"{len(res)} de 8 portas decididas", any_answer(res) and elapsed < TIMEOUT / 2))
+    return results
+
+
+def identify_checks():
+    results = []
+    print("\nidentify_type (portas de todas as classes em uma sonda):")
+
+    def host(ip, printer='closed', camera='closed', ssh='closed', web='closed'):
+        make = {'open': lambda: listener(ip), 'filtered': lambda: listener(ip, backlog_full=True),
+                'closed': lambda: closed_port(ip)}
+        return {'printer': [make[printer](), make[printer]()], 'camera': [make[camera]()],
+                'ssh': [make[ssh]()], 'web': [make[web](), make[web]()]}
+
+    cases = [
+        ("Impressora aberta, resto em DROP: decide sem esperar",
+         '127.0.0.71', dict(printer='open', camera='filtered', ssh='filtered', web='filtered'), 64, 'printer', True),
+        ("Câmera aberta, impressora fechada",
+         '127.0.0.72', dict(camera='open', web='open'), 64, 'camera', True),
+        ("SSH + TTL Linux",
+         '127.0.0.73', dict(ssh='open', web='open'), 64, 'linux', True),
+        ("SSH com TTL desconhecido cai para web",
+         '127.0.0.74', dict(ssh='open', web='open'), None, 'web_device', True),
+        ("TTL Windows: web não decide (portas web nem são sondadas)",
+         '127.0.0.75', dict(web='open'), 128, 'windows_locked', True),
+        ("Impressora em DROP e web aberta: aguarda a impressora (prioridade), depois web",
+         '127.0.0.76', dict(printer='filtered', web='open'), 64, 'web_device', False),
+        ("Tudo em DROP: um timeout para as 6 portas",
+         '127.0.0.77', dict(printer='filtered', camera='filtered', ssh='filtered', web='filtered'), None, 'network', False),
+    ]
+    for label, ip, states, ttl, expected, fast in cases:
+        prober = engine.port_prober = PortProber(config={'timeout': TIMEOUT, 'profiles': host(ip, **states)})
+        (dtype, _, _), elapsed = timed(lambda: engine.DeviceIntelligence.identify_type(ip, ttl, {}))
+        within = elapsed < TIMEOUT / 2 if fast else TIMEOUT * 0.9 < elapsed < TIMEOUT * 2
+        extra = f", {prober.stats['sockets']} conexões" if ttl == 128 else ""
+        results.append(check(f"{label}: {dtype} em {elapsed * 1000:.0f}ms{extra}",
+                             dtype == expected and within and (ttl != 128 or prober.stats['sockets'] == 3)))
+    return results
+
+
+def async_and_settings_checks():
+    results = []
+    print("\nDescoberta (asyncio) e configuração:")
+    ip = '127.0.0.81'
+    ports = [listener(ip, backlog_full=True), closed_port(ip), listener(ip)]
+    sync = probe_ports(ip, ports, TIMEOUT)
+    res = asyncio.run(probe_ports_async(ip, ports, TIMEOUT))
+    results.append(check(f"Sem predicado: mesmos estados nas duas variantes ({sorted(res.values())})",
+                         res == sync and sorted(res.values()) == sorted([FILTERED, CLOSED, OPEN])))
+    res, elapsed = timed(lambda: asyncio.run(probe_ports_async(ip, ports, TIMEOUT, any_answer)))
+    results.append(check(f"asyncio com retorno antecipado: {elapsed * 1000:.1f}ms, conexões restantes canceladas",
+                         any_answer(res) and FILTERED not in res.values() and elapsed < TIMEOUT / 2))
+
+    from utils import save_general_settings
+    save_general_settings({'port_probe': {'timeout': 0.3, 'profiles': {'printer': [9100, 515, 631]}}})
+    config = load_port_config()
+    results.append(check("settings['port_probe'] sobrepõe só as classes informadas",
+                         config['timeout'] == 0.3 and config['profiles']['printer'] == [9100, 515, 631]
+                         and config['profiles']['camera'] == [554] and 3389 in config['profiles']['liveness']))
+    return results
+
+
+if __name__ == "__main__":
+    try:
+        results = liveness_checks()
+        results += identify_checks()
+        results += async_and_settings_checks()
+    finally:
+        for s in _keep:
+            s.close()
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
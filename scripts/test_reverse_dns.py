@@ -0,0 +1,255 @@
+"""
+Verificação do DNS reverso concorrente (scanner/rdns.py) contra um servidor DNS stub local.
+
+O stub (UDP em 127.0.0.1, porta efêmera) responde PTR com TTL próprio, NXDOMAIN com SOA
+(TTL negativo), CNAME -> PTR (delegação RFC 2317) e descarta as consultas de alguns IPs
+(resolver sem resposta, o caso que travava o auditor no gethostbyaddr).
+
+1. Conjunto inteiro resolvido em paralelo: o custo é um timeout, não um por host.
+2. TTLs: positivo (com piso), negativo pelo SOA, falha curta.
+3. Cache persistente: segundo scan e "reinício" sem nenhuma consulta; expiração por TTL;
+   teto de entradas (LRU); consultas concorrentes ao mesmo IP viram uma só.
+4. get_full_audit usa o nome resolvido; backend 'system' (pool de threads) como fallback.
+
+Uso: python scripts/test_reverse_dns.py [--hosts 300]
+"""
+import sys
+import os
+import time
+import socket
+import struct
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Base isolada: nunca toca no diretório de dados real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_rdns_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.rdns import ReverseDNS, reverse_name
+import scanner.engine as engine
+
+TIMEOUT = 0.3
+ATTEMPTS = 2
+PTR_TTL = 7200
+SOA_MINIMUM = 600
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def encode_name(name):
+    return b''.join(bytes([len(p)]) + p.encode('ascii') for p in name.rstrip('.').split('.')) + b'\x00'
+
+
+class StubDNS:
+    """Servidor DNS mínimo: records[nome reverso] = ('ptr', host, ttl) | ('cname', alvo, ttl) | ('nx',) | ('drop',)"""
+
+    def __init__(self):
+        self.records = {}
+        self.queries = {}
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.address = f"127.0.0.1:{self.sock.getsockname()[1]}"
+        self._lock = threading.Lock()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    @property
+    def total(self):
+        return sum(self.queries.values())
+
+    def _serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(512)
+            except OSError:
+                return
+            qid = data[:2]
+            offset, labels = 12, []
+            while data[offset]:
+                labels.append(data[offset + 1:offset + 1 + data[offset]].decode())
+                offset += data[offset] + 1
+            question = data[12:offset + 5]
+            name = '.'.join(labels)
+            with self._lock:
+                self.queries[name] = self.queries.get(name, 0) + 1
+            record = self.records.get(name, ('nx',))
+            if record[0] == 'drop':
+                continue
+            self.sock.sendto(self._answer(qid, question, name, record), addr)
+
+    def _answer(self, qid, question, name, record):
+        answers, authority, rcode = [], [], 0
+        if record[0] == 'ptr':
+            answers.append(b'\xc0\x0c' + struct.pack('!HHIH', 12, 1, record[2], len(encode_name(record[1])))
+                           + encode_name(record[1]))
+        elif record[0] == 'cname':
+            target = encode_name(record[1])
+            answers.append(b'\xc0\x0c' + struct.pack('!HHIH', 5, 1, record[2], len(target)) + target)
+            ptr, ttl = self.records[record[1]][1], self.records[record[1]][2]
+            answers.append(target + struct.pack('!HHIH', 12, 1, ttl, len(encode_name(ptr))) + encode_name(ptr))
+        else:
+            rcode = 3
+            soa = (encode_name('ns1.empresa.local') + encode_name('hostmaster.empresa.local')
+                   + struct.pack('!IIIII', 2024010101, 3600, 600, 86400, SOA_MINIMUM))
+            zone = encode_name('.'.join(name.split('.')[-4:]))
+            authority.append(zone + struct.pack('!HHIH', 6, 1, 3600, len(soa)) + soa)
+        header = qid + struct.pack('!HHHHH', 0x8180 | rcode, 1, len(answers), len(authority), 0)
+        return header + question + b''.join(answers) + b''.join(authority)
+
+
+class Clock:
+    def __init__(self):
+        self.t = time.time()
+
+    def __call__(self):
+        return self.t
+
+
+def build_hosts(stub, count):
+    """70% com PTR, 20% sem PTR (NXDOMAIN), 5% em CNAME (RFC 2317), 5% sem resposta"""
+    hosts = {}
+    for i in range(count):
+        ip = f"10.40.{i // 250}.{i % 250 + 1}"
+        kind = i % 20
+        rname = reverse_name(ip)
+        if kind < 14:
+            stub.records[rname] = ('ptr', f"host{i}.empresa.local", PTR_TTL if i % 2 else 30)
+            hosts[ip] = f"host{i}.empresa.local"
+        elif kind < 18:
+            hosts[ip] = None
+        elif kind < 19:
+            target = f"{i % 250 + 1}.0-255.{i // 250}.40.10.in-addr.arpa"
+            stub.records[target] = ('ptr', f"delegado{i}.filial.local", 900)
+            stub.records[rname] = ('cname', target, 86400)
+            hosts[ip] = f"delegado{i}.filial.local"
+        else:
+            stub.records[rname] = ('drop',)
+            hosts[ip] = None
+    return hosts
+
+
+def resolver(stub, clock, cache_path, **extra):
+    config = {'nameservers': [stub.address], 'timeout': TIMEOUT, 'attempts': ATTEMPTS}
+    config.update(extra)
+    return ReverseDNS(config=config, cache_path=cache_path, clock=clock)
+
+
+def scan_checks(stub, hosts, cache_path):
+    results = []
+    clock = Clock()
+    rdns = resolver(stub, clock, cache_path)
+    dropped = sum(1 for ip in hosts if stub.records.get(reverse_name(ip), ('',))[0] == 'drop')
+    print(f"Stub DNS em {stub.address}: {len(hosts)} hosts ({dropped} sem resposta)")
+
+    start = time.time()
+    names = rdns.resolve_many(hosts)
+    elapsed = time.time() - start
+    sequential = dropped * TIMEOUT * ATTEMPTS
+    results.append(check(f"{len(hosts)} hosts em paralelo: {elapsed:.2f}s (só os sem resposta custariam "
+                         f"{sequential:.1f}s em série)", names == hosts and elapsed < TIMEOUT * ATTEMPTS * 3))
+    results.append(check(f"Nomes: {rdns.stats['found']} PTR (inclui CNAME RFC 2317), {rdns.stats['negative']} "
+                         f"NXDOMAIN, {rdns.stats['failed']} falhas",
+                         rdns.stats['failed'] == dropped and rdns.stats['found'] == sum(1 for v in hosts.values() if v)))
+
+    now = clock()
+    cache = rdns._cache
+    ttl = {ip: round(cache[ip][1] - now) for ip in cache}
+    short = next(ip for ip, i in zip(hosts, range(len(hosts))) if i % 20 < 14 and i % 2 == 0)
+    long_ = next(ip for ip, i in zip(hosts, range(len(hosts))) if i % 20 < 14 and i % 2 == 1)
+    nx = next(ip for ip, i in zip(hosts, range(len(hosts))) if 14 <= i % 20 < 18)
+    cname = next(ip for ip, i in zip(hosts, range(len(hosts))) if i % 20 == 18)
+    drop = next(ip for ip, i in zip(hosts, range(len(hosts))) if i % 20 == 19)
+    results.append(check(f"TTLs: PTR {ttl[long_]}s, PTR de 30s com piso {ttl[short]}s, CNAME->PTR {ttl[cname]}s, "
+                         f"negativo pelo SOA {ttl[nx]}s, sem resposta {ttl[drop]}s",
+                         ttl[long_] == PTR_TTL and ttl[short] == 300 and ttl[cname] == 900
+                         and ttl[nx] == SOA_MINIMUM and ttl[drop] == 120))
+
+    before = stub.total
+    again = rdns.resolve_many(hosts)
+    results.append(check(f"Segundo scan no mesmo processo: {stub.total - before} consultas ao DNS",
+                         again == hosts and stub.total == before))
+    rdns.save_cache()
+
+    # "Reinício" dentro da validade: tudo do cache, inclusive os negativos
+    clock.t += 200
+    fresh = resolver(stub, clock, cache_path)
+    before = stub.total
+    answers = fresh.resolve_many(hosts)
+    results.append(check(f"Após reinício ({os.path.getsize(cache_path) // 1024} KB em disco): "
+                         f"{stub.total - before} consultas (falhas de 120s foram refeitas: {dropped})",
+                         answers == hosts and stub.total - before == dropped * ATTEMPTS
+                         and fresh.stats['queries'] == dropped))
+
+    # Depois do TTL negativo (600s) só os negativos e os PTR de TTL curto voltam ao DNS
+    clock.t += SOA_MINIMUM
+    before = dict(stub.queries)
+    fresh.resolve_many(hosts)
+    requeried = {name for name, n in stub.queries.items() if n > before.get(name, 0)}
+    results.append(check(f"{SOA_MINIMUM}s depois: {len(requeried)} nomes reconsultados (negativos, PTR curtos e falhas)",
+                         reverse_name(nx) in requeried and reverse_name(short) in requeried
+                         and reverse_name(long_) not in requeried and reverse_name(cname) not in requeried))
+    return results
+
+
+def bound_checks(stub, hosts):
+    results = []
+    print("\nLimites:")
+    path = os.path.join(os.environ['APPDATA'], 'bounded.json')
+    rdns = resolver(stub, Clock(), path, max_entries=100)
+    ips = [ip for ip in hosts if stub.records.get(reverse_name(ip), ('',))[0] != 'drop']
+    rdns.resolve_many(ips)
+    results.append(check(f"max_entries=100: cache com {len(rdns._cache)} entradas, as mais recentes (LRU)",
+                         len(rdns._cache) == 100 and list(rdns._cache) == ips[-100:]))
+
+    rdns = resolver(stub, Clock(), os.path.join(os.environ['APPDATA'], 'single.json'))
+    ip = next(ip for ip in hosts if hosts[ip])
+    before = stub.queries.get(reverse_name(ip), 0)
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        answers = list(pool.map(lambda _: rdns.resolve(ip), range(20)))
+    results.append(check(f"20 auditores pedindo o mesmo IP: {stub.queries[reverse_name(ip)] - before} consulta",
+                         set(answers) == {hosts[ip]} and stub.queries[reverse_name(ip)] - before == 1))
+    return results
+
+
+def engine_checks(stub):
+    results = []
+    print("\nAuditoria:")
+    ip = '127.0.0.91'
+    stub.records[reverse_name(ip)] = ('ptr', 'estacao91.empresa.local', 3600)
+    engine.reverse_dns = resolver(stub, Clock(), os.path.join(os.environ['APPDATA'], 'engine.json'))
+    engine.reverse_dns.prefetch(ip)
+    audit = engine.get_full_audit(ip, '', '', pre_ping_success=True, pre_hostname='', pre_ttl=64)
+    results.append(check(f"get_full_audit sem nome da descoberta: {audit['hostname']!r}",
+                         audit['hostname'] == 'estacao91.empresa.local'))
+
+    silent = '127.0.0.92'
+    stub.records[reverse_name(silent)] = ('drop',)
+    start = time.time()
+    audit = engine.get_full_audit(silent, '', '', pre_ping_success=True, pre_hostname='', pre_ttl=64)
+    results.append(check(f"Sem resposta do DNS: auditoria segue com 'N/A' em {time.time() - start:.2f}s "
+                         f"(limite {engine.reverse_dns._wait_limit():.1f}s)", audit['hostname'] == 'N/A'))
+
+    system = ReverseDNS(config={'backend': 'system'}, cache_path=os.path.join(os.environ['APPDATA'], 'system.json'))
+    name = system.resolve('127.0.0.1')
+    results.append(check(f"Backend 'system' (pool de threads com gethostbyaddr): 127.0.0.1 -> {name!r}",
+                         bool(name) and system.backend == 'system'))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verificação do DNS reverso concorrente")
+    parser.add_argument('--hosts', type=int, default=300)
+    args = parser.parse_args()
+    stub = StubDNS()
+    hosts = build_hosts(stub, args.hosts)
+    results = scan_checks(stub, hosts, os.path.join(os.environ['APPDATA'], 'rdns_cache.json'))
+    results += bound_checks(stub, hosts)
+    results += engine_checks(stub)
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
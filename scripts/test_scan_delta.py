@@ -0,0 +1,118 @@
+"""
+Verificação das respostas versionadas do scanner (blueprints/inventory.py), via cliente de teste Flask.
+
+1. /api/scanner/results: ETag fraca; If-None-Match com inventário inalterado responde 304
+   sem corpo; qualquer escrita gera outra ETag.
+2. ?since=<versão>&epoch=<epoch>: só adicionados/alterados/removidos; since vazio,
+   epoch de outro processo ou versão do futuro recebem a lista completa.
+3. /api/scanner/status?logs_since=<seq>: só os logs novos; cliente atrás da janela de
+   100 logs recebe a janela inteira (logs_full).
+
+Uso: python scripts/test_scan_delta.py
+"""
+import sys
+import os
+import logging
+import tempfile
+
+# Configurações isoladas: nunca toca no diretório de dados real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_delta_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from blueprints.inventory import inventory_bp
+from shared_state import device_store, update_scan_status
+
+logging.disable(logging.WARNING)
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def client():
+    app = Flask(__name__)
+    app.secret_key = 'teste'
+    app.register_blueprint(inventory_bp)
+    c = app.test_client()
+    with c.session_transaction() as s:
+        s['username'] = 'admin'
+        s['is_master'] = True
+    return c
+
+
+def device(i, **extra):
+    return dict({'ip': f"10.5.0.{i}", 'hostname': f"pc{i}", 'device_type': 'windows', 'status_code': 'ONLINE'}, **extra)
+
+
+def etag_checks(c):
+    results = []
+    print("Lista completa com ETag:")
+    for i in range(1, 31):
+        device_store.upsert(device(i))
+    first = c.get('/api/scanner/results')
+    etag = first.headers.get('ETag')
+    again = c.get('/api/scanner/results', headers={'If-None-Match': etag})
+    results.append(check(f"200 com {len(first.get_json())} dispositivos e ETag {etag}; repetida: {again.status_code} "
+                         f"com {len(again.data)} bytes",
+                         first.status_code == 200 and len(first.get_json()) == 30 and etag.startswith('W/')
+                         and again.status_code == 304 and not again.data))
+    device_store.upsert(device(7, hostname='pc7-novo'))
+    changed = c.get('/api/scanner/results', headers={'If-None-Match': etag})
+    results.append(check(f"Depois de uma escrita: {changed.status_code} com ETag nova",
+                         changed.status_code == 200 and changed.headers.get('ETag') != etag))
+    return results
+
+
+def delta_checks(c):
+    results = []
+    print("\nDelta por versão:")
+    full = c.get('/api/scanner/results', query_string={'since': ''}).get_json()
+    results.append(check(f"since vazio: lista completa ({len(full['devices'])}), epoch {full['epoch']}, versão {full['version']}",
+                         full['full'] and len(full['devices']) == len(device_store)))
+    device_store.upsert(device(99))
+    device_store.upsert(device(3, hostname='pc3-novo'))
+    device_store.remove('10.5.0.4')
+    delta = c.get('/api/scanner/results', query_string={'since': full['version'], 'epoch': full['epoch']}).get_json()
+    results.append(check(f"Delta: added {[d['ip'] for d in delta['added']]}, changed {[d['ip'] for d in delta['changed']]}, "
+                         f"removed {delta['removed']}",
+                         not delta['full'] and [d['ip'] for d in delta['added']] == ['10.5.0.99']
+                         and [d['ip'] for d in delta['changed']] == ['10.5.0.3'] and delta['removed'] == ['10.5.0.4']))
+    other = c.get('/api/scanner/results', query_string={'since': full['version'], 'epoch': 'reiniciado'}).get_json()
+    ahead = c.get('/api/scanner/results', query_string={'since': delta['version'] + 50, 'epoch': full['epoch']}).get_json()
+    results.append(check("Processo reiniciado (epoch) ou versão do futuro: lista completa",
+                         other['full'] and ahead['full'] and len(other['devices']) == len(device_store)))
+    return results
+
+
+def log_checks(c):
+    results = []
+    print("\nLogs incrementais:")
+    update_scan_status({"logs": [{"msg": "início", "time": "10:00:00"}]})
+    for i in range(5):
+        update_scan_status({"logs": {"msg": f"log {i}", "time": "10:00:01"}})
+    status = c.get('/api/scanner/status').get_json()
+    seq = status['log_seq']
+    update_scan_status({"logs": {"msg": "novo", "time": "10:00:02"}})
+    newer = c.get('/api/scanner/status', query_string={'logs_since': seq}).get_json()
+    results.append(check(f"Janela inicial {len(status['logs'])} logs; logs_since={seq}: {[l['msg'] for l in newer['logs']]}",
+                         status['logs_full'] and len(status['logs']) == 6
+                         and [l['msg'] for l in newer['logs']] == ['novo'] and not newer['logs_full']))
+    for i in range(150):
+        update_scan_status({"logs": {"msg": f"rajada {i}", "time": "10:00:03"}})
+    behind = c.get('/api/scanner/status', query_string={'logs_since': seq}).get_json()
+    results.append(check(f"Cliente atrás da janela: {len(behind['logs'])} logs, logs_full={behind['logs_full']}",
+                         behind['logs_full'] and len(behind['logs']) == 100))
+    return results
+
+
+if __name__ == "__main__":
+    c = client()
+    results = etag_checks(c)
+    results += delta_checks(c)
+    results += log_checks(c)
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
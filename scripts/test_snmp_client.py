@@ -0,0 +1,111 @@
+import sys
+import os
+import time
+import asyncio
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from snmp_helper import snmp_client, snmp_get, snmp_walk, get_printer_data, fetch_printer_tables
+from snmp_responder import LoopbackSnmpResponder, PRINTER_FIXTURE
+
+PORT = 1161
+# Cada alias de loopback faz o papel de uma impressora diferente
+AGENTS = [f'127.0.0.{i}' for i in range(2, 42)]
+AGENT_DELAY = 0.2
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def start_responder():
+    """Responder em processo separado: como agentes reais, não disputa a GIL com o cliente"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snmp_responder.py')
+    proc = subprocess.Popen([sys.executable, script, '--agents', str(len(AGENTS)), '--port', str(PORT),
+                             '--delay', str(AGENT_DELAY)], stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()  # linha de "pronto"
+    return proc
+
+
+def run_snmp_client_test():
+    responder = start_responder()
+    print(f"Responder em {len(AGENTS)} aliases de loopback (porta {PORT}, {AGENT_DELAY}s por resposta)")
+    ip = AGENTS[0]
+    results = []
+
+    try:
+        # 1. Fachada síncrona
+        data = snmp_client.get_sync(ip, ['1.3.6.1.2.1.1.5.0', '1.3.6.1.2.1.1.9.0'], port=PORT)
+        results.append(check("GET síncrono", data.get('1.3.6.1.2.1.1.5.0') == 'PRN-FINANCEIRO'))
+
+        # 2. GETBULK multi-coluna
+        before = snmp_client.stats['requests']
+        table = snmp_client.walk_table_sync(ip, ['1.3.6.1.2.1.43.11.1.1.6', '1.3.6.1.2.1.43.11.1.1.9'], port=PORT)
+        names = [v for _, v in table['1.3.6.1.2.1.43.11.1.1.6']]
+        results.append(check(f"GETBULK de 2 colunas em {snmp_client.stats['requests'] - before} PDU(s): {names}",
+                             len(names) == 5 and table['1.3.6.1.2.1.43.11.1.1.9'][2] == ('1.3', '-3')))
+
+        # 3. API assíncrona chamada de outro event loop
+        async def foreign_loop():
+            return await asyncio.gather(*[snmp_get(a, ['1.3.6.1.2.1.1.1.0'], port=PORT) for a in AGENTS],
+                                        snmp_walk(ip, '1.3.6.1.4.1.2699.1.1.1.1.6', port=PORT))
+        start = time.time()
+        out = asyncio.run(foreign_loop())
+        elapsed = time.time() - start
+        results.append(check(f"{len(AGENTS)} GETs + 1 walk concorrentes em {elapsed:.2f}s",
+                             all('error' not in r for r in out[:-1]) and out[-1] == ['maria', 'joao', 'maria']
+                             and elapsed < AGENT_DELAY * 4))
+
+        # 4. Printer-MIB: todas as tabelas por GETBULK, linhas indexadas
+        before = snmp_client.stats['requests']
+        get_printer_data(ip, port=PORT)
+        pdus = snmp_client.stats['requests'] - before
+        tables = snmp_client.run(fetch_printer_tables(ip, port=PORT))
+        results.append(check(f"Impressora em {pdus} PDUs (antes: 1 GET + 9 walks); suprimentos {list(tables['supplies'])}",
+                             pdus <= 3 and '1.25' in tables['supplies']
+                             and tables['inputs']['1.2'] == {'capacity': '100', 'level': '-3', 'name': 'Bandeja Manual'}))
+
+        # 5. Coleta completa de impressoras a partir de várias threads (como o Sentinel)
+        engine_id = id(snmp_client._engine)
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=25) as pool:
+            printers = list(pool.map(lambda a: get_printer_data(a, port=PORT), AGENTS))
+        elapsed = time.time() - start
+        p = printers[0] or {}
+        # Limite: menos de um round-trip serial por impressora
+        results.append(check(f"{len(AGENTS)} impressoras em {elapsed:.2f}s (sequencial seria ~{len(AGENTS) * 10 * AGENT_DELAY:.0f}s)",
+                             all(printers) and elapsed < len(AGENTS) * AGENT_DELAY))
+        results.append(check(f"Parse: {len(p.get('supplies', []))} suprimentos, {len(p.get('trays', []))} bandejas, "
+                             f"{len(p.get('covers', []))} tampas",
+                             len(p.get('supplies', [])) == 5 and len(p.get('trays', [])) == 2 and len(p.get('covers', [])) == 2))
+        results.append(check("Engine único reutilizado", id(snmp_client._engine) == engine_id))
+
+        # 6. Agente com PDU pequena: GETBULK responde tooBig e o cliente reduz as repetições
+        small = LoopbackSnmpResponder(PRINTER_FIXTURE, port=PORT + 1, max_varbinds=40).start()
+        try:
+            p = get_printer_data('127.0.0.1', port=PORT + 1) or {}
+            results.append(check(f"tooBig: {len(p.get('supplies', []))} suprimentos com limite de 40 varbinds",
+                                 len(p.get('supplies', [])) == 5 and len(p.get('trays', [])) == 2))
+        finally:
+            small.stop()
+
+        # 7. Agente inexistente não trava o cliente
+        start = time.time()
+        data = snmp_client.get_sync('127.0.0.250', ['1.3.6.1.2.1.1.1.0'], port=PORT, timeout=0.5, retries=0)
+        results.append(check(f"Timeout isolado ({time.time() - start:.2f}s): {data}", 'error' in data))
+    finally:
+        responder.terminate()
+        responder.wait(5)
+        snmp_client.stop()
+
+    print(f"\n{sum(results)}/{len(results)} verificações OK. Estatísticas: {snmp_client.stats}")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_snmp_client_test() else 1)
@@ -0,0 +1,175 @@
+"""
+Verificação do índice de triggers e do mapa de alertas abertos (base isolada em diretório temporário).
+
+Conta os comandos SQL emitidos por amostra em _check_triggers + auto_resolve_alerts:
+  - amostras sem mudança de estado: nenhum SQL
+  - violação cria o alerta uma vez; normalização resolve uma vez
+  - filtro por tipo de dispositivo, trigger desabilitado e operador inválido
+  - edição via ORM invalida na hora; edição externa é detectada na conferência da assinatura
+e compara com o caminho antigo (SELECT de triggers por amostra + SELECT de alertas + 1 por alerta).
+
+Uso: python scripts/test_trigger_index.py [--devices 200]
+"""
+import sys
+import os
+import logging
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime
+
+# Base isolada: nunca toca no netaudit.db real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_triggers_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from database import init_db, get_session, engine, DB_PATH
+from models import Device, Trigger, Alert
+from trigger_index import trigger_index
+from alert_manager import alert_manager
+from metrics_collector import collector
+
+# Um log por alerta criado/resolvido poluiria a saída
+logging.disable(logging.INFO)
+
+METRICS = ('cpu_usage', 'ram_usage', 'latency')
+
+statements = []
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def seed(session, count):
+    session.add_all([
+        Trigger(name='CPU Alta', metric_type='cpu_usage', operator='>', threshold=95, duration_seconds=0, severity='warning'),
+        Trigger(name='RAM Servidor', metric_type='ram_usage', operator='>', threshold=90, duration_seconds=0,
+                severity='high', device_type_filter='server'),
+        Trigger(name='Latência Alta', metric_type='latency', operator='>', threshold=200, duration_seconds=0, severity='warning'),
+        Trigger(name='Desabilitado', metric_type='cpu_usage', operator='>', threshold=1, severity='info', enabled=False),
+        Trigger(name='Operador inválido', metric_type='cpu_usage', operator='~', threshold=1, severity='info'),
+    ])
+    session.add_all([Device(ip=f'10.3.{i // 250}.{i % 250 + 1}', hostname=f'host{i}',
+                            device_type='server' if i % 2 else 'windows') for i in range(count)])
+    session.commit()
+    return session.query(Device).order_by(Device.id).all()
+
+
+def sample(session, device, metric, value):
+    collector._check_triggers(session, device, metric, value)
+    alert_manager.auto_resolve_alerts(device.id, metric, value, session)
+
+
+def cycle(session, devices, values):
+    statements.clear()
+    for d in devices:
+        for metric in METRICS:
+            sample(session, d, metric, values(d, metric))
+    session.commit()
+    return len([s for s in statements if not s.startswith(('BEGIN', 'COMMIT'))])
+
+
+def legacy_cycle(session, devices, values):
+    """Caminho antigo: triggers por amostra + alertas abertos do dispositivo + trigger por alerta"""
+    statements.clear()
+    for d in devices:
+        for metric in METRICS:
+            session.query(Trigger).filter(Trigger.metric_type == metric, Trigger.enabled == True).all()
+            for alert in session.query(Alert).join(Device).filter(Alert.device_id == d.id, Alert.resolved_at == None).all():
+                session.query(Trigger).filter(Trigger.name == alert.title, Trigger.metric_type == metric).first()
+    return len(statements)
+
+
+def open_alerts(session):
+    return {(a.device_id, a.title) for a in session.query(Alert).filter(Alert.resolved_at == None)}
+
+
+def run(count):
+    results = []
+    init_db()
+    session = get_session()
+    # No Sentinel cada coleta carrega o dispositivo uma vez; aqui os mesmos objetos atravessam os ciclos
+    session.expire_on_commit = False
+    devices = seed(session, count)
+    normal = lambda d, m: 10.0
+    samples = count * len(METRICS)
+
+    trigger_index.refresh(session)
+    alert_manager.sync_active_alerts(session)
+    results.append(check(f"Índice: {trigger_index.stats['rules']} regras (desabilitado fora)",
+                         trigger_index.stats['rules'] == 4))
+    results.append(check("Operador inválido nunca viola",
+                         not [r for r in trigger_index.rules_for('cpu_usage', 'windows') if r.violated(10 ** 9)
+                              and r.operator == '~']))
+
+    legacy = legacy_cycle(session, devices, normal)
+    quiet = cycle(session, devices, normal)
+    print(f"\n{samples} amostras por ciclo ({count} dispositivos x {len(METRICS)} métricas):")
+    results.append(check(f"Ciclo sem mudança: {quiet} SQL (antes {legacy})", quiet == 0 and legacy >= samples))
+
+    hot = lambda d, m: 99.0 if m in ('cpu_usage', 'ram_usage') else 10.0
+    created = cycle(session, devices, hot)
+    alerts = open_alerts(session)
+    ram_alerts = {t for t in alerts if t[1] == 'RAM Servidor'}
+    results.append(check(f"Violação: {len(alerts)} alertas criados ({created} SQL); RAM só nos servidores",
+                         len(alerts) == count + count // 2
+                         and all(devices[i].device_type == 'server' for i in range(count)
+                                 if (devices[i].id, 'RAM Servidor') in ram_alerts)))
+    again = cycle(session, devices, hot)
+    results.append(check(f"Violação mantida: {again} SQL, nenhum alerta duplicado",
+                         again == 0 and len(open_alerts(session)) == len(alerts)))
+    with_alerts = legacy_cycle(session, devices, hot)
+    print(f"       caminho antigo com {len(alerts)} alertas abertos: {with_alerts} SQL por ciclo")
+
+    resolved = cycle(session, devices, normal)
+    results.append(check(f"Normalizou: todos resolvidos ({resolved} SQL, só no ciclo da mudança)",
+                         not open_alerts(session) and not alert_manager.active_alerts))
+    results.append(check("Ciclo seguinte volta a 0 SQL", cycle(session, devices, normal) == 0))
+
+    print("\nRecarga do índice:")
+    trigger = session.query(Trigger).filter(Trigger.name == 'CPU Alta').one()
+    trigger.threshold = 5
+    session.commit()
+    reloaded = trigger_index.refresh(session)
+    results.append(check("Edição via ORM invalida e recarrega no próximo refresh",
+                         reloaded and trigger_index.rules_for('cpu_usage', 'windows')[0].threshold == 5))
+    results.append(check("Sem mudança: refresh não recarrega nem consulta dentro do intervalo",
+                         not trigger_index.refresh(session) and trigger_index.stats['checks'] == 2))
+
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("UPDATE triggers SET enabled = 0 WHERE name = 'Latência Alta'")
+    not_yet = trigger_index.refresh(session)
+    trigger_index.check_seconds = 0
+    detected = trigger_index.refresh(session)
+    results.append(check("Edição externa detectada na conferência da assinatura",
+                         not not_yet and detected and not trigger_index.rules_for('latency', 'windows')))
+
+    # Alerta aberto antes do start (outra execução do Sentinel) é reconhecido pelo título
+    session.add(Alert(device_id=devices[0].id, severity='warning', title='CPU Alta', triggered_at=datetime.now()))
+    session.commit()
+    alert_manager.sync_active_alerts(session)
+    statements.clear()
+    sample(session, devices[0], 'cpu_usage', 50.0)
+    results.append(check("Alerta preexistente carregado no start: não duplica",
+                         len([a for a in open_alerts(session) if a[0] == devices[0].id]) == 1
+                         and not [s for s in statements if s.lstrip().upper().startswith('INSERT')]))
+    session.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verificação do índice de triggers")
+    parser.add_argument('--devices', type=int, default=200)
+    args = parser.parse_args()
+    results = run(args.devices)
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
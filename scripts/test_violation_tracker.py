@@ -0,0 +1,155 @@
+"""
+Verificação do rastreador de violações (janelas por amostra, shards, checkpoint e restore).
+Base isolada em diretório temporário.
+
+1. Janela medida pelos timestamps das amostras: amostras atrasadas processadas de uma vez
+   disparam no ponto certo; normalização e buraco sem amostras reiniciam a janela.
+2. 25 threads avaliando a frota ao mesmo tempo: cada (dispositivo, trigger) dispara
+   exatamente na amostra esperada.
+3. Checkpoint incremental (só o que mudou) e restore após "reinício" sem perder a janela.
+
+Uso: python scripts/test_violation_tracker.py [--devices 500]
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# Base isolada: nunca toca no netaudit.db real
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='netaudit_violations_')
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import init_db, get_session, engine
+from models import TriggerViolation
+from violation_tracker import ViolationTracker, MAX_SAMPLE_GAP
+
+WORKERS = 25
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+
+def window_checks():
+    results = []
+    print("Janela por amostra:")
+    t = ViolationTracker()
+    fired = [t.observe(1, 10, True, 300, at(s)) for s in (0, 100, 200, 299, 300)]
+    results.append(check(f"Duração 300s: dispara na amostra de t=300 {fired}", fired == [False] * 4 + [True]))
+
+    t = ViolationTracker()
+    start = time.time()
+    backlog = [t.observe(2, 10, True, 300, at(s)) for s in range(0, 420, 60)]
+    results.append(check(f"Amostras de 7 min processadas em {1000 * (time.time() - start):.2f}ms: "
+                         f"dispara pela hora da amostra {backlog}", backlog.index(True) == 5))
+
+    t = ViolationTracker()
+    seq = [t.observe(3, 10, v, 120, at(s)) for s, v in ((0, True), (60, True), (90, False), (120, True), (200, True),
+                                                          (240, True))]
+    results.append(check(f"Amostra normal no meio reinicia a janela {seq}", seq == [False, False, False, False, False, True]))
+
+    t = ViolationTracker()
+    gap = [t.observe(4, 10, True, 60, at(s)) for s in (0, 30, 30 + MAX_SAMPLE_GAP + 1, 30 + MAX_SAMPLE_GAP + 31)]
+    results.append(check(f"Buraco de {MAX_SAMPLE_GAP + 1}s sem amostras reinicia a janela {gap}",
+                         gap == [False, False, False, False]))
+
+    t = ViolationTracker()
+    late = [t.observe(5, 10, True, 60, at(s)) for s in (0, 70, 30)]
+    results.append(check(f"Amostra fora de ordem não reabre a janela {late}", late == [False, True, True]))
+
+    results.append(check("Duração 0: dispara na hora sem guardar estado",
+                         t.observe(6, 11, True, 0, at(0)) and len(t) == 1))
+
+    t = ViolationTracker()
+    t.observe(7, 10, True, 300, at(0))
+    t.observe(7, 11, True, 120, at(0))
+    pending = t.pending_window(7)
+    t.observe(7, 11, True, 120, at(120))
+    results.append(check(f"Janela pendente para o agendador: {pending}s, depois de cobrir 120s: {t.pending_window(7)}s",
+                         pending == 120 and t.pending_window(7) == 300))
+    return results
+
+
+def concurrency_checks(count):
+    results = []
+    t = ViolationTracker()
+    triggers = {10: 0, 11: 60, 12: 300}            # trigger_id -> duração
+    samples = list(range(0, 600, 30))               # 10 min de amostras a cada 30s
+    fired_at = {}
+
+    def device_task(device_id):
+        # Todas as triggers do dispositivo em sequência; dispositivos em paralelo
+        for s in samples:
+            for trigger_id, duration in triggers.items():
+                if t.observe(device_id, trigger_id, True, duration, at(s)) and (device_id, trigger_id) not in fired_at:
+                    fired_at[(device_id, trigger_id)] = s
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(device_task, range(1, count + 1)))
+    elapsed = time.time() - start
+    ops = count * len(samples) * len(triggers)
+    print(f"\n{count} dispositivos x {len(triggers)} triggers x {len(samples)} amostras em {WORKERS} threads:")
+    results.append(check(f"{ops} avaliações em {elapsed:.2f}s ({int(ops / elapsed)}/s)",
+                         len(fired_at) == count * len(triggers)))
+    results.append(check("Cada par dispara exatamente ao cobrir a duração",
+                         all(fired_at[(d, tr)] == dur for d in range(1, count + 1) for tr, dur in triggers.items())))
+    results.append(check(f"{len(t)} janelas rastreadas (duração 0 não guarda estado)", len(t) == count * 2))
+    return results, t
+
+
+def persistence_checks(tracker, count):
+    results = []
+    print("\nCheckpoint e restore:")
+    init_db()
+    written = tracker.checkpoint(engine)
+    again = tracker.checkpoint(engine)
+    results.append(check(f"Primeiro checkpoint grava {written} janelas; sem mudanças grava {again}",
+                         written == count * 2 and again == 0))
+
+    tracker.observe(1, 11, False, 60, at(600))      # normalizou: removida
+    tracker.observe(2, 11, True, 60, at(600))       # avançou: atualizada
+    changed = tracker.checkpoint(engine)
+    session = get_session()
+    row = session.get(TriggerViolation, (2, 11))
+    results.append(check(f"Checkpoint incremental: {changed} linhas (1 update + 1 delete)",
+                         changed == 2 and session.get(TriggerViolation, (1, 11)) is None and row.last_sample == at(600)))
+
+    # "Reinício": instância nova restaura do banco 30s após a última amostra
+    restored = ViolationTracker()
+    n = restored.restore(session, now=at(630))
+    results.append(check(f"Restore: {n} janelas", n == count * 2 - 1))
+    results.append(check("Janela restaurada continua de onde parou (não reinicia no restart)",
+                         restored.observe(3, 12, True, 300, at(630))))
+
+    late = ViolationTracker()
+    n = late.restore(session, now=at(570 + MAX_SAMPLE_GAP + 301))
+    late.checkpoint(engine)
+    left = session.query(TriggerViolation).count()
+    results.append(check(f"Restore muito depois: janelas sem amostra recente descartadas (restam {left} no banco)",
+                         n == 0 and left == 0))
+    session.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verificação do rastreador de violações")
+    parser.add_argument('--devices', type=int, default=500)
+    args = parser.parse_args()
+    results = window_checks()
+    more, tracker = concurrency_checks(args.devices)
+    results += more
+    results += persistence_checks(tracker, args.devices)
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,179 @@
+"""
+Verificação do pool de sessões WMI e do plano de consultas com o backend falso (roda em Linux).
+
+1. Resultado no mesmo formato/valores da coleta antiga (CPU, RAM, discos, top processos,
+   versão, uptime) a partir das mesmas classes.
+2. Frota em ciclos concorrentes: uma conexão por host reaproveitada, 4 consultas por
+   coleta e processos filtrados no servidor, comparado à coleta antiga (conexão nova,
+   6 consultas e todos os processos a cada ciclo).
+3. Expiração por ociosidade, reconexão após sessão derrubada, host fora do ar.
+
+Uso: python scripts/test_wmi_pool.py [--hosts 50]
+"""
+import sys
+import os
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wmi_helper import WmiSessionPool, WMICollector, TOP_PROCESSES, is_windows_obsolete
+from fake_wmi import FakeWmiTransport, windows_host
+
+WORKERS = 25
+CYCLES = 3
+CONNECT_LATENCY = 0.2   # handshake DCOM + autenticação
+QUERY_LATENCY = 0.01
+
+
+def check(label, ok):
+    print(f"  [{'ok' if ok else 'FALHA'}] {label}")
+    return ok
+
+
+def expected(host):
+    """Valores calculados direto das linhas, como a coleta antiga fazia"""
+    procs = sorted(host['Win32_Process'], key=lambda p: int(p['WorkingSetSize']), reverse=True)[:TOP_PROCESSES]
+    os_info = host['Win32_OperatingSystem'][0]
+    total, free = float(os_info['TotalVisibleMemorySize']), float(os_info['FreePhysicalMemory'])
+    return {
+        'pids': [p['ProcessId'] for p in procs],
+        'memory': round((total - free) / total * 100, 2),
+        'drives': [d['DeviceID'] for d in host['Win32_LogicalDisk'] if d['DriveType'] == 3],
+        'cpu': round(sum(c['LoadPercentage'] for c in host['Win32_Processor']) / len(host['Win32_Processor']), 2),
+    }
+
+
+def legacy_poll(transport, ip):
+    """Coleta antiga: conexão nova e uma consulta por métrica (3 delas no Win32_OperatingSystem)"""
+    collector = WMICollector(ip, 'user', 'pass', 'CORP', transport=transport)
+    collector.get_cpu_usage()
+    collector.get_memory_usage()
+    collector.get_disk_usage()
+    collector.get_running_processes()
+    collector.get_windows_version()
+    collector.get_uptime()
+    collector.close()
+
+
+def run_cycles(hosts, poll):
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        for _ in range(CYCLES):
+            list(pool.map(poll, hosts))
+    return time.time() - start
+
+
+def shape_checks(rng):
+    results = []
+    print("Formato e valores:")
+    host = windows_host(rng, processes=300, cpus=4)
+    transport = FakeWmiTransport({'10.0.0.1': host})
+    pool = WmiSessionPool(transport=transport)
+    metrics = pool.collect('10.0.0.1', 'CORP\\user', 'pass')
+    exp = expected(host)
+    results.append(check(f"Chaves iguais às da coleta antiga: {sorted(metrics)}",
+                         sorted(metrics) == ['cpu_percent', 'disks', 'memory', 'processes',
+                                             'timestamp', 'uptime_seconds', 'windows_version']))
+    results.append(check(f"CPU média de 4 núcleos ({metrics['cpu_percent']}%), RAM {metrics['memory']['percent']}%",
+                         metrics['cpu_percent'] == exp['cpu'] and metrics['memory']['percent'] == exp['memory']))
+    results.append(check(f"Só discos locais: {[d['drive'] for d in metrics['disks']]}",
+                         [d['drive'] for d in metrics['disks']] == exp['drives']))
+    results.append(check("Top 10 processos por memória idênticos ao ordenamento completo",
+                         [p['pid'] for p in metrics['processes']] == exp['pids']))
+    results.append(check(f"Versão {metrics['windows_version']['version']!r}, uptime {metrics['uptime_seconds']}s",
+                         metrics['windows_version']['is_obsolete'] is False and metrics['uptime_seconds'] > 0))
+    results.append(check("Obsoletos: Windows 7 / Server 2012 sim, Windows 11 não",
+                         is_windows_obsolete('Microsoft Windows 7 Professional')
+                         and is_windows_obsolete('Microsoft Windows Server 2012 R2 Standard')
+                         and not is_windows_obsolete('Microsoft Windows 11 Pro')))
+
+    small = windows_host(rng, processes=40)
+    for p in small['Win32_Process']:
+        p['WorkingSetSize'] = str(rng.randint(1, 20) * 1024 * 1024)
+    transport = FakeWmiTransport({'10.0.0.2': small})
+    pool = WmiSessionPool(transport=transport)
+    first = pool.collect('10.0.0.2')
+    second = pool.collect('10.0.0.2')
+    results.append(check(f"Host só com processos pequenos: corte volta a zero e ainda traz {len(second['processes'])} "
+                         f"processos ({transport.stats['by_class']['Win32_Process']} consultas em 2 coletas)",
+                         len(first['processes']) == len(second['processes']) == TOP_PROCESSES
+                         and transport.stats['by_class']['Win32_Process'] == 3))
+    return results
+
+
+def fleet_checks(rng, count):
+    results = []
+    hosts = {f'10.1.{i // 250}.{i % 250 + 1}': windows_host(rng) for i in range(count)}
+    ips = list(hosts)
+
+    legacy = FakeWmiTransport(hosts, CONNECT_LATENCY, QUERY_LATENCY)
+    legacy_elapsed = run_cycles(ips, lambda ip: legacy_poll(legacy, ip))
+
+    transport = FakeWmiTransport(hosts, CONNECT_LATENCY, QUERY_LATENCY)
+    pool = WmiSessionPool(transport=transport)
+    collected = []
+    pooled_elapsed = run_cycles(ips, lambda ip: collected.append(pool.collect(ip, 'CORP\\user', 'pass')))
+    polls = count * CYCLES
+
+    print(f"\n{count} hosts x {CYCLES} ciclos, {WORKERS} workers (conexão {CONNECT_LATENCY}s, consulta {QUERY_LATENCY}s):")
+    for label, t, elapsed in (('antigo', legacy, legacy_elapsed), ('pool', transport, pooled_elapsed)):
+        print(f"  {label:<7} {elapsed:5.2f}s  conexões {t.stats['connects']:>4}  consultas {t.stats['queries']:>4}  "
+              f"linhas {t.stats['rows']:>6}  Win32_OperatingSystem {t.stats['by_class']['Win32_OperatingSystem']}")
+
+    results.append(check("Todas as coletas completas", len(collected) == polls and all(collected)))
+    results.append(check(f"Uma conexão por host ({transport.stats['connects']}), reaproveitada {pool.stats['reused']}x",
+                         transport.stats['connects'] == count and pool.stats['reused'] == polls - count))
+    per_poll = transport.stats['queries'] / polls
+    results.append(check(f"{per_poll:.2f} consultas por coleta (antes 6), Win32_OperatingSystem 1x por coleta",
+                         per_poll <= 4.1 and transport.stats['by_class']['Win32_OperatingSystem'] == polls))
+    results.append(check(f"Linhas transferidas: {transport.stats['rows']} vs {legacy.stats['rows']} "
+                         f"(processos filtrados no servidor)",
+                         transport.stats['rows'] < legacy.stats['rows'] / 5))
+    results.append(check(f"Tempo da frota: {pooled_elapsed:.2f}s vs {legacy_elapsed:.2f}s",
+                         pooled_elapsed < legacy_elapsed / 2))
+    return results
+
+
+def lifecycle_checks(rng):
+    results = []
+    print("\nCiclo de vida das sessões:")
+    clock = [0.0]
+    hosts = {'10.2.0.1': windows_host(rng), '10.2.0.2': windows_host(rng)}
+    transport = FakeWmiTransport(hosts, down={'10.2.0.9'})
+    pool = WmiSessionPool(transport=transport, idle_timeout=300, clock=lambda: clock[0])
+
+    pool.collect('10.2.0.1')
+    pool.collect('10.2.0.2')
+    clock[0] = 200
+    pool.collect('10.2.0.2')
+    clock[0] = 400
+    closed = pool.close_idle()
+    results.append(check(f"Ociosidade: só a sessão parada há >300s é fechada ({closed})",
+                         closed == 1 and transport.stats['closed'] == 1 and len(pool._entries) == 1))
+
+    transport.drop_sessions('10.2.0.2')
+    metrics = pool.collect('10.2.0.2')
+    results.append(check(f"Sessão derrubada (reboot): reconecta na mesma coleta ({transport.stats['connects']} conexões)",
+                         metrics is not None and transport.stats['connects'] == 3))
+
+    results.append(check("Host fora do ar: None e nenhuma sessão retida",
+                         pool.collect('10.2.0.9') is None and ('10.2.0.9', None) not in pool._entries))
+    pool.close_all()
+    results.append(check("close_all fecha tudo", not pool._entries and transport.stats['closed'] == 3))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verificação do pool de sessões WMI")
+    parser.add_argument('--hosts', type=int, default=50)
+    args = parser.parse_args()
+    rng = random.Random(16)
+    results = shape_checks(rng)
+    results += fleet_checks(rng, args.hosts)
+    results += lifecycle_checks(rng)
+    print(f"\n{sum(results)}/{len(results)} verificações OK.")
+    sys.exit(0 if all(results) else 1)
@@ -1,22 +1,42 @@
 import threading
+import time
+import uuid
 import logging
+from collections import OrderedDict
+from event_bus import event_bus
 
 logger = logging.getLogger('NetAudit.State')
 
 # Objeto global para compartilhar o estado do scan entre app.py e ai_actions.py
 scan_status = {
     "running": False,
-    "results": [],
     "progress": 0,
     "total": 0,
     "scanned": 0,
     "etr": "Portal Sentinel em repouso...",
     "last_results": {"updated": 0, "added": 0, "total_found": 0},
-    "logs": []
+    "logs": [],
+    "log_seq": 0
 }
 
 scan_lock = threading.Lock()
-results_lock = threading.Lock()
+
+def _sequence_log(entry):
+    """Numera cada log para que o cliente peça apenas os novos (?logs_since=)"""
+    scan_status["log_seq"] += 1
+    return dict(entry, seq=scan_status["log_seq"])
+
+def logs_since(seq):
+    """
+    Retorna (logs, full): apenas os logs com seq > seq, ou a janela inteira
+    (full=True) se o cliente ficou para trás da janela de 100 ou o contador reiniciou
+    """
+    with scan_lock:
+        logs = scan_status["logs"]
+        current = scan_status["log_seq"]
+        if seq is None or seq > current or (logs and logs[0]["seq"] > seq + 1):
+            return list(logs), True
+        return [l for l in logs if l["seq"] > seq], False
 
 def update_scan_status(updates):
     """Atualiza o estado global de forma segura e loga mudanças críticas"""
@@ -24,10 +44,10 @@ def update_scan_status(updates):
         for k, v in updates.items():
             if k == "logs" and isinstance(v, list):
                 # Se for uma lista completa, substitui (usado no reset)
-                scan_status[k] = v
+                scan_status[k] = [_sequence_log(item) for item in v]
             elif k == "logs":
                 # Se for um único log (item), adiciona
-                scan_status["logs"].append(v)
+                scan_status["logs"].append(_sequence_log(v))
                 if len(scan_status["logs"]) > 100:
                     scan_status["logs"] = scan_status["logs"][-100:]
             else:
@@ -35,3 +55,195 @@ def update_scan_status(updates):
         
         if "etr" in updates or "running" in updates:
             logger.debug(f"Status update: running={scan_status['running']}, etr={scan_status['etr']}")
+
+        if event_bus.has_subscribers("scan"):
+            _publish_scan_events(updates)
+
+def _publish_scan_events(updates):
+    """Empurra progresso (coalescido) e novos logs para os assinantes SSE (chamado com scan_lock)"""
+    logs = updates.get("logs")
+    if isinstance(logs, dict):
+        event_bus.publish("scan.log", scan_status["logs"][-1])
+    elif isinstance(logs, list):
+        event_bus.publish("scan.log", {"reset": True, "logs": list(scan_status["logs"]), "seq": scan_status["log_seq"]})
+
+    if any(k != "logs" for k in updates):
+        total = scan_status.get("total", 0)
+        progress = min(100, int(scan_status.get("scanned", 0) / total * 100)) if total > 0 else 0
+        event_bus.publish("scan.progress", {
+            "running": scan_status["running"],
+            "progress": progress,
+            "total": total,
+            "scanned": scan_status["scanned"],
+            # Mesmos campos do /api/scanner/status (contador de IPs da página Scanner)
+            "scanned_ips": scan_status["scanned"],
+            "total_ips": total,
+            "etr": scan_status["etr"],
+            "last_results": scan_status.get("last_results"),
+            "log_seq": scan_status["log_seq"]
+        }, coalesce=True)
+
+
+class DeviceStore:
+    """
+    Inventário em memória indexado por IP (e MAC).
+
+    Cada escrita incrementa uma versão global e marca a entrada com ela.
+    Os dicts de dispositivo são tratados como imutáveis: quem atualiza
+    substitui o dict inteiro, então snapshots podem ser compartilhados
+    entre leitores sem cópia.
+
+    A versão só é comparável dentro da mesma `epoch` (gerada a cada
+    inicialização do processo); clientes com outra epoch recebem a lista completa.
+    """
+
+    MAX_TOMBSTONES = 10000
+    # Renovados a cada sondagem do coletor: sozinhos não geram versão na recarga do banco
+    VOLATILE_FIELDS = ('last_seen',)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._by_ip = {}              # {ip: device_dict}
+        self._ip_by_mac = {}          # {mac: ip}
+        self._versions = OrderedDict()  # {ip: versão da última escrita}, da mais antiga para a mais recente
+        self._created = {}            # {ip: versão em que entrou no inventário}
+        self._removed = OrderedDict()   # {ip: versão da remoção} (tombstones para o delta)
+        self._tombstone_floor = 0     # deltas anteriores a esta versão exigem lista completa
+        self._version = 0
+        self._snapshot = []
+        self._snapshot_version = 0
+        self._loaded = {}             # {ip: dict da última recarga do banco} (base de comparação do replace_all)
+        self.epoch = uuid.uuid4().hex[:12]
+        self.loaded_at = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def __len__(self):
+        return len(self._by_ip)
+
+    def _index_mac(self, device, old=None):
+        if old:
+            old_mac = old.get('mac')
+            if old_mac and self._ip_by_mac.get(old_mac) == old.get('ip'):
+                del self._ip_by_mac[old_mac]
+        mac = device.get('mac') if device else None
+        if mac and mac != '-':
+            self._ip_by_mac[mac] = device['ip']
+
+    def upsert(self, device):
+        """
+        Insere ou substitui um dispositivo (chave: IP)
+
+        Returns:
+            bool: True se o IP era novo no inventário
+        """
+        ip = device['ip']
+        with self._lock:
+            old = self._by_ip.get(ip)
+            self._version += 1
+            self._by_ip[ip] = device
+            self._versions[ip] = self._version
+            self._versions.move_to_end(ip)
+            if old is None:
+                self._created[ip] = self._version
+                self._removed.pop(ip, None)
+            self._index_mac(device, old)
+            return old is None
+
+    def remove(self, ip):
+        with self._lock:
+            old = self._by_ip.pop(ip, None)
+            if old is None:
+                return False
+            self._version += 1
+            self._versions.pop(ip, None)
+            self._created.pop(ip, None)
+            self._removed[ip] = self._version
+            if len(self._removed) > self.MAX_TOMBSTONES:
+                _, floor = self._removed.popitem(last=False)
+                self._tombstone_floor = floor
+            self._index_mac(None, old)
+            return True
+
+    def replace_all(self, devices):
+        """
+        Sincroniza com uma lista completa (ex: recarga do banco), versionando só o que mudou.
+
+        O dict do banco tem outro formato que o da auditoria: uma entrada só é
+        substituída se difere da memória e também da recarga anterior do mesmo
+        IP, ou seja, se o conteúdo gravado mudou de fato (VOLATILE_FIELDS ignorados).
+        """
+        with self._lock:
+            incoming = {d['ip']: d for d in devices}
+            for ip in [ip for ip in self._by_ip if ip not in incoming]:
+                self.remove(ip)
+            for ip, device in incoming.items():
+                current = self._by_ip.get(ip)
+                if current is None or not (self._same_content(current, device)
+                                           or self._same_content(self._loaded.get(ip), device)):
+                    self.upsert(device)
+            self._loaded = incoming
+            self.loaded_at = time.time()
+
+    @classmethod
+    def _same_content(cls, a, b):
+        if a is None or b is None:
+            return False
+        return ({k: v for k, v in a.items() if k not in cls.VOLATILE_FIELDS}
+                == {k: v for k, v in b.items() if k not in cls.VOLATILE_FIELDS})
+
+    def get(self, ip):
+        return self._by_ip.get(ip)
+
+    def get_by_mac(self, mac):
+        ip = self._ip_by_mac.get(mac)
+        return self._by_ip.get(ip) if ip else None
+
+    def entry_version(self, ip):
+        return self._versions.get(ip, 0)
+
+    def changes_since(self, since, epoch=None):
+        """
+        Delta do inventário desde a versão `since`.
+
+        Returns:
+            dict: {'epoch', 'version', 'full': True, 'devices': [...]} quando o
+            cliente precisa da lista completa, ou {'epoch', 'version', 'full': False,
+            'added': [...], 'changed': [...], 'removed': [ips]}
+        """
+        with self._lock:
+            base = {"epoch": self.epoch, "version": self._version}
+            if since is None or epoch != self.epoch or since > self._version or since < self._tombstone_floor:
+                return dict(base, full=True, devices=self.snapshot())
+
+            added, changed = [], []
+            # _versions está ordenado por escrita: percorre do fim até alcançar `since`
+            for ip in reversed(self._versions):
+                if self._versions[ip] <= since:
+                    break
+                target = added if self._created.get(ip, 0) > since else changed
+                target.append(self._by_ip[ip])
+
+            removed = []
+            for ip in reversed(self._removed):
+                if self._removed[ip] <= since:
+                    break
+                removed.append(ip)
+
+            return dict(base, full=False, added=added, changed=changed, removed=removed)
+
+    def snapshot(self):
+        """Lista de dispositivos para leitura; reconstruída apenas quando a versão muda"""
+        if self._snapshot_version == self._version:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot_version != self._version:
+                self._snapshot = list(self._by_ip.values())
+                self._snapshot_version = self._version
+            return self._snapshot
+
+
+# Inventário global compartilhado entre scanner, API e IA
+device_store = DeviceStore()
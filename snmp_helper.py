@@ -1,124 +1,375 @@
+"""
+SNMP Helper - Cliente SNMP compartilhado (um SnmpEngine e um event loop de longa duração)
+Requisições de todas as threads (scanner, Sentinel) são multiplexadas no mesmo engine;
+tabelas são lidas com GETBULK. API assíncrona + fachada síncrona thread-safe.
+"""
 import asyncio
+import socket
+import threading
+import logging
 from pysnmp.hlapi.asyncio import *
+from pysnmp.proto import rfc1902, rfc1905
+from pysnmp.entity import config
+from pysnmp.carrier.asyncio.dgram import udp
 
-async def snmp_get(ip, oids, community='public'):
-    """Faz um GET SNMP síncrono (embebido em async) para vários OIDs"""
-    results = {}
-    snmpEngine = SnmpEngine()
-    
-    # Prepara a lista de objetos de consulta
-    object_types = [ObjectType(ObjectIdentity(oid)) for oid in oids]
-    
-    try:
-        # Pysnmp 6.x async API (camelCase)
-        iterator = getCmd(
-            snmpEngine,
-            CommunityData(community, mpModel=1), # Tenta SNMPv2c
-            UdpTransportTarget((ip, 161), timeout=2.5, retries=2),
-            ContextData(),
-            *object_types
+logger = logging.getLogger("SnmpClient")
+
+# Buffer de recepção do socket compartilhado: rajadas de respostas de centenas de
+# agentes chegam juntas e o padrão do SO (~200KB) descarta datagramas
+RECV_BUFFER_BYTES = 4 * 1024 * 1024
+
+# Valores que encerram a coluna em um GETBULK/WALK
+_END_OF_COLUMN = (rfc1905.EndOfMibView, rfc1905.NoSuchObject, rfc1905.NoSuchInstance)
+
+
+def _oid_str(name):
+    return ".".join(map(str, name.asTuple()))
+
+
+def _var_bind(oid):
+    # OID numérico cru: dispensa a resolução via MIB (ObjectIdentity), que domina o custo de CPU
+    return (rfc1902.ObjectName(oid.strip('.')), rfc1905.unSpecified)
+
+
+class SnmpClient:
+    """
+    Serviço SNMP de longa duração.
+
+    Um único SnmpEngine (e portanto um único socket UDP) vive em um event loop
+    dedicado; o engine casa as respostas pelo request-id, então centenas de
+    agentes podem ser consultados em paralelo sem criar engines/loops por chamada.
+    """
+
+    def __init__(self, timeout=2.0, retries=1, max_repetitions=25, max_inflight=256):
+        """
+        Args:
+            timeout: Timeout padrão por requisição (s)
+            retries: Retransmissões padrão
+            max_repetitions: Linhas pedidas por GETBULK
+            max_inflight: Requisições simultâneas no engine
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.max_repetitions = max_repetitions
+        self.max_inflight = max_inflight
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._engine = None
+        self._sem = None
+        self.stats = {"requests": 0, "errors": 0, "inflight": 0}
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def start(self):
+        """Sobe o event loop dedicado (idempotente; chamado sob demanda pela fachada)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            ready = threading.Event()
+
+            def run():
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                self._loop = loop
+                self._engine = SnmpEngine()
+                self._open_transport(loop)
+                self._sem = asyncio.Semaphore(self.max_inflight)
+                ready.set()
+                try:
+                    loop.run_forever()
+                finally:
+                    try:
+                        self._engine.closeDispatcher()
+                    except Exception:
+                        pass
+                    # Cancela o que ficou pendente (timers do dispatcher, requisições em voo)
+                    pending = asyncio.all_tasks(loop)
+                    for task in pending:
+                        task.cancel()
+                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                    loop.close()
+
+            self._thread = threading.Thread(target=run, name="SnmpClientLoop", daemon=True)
+            self._thread.start()
+            ready.wait(5)
+            logger.info("[SNMP] Cliente compartilhado iniciado.")
+
+    def _open_transport(self, loop):
+        """Registra no engine o socket UDP único (o hlapi reutiliza o transporte já registrado)"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_BYTES)
+        except OSError as e:
+            logger.debug(f"SO_RCVBUF não ajustado: {e}")
+        sock.bind(('0.0.0.0', 0))
+        sock.setblocking(False)
+        transport = udp.UdpAsyncioTransport(loop=loop).openServerMode(sock=sock)
+        config.addTransport(self._engine, udp.domainName, transport)
+
+    def stop(self):
+        with self._lock:
+            if self._loop and self._thread and self._thread.is_alive():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(5)
+            self._thread = None
+            self._loop = None
+
+    def submit(self, coro):
+        """Agenda uma corrotina no loop do cliente. Retorna um concurrent.futures.Future."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout=None):
+        """Fachada síncrona: executa a corrotina no loop do cliente e bloqueia até o resultado"""
+        self.start()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            coro.close()
+            raise RuntimeError("SnmpClient.run() chamado de dentro do loop do cliente; use await")
+        return self.submit(coro).result(timeout)
+
+    async def call(self, coro):
+        """Aguarda uma corrotina do cliente a partir de qualquer event loop"""
+        self.start()
+        if asyncio.get_running_loop() is self._loop:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    # ------------------------------------------------------------------
+    # Operações (executam no loop do cliente)
+    # ------------------------------------------------------------------
+    def _target(self, ip, port, timeout, retries):
+        return UdpTransportTarget(
+            (ip, port),
+            timeout=self.timeout if timeout is None else timeout,
+            retries=self.retries if retries is None else retries
         )
-        
-        errorIndication, errorStatus, errorIndex, varBinds = await iterator
-        
+
+    async def _request(self, fn, *args, **kwargs):
+        async with self._sem:
+            self.stats["requests"] += 1
+            self.stats["inflight"] += 1
+            try:
+                return await fn(self._engine, *args, lookupMib=False, **kwargs)
+            finally:
+                self.stats["inflight"] -= 1
+
+    async def get(self, ip, oids, community='public', port=161, timeout=None, retries=None):
+        """
+        GET de vários OIDs em uma única PDU.
+
+        Returns:
+            dict: {oid numérico: valor (prettyPrint)} ou {"error": mensagem}.
+                  OIDs inexistentes no agente (noSuchObject/noSuchInstance) ficam de fora.
+        """
+        results = {}
+        try:
+            errorIndication, errorStatus, errorIndex, varBinds = await self._request(
+                getCmd,
+                CommunityData(community, mpModel=1),  # SNMPv2c
+                self._target(ip, port, timeout, retries),
+                ContextData(),
+                *[_var_bind(oid) for oid in oids]
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            return {"error": str(e)}
+
         if errorIndication:
+            self.stats["errors"] += 1
             return {"error": str(errorIndication)}
         elif errorStatus:
+            self.stats["errors"] += 1
             return {"error": f"{errorStatus.prettyPrint()} at {errorIndex and varBinds[int(errorIndex)-1][0] or '?'}"}
-        else:
-            for varBind in varBinds:
-                # Armazena tanto o OID numérico quanto o "pretty name"
-                oid_num = ".".join(map(str, varBind[0].asTuple())) # Ex: 1.3.6.1.2.1.1.1.0
-                value = varBind[1].prettyPrint()
-                results[oid_num] = value
-                
-    except Exception as e:
-        return {"error": str(e)}
-    finally:
-        snmpEngine.closeDispatcher()
-        
-    return results
 
-async def snmp_walk(ip, oid, community='public'):
-    """Faz um WALK SNMP para obter uma tabela inteira"""
-    results = []
-    snmpEngine = SnmpEngine()
-    
-    try:
-        iterator = nextCmd(
-            snmpEngine,
-            CommunityData(community, mpModel=1),
-            UdpTransportTarget((ip, 161), timeout=2.0, retries=1),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid)),
-            lexicographicMode=False
-        )
+        for name, value in varBinds:
+            if isinstance(value, _END_OF_COLUMN):
+                continue
+            results[_oid_str(name)] = value.prettyPrint()
+        return results
+
+    async def walk_table(self, ip, columns, community='public', port=161, timeout=None, retries=None,
+                         max_repetitions=None):
+        """
+        Lê várias colunas de uma tabela com GETBULK, todas na mesma PDU por rodada.
 
-        async for errorIndication, errorStatus, errorIndex, varBinds in iterator:
+        Args:
+            columns: OIDs das colunas (ex: '1.3.6.1.2.1.43.11.1.1.6')
+
+        Returns:
+            dict: {coluna: [(índice, valor), ...]} na ordem do agente; índice = sufixo após a coluna
+        """
+        prefixes = {col: tuple(int(x) for x in col.strip('.').split('.')) for col in columns}
+        rows = {col: [] for col in columns}
+        cursors = {col: col for col in columns}
+        last = {}
+        reps = max_repetitions or self.max_repetitions
+
+        while cursors:
+            active = list(cursors)
+            try:
+                errorIndication, errorStatus, errorIndex, varBindTable = await self._request(
+                    bulkCmd,
+                    CommunityData(community, mpModel=1),
+                    self._target(ip, port, timeout, retries),
+                    ContextData(),
+                    0, reps,
+                    *[_var_bind(cursors[col]) for col in active]
+                )
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.debug(f"GETBULK {ip} falhou: {e}")
+                break
+            if errorStatus and int(errorStatus) == 1 and reps > 1:
+                # tooBig: o agente não cabe a resposta em uma PDU; pede menos linhas
+                reps //= 2
+                continue
             if errorIndication or errorStatus:
+                self.stats["errors"] += 1
                 break
-            
-            for varBind in varBinds:
-                results.append(varBind[1].prettyPrint())
-                
-    except Exception:
-        pass
-    finally:
-        snmpEngine.closeDispatcher()
-        
-    return results
 
-def get_printer_data(ip, community='public'):
-    """Função wrapper para ser chamada de forma síncrona pelo app.py"""
-    # ... (Generic OIDs - Keep existing)
-    sys_oids = [
-        '1.3.6.1.2.1.1.1.0',            # SysDesc
-        '1.3.6.1.2.1.1.3.0',            # SysUpTime
-        '1.3.6.1.2.1.1.4.0',            # SysContact
-        '1.3.6.1.2.1.1.5.0',            # SysName
-        '1.3.6.1.2.1.1.6.0',            # SysLocation
-        '1.3.6.1.2.1.43.5.1.1.17.1',    # Serial Number
-        '1.3.6.1.2.1.43.10.2.1.4.1.1',  # Total Page Count
-        '1.3.6.1.2.1.25.3.5.1.1.1',     # Printer Status
-        '1.3.6.1.2.1.25.3.5.1.2.1',     # Error State
-        '1.3.6.1.2.1.43.16.5.1.2.1.1',  # Console Display Buffer
-    ]
-    
-    # Supplies OIDs (Keep existing)
-    supply_oids = []
-    for i in range(1, 21): 
-        supply_oids.append(f'1.3.6.1.2.1.43.11.1.1.6.1.{i}') # Name
-        supply_oids.append(f'1.3.6.1.2.1.43.11.1.1.8.1.{i}') # Max Capacity
-        supply_oids.append(f'1.3.6.1.2.1.43.11.1.1.9.1.{i}') # Current Level
-    
-    all_get_oids = sys_oids + supply_oids
+            done = set()
+            for row in varBindTable:
+                for col, (name, value) in zip(active, row):
+                    if col in done:
+                        continue
+                    oid = name.asTuple()
+                    prefix = prefixes[col]
+                    if (isinstance(value, _END_OF_COLUMN) or oid[:len(prefix)] != prefix
+                            or (rows[col] and oid <= last[col])):
+                        # Fim da coluna (ou agente que não avança: evita laço infinito)
+                        done.add(col)
+                        continue
+                    last[col] = oid
+                    rows[col].append((".".join(map(str, oid[len(prefix):])), value.prettyPrint()))
+                    cursors[col] = _oid_str(name)
+            # Resposta vazia encerra todas as colunas ativas
+            for col in active:
+                if col in done or not varBindTable:
+                    cursors.pop(col, None)
+        return rows
 
-    try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        # 1. SNMP GET (Scalar Data)
-        data = loop.run_until_complete(snmp_get(ip, all_get_oids, community))
-        
-        # 2. SNMP WALKS (Table Data - Best Effort)
-        # Alerts & Jobs
-        alerts_walk = loop.run_until_complete(snmp_walk(ip, '1.3.6.1.2.1.43.18.1.1.8', community))
-        jobs_walk = loop.run_until_complete(snmp_walk(ip, '1.3.6.1.4.1.2699.1.1.1.1.6', community))
-        
-        # Max Info: Input Trays (Paper)
-        tray_names = loop.run_until_complete(snmp_walk(ip, '1.3.6.1.2.1.43.8.2.1.18', community))
-        tray_levels = loop.run_until_complete(snmp_walk(ip, '1.3.6.1.2.1.43.8.2.1.10', community))
-        tray_caps = loop.run_until_complete(snmp_walk(ip, '1.3.6.1.2.1.43.8.2.1.9', community))
-        
-        # Max Info: Output Bins
-        out_names = loop.run_until_complete(snmp_walk(ip, '1.3.6.1.2.1.43.9.2.1.6', community))
-        out_levels = loop.run_until_complete(snmp_walk(ip, '1.3.6.1.2.1.43.9.2.1.5', community)) # Remaining capacity usually
-        
-        # Max Info: Covers/Doors
-        cover_descs = loop.run_until_complete(snmp_walk(ip, '1.3.6.1.2.1.43.6.1.1.2', community))
-        cover_status = loop.run_until_complete(snmp_walk(ip, '1.3.6.1.2.1.43.6.1.1.3', community))
+    async def walk(self, ip, oid, community='public', port=161, timeout=None, retries=None):
+        """WALK (via GETBULK) de uma subárvore. Retorna apenas os valores, em ordem."""
+        table = await self.walk_table(ip, [oid], community, port, timeout, retries)
+        return [value for _, value in table[oid]]
+
+    # ------------------------------------------------------------------
+    # Fachada síncrona
+    # ------------------------------------------------------------------
+    def get_sync(self, ip, oids, community='public', port=161, timeout=None, retries=None):
+        return self.run(self.get(ip, oids, community, port, timeout, retries))
+
+    def walk_table_sync(self, ip, columns, community='public', port=161, timeout=None, retries=None):
+        return self.run(self.walk_table(ip, columns, community, port, timeout, retries))
+
+
+# Instância global compartilhada
+snmp_client = SnmpClient()
+
+
+async def snmp_get(ip, oids, community='public', port=161):
+    """Faz um GET SNMP para vários OIDs (no engine compartilhado)"""
+    return await snmp_client.call(snmp_client.get(ip, oids, community, port, timeout=2.5, retries=2))
+
+
+async def snmp_walk(ip, oid, community='public', port=161):
+    """Faz um WALK SNMP (GETBULK) para obter uma tabela inteira"""
+    return await snmp_client.call(snmp_client.walk(ip, oid, community, port, timeout=2.0, retries=1))
+
+
+# Scalars (Generic OIDs)
+OID_SYS_DESCR = '1.3.6.1.2.1.1.1.0'
+OID_SYS_UPTIME = '1.3.6.1.2.1.1.3.0'
+OID_SYS_CONTACT = '1.3.6.1.2.1.1.4.0'
+OID_SYS_NAME = '1.3.6.1.2.1.1.5.0'
+OID_SYS_LOCATION = '1.3.6.1.2.1.1.6.0'
+OID_PRT_SERIAL = '1.3.6.1.2.1.43.5.1.1.17.1'
+OID_PRT_PAGE_COUNT = '1.3.6.1.2.1.43.10.2.1.4.1.1'
+OID_PRT_STATUS = '1.3.6.1.2.1.25.3.5.1.1.1'
+OID_PRT_ERROR_STATE = '1.3.6.1.2.1.25.3.5.1.2.1'
+OID_PRT_CONSOLE = '1.3.6.1.2.1.43.16.5.1.2.1.1'
+
+_PRINTER_GET_OIDS = [
+    OID_SYS_DESCR, OID_SYS_UPTIME, OID_SYS_CONTACT, OID_SYS_NAME, OID_SYS_LOCATION,
+    OID_PRT_SERIAL, OID_PRT_PAGE_COUNT, OID_PRT_STATUS, OID_PRT_ERROR_STATE, OID_PRT_CONSOLE,
+]
+
+# Tabelas da Printer-MIB (RFC 3805) lidas por GETBULK: {tabela: {campo: coluna}}
+PRINTER_TABLES = {
+    'supplies': {                           # prtMarkerSuppliesTable
+        'name': '1.3.6.1.2.1.43.11.1.1.6',
+        'max_capacity': '1.3.6.1.2.1.43.11.1.1.8',
+        'level': '1.3.6.1.2.1.43.11.1.1.9',
+    },
+    'inputs': {                             # prtInputTable
+        'capacity': '1.3.6.1.2.1.43.8.2.1.9',
+        'level': '1.3.6.1.2.1.43.8.2.1.10',
+        'name': '1.3.6.1.2.1.43.8.2.1.18',
+    },
+    'outputs': {                            # prtOutputTable
+        'level': '1.3.6.1.2.1.43.9.2.1.5',
+        'name': '1.3.6.1.2.1.43.9.2.1.6',
+    },
+    'covers': {                             # prtCoverTable
+        'description': '1.3.6.1.2.1.43.6.1.1.2',
+        'status': '1.3.6.1.2.1.43.6.1.1.3',
+    },
+    'alerts': {                             # prtAlertTable
+        'description': '1.3.6.1.2.1.43.18.1.1.8',
+    },
+    'jobs': {                               # Job Monitoring MIB (jmJobAttribute)
+        'user': '1.3.6.1.4.1.2699.1.1.1.1.6',
+    },
+}
+
+# Linhas por rodada: todas as colunas vão na mesma PDU, então o total de varbinds é
+# colunas x repetições; o walk_table reduz sozinho se o agente responder tooBig
+PRINTER_BULK_REPETITIONS = 10
 
-        loop.close()
+
+def _index_key(index):
+    return tuple(int(x) for x in index.split('.') if x)
+
+
+async def fetch_printer_tables(ip, community='public', port=161, timeout=2.0, retries=1):
+    """
+    Lê todas as tabelas de PRINTER_TABLES em um único walk GETBULK multi-coluna.
+
+    Returns:
+        dict: {tabela: {índice: {campo: valor}}}, linhas em ordem de índice.
+              Suprimentos/bandejas são descobertos pelo que o agente tem, sem slots fixos.
+    """
+    columns = {oid: (table, field) for table, fields in PRINTER_TABLES.items() for field, oid in fields.items()}
+    raw = await snmp_client.walk_table(ip, list(columns), community, port, timeout, retries,
+                                       max_repetitions=PRINTER_BULK_REPETITIONS)
+    tables = {table: {} for table in PRINTER_TABLES}
+    for oid, entries in raw.items():
+        table, field = columns[oid]
+        for index, value in entries:
+            tables[table].setdefault(index, {})[field] = value
+    return {table: dict(sorted(rows.items(), key=lambda item: _index_key(item[0])))
+            for table, rows in tables.items()}
+
+
+async def _printer_raw(ip, community, port):
+    """GET dos escalares + walk das tabelas, concorrentes no mesmo engine (2 PDUs por rodada)"""
+    return await asyncio.gather(
+        snmp_client.get(ip, _PRINTER_GET_OIDS, community, port, timeout=2.5, retries=2),
+        fetch_printer_tables(ip, community, port)
+    )
+
+
+def get_printer_data(ip, community='public', port=161):
+    """Função wrapper para ser chamada de forma síncrona pelo app.py"""
+    try:
+        # Uma ida ao loop compartilhado: GET + GETBULK concorrentes
+        data, tables = snmp_client.run(_printer_raw(ip, community, port))
         
         if "error" in data:
             return None
@@ -133,10 +384,8 @@ def get_printer_data(ip, community='public'):
             if "unknown" in lower: return ""
             return s
 
-        def find_val(oid_suffix):
-            for k, v in data.items():
-                if k.endswith(oid_suffix): return v
-            return "N/A"
+        def scalar(oid):
+            return data.get(oid, "N/A")
 
         def format_uptime(timeticks):
             try:
@@ -151,94 +400,93 @@ def get_printer_data(ip, community='public'):
             except: return "N/A"
 
         # Tenta extrair valores
-        sys_name = clean_snmp_string(find_val('1.1.5.0'))
-        model = clean_snmp_string(find_val('1.1.1.0'))
-        location = clean_snmp_string(find_val('1.1.6.0'))
-        contact = clean_snmp_string(find_val('1.1.4.0'))
-        serial = clean_snmp_string(find_val('43.5.1.1.17.1'))
+        sys_name = clean_snmp_string(scalar(OID_SYS_NAME))
+        model = clean_snmp_string(scalar(OID_SYS_DESCR))
+        location = clean_snmp_string(scalar(OID_SYS_LOCATION))
+        contact = clean_snmp_string(scalar(OID_SYS_CONTACT))
+        serial = clean_snmp_string(scalar(OID_PRT_SERIAL))
         
         # Process Alerts
         alerts_list = []
-        if alerts_walk:
-            seen_shorts = set()
-            for a in alerts_walk:
-                a = str(a).strip()
-                if a and len(a) > 2 and a not in seen_shorts:
-                    alerts_list.append(a)
-                    seen_shorts.add(a)
+        seen_shorts = set()
+        for row in tables['alerts'].values():
+            a = str(row.get('description', '')).strip()
+            if a and len(a) > 2 and a not in seen_shorts:
+                alerts_list.append(a)
+                seen_shorts.add(a)
 
         # Process Job History
         job_history = []
-        if jobs_walk:
+        jobs = [str(row.get('user', '')).strip() for row in tables['jobs'].values()]
+        if jobs:
             from collections import Counter
-            job_counts = Counter([str(j).strip() for j in jobs_walk if len(str(j).strip()) > 1])
+            job_counts = Counter([j for j in jobs if len(j) > 1])
             job_history = [{"user": k, "count": v} for k, v in job_counts.most_common(5)]
 
-        # Process Trays
+        # Process Trays (colunas casadas pelo índice da linha, não pela posição)
         trays = []
-        if tray_names:
-            for i, name in enumerate(tray_names):
-                try:
-                    cap = int(tray_caps[i]) if i < len(tray_caps) else -1
-                    lvl = int(tray_levels[i]) if i < len(tray_levels) else -1
-                    
-                    # RFC Printer MIB: -1=No Restriction, -2=Unknown, -3=Some
-                    status = "OK"
+        for row in tables['inputs'].values():
+            name = row.get('name')
+            try:
+                cap = int(row.get('capacity', -1))
+                lvl = int(row.get('level', -1))
+                
+                # RFC Printer MIB: -1=No Restriction, -2=Unknown, -3=Some
+                status = "OK"
+                pct = 0
+                if lvl == -3: 
+                    status = "Disponível"
+                    pct = 100
+                elif lvl >= 0 and cap > 0:
+                    pct = int((lvl / cap) * 100)
+                    status = f"{pct}%"
+                elif lvl == 0 and cap > 0:
+                    status = "Vazia"
                     pct = 0
-                    if lvl == -3: 
-                        status = "Disponível"
-                        pct = 100
-                    elif lvl >= 0 and cap > 0:
-                        pct = int((lvl / cap) * 100)
-                        status = f"{pct}%"
-                    elif lvl == 0 and cap > 0:
-                        status = "Vazia"
-                        pct = 0
-                    
-                    if name:
-                        trays.append({
-                            "name": str(name),
-                            "capacity": cap,
-                            "level": lvl,
-                            "pct": pct,
-                            "status": status
-                        })
-                except: pass
+                
+                if name:
+                    trays.append({
+                        "name": str(name),
+                        "capacity": cap,
+                        "level": lvl,
+                        "pct": pct,
+                        "status": status
+                    })
+            except: pass
 
         # Process Covers/Doors
         covers = []
-        if cover_descs:
-            for i, desc in enumerate(cover_descs):
-                desc_clean = clean_snmp_string(desc)
-                if not desc_clean: continue
-                try:
-                    st = int(cover_status[i]) if i < len(cover_status) else 0
-                    st_str = "Desconhecido"
-                    is_open = False
-                    if st == 3: 
-                        st_str = "ABERTA"
-                        is_open = True
-                    elif st == 4: st_str = "Fechada"
-                    elif st == 5: 
-                        st_str = "ABERTA (Travada)"
-                        is_open = True
-                    elif st == 6: st_str = "Fechada (Travada)"
-                    
-                    covers.append({"name": desc_clean, "status": st_str, "is_open": is_open})
-                except: pass
+        for row in tables['covers'].values():
+            desc_clean = clean_snmp_string(row.get('description'))
+            if not desc_clean: continue
+            try:
+                st = int(row.get('status', 0))
+                st_str = "Desconhecido"
+                is_open = False
+                if st == 3: 
+                    st_str = "ABERTA"
+                    is_open = True
+                elif st == 4: st_str = "Fechada"
+                elif st == 5: 
+                    st_str = "ABERTA (Travada)"
+                    is_open = True
+                elif st == 6: st_str = "Fechada (Travada)"
+                
+                covers.append({"name": desc_clean, "status": st_str, "is_open": is_open})
+            except: pass
 
         p_data = {
             "model": model, 
             "hostname": sys_name,
             "location": location,
             "contact": contact,
-            "uptime_raw": find_val('1.1.3.0'),
-            "uptime": format_uptime(find_val('1.1.3.0')),
+            "uptime_raw": scalar(OID_SYS_UPTIME),
+            "uptime": format_uptime(scalar(OID_SYS_UPTIME)),
             "serial": serial,
-            "pages": find_val('43.10.2.1.4.1.1'),
-            "status": find_val('25.3.5.1.1.1'),
-            "error_state": find_val('25.3.5.1.2.1'),
-            "console_display": find_val('43.16.5.1.2.1.1'),
+            "pages": scalar(OID_PRT_PAGE_COUNT),
+            "status": scalar(OID_PRT_STATUS),
+            "error_state": scalar(OID_PRT_ERROR_STATE),
+            "console_display": scalar(OID_PRT_CONSOLE),
             "supplies": [],
             "alerts": alerts_list,
             "job_history": job_history,
@@ -246,11 +494,11 @@ def get_printer_data(ip, community='public'):
             "covers": covers
         }
         
-        # Mapeia suprimentos com lógica RFC 3805
-        for i in range(1, 21):
-            name = find_val(f'43.11.1.1.6.1.{i}')
-            max_cap = find_val(f'43.11.1.1.8.1.{i}')
-            level = find_val(f'43.11.1.1.9.1.{i}')
+        # Mapeia suprimentos com lógica RFC 3805 (todas as linhas que o agente expõe)
+        for row in tables['supplies'].values():
+            name = row.get('name', "N/A")
+            max_cap = row.get('max_capacity', "N/A")
+            level = row.get('level', "N/A")
             
             if name != "N/A" and level != "N/A":
                 level_display = "-1"
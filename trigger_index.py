@@ -0,0 +1,152 @@
+"""
+Trigger Index - Regras de alerta compiladas em memória para o Sentinel
+Índice metric_type -> device_type -> regras com o predicado já resolvido, montado a
+partir da tabela triggers e recarregado só quando ela muda (edição via ORM invalida na
+hora; edições externas são detectadas pela assinatura da tabela a cada CHECK_SECONDS).
+"""
+import time
+import logging
+import operator
+import threading
+from sqlalchemy import event
+
+from models import Trigger
+
+logger = logging.getLogger("TriggerIndex")
+
+# Intervalo entre conferências da assinatura da tabela triggers
+CHECK_SECONDS = 30
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+}
+
+# Colunas que definem a regra (assinatura + compilação)
+_COLUMNS = (Trigger.id, Trigger.name, Trigger.description, Trigger.metric_type, Trigger.operator,
+            Trigger.threshold, Trigger.duration_seconds, Trigger.severity, Trigger.notify_email,
+            Trigger.notify_webhook, Trigger.device_type_filter, Trigger.enabled)
+
+
+def compile_predicate(op, threshold):
+    """Predicado value -> violado; operador desconhecido nunca viola"""
+    fn = OPERATORS.get(op)
+    if fn is None or threshold is None:
+        return lambda value: False
+    return lambda value: value is not None and fn(value, threshold)
+
+
+class CompiledRule:
+    """Trigger compilado (mesmos atributos usados pelo AlertManager, sem vínculo com a sessão)"""
+
+    __slots__ = ('id', 'name', 'description', 'metric_type', 'operator', 'threshold',
+                 'duration_seconds', 'severity', 'notify_email', 'notify_webhook',
+                 'device_type_filter', 'violated')
+
+    def __init__(self, row):
+        (self.id, self.name, self.description, self.metric_type, self.operator, self.threshold,
+         self.duration_seconds, self.severity, self.notify_email, self.notify_webhook,
+         self.device_type_filter, _) = row
+        self.violated = compile_predicate(self.operator, self.threshold)
+
+    def __repr__(self):
+        return f"<CompiledRule {self.name} {self.metric_type} {self.operator} {self.threshold}>"
+
+
+class TriggerIndex:
+    """Índice de regras habilitadas (leitura sem lock: o índice é trocado inteiro no reload)"""
+
+    def __init__(self, check_seconds=CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._signature = None
+        self._by_metric = {}        # {metric_type: {device_type | None: [regras]}}
+        self._merged = {}           # {(metric_type, device_type): (regras)} montado sob demanda
+        self._by_id = {}
+        self._by_name = {}          # {nome: [regras]} (alertas são ligados ao trigger pelo título)
+        self._loaded = False
+        self._stale = True
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"reloads": 0, "checks": 0, "rules": 0}
+
+    def invalidate(self):
+        """Força a conferência da tabela na próxima chamada de refresh"""
+        self._stale = True
+
+    def _build(self, rows):
+        by_metric, by_id, by_name = {}, {}, {}
+        for row in rows:
+            rule = CompiledRule(row)
+            if not row[-1]:
+                continue  # desabilitado
+            by_metric.setdefault(rule.metric_type, {}).setdefault(rule.device_type_filter or None, []).append(rule)
+            by_id[rule.id] = rule
+            by_name.setdefault(rule.name, []).append(rule)
+        self._by_metric, self._by_id, self._by_name = by_metric, by_id, by_name
+        self._merged = {}
+        self.stats["rules"] = len(by_id)
+
+    def refresh(self, session, force=False):
+        """
+        Confere a tabela triggers (no máximo a cada check_seconds, ou já se invalidado)
+        e recompila o índice se algo mudou.
+
+        Returns:
+            bool: True se o índice foi recarregado
+        """
+        now = time.monotonic()
+        if not force and self._loaded and not self._stale and now - self._last_check < self.check_seconds:
+            return False
+        with self._lock:
+            self._stale = False
+            self._last_check = now
+            self.stats["checks"] += 1
+            rows = [tuple(r) for r in session.query(*_COLUMNS).order_by(Trigger.id).all()]
+            signature = hash(tuple(rows))
+            if self._loaded and signature == self._signature:
+                return False
+            self._build(rows)
+            self._signature = signature
+            self._loaded = True
+            self.stats["reloads"] += 1
+        logger.info(f"Índice de triggers recarregado: {self.stats['rules']} regras habilitadas")
+        return True
+
+    def ensure_loaded(self, session):
+        if not self._loaded:
+            self.refresh(session, force=True)
+
+    def rules_for(self, metric_type, device_type):
+        """Regras da métrica que valem para o tipo de dispositivo (específicas + sem filtro)"""
+        key = (metric_type, device_type)
+        rules = self._merged.get(key)
+        if rules is None:
+            by_type = self._by_metric.get(metric_type, {})
+            rules = tuple(by_type.get(device_type, ())) + tuple(by_type.get(None, ())) if device_type else \
+                tuple(by_type.get(None, ()))
+            self._merged[key] = rules
+        return rules
+
+    def rules_for_metric(self, metric_type):
+        """Todas as regras da métrica, de qualquer tipo de dispositivo"""
+        return [r for rules in self._by_metric.get(metric_type, {}).values() for r in rules]
+
+    def get(self, trigger_id):
+        return self._by_id.get(trigger_id)
+
+    def by_name(self, name):
+        return self._by_name.get(name, [])
+
+
+# Instância global (conferida pelo despachante do Sentinel a cada tick)
+trigger_index = TriggerIndex()
+
+
+@event.listens_for(Trigger, 'after_insert')
+@event.listens_for(Trigger, 'after_update')
+@event.listens_for(Trigger, 'after_delete')
+def _trigger_changed(mapper, connection, target):
+    trigger_index.invalidate()
@@ -0,0 +1,225 @@
+"""
+Violation Tracker - Estado das violações de triggers com duração mínima
+Mapa (device_id, trigger_id) -> janela de violação contínua, dividido em shards com
+lock próprio (os workers do Sentinel avaliam dispositivos diferentes em paralelo).
+A duração é medida pelos timestamps das amostras ingeridas, não pelo relógio de
+quando a violação foi vista; o estado é gravado em trigger_violations a cada
+checkpoint (só o que mudou) e restaurado no início do Sentinel.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import TriggerViolation
+
+logger = logging.getLogger("ViolationTracker")
+
+SHARDS = 16
+# Intervalo sem amostras que quebra a continuidade da janela (além da própria duração do trigger):
+# dispositivo que ficou fora do ar ou em backoff não "acumula" violação sem dados
+MAX_SAMPLE_GAP = 180
+
+
+class ViolationWindow:
+    """Janela contínua de amostras violando um trigger"""
+
+    __slots__ = ('started_at', 'last_sample', 'samples', 'duration_seconds')
+
+    def __init__(self, started_at, duration_seconds, last_sample=None, samples=1):
+        self.started_at = started_at
+        self.last_sample = last_sample or started_at
+        self.samples = samples
+        self.duration_seconds = duration_seconds
+
+    def covered(self):
+        """Segundos cobertos pela janela (da primeira à última amostra violando)"""
+        return (self.last_sample - self.started_at).total_seconds()
+
+
+class _Shard:
+    __slots__ = ('lock', 'devices', 'dirty', 'cleared')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.devices = {}       # {device_id: {trigger_id: ViolationWindow}}
+        self.dirty = set()      # chaves alteradas desde o último checkpoint
+        self.cleared = set()    # chaves removidas desde o último checkpoint
+
+
+class ViolationTracker:
+    """Janelas de violação thread-safe, com checkpoint incremental em SQLite"""
+
+    def __init__(self, shards=SHARDS, max_gap=MAX_SAMPLE_GAP):
+        self.max_gap = max_gap
+        self._shards = [_Shard() for _ in range(shards)]
+        self.stats = {"tracked": 0, "checkpoints": 0, "written": 0, "deleted": 0, "restored": 0}
+
+    def _shard(self, device_id):
+        return self._shards[hash(device_id) % len(self._shards)]
+
+    def observe(self, device_id, trigger_id, violated, duration_seconds, timestamp=None):
+        """
+        Registra uma amostra avaliada contra um trigger.
+
+        Args:
+            violated: Resultado do predicado do trigger para a amostra
+            duration_seconds: Duração mínima do trigger (0 = dispara na primeira amostra)
+            timestamp: Momento da amostra (padrão: agora)
+
+        Returns:
+            bool: True se a violação já cobre a duração mínima (deve alertar)
+        """
+        timestamp = timestamp or datetime.now()
+        duration_seconds = duration_seconds or 0
+        shard = self._shard(device_id)
+        key = (device_id, trigger_id)
+        with shard.lock:
+            windows = shard.devices.get(device_id)
+            window = windows.get(trigger_id) if windows else None
+            if not violated or duration_seconds <= 0:
+                if window is not None:
+                    del windows[trigger_id]
+                    if not windows:
+                        del shard.devices[device_id]
+                    shard.dirty.discard(key)
+                    shard.cleared.add(key)
+                return bool(violated)
+
+            if window is not None and timestamp < window.last_sample:
+                return window.covered() >= duration_seconds  # amostra atrasada: não reabre a janela
+            gap = (timestamp - window.last_sample).total_seconds() if window else None
+            if window is None or gap > max(self.max_gap, duration_seconds):
+                # Primeira violação (ou continuidade quebrada por falta de amostras): nova janela
+                window = ViolationWindow(timestamp, duration_seconds)
+                shard.devices.setdefault(device_id, {})[trigger_id] = window
+            else:
+                window.last_sample = timestamp
+                window.samples += 1
+                window.duration_seconds = duration_seconds
+            shard.dirty.add(key)
+            shard.cleared.discard(key)
+            return window.covered() >= duration_seconds
+
+    def pending_window(self, device_id):
+        """
+        Menor duration_seconds entre as janelas do dispositivo que ainda não cobrem a duração
+        (o agendador acelera a coleta para confirmar ou descartar o alerta). None se não há.
+        """
+        shard = self._shard(device_id)
+        with shard.lock:
+            windows = list((shard.devices.get(device_id) or {}).values())
+        pending = [w.duration_seconds for w in windows if w.covered() < w.duration_seconds]
+        return min(pending) if pending else None
+
+    def forget_device(self, device_id):
+        shard = self._shard(device_id)
+        with shard.lock:
+            for trigger_id in shard.devices.pop(device_id, {}):
+                shard.dirty.discard((device_id, trigger_id))
+                shard.cleared.add((device_id, trigger_id))
+
+    def __len__(self):
+        return sum(len(w) for s in self._shards for w in s.devices.values())
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+    def _drain(self):
+        """Retira as mudanças pendentes de todos os shards: (linhas para upsert, chaves removidas)"""
+        upserts, deletes = [], []
+        for shard in self._shards:
+            with shard.lock:
+                for device_id, trigger_id in shard.dirty:
+                    w = shard.devices[device_id][trigger_id]
+                    upserts.append({'device_id': device_id, 'trigger_id': trigger_id, 'started_at': w.started_at,
+                                    'last_sample': w.last_sample, 'samples': w.samples,
+                                    'duration_seconds': w.duration_seconds})
+                deletes.extend({'d': d, 't': t} for d, t in shard.cleared)
+                shard.dirty, shard.cleared = set(), set()
+        return upserts, deletes
+
+    def _requeue(self, upserts, deletes):
+        """Checkpoint falhou: devolve as chaves para o próximo (sem sobrescrever mudanças mais novas)"""
+        for row in upserts:
+            key = (row['device_id'], row['trigger_id'])
+            shard = self._shard(row['device_id'])
+            with shard.lock:
+                if key not in shard.cleared and row['trigger_id'] in shard.devices.get(row['device_id'], {}):
+                    shard.dirty.add(key)
+        for row in deletes:
+            key = (row['d'], row['t'])
+            shard = self._shard(row['d'])
+            with shard.lock:
+                if row['t'] not in shard.devices.get(row['d'], {}):
+                    shard.cleared.add(key)
+
+    def checkpoint(self, engine=None):
+        """
+        Grava em trigger_violations só as janelas alteradas/removidas desde o último checkpoint.
+
+        Returns:
+            int: Linhas escritas + removidas
+        """
+        if engine is None:
+            from database import engine
+        upserts, deletes = self._drain()
+        if not upserts and not deletes:
+            return 0
+        table = TriggerViolation.__table__
+        try:
+            with engine.begin() as conn:
+                if upserts:
+                    stmt = sqlite_insert(table)
+                    conn.execute(stmt.on_conflict_do_update(
+                        index_elements=['device_id', 'trigger_id'],
+                        set_={c: stmt.excluded[c] for c in ('started_at', 'last_sample', 'samples', 'duration_seconds')}
+                    ), upserts)
+                if deletes:
+                    conn.execute(table.delete().where(
+                        (table.c.device_id == bindparam('d')) & (table.c.trigger_id == bindparam('t'))
+                    ), deletes)
+        except Exception as e:
+            logger.error(f"Erro no checkpoint de violações ({len(upserts)} janelas): {e}")
+            self._requeue(upserts, deletes)
+            return 0
+        self.stats["checkpoints"] += 1
+        self.stats["written"] += len(upserts)
+        self.stats["deleted"] += len(deletes)
+        self.stats["tracked"] = len(self)
+        return len(upserts) + len(deletes)
+
+    def restore(self, session, now=None):
+        """
+        Recarrega as janelas gravadas (início do Sentinel). Janelas cuja última amostra é mais
+        antiga que a tolerância de continuidade são descartadas do banco.
+
+        Returns:
+            int: Janelas restauradas
+        """
+        now = now or datetime.now()
+        restored = 0
+        stale = []
+        for row in session.query(TriggerViolation).all():
+            limit = max(self.max_gap, row.duration_seconds or 0)
+            if now - row.last_sample > timedelta(seconds=limit):
+                stale.append((row.device_id, row.trigger_id))
+                continue
+            shard = self._shard(row.device_id)
+            with shard.lock:
+                shard.devices.setdefault(row.device_id, {})[row.trigger_id] = ViolationWindow(
+                    row.started_at, row.duration_seconds, row.last_sample, row.samples)
+            restored += 1
+        for device_id, trigger_id in stale:
+            shard = self._shard(device_id)
+            with shard.lock:
+                shard.cleared.add((device_id, trigger_id))
+        self.stats["restored"] = restored
+        self.stats["tracked"] = len(self)
+        logger.info(f"Violações restauradas: {restored} ({len(stale)} expiradas)")
+        return restored
+
+
+# Instância global (checkpoint pelo despachante do Sentinel; restore no start)
+violation_tracker = ViolationTracker()
@@ -1,297 +1,522 @@
 """
 WMI Helper - Coleta de métricas de dispositivos Windows remotos
-Suporta: CPU, RAM, Disco, Processos, Versão do Windows, Status de Updates
+Suporta: CPU, RAM, Disco, Processos, Versão do Windows, Uptime
+
+Conexões DCOM ficam em um pool por host (reaproveitadas entre ciclos, expiradas por
+ociosidade) e cada coleta roda um plano fixo de 4 consultas WQL com só as propriedades
+necessárias. O acesso ao WMI passa por um transporte (WmiTransport) substituível:
+o padrão usa o pacote `wmi` (pywin32); testes usam um backend falso.
 """
-import wmi
+import re
+import time
 import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from datetime import datetime
 
 logger = logging.getLogger("WMIHelper")
 
+# Plano de consultas por host: uma consulta por classe, só as propriedades usadas
+QUERY_CPU = "SELECT LoadPercentage FROM Win32_Processor"
+QUERY_OS = ("SELECT Caption, BuildNumber, ServicePackMajorVersion, TotalVisibleMemorySize, "
+            "FreePhysicalMemory, LastBootUpTime FROM Win32_OperatingSystem")
+QUERY_DISKS = "SELECT DeviceID, Size, FreeSpace FROM Win32_LogicalDisk WHERE DriveType = 3"
+# WQL não tem ORDER BY/TOP: o filtro por WorkingSetSize corta no servidor os processos pequenos
+QUERY_PROCESSES = "SELECT Name, ProcessId, WorkingSetSize FROM Win32_Process WHERE WorkingSetSize > {min_bytes}"
+
+TOP_PROCESSES = 10
+# Corte inicial do filtro de processos; depois se ajusta ao N-ésimo maior visto no host
+DEFAULT_PROCESS_MIN_BYTES = 50 * 1024 * 1024
+# Sessões sem uso por mais que isso são fechadas
+IDLE_TIMEOUT = 300
+
+OBSOLETE_VERSIONS = [
+    'Windows XP',
+    'Windows Vista',
+    'Windows 7',
+    'Windows 8',
+    'Server 2003',
+    'Server 2008',
+    'Server 2012'
+]
+
+_SELECT_RE = re.compile(r"^\s*SELECT\s+(.+?)\s+FROM\s", re.IGNORECASE)
+
+
+def wql_properties(wql):
+    """Propriedades da cláusula SELECT ('*' = todas)"""
+    match = _SELECT_RE.match(wql)
+    if not match:
+        return []
+    return [p.strip() for p in match.group(1).split(',')]
+
+
+# ----------------------------------------------------------------------
+# Transporte
+# ----------------------------------------------------------------------
+class WmiTransport(ABC):
+    """Interface de acesso WMI: abre sessões com um host"""
+
+    @abstractmethod
+    def connect(self, host, user=None, password=None):
+        """
+        Returns:
+            WmiSession conectada (exceção em caso de falha)
+        """
+
+
+class WmiSession(ABC):
+    """Sessão aberta com um host"""
+
+    @abstractmethod
+    def query(self, wql):
+        """Executa a WQL e retorna [{propriedade: valor}] com as propriedades do SELECT"""
+
+    def close(self):
+        pass
+
+
+class _PyWmiSession(WmiSession):
+    def __init__(self, connection):
+        self.connection = connection
+
+    def query(self, wql):
+        props = wql_properties(wql)
+        return [{p: getattr(row, p, None) for p in props} for row in self.connection.query(wql)]
+
+    def close(self):
+        self.connection = None
+
+
+class PyWmiTransport(WmiTransport):
+    """
+    Transporte DCOM via pacote `wmi` (Windows).
+
+    As sessões são compartilhadas entre as threads do Sentinel: as threads precisam
+    estar no apartamento multithread do COM (CoInitializeEx(COINIT_MULTITHREADED)).
+    """
+
+    def connect(self, host, user=None, password=None):
+        import wmi
+        if user and password:
+            # Conexão remota autenticada
+            connection = wmi.WMI(computer=host, user=user, password=password)
+        else:
+            # Conexão local
+            connection = wmi.WMI()
+        return _PyWmiSession(connection)
+
+
+# ----------------------------------------------------------------------
+# Interpretação das consultas
+# ----------------------------------------------------------------------
+def _num(value, default=0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def is_windows_obsolete(version_string):
+    """
+    Verifica se a versão do Windows está obsoleta
+
+    Args:
+        version_string: String da versão (ex: "Microsoft Windows 7 Professional")
+    """
+    version_string = (version_string or '').lower()
+    return any(obsolete.lower() in version_string for obsolete in OBSOLETE_VERSIONS)
+
+
+def parse_cpu(rows):
+    """Média de LoadPercentage entre os processadores (0-100)"""
+    loads = [_num(r.get('LoadPercentage'), None) for r in rows]
+    loads = [l for l in loads if l is not None]
+    return round(sum(loads) / len(loads), 2) if loads else None
+
+
+def parse_memory(os_info):
+    total_memory = _num(os_info.get('TotalVisibleMemorySize'))
+    free_memory = _num(os_info.get('FreePhysicalMemory'))
+    if not total_memory:
+        return None
+    used_memory = total_memory - free_memory
+    return {
+        'percent': round((used_memory / total_memory) * 100, 2),
+        'total_gb': round(total_memory / (1024 * 1024), 2),
+        'available_gb': round(free_memory / (1024 * 1024), 2)
+    }
+
+
+def parse_version(os_info):
+    version_string = os_info.get('Caption') or ''
+    return {
+        'version': version_string,
+        'build': os_info.get('BuildNumber'),
+        'is_obsolete': is_windows_obsolete(version_string),
+        'service_pack': os_info.get('ServicePackMajorVersion') or 0
+    }
+
+
+def parse_uptime(os_info, now=None):
+    boot_time = os_info.get('LastBootUpTime')
+    if not boot_time:
+        return None
+    # Formato CIM_DATETIME: yyyymmddHHMMSS.mmmmmm+UUU
+    boot_dt = datetime.strptime(str(boot_time).split('.')[0], '%Y%m%d%H%M%S')
+    return int(((now or datetime.now()) - boot_dt).total_seconds())
+
+
+def parse_disks(rows):
+    disks = []
+    for disk in rows:
+        size = _num(disk.get('Size'))
+        if not size:
+            continue
+        total_gb = size / (1024**3)
+        free_gb = _num(disk.get('FreeSpace')) / (1024**3)
+        disks.append({
+            'drive': disk.get('DeviceID'),
+            'percent': round(((total_gb - free_gb) / total_gb) * 100, 2),
+            'free_gb': round(free_gb, 2),
+            'total_gb': round(total_gb, 2)
+        })
+    return disks
+
+
+def parse_processes(rows, top_n=TOP_PROCESSES):
+    """Top N por memória (WorkingSetSize em bytes)"""
+    processes = []
+    for process in rows:
+        processes.append({
+            'name': process.get('Name'),
+            'memory_mb': round(_num(process.get('WorkingSetSize')) / (1024 * 1024), 2),
+            'pid': process.get('ProcessId')
+        })
+    processes.sort(key=lambda x: x['memory_mb'], reverse=True)
+    return processes[:top_n]
+
+
+# ----------------------------------------------------------------------
+# Pool de sessões
+# ----------------------------------------------------------------------
+class _PooledSession:
+    __slots__ = ('session', 'last_used', 'lock', 'process_min_bytes')
+
+    def __init__(self, session):
+        self.session = session
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        self.process_min_bytes = DEFAULT_PROCESS_MIN_BYTES
+
+
+class WmiSessionPool:
+    """Uma sessão por (host, usuário), reaproveitada entre coletas e fechada após ociosidade"""
+
+    def __init__(self, transport=None, idle_timeout=IDLE_TIMEOUT, clock=time.monotonic):
+        """
+        Args:
+            transport: WmiTransport (padrão: PyWmiTransport)
+            idle_timeout: Segundos sem uso até a sessão ser fechada
+            clock: Relógio (injetável para testes)
+        """
+        self.transport = transport or PyWmiTransport()
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._entries = {}
+        self._connecting = {}
+        self._lock = threading.Lock()
+        self.stats = {"connects": 0, "reused": 0, "expired": 0, "errors": 0, "queries": 0}
+
+    def _close(self, entry):
+        try:
+            entry.session.close()
+        except Exception:
+            pass
+
+    def close_idle(self):
+        """Fecha sessões ociosas além do idle_timeout. Retorna quantas foram fechadas."""
+        now = self.clock()
+        with self._lock:
+            expired = [(k, e) for k, e in self._entries.items()
+                       if now - e.last_used > self.idle_timeout and not e.lock.locked()]
+            for key, _ in expired:
+                del self._entries[key]
+            self.stats["expired"] += len(expired)
+        for _, entry in expired:
+            self._close(entry)
+        return len(expired)
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._close(entry)
+
+    def discard(self, host, user=None):
+        """Descarta a sessão do host (ex: após erro de RPC); a próxima coleta reconecta"""
+        with self._lock:
+            entry = self._entries.pop((host, user), None)
+        if entry:
+            self._close(entry)
+
+    def _entry(self, host, user, password):
+        key = (host, user)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self.stats["reused"] += 1
+                return entry
+            # Um connect por host por vez; outros hosts conectam em paralelo
+            connecting = self._connecting.setdefault(key, threading.Lock())
+        with connecting:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry:
+                    self.stats["reused"] += 1
+                    return entry
+            try:
+                entry = _PooledSession(self.transport.connect(host, user, password))
+            except Exception:
+                with self._lock:
+                    self._connecting.pop(key, None)
+                raise
+            with self._lock:
+                self._entries[key] = entry
+                self._connecting.pop(key, None)
+                self.stats["connects"] += 1
+            return entry
+
+    @contextmanager
+    def session(self, host, user=None, password=None):
+        """
+        Sessão exclusiva com o host durante o bloco (criada sob demanda).
+
+        Yields:
+            _PooledSession (session + estado por host)
+        """
+        self.close_idle()
+        entry = self._entry(host, user, password)
+        with entry.lock:
+            try:
+                yield entry
+            finally:
+                entry.last_used = self.clock()
+
+    def query(self, entry, wql):
+        self.stats["queries"] += 1
+        return entry.session.query(wql)
+
+    def _run_plan(self, entry, top_n):
+        """Plano fixo de consultas; cada falha isolada vira None no campo correspondente"""
+        out = {}
+        failures = 0
+        for name, wql in (('cpu', QUERY_CPU), ('os', QUERY_OS), ('disks', QUERY_DISKS)):
+            try:
+                out[name] = self.query(entry, wql)
+            except Exception as e:
+                failures += 1
+                out[name] = None
+                logger.debug(f"WQL falhou ({name}): {e}")
+        try:
+            rows = self.query(entry, QUERY_PROCESSES.format(min_bytes=entry.process_min_bytes))
+            if len(rows) < top_n and entry.process_min_bytes:
+                # Corte alto demais para este host: repete sem filtro (raro; o corte se ajusta abaixo)
+                rows = self.query(entry, QUERY_PROCESSES.format(min_bytes=0))
+            out['processes'] = rows
+            top = sorted((_num(r.get('WorkingSetSize')) for r in rows), reverse=True)
+            # Próximo corte: metade do N-ésimo maior (folga para processos que crescem)
+            entry.process_min_bytes = int(top[top_n - 1] / 2) if len(top) >= top_n else 0
+        except Exception as e:
+            failures += 1
+            out['processes'] = None
+            logger.debug(f"WQL falhou (processes): {e}")
+        return out, failures == 4
+
+    def collect(self, host, user=None, password=None, top_n=TOP_PROCESSES):
+        """
+        Coleta CPU, RAM, discos, top N processos, versão e uptime de um host.
+
+        Returns:
+            dict no formato de get_windows_metrics, ou None se o host não responde
+        """
+        for attempt in (1, 2):
+            try:
+                with self.session(host, user, password) as entry:
+                    raw, broken = self._run_plan(entry, top_n)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Erro ao conectar WMI em {host}: {e}")
+                return None
+            if not broken:
+                break
+            # Todas as consultas falharam: sessão provavelmente morta (reboot, RPC); reconecta uma vez
+            self.stats["errors"] += 1
+            self.discard(host, user)
+            if attempt == 2:
+                logger.error(f"Erro ao coletar métricas WMI de {host}: sessão sem resposta")
+                return None
+
+        os_rows = raw['os'] or []
+        os_info = os_rows[0] if os_rows else {}
+        return {
+            'cpu_percent': parse_cpu(raw['cpu']) if raw['cpu'] is not None else None,
+            'memory': parse_memory(os_info) if os_info else None,
+            'disks': parse_disks(raw['disks']) if raw['disks'] is not None else None,
+            'processes': parse_processes(raw['processes'], top_n) if raw['processes'] is not None else None,
+            'windows_version': parse_version(os_info) if os_info else None,
+            'uptime_seconds': parse_uptime(os_info) if os_info else None,
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+# Instância global (sessões DCOM reaproveitadas entre os ciclos do Sentinel)
+wmi_pool = WmiSessionPool()
+
+
 class WMICollector:
-    """Coletor de métricas via WMI para Windows remotos"""
-    
-    def __init__(self, ip, username=None, password=None, domain=None):
+    """Coletor de métricas via WMI para Windows remotos (sessão própria, fora do pool)"""
+
+    def __init__(self, ip, username=None, password=None, domain=None, transport=None):
         """
         Inicializa conexão WMI
-        
+
         Args:
             ip: IP do dispositivo Windows
             username: Usuário com permissão WMI (opcional para localhost)
             password: Senha do usuário
             domain: Domínio (opcional)
+            transport: WmiTransport (padrão: PyWmiTransport)
         """
         self.ip = ip
         self.username = username
         self.password = password
         self.domain = domain
+        self.transport = transport or PyWmiTransport()
         self.connection = None
-        
+
     def connect(self):
         """Estabelece conexão WMI"""
         try:
-            if self.username and self.password:
-                # Conexão remota autenticada
-                connection_string = f"\\\\{self.ip}\\root\\cimv2"
-                if self.domain:
-                    user = f"{self.domain}\\{self.username}"
-                else:
-                    user = self.username
-                    
-                self.connection = wmi.WMI(
-                    computer=self.ip,
-                    user=user,
-                    password=self.password
-                )
-            else:
-                # Conexão local
-                self.connection = wmi.WMI()
-                
+            self.connection = self.transport.connect(self.ip, _qualified_user(self.username, self.domain), self.password)
             return True
         except Exception as e:
             logger.error(f"Erro ao conectar WMI em {self.ip}: {e}")
             return False
-    
+
+    def _query(self, wql):
+        if not self.connection and not self.connect():
+            return None
+        return self.connection.query(wql)
+
+    def _os_info(self):
+        rows = self._query(QUERY_OS)
+        return rows[0] if rows else None
+
     def get_cpu_usage(self):
-        """
-        Retorna uso de CPU em percentual
-        
-        Returns:
-            float: Percentual de uso de CPU (0-100)
-        """
+        """Retorna uso de CPU em percentual (0-100)"""
         try:
-            if not self.connection:
-                if not self.connect():
-                    return None
-                    
-            cpu_info = self.connection.Win32_Processor()[0]
-            return float(cpu_info.LoadPercentage)
+            rows = self._query(QUERY_CPU)
+            return parse_cpu(rows) if rows is not None else None
         except Exception as e:
             logger.error(f"Erro ao coletar CPU de {self.ip}: {e}")
             return None
-    
+
     def get_memory_usage(self):
-        """
-        Retorna uso de memória RAM em percentual
-        
-        Returns:
-            dict: {'percent': float, 'total_gb': float, 'available_gb': float}
-        """
+        """Retorna uso de memória RAM: {'percent', 'total_gb', 'available_gb'}"""
         try:
-            if not self.connection:
-                if not self.connect():
-                    return None
-                    
-            os_info = self.connection.Win32_OperatingSystem()[0]
-            total_memory = int(os_info.TotalVisibleMemorySize)
-            free_memory = int(os_info.FreePhysicalMemory)
-            used_memory = total_memory - free_memory
-            
-            percent = (used_memory / total_memory) * 100
-            total_gb = total_memory / (1024 * 1024)
-            available_gb = free_memory / (1024 * 1024)
-            
-            return {
-                'percent': round(percent, 2),
-                'total_gb': round(total_gb, 2),
-                'available_gb': round(available_gb, 2)
-            }
+            os_info = self._os_info()
+            return parse_memory(os_info) if os_info else None
         except Exception as e:
             logger.error(f"Erro ao coletar RAM de {self.ip}: {e}")
             return None
-    
+
     def get_disk_usage(self):
-        """
-        Retorna uso de todos os discos
-        
-        Returns:
-            list: [{'drive': 'C:', 'percent': 45.2, 'free_gb': 100, 'total_gb': 500}, ...]
-        """
+        """Retorna uso dos discos locais: [{'drive', 'percent', 'free_gb', 'total_gb'}, ...]"""
         try:
-            if not self.connection:
-                if not self.connect():
-                    return None
-                    
-            disks = []
-            for disk in self.connection.Win32_LogicalDisk(DriveType=3):  # DriveType 3 = Local Disk
-                if disk.Size:
-                    total_gb = int(disk.Size) / (1024**3)
-                    free_gb = int(disk.FreeSpace) / (1024**3)
-                    used_gb = total_gb - free_gb
-                    percent = (used_gb / total_gb) * 100
-                    
-                    disks.append({
-                        'drive': disk.DeviceID,
-                        'percent': round(percent, 2),
-                        'free_gb': round(free_gb, 2),
-                        'total_gb': round(total_gb, 2)
-                    })
-            
-            return disks
+            rows = self._query(QUERY_DISKS)
+            return parse_disks(rows) if rows is not None else None
         except Exception as e:
             logger.error(f"Erro ao coletar discos de {self.ip}: {e}")
             return None
-    
-    def get_running_processes(self, top_n=10):
-        """
-        Retorna processos em execução ordenados por uso de memória
-        
-        Args:
-            top_n: Número de processos a retornar
-            
-        Returns:
-            list: [{'name': 'chrome.exe', 'memory_mb': 512, 'cpu_percent': 5}, ...]
-        """
+
+    def get_running_processes(self, top_n=TOP_PROCESSES):
+        """Retorna os top N processos por memória: [{'name', 'memory_mb', 'pid'}, ...]"""
         try:
-            if not self.connection:
-                if not self.connect():
-                    return None
-                    
-            processes = []
-            for process in self.connection.Win32_Process():
-                try:
-                    # WorkingSetSize está em bytes
-                    memory_mb = int(process.WorkingSetSize or 0) / (1024 * 1024)
-                    
-                    processes.append({
-                        'name': process.Name,
-                        'memory_mb': round(memory_mb, 2),
-                        'pid': process.ProcessId
-                    })
-                except:
-                    continue
-            
-            # Ordenar por uso de memória
-            processes.sort(key=lambda x: x['memory_mb'], reverse=True)
-            return processes[:top_n]
+            rows = self._query(QUERY_PROCESSES.format(min_bytes=0))
+            return parse_processes(rows, top_n) if rows is not None else None
         except Exception as e:
             logger.error(f"Erro ao coletar processos de {self.ip}: {e}")
             return None
-    
+
     def get_windows_version(self):
-        """
-        Retorna informações sobre a versão do Windows
-        
-        Returns:
-            dict: {'version': 'Windows 10', 'build': '19045', 'is_obsolete': False}
-        """
+        """Retorna {'version', 'build', 'is_obsolete', 'service_pack'}"""
         try:
-            if not self.connection:
-                if not self.connect():
-                    return None
-                    
-            os_info = self.connection.Win32_OperatingSystem()[0]
-            version_string = os_info.Caption
-            build_number = os_info.BuildNumber
-            
-            # Detectar se é obsoleto
-            is_obsolete = self._is_windows_obsolete(version_string)
-            
-            return {
-                'version': version_string,
-                'build': build_number,
-                'is_obsolete': is_obsolete,
-                'service_pack': os_info.ServicePackMajorVersion or 0
-            }
+            os_info = self._os_info()
+            return parse_version(os_info) if os_info else None
         except Exception as e:
             logger.error(f"Erro ao coletar versão do Windows de {self.ip}: {e}")
             return None
-    
+
     def _is_windows_obsolete(self, version_string):
-        """
-        Verifica se a versão do Windows está obsoleta
-        
-        Args:
-            version_string: String da versão (ex: "Microsoft Windows 7 Professional")
-            
-        Returns:
-            bool: True se obsoleto
-        """
-        obsolete_versions = [
-            'Windows XP',
-            'Windows Vista',
-            'Windows 7',
-            'Windows 8',
-            'Server 2003',
-            'Server 2008',
-            'Server 2012'
-        ]
-        
-        for obsolete in obsolete_versions:
-            if obsolete.lower() in version_string.lower():
-                return True
-        
-        return False
-    
+        return is_windows_obsolete(version_string)
+
     def get_uptime(self):
-        """
-        Retorna uptime do sistema em segundos
-        
-        Returns:
-            int: Uptime em segundos
-        """
+        """Retorna uptime do sistema em segundos"""
         try:
-            if not self.connection:
-                if not self.connect():
-                    return None
-                    
-            os_info = self.connection.Win32_OperatingSystem()[0]
-            boot_time = os_info.LastBootUpTime
-            
-            # Converter formato WMI para datetime
-            boot_dt = datetime.strptime(boot_time.split('.')[0], '%Y%m%d%H%M%S')
-            uptime_seconds = int((datetime.now() - boot_dt).total_seconds())
-            
-            return uptime_seconds
+            os_info = self._os_info()
+            return parse_uptime(os_info) if os_info else None
         except Exception as e:
             logger.error(f"Erro ao coletar uptime de {self.ip}: {e}")
             return None
-    
+
     def get_all_metrics(self):
-        """
-        Coleta todas as métricas de uma vez
-        
-        Returns:
-            dict: Dicionário com todas as métricas
-        """
-        if not self.connection:
-            if not self.connect():
-                return None
-        
-        return {
-            'cpu_percent': self.get_cpu_usage(),
-            'memory': self.get_memory_usage(),
-            'disks': self.get_disk_usage(),
-            'processes': self.get_running_processes(),
-            'windows_version': self.get_windows_version(),
-            'uptime_seconds': self.get_uptime(),
-            'timestamp': datetime.now().isoformat()
-        }
-    
+        """Coleta todas as métricas com o plano de consultas do pool (uma consulta por classe)"""
+        if not self.connection and not self.connect():
+            return None
+        pool = WmiSessionPool(transport=_FixedTransport(self.connection))
+        return pool.collect(self.ip)
+
     def close(self):
         """Fecha conexão WMI"""
         try:
             if self.connection:
+                self.connection.close()
                 self.connection = None
         except:
             pass
 
 
+class _FixedTransport(WmiTransport):
+    """Adapta uma sessão já aberta ao pool (usado por WMICollector.get_all_metrics)"""
+
+    def __init__(self, session):
+        self._session = session
+
+    def connect(self, host, user=None, password=None):
+        return self._session
+
+
+def _qualified_user(username, domain):
+    if username and domain:
+        return f"{domain}\\{username}"
+    return username
+
+
 # Função helper para uso rápido
 def get_windows_metrics(ip, username=None, password=None, domain=None):
     """
-    Função wrapper para coletar métricas rapidamente
-    
+    Função wrapper para coletar métricas rapidamente (sessão reaproveitada do pool)
+
     Args:
         ip: IP do dispositivo
         username: Usuário (opcional)
         password: Senha (opcional)
         domain: Domínio (opcional)
-        
+
     Returns:
         dict: Métricas coletadas ou None em caso de erro
     """
-    collector = WMICollector(ip, username, password, domain)
-    metrics = collector.get_all_metrics()
-    collector.close()
-    return metrics
+    return wmi_pool.collect(ip, _qualified_user(username, domain), password)